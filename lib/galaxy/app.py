@@ -290,7 +290,7 @@ class UniverseApplication(StructuredApp, GalaxyManagerApplication):
             model=self.security_agent.model,
             permitted_actions=self.security_agent.permitted_actions)
         # Load quota management.
-        self.quota_agent = self._register_singleton(QuotaAgent, get_quota_agent(self.config, self.model))
+        self.quota_agent = self._register_singleton(QuotaAgent, get_quota_agent(self.config, self.model, queue_worker=self.queue_worker))
         # Heartbeat for thread profiling
         self.heartbeat = None
         self.auth_manager = self._register_singleton(auth.AuthManager, auth.AuthManager(self.config))
@@ -322,6 +322,15 @@ class UniverseApplication(StructuredApp, GalaxyManagerApplication):
                 time_execution=True)
             self.application_stack.register_postfork_function(self.prune_history_audit_task.start)
             self.haltables.append(("HistoryAuditTablePruneTask", self.prune_history_audit_task.shutdown))
+        if not self.config.enable_celery_tasks and self.config.disk_usage_ledger_interval > 0:
+            self.apply_disk_usage_deltas_task = IntervalTask(
+                func=lambda: galaxy.model.UserDiskUsageDelta.apply(self.model.session),
+                name="ApplyDiskUsageDeltasTask",
+                interval=self.config.disk_usage_ledger_interval,
+                immediate_start=False,
+                time_execution=True)
+            self.application_stack.register_postfork_function(self.apply_disk_usage_deltas_task.start)
+            self.haltables.append(("ApplyDiskUsageDeltasTask", self.apply_disk_usage_deltas_task.shutdown))
         # Start the job manager
         self.application_stack.register_postfork_function(self.job_manager.start)
         self.proxy_manager = ProxyManager(self.config)
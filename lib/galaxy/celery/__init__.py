@@ -60,16 +60,31 @@ def get_history_audit_table_prune_interval():
         return 3600
 
 
+def get_disk_usage_ledger_interval():
+    config = get_config()
+    if config:
+        return config.disk_usage_ledger_interval
+    else:
+        return 0
+
+
 broker = get_broker()
 celery_app = Celery('galaxy', broker=broker, include=['galaxy.celery.tasks'])
+beat_schedule = {}
 prune_interval = get_history_audit_table_prune_interval()
 if prune_interval > 0:
-    celery_app.conf.beat_schedule = {
-        'prune-history-audit-table': {
-            'task': 'galaxy.celery.tasks.prune_history_audit_table',
-            'schedule': prune_interval,
-        },
+    beat_schedule['prune-history-audit-table'] = {
+        'task': 'galaxy.celery.tasks.prune_history_audit_table',
+        'schedule': prune_interval,
+    }
+disk_usage_ledger_interval = get_disk_usage_ledger_interval()
+if disk_usage_ledger_interval > 0:
+    beat_schedule['apply-disk-usage-deltas'] = {
+        'task': 'galaxy.celery.tasks.apply_disk_usage_deltas',
+        'schedule': disk_usage_ledger_interval,
     }
+if beat_schedule:
+    celery_app.conf.beat_schedule = beat_schedule
 celery_app.conf.timezone = 'UTC'
 
 
@@ -83,3 +83,32 @@ def prune_history_audit_table(sa_session: scoped_session):
     timer = ExecutionTimer()
     model.HistoryAudit.prune(sa_session)
     log.debug(f"Successfully pruned history_audit table {timer}")
+
+
+@celery_app.task
+@galaxy_task
+def apply_disk_usage_deltas(sa_session: scoped_session):
+    """Add pending changes recorded in the user_disk_usage_delta table to the users' disk usage."""
+    timer = ExecutionTimer()
+    applied = model.UserDiskUsageDelta.apply(sa_session)
+    log.debug(f"Applied {applied} disk usage changes {timer}")
+
+
+@celery_app.task(ignore_result=True)
+@galaxy_task
+def reconcile_user_disk_usage(sa_session: scoped_session, user_ids):
+    """Recalculate the disk usage of a chunk of users and correct any drift."""
+    timer = ExecutionTimer()
+    drift = model.User.reconcile_disk_usage(sa_session, user_ids)
+    for user_id, (old_usage, new_usage) in drift.items():
+        log.info(f"Disk usage of user {user_id} drifted by {old_usage - new_usage} bytes, corrected to {new_usage}")
+    log.debug(f"Reconciled disk usage of {len(user_ids)} users ({len(drift)} drifted) {timer}")
+
+
+@celery_app.task(ignore_result=True)
+@galaxy_task
+def reconcile_all_user_disk_usage(sa_session: scoped_session, chunk_size=1000):
+    """Queue disk usage reconciliation of all users in chunks that workers process in parallel."""
+    user_ids = [row[0] for row in sa_session.query(model.User.id).order_by(model.User.id)]
+    for i in range(0, len(user_ids), chunk_size):
+        reconcile_user_disk_usage.delay(user_ids=user_ids[i:i + chunk_size])
@@ -1267,7 +1267,7 @@ class ConfiguresGalaxyMixin:
 
     def _configure_security(self):
         from galaxy.security import idencoding
-        self.security = idencoding.IdEncodingHelper(id_secret=self.config.id_secret)
+        self.security = idencoding.IdEncodingHelper(id_secret=self.config.id_secret, cache_size=self.config.id_encoding_cache_size)
 
     def _configure_tool_shed_registry(self):
         import galaxy.tool_shed.tool_shed_registry
@@ -1295,6 +1295,10 @@ class ConfiguresGalaxyMixin:
             from galaxy.model import custom_types
             custom_types.MAX_METADATA_VALUE_SIZE = self.config.max_metadata_value_size
 
+        if getattr(self.config, "disk_usage_ledger_interval", 0) > 0:
+            from galaxy.model import User
+            User.use_disk_usage_ledger = True
+
         if check_migrate_databases:
             # Initialize database / check for appropriate schema version.  # If this
             # is a new installation, we'll restrict the tool migration messaging.
@@ -245,6 +245,7 @@ class Bref3(Binary):
     def __init__(self, **kwd):
         super().__init__(**kwd)
         self._magic = binascii.unhexlify("7a8874f400156272")
+        self.magic_numbers = [self._magic]
 
     def sniff_prefix(self, sniff_prefix):
         return sniff_prefix.startswith_bytes(self._magic)
@@ -868,6 +869,7 @@ class H5(Binary):
     def __init__(self, **kwd):
         super().__init__(**kwd)
         self._magic = binascii.unhexlify("894844460d0a1a0a")
+        self.magic_numbers = [self._magic]
 
     def sniff(self, filename):
         # The first 8 bytes of any hdf5 file are 0x894844460d0a1a0a
@@ -1209,6 +1211,11 @@ class GmxBinary(Binary):
     magic_number: Optional[int] = None  # variables to be overwritten in the child class
     file_ext = ""
 
+    def __init__(self, **kwd):
+        super().__init__(**kwd)
+        if self.magic_number is not None:
+            self.magic_numbers = [struct.pack('>1i', self.magic_number)]
+
     def sniff_prefix(self, sniff_prefix):
         # The first 4 bytes of any GROMACS binary file containing the magic number
         return sniff_prefix.magic_header('>1i') == self.magic_number
@@ -1645,6 +1652,7 @@ class Sff(Binary):
     edam_format = "format_3284"
     edam_data = "data_0924"
     file_ext = "sff"
+    magic_numbers = [b'.sff']
 
     def sniff_prefix(self, sniff_prefix):
         # The first 4 bytes of any sff file is '.sff', and the file is binary. For details
@@ -1682,6 +1690,7 @@ class BigWig(Binary):
     def __init__(self, **kwd):
         super().__init__(**kwd)
         self._magic = 0x888FFC26
+        self.magic_numbers = [struct.pack("I", self._magic)]
         self._name = "BigWig"
 
     def sniff_prefix(self, sniff_prefix):
@@ -1712,6 +1721,7 @@ class BigBed(BigWig):
     def __init__(self, **kwd):
         Binary.__init__(self, **kwd)
         self._magic = 0x8789F2EB
+        self.magic_numbers = [struct.pack("I", self._magic)]
         self._name = "BigBed"
 
 
@@ -1721,6 +1731,7 @@ class TwoBit(Binary):
     edam_format = "format_3009"
     edam_data = "data_0848"
     file_ext = "twobit"
+    magic_numbers = [struct.pack(">L", TWOBIT_MAGIC_NUMBER), struct.pack(">L", TWOBIT_MAGIC_NUMBER_SWAP)]
 
     def sniff_prefix(self, sniff_prefix):
         magic = sniff_prefix.magic_header(">L")
@@ -1748,6 +1759,7 @@ class SQlite(Binary):
     MetadataElement(name="table_row_count", default={}, param=DictParameter, desc="Database Table Row Count", readonly=True, visible=True, no_value={})
     file_ext = "sqlite"
     edam_format = "format_3621"
+    magic_numbers = [b'SQLite format 3\0']
 
     def init_meta(self, dataset, copy_from=None):
         Binary.init_meta(self, dataset, copy_from=copy_from)
@@ -2342,6 +2354,7 @@ class ExcelXls(Binary):
 class Sra(Binary):
     """ Sequence Read Archive (SRA) datatype originally from mdshw5/sra-tools-galaxy"""
     file_ext = 'sra'
+    magic_numbers = [b'NCBI.sra']
 
     def sniff_prefix(self, sniff_prefix):
         """ The first 8 bytes of any NCBI sra file is 'NCBI.sra', and the file is binary.
@@ -2750,6 +2763,7 @@ class NetCDF(Binary):
     file_ext = "netcdf"
     edam_format = "format_3650"
     edam_data = "data_0943"
+    magic_numbers = [b'CDF']
 
     def set_peek(self, dataset, is_multi_byte=False):
         if not dataset.dataset.purged:
@@ -2889,6 +2903,7 @@ class DAA(Binary):
     def __init__(self, **kwd):
         super().__init__(**kwd)
         self._magic = binascii.unhexlify("6be33e6d47530e3c")
+        self.magic_numbers = [self._magic]
 
     def sniff_prefix(self, sniff_prefix):
         # The first 8 bytes of any daa file are 0x3c0e53476d3ee36b
@@ -2912,6 +2927,7 @@ class RMA6(Binary):
     def __init__(self, **kwd):
         super().__init__(**kwd)
         self._magic = binascii.unhexlify("000003f600000006")
+        self.magic_numbers = [self._magic]
 
     def sniff_prefix(self, sniff_prefix):
         return sniff_prefix.startswith_bytes(self._magic)
@@ -2934,6 +2950,7 @@ class DMND(Binary):
     def __init__(self, **kwd):
         super().__init__(**kwd)
         self._magic = binascii.unhexlify("6d18ee15a4f84a02")
+        self.magic_numbers = [self._magic]
 
     def sniff_prefix(self, sniff_prefix):
         # The first 8 bytes of any dmnd file are 0x24af8a415ee186d
@@ -2980,6 +2997,7 @@ class Parquet(Binary):
     def __init__(self, **kwd):
         super().__init__(**kwd)
         self._magic = b"PAR1"  # Defined at https://parquet.apache.org/documentation/latest/
+        self.magic_numbers = [self._magic]
 
     def sniff_prefix(self, sniff_prefix):
         return sniff_prefix.startswith_bytes(self._magic)
@@ -6,7 +6,7 @@ import shutil
 import string
 import tempfile
 from inspect import isclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import webob.exc
 from markupsafe import escape
@@ -14,6 +14,7 @@ from markupsafe import escape
 from galaxy import util
 from galaxy.datatypes.metadata import MetadataElement  # import directly to maintain ease of use in Datatype class definitions
 from galaxy.datatypes.sniff import build_sniff_from_prefix
+from galaxy.datatypes.util import block_scan
 from galaxy.util import (
     compression_utils,
     FILENAME_VALID_CHARS,
@@ -122,6 +123,9 @@ class Data(metaclass=DataMeta):
     # The dataset contains binary data --> do not space_to_tab or convert newlines, etc.
     # Allow binary file uploads of this type when True.
     is_binary = True
+    # Byte strings one of which files of this datatype start with, the sniffer of the datatype
+    # is skipped for files starting with none of them (see galaxy.datatypes.sniff.SnifferIndex).
+    magic_numbers: Optional[List[bytes]] = None
     # Composite datatypes
     composite_type: Optional[str] = None
     composite_files: Dict[str, Any] = {}
@@ -827,24 +831,7 @@ class Text(Data):
         Count the number of lines of data in dataset,
         skipping all blank lines and comments.
         """
-        CHUNK_SIZE = 2 ** 15  # 32Kb
-        data_lines = 0
-        with compression_utils.get_fileobj(dataset.file_name) as in_file:
-            # FIXME: Potential encoding issue can prevent the ability to iterate over lines
-            # causing set_meta process to fail otherwise OK jobs. A better solution than
-            # a silent try/except is desirable.
-            try:
-                while True:
-                    line = in_file.readline(CHUNK_SIZE)
-                    if not line:
-                        break
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        data_lines += 1
-            except UnicodeDecodeError:
-                log.error(f'Unable to count lines in file {dataset.file_name}')
-                data_lines = None
-        return data_lines
+        return block_scan.count_data_lines(dataset.file_name)
 
     def set_peek(self, dataset, line_count=None, is_multi_byte=False, WIDTH=256, skipchars=None, line_wrap=True, **kwd):
         """
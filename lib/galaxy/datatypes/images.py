@@ -331,6 +331,17 @@ class Mrc2014(Binary):
     file_ext = 'mrc'
 
     def sniff(self, filename):
+        # Only validate files with the map ID string at the offset mrcfile.open()
+        # checks, or that it may decompress, validating other files is slow.
+        try:
+            with open(filename, 'rb') as fh:
+                start = fh.read(212)
+        except OSError:
+            return False
+        if start[-4:] != b'MAP ' and start[:2] not in (b'\x1f\x8b', b'BZ'):
+            return False
+        if start[-4:] == b'MAP ' and len(start) < 212:
+            return False
         # Handle the wierdness of mrcfile:
         # https://github.com/ccpem/mrcfile/blob/master/mrcfile/validator.py#L88
         try:
@@ -25,6 +25,7 @@ from galaxy.datatypes.sniff import (
     get_headers,
     iter_headers,
 )
+from galaxy.datatypes.util import block_scan
 from galaxy.util import (
     compression_utils,
     nice_size
@@ -93,21 +94,8 @@ class Sequence(data.Text):
         """
         Set the number of sequences and the number of data lines in dataset.
         """
-        data_lines = 0
-        sequences = 0
-        with compression_utils.get_fileobj(dataset.file_name) as fh:
-            for line in fh:
-                line = line.strip()
-                if line and line.startswith('#'):
-                    # We don't count comment lines for sequence data types
-                    continue
-                if line and line.startswith('>'):
-                    sequences += 1
-                    data_lines += 1
-                else:
-                    data_lines += 1
-            dataset.metadata.data_lines = data_lines
-            dataset.metadata.sequences = sequences
+        # We don't count comment lines for sequence data types
+        dataset.metadata.data_lines, dataset.metadata.sequences = block_scan.scan_fasta(dataset.file_name)
 
     def set_peek(self, dataset, is_multi_byte=False):
         if not dataset.dataset.purged:
@@ -654,28 +642,7 @@ class BaseFastq(Sequence):
             dataset.metadata.data_lines = None
             dataset.metadata.sequences = None
             return
-        data_lines = 0
-        sequences = 0
-        seq_counter = 0     # blocks should be 4 lines long
-        with compression_utils.get_fileobj(dataset.file_name) as in_file:
-            for line in in_file:
-                line = line.strip()
-                if line and line.startswith('#') and not data_lines:
-                    # We don't count comment lines for sequence data types
-                    continue
-                seq_counter += 1
-                data_lines += 1
-                if line and line.startswith('@'):
-                    if seq_counter >= 4:
-                        # count previous block
-                        # blocks should be 4 lines long
-                        sequences += 1
-                        seq_counter = 1
-            if seq_counter >= 4:
-                # count final block
-                sequences += 1
-            dataset.metadata.data_lines = data_lines
-            dataset.metadata.sequences = sequences
+        dataset.metadata.data_lines, dataset.metadata.sequences = block_scan.scan_fastq(dataset.file_name)
 
     def sniff_prefix(self, file_prefix):
         """
@@ -4,7 +4,9 @@ File format detector
 
 import bz2
 import gzip
+import hashlib
 import io
+import itertools
 import logging
 import os
 import re
@@ -12,8 +14,12 @@ import shutil
 import struct
 import sys
 import tempfile
+import threading
+import time
 import urllib.request
 import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from galaxy import util
 from galaxy.util import compression_utils, stream_to_open_named_file
@@ -29,6 +35,9 @@ from galaxy.util.checkers import (
 log = logging.getLogger(__name__)
 
 SNIFF_PREFIX_BYTES = int(os.environ.get("GALAXY_SNIFF_PREFIX_BYTES", None) or 2 ** 20)
+# Number of sniffer indexes and of sniff results kept in memory
+MAX_SNIFFER_INDEXES = 16
+MAX_SNIFF_RESULTS = 10000
 
 
 def get_test_fname(fname):
@@ -456,8 +465,177 @@ def guess_ext(fname, sniff_order, is_binary=False):
     return 'txt'  # default text data type file extension
 
 
+class SnifferIndex:
+    """
+    Decisions about the sniffers of a sniff order that do not depend on the
+    sniffed file, computed once per sniff order.
+
+    Sniffers are split by whether they expect compressed files, and
+    datatypes declaring ``magic_numbers`` are indexed by them: a file whose
+    header starts with none of the magic numbers of a datatype is not
+    sniffed with it, the datatypes to skip are found with one dictionary
+    lookup per magic number length.
+    """
+
+    def __init__(self, sniff_order):
+        self.sniff_order = sniff_order
+        # Identifies the index in cached sniff results
+        self.serial = next(_sniffer_index_serials)
+        # (position, datatype, sniffs a FilePrefix) for uncompressed and compressed files
+        self.uncompressed_sniffers = []
+        self.compressed_sniffers = []
+        self.magic_index = {}
+        self.magic_sniffers = set()
+        for position, datatype in enumerate(sniff_order):
+            has_sniff_prefix = hasattr(datatype, "sniff_prefix")
+            datatype_compressed = getattr(datatype, "compressed", False)
+            if not has_sniff_prefix or not datatype_compressed:
+                self.uncompressed_sniffers.append((position, datatype, has_sniff_prefix))
+            if not has_sniff_prefix or datatype_compressed:
+                self.compressed_sniffers.append((position, datatype, has_sniff_prefix))
+            magic_numbers = getattr(datatype, "magic_numbers", None)
+            if magic_numbers is not None:
+                self.magic_sniffers.add(position)
+                for magic_number in magic_numbers:
+                    self.magic_index.setdefault(len(magic_number), {}).setdefault(magic_number, set()).add(position)
+
+    def sniffers(self, file_prefix):
+        """Return the (position, datatype, sniffs a FilePrefix) of the sniffers that may match ``file_prefix``."""
+        if file_prefix.compressed_format:
+            # Magic numbers are not checked against the decompressed contents
+            return self.compressed_sniffers
+        header = file_prefix.contents_header_bytes
+        if header is None or not self.magic_sniffers:
+            return self.uncompressed_sniffers
+        skipped = set(self.magic_sniffers)
+        for length, magic_numbers in self.magic_index.items():
+            skipped.difference_update(magic_numbers.get(header[:length], ()))
+        return [sniffer for sniffer in self.uncompressed_sniffers if sniffer[0] not in skipped]
+
+
+_sniffer_index_serials = itertools.count()
+_sniffer_indexes = OrderedDict()
+_sniff_results = OrderedDict()
+# Guards _sniffer_indexes and _sniff_results, sniffing may happen in several threads
+_sniff_cache_lock = threading.Lock()
+
+
+def get_sniffer_index(sniff_order):
+    """Return the (cached) ``SnifferIndex`` of ``sniff_order``."""
+    key = tuple(id(datatype) for datatype in sniff_order)
+    with _sniff_cache_lock:
+        index = _sniffer_indexes.get(key)
+        if index is not None:
+            _sniffer_indexes.move_to_end(key)
+            return index
+    index = SnifferIndex(list(sniff_order))
+    with _sniff_cache_lock:
+        index = _sniffer_indexes.setdefault(key, index)
+        while len(_sniffer_indexes) > MAX_SNIFFER_INDEXES:
+            _sniffer_indexes.popitem(last=False)
+    return index
+
+
+def _sniff_result_key(file_prefix, index, is_binary):
+    """Return the key of the sniff result of ``file_prefix``, or None if it cannot be cached."""
+    if file_prefix.contents_header_bytes is None:
+        return None
+    try:
+        st = os.stat(file_prefix.filename)
+    except (OSError, TypeError):
+        return None
+    fingerprint = hashlib.sha1(file_prefix.contents_header_bytes).hexdigest()
+    return (os.path.abspath(file_prefix.filename), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, fingerprint, index.serial, is_binary)
+
+
+def clear_sniff_results():
+    with _sniff_cache_lock:
+        _sniff_results.clear()
+
+
+class SnifferProfile:
+    """
+    Time taken and bytes read by each sniffer, by datatype extension.
+
+    Sniffers reading more than ``byte_budget`` bytes for a file (e.g.
+    sniffers re-opening the file and reading it further than the
+    ``FilePrefix``) are logged, the bytes read are only measured where the
+    I/O counters of the process are available (``/proc/self/io``).
+    """
+
+    def __init__(self, byte_budget=SNIFF_PREFIX_BYTES):
+        self.byte_budget = byte_budget
+        self.stats = {}
+        self.measure_bytes = _bytes_read() is not None
+
+    def record(self, datatype, seconds, bytes_read, matched):
+        ext = datatype.file_ext
+        stats = self.stats.get(ext)
+        if stats is None:
+            stats = self.stats[ext] = {"calls": 0, "matches": 0, "seconds": 0.0, "bytes_read": 0, "over_budget": 0}
+        stats["calls"] += 1
+        stats["matches"] += int(bool(matched))
+        stats["seconds"] += seconds
+        if bytes_read is not None:
+            stats["bytes_read"] += bytes_read
+            if bytes_read > self.byte_budget:
+                if not stats["over_budget"]:
+                    log.warning(f"Sniffer of datatype {ext} read {bytes_read} bytes, more than the budget of {self.byte_budget} bytes")
+                stats["over_budget"] += 1
+
+    def slowest(self, limit=10):
+        """Return the ``limit`` (extension, stats) with the largest total time."""
+        return sorted(self.stats.items(), key=lambda item: item[1]["seconds"], reverse=True)[:limit]
+
+
+_sniffer_profile = None
+
+
+@contextmanager
+def profile_sniffers(byte_budget=SNIFF_PREFIX_BYTES):
+    """
+    Record the time taken and bytes read by each sniffer run within this
+    context in the ``SnifferProfile`` returned, results are not cached.
+    """
+    global _sniffer_profile
+    previous = _sniffer_profile
+    _sniffer_profile = SnifferProfile(byte_budget=byte_budget)
+    try:
+        yield _sniffer_profile
+    finally:
+        _sniffer_profile = previous
+
+
+def _bytes_read():
+    try:
+        with open("/proc/self/io", "rb") as f:
+            for line in f:
+                if line.startswith(b"rchar:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _run_sniffer(datatype, has_sniff_prefix, fname, file_prefix, is_binary):
+    if has_sniff_prefix:
+        if file_prefix.compressed_format and getattr(datatype, "compressed_format", None):
+            # In this case go a step further and compare the compressed format detected
+            # to the expected.
+            if file_prefix.compressed_format != datatype.compressed_format:
+                return False
+        return datatype.sniff_prefix(file_prefix)
+    elif is_binary and not datatype.is_binary:
+        return False
+    return datatype.sniff(fname)
+
+
 def run_sniffers_raw(filename_or_file_prefix, sniff_order, is_binary=False):
     """Run through sniffers specified by sniff_order, return None of None match.
+
+    Sniffers that cannot match the file (see ``SnifferIndex``) are skipped,
+    and results are cached by file (path, size, modification time and
+    prefix contents) unless sniffers are profiled (see ``profile_sniffers``).
     """
     if isinstance(filename_or_file_prefix, FilePrefix):
         fname = filename_or_file_prefix.filename
@@ -466,8 +644,18 @@ def run_sniffers_raw(filename_or_file_prefix, sniff_order, is_binary=False):
         fname = filename_or_file_prefix
         file_prefix = FilePrefix(filename_or_file_prefix)
 
+    index = get_sniffer_index(sniff_order)
+    profile = _sniffer_profile
+    result_key = None
+    if profile is None:
+        result_key = _sniff_result_key(file_prefix, index, is_binary)
+        with _sniff_cache_lock:
+            if result_key in _sniff_results:
+                _sniff_results.move_to_end(result_key)
+                return _sniff_results[result_key]
+
     file_ext = None
-    for datatype in sniff_order:
+    for _, datatype, has_sniff_prefix in index.sniffers(file_prefix):
         """
         Some classes may not have a sniff function, which is ok.  In fact,
         Binary, Data, Tabular and Text are examples of classes that should never
@@ -476,29 +664,27 @@ def run_sniffers_raw(filename_or_file_prefix, sniff_order, is_binary=False):
         from this function after all other datatypes in sniff_order have not been
         successfully discovered.
         """
+        if profile is not None:
+            start_bytes = _bytes_read() if profile.measure_bytes else None
+            start = time.perf_counter()
+        matched = False
         try:
-            if hasattr(datatype, "sniff_prefix"):
-                datatype_compressed = getattr(datatype, "compressed", False)
-                if datatype_compressed and not file_prefix.compressed_format:
-                    continue
-                if not datatype_compressed and file_prefix.compressed_format:
-                    continue
-                if file_prefix.compressed_format and getattr(datatype, "compressed_format", None):
-                    # In this case go a step further and compare the compressed format detected
-                    # to the expected.
-                    if file_prefix.compressed_format != datatype.compressed_format:
-                        continue
-                if datatype.sniff_prefix(file_prefix):
-                    file_ext = datatype.file_ext
-                    break
-            elif is_binary and not datatype.is_binary:
-                continue
-            elif datatype.sniff(fname):
-                file_ext = datatype.file_ext
-                break
+            matched = _run_sniffer(datatype, has_sniff_prefix, fname, file_prefix, is_binary)
         except Exception:
             pass
+        if profile is not None:
+            seconds = time.perf_counter() - start
+            bytes_read = _bytes_read() - start_bytes if start_bytes is not None else None
+            profile.record(datatype, seconds, bytes_read, matched)
+        if matched:
+            file_ext = datatype.file_ext
+            break
 
+    if result_key is not None:
+        with _sniff_cache_lock:
+            _sniff_results[result_key] = file_ext
+            while len(_sniff_results) > MAX_SNIFF_RESULTS:
+                _sniff_results.popitem(last=False)
     return file_ext
 
 
@@ -11,8 +11,10 @@ import re
 import shutil
 import subprocess
 import tempfile
+from contextlib import closing
 from json import dumps
 
+import numpy as np
 import pysam
 from markupsafe import escape
 
@@ -25,12 +27,24 @@ from galaxy.datatypes.sniff import (
     iter_headers,
     validate_tabular,
 )
+from galaxy.datatypes.util import block_scan, line_index
+from galaxy.exceptions import RequestParameterInvalidException
 from galaxy.util import compression_utils
 from . import dataproviders
 
 log = logging.getLogger(__name__)
 
 
+def _row_param(name, value):
+    try:
+        row = int(value)
+    except (TypeError, ValueError):
+        row = -1
+    if row < 0:
+        raise RequestParameterInvalidException(f"{name} must be a non-negative integer, got {value!r}")
+    return row
+
+
 @dataproviders.decorators.has_dataproviders
 class TabularData(data.Text):
     """Generic tabular data"""
@@ -39,6 +53,8 @@ class TabularData(data.Text):
     CHUNKABLE = True
     data_line_offset = 0
     max_peek_columns = 50
+    # Datasets of at least this size get a line offset index (see get_rows)
+    line_index_min_size = 64 * 1024 * 1024
 
     """Add metadata elements"""
     MetadataElement(name="comment_lines", default=0, desc="Number of comment lines", readonly=False, optional=True, no_value=0)
@@ -47,6 +63,7 @@ class TabularData(data.Text):
     MetadataElement(name="column_types", default=[], desc="Column types", param=metadata.ColumnTypesParameter, readonly=True, visible=False, no_value=[])
     MetadataElement(name="column_names", default=[], desc="Column names", readonly=True, visible=False, optional=True, no_value=[])
     MetadataElement(name="delimiter", default='\t', desc="Data delimiter", readonly=True, visible=False, optional=True, no_value=[])
+    MetadataElement(name="line_index", desc="Line offset index", param=metadata.FileParameter, file_ext="line_index", readonly=True, no_value=None, visible=False, optional=True)
 
     @abc.abstractmethod
     def set_meta(self, dataset, **kwd):
@@ -81,8 +98,60 @@ class TabularData(data.Text):
                       'data_line_offset': self.data_line_offset,
                       })
 
+    def set_line_index(self, dataset):
+        """
+        Index the offsets of every ``line_index.LINES_PER_ENTRY``-th line of
+        large datasets, to read any of their lines without reading the lines
+        before it (see get_rows).
+        """
+        try:
+            if os.path.getsize(dataset.file_name) < self.line_index_min_size:
+                return
+        except OSError:
+            return
+        index = line_index.LineIndex.build(dataset.file_name)
+        if index is None:
+            return
+        index_file = dataset.metadata.line_index
+        if not index_file:
+            index_file = dataset.metadata.spec['line_index'].param.new_file(dataset=dataset)
+        index.write(index_file.file_name)
+        dataset.metadata.line_index = index_file
+
+    def get_line_index(self, dataset):
+        index_file = dataset.metadata.line_index
+        if not index_file:
+            return None
+        try:
+            return line_index.LineIndex.read(index_file.file_name)
+        except Exception:
+            log.exception(f"Failed to read the line index of dataset {dataset.id}")
+            return None
+
+    def get_rows(self, trans, dataset, row_start, row_end=None, ck_size=None):
+        """
+        Return the lines ``[row_start, row_end)`` of the dataset (comment
+        lines included, stopping after ``ck_size`` bytes), using its line
+        index if it has one.
+        """
+        row_start = max(0, row_start)
+        index = self.get_line_index(dataset)
+        lines = line_index.read_lines(dataset.file_name, row_start, row_end, index=index,
+                                      max_bytes=ck_size or trans.app.config.display_chunk_size)
+        return dumps({'ck_data': util.unicodify(b''.join(lines)),
+                      'row_start': row_start,
+                      'row_end': row_start + len(lines),
+                      'total_rows': index.total_lines if index else None,
+                      'data_line_offset': self.data_line_offset,
+                      })
+
     def display_data(self, trans, dataset, preview=False, filename=None, to_ext=None, offset=None, ck_size=None, **kwd):
         preview = util.string_as_bool(preview)
+        if kwd.get('row_start') is not None:
+            row_end = kwd.get('row_end')
+            return self.get_rows(trans, dataset, _row_param('row_start', kwd['row_start']),
+                                 _row_param('row_end', row_end) if row_end is not None else None,
+                                 int(ck_size) if ck_size is not None else None)
         if offset is not None:
             return self.get_chunk(trans, dataset, offset, ck_size)
         elif to_ext or not preview:
@@ -293,95 +362,38 @@ class Tabular(TabularData):
         requested_skip = skip
         if skip is None:
             skip = 0
-        column_type_set_order = ['int', 'float', 'list', 'str']  # Order to set column types in
-        default_column_type = column_type_set_order[-1]  # Default column type is lowest in list
-        column_type_compare_order = list(column_type_set_order)  # Order to compare column types
-        column_type_compare_order.reverse()
-
-        def type_overrules_type(column_type1, column_type2):
-            if column_type1 is None or column_type1 == column_type2:
-                return False
-            if column_type2 is None:
-                return True
-            for column_type in column_type_compare_order:
-                if column_type1 == column_type:
-                    return True
-                if column_type2 == column_type:
-                    return False
-            # neither column type was found in our ordered list, this cannot happen
-            raise ValueError(f"Tried to compare unknown column types: {column_type1} and {column_type2}")
-
-        def is_int(column_text):
-            # Don't allow underscores in numeric literals (PEP 515)
-            if '_' in column_text:
-                return False
-            try:
-                int(column_text)
-                return True
-            except ValueError:
-                return False
-
-        def is_float(column_text):
-            # Don't allow underscores in numeric literals (PEP 515)
-            if '_' in column_text:
-                return False
-            try:
-                float(column_text)
-                return True
-            except ValueError:
-                if column_text.strip().lower() == 'na':
-                    return True  # na is special cased to be a float
-                return False
-
-        def is_list(column_text):
-            return "," in column_text
-
-        def is_str(column_text):
-            # anything, except an empty string, is True
-            if column_text == "":
-                return False
-            return True
-
-        is_column_type = {}  # Dict to store column type string to checking function
-        for column_type in column_type_set_order:
-            is_column_type[column_type] = locals()[f"is_{column_type}"]
-
-        def guess_column_type(column_text):
-            for column_type in column_type_set_order:
-                if is_column_type[column_type](column_text):
-                    return column_type
-            return None
-
+        default_column_type = block_scan.COLUMN_TYPES[-1]  # Default column type is the most general one
         data_lines = 0
         comment_lines = 0
         column_names = None
-        column_types = []
+        guesser = block_scan.ColumnTypeGuesser()
         first_line_column_types = [default_column_type]  # default value is one column of type str
         if dataset.has_data():
             # NOTE: if skip > num_check_lines, we won't detect any metadata, and will use default
-            with compression_utils.get_fileobj(dataset.file_name) as dataset_fh:
-                i = 0
-                while True:
-                    line = dataset_fh.readline()
-                    if not line:
-                        break
-                    line = line.rstrip('\r\n')
+            i = 0
+            with closing(block_scan.iter_line_blocks(dataset.file_name)) as blocks:
+                for block in blocks:
+                    data, starts, ends = block_scan.line_bounds(block)
+                    first_bytes = data[starts]
+                    # We'll call blank lines comments
+                    is_data = (first_bytes != block_scan.NEWLINE) & (first_bytes != block_scan.HASH)
+                    if i < skip:
+                        is_data[:skip - i] = False
+                    end = len(is_data)
+                    if max_data_lines is not None:
+                        last = int(np.searchsorted(np.cumsum(is_data), max_data_lines - data_lines))
+                        if last < end:
+                            end = last + 1
+                    guessed = np.flatnonzero(is_data[:end])
+                    if max_guess_type_data_lines is not None:
+                        guessed = guessed[:max(0, max_guess_type_data_lines - data_lines)]
+                    if i == 0 or len(guessed):
+                        # Only the lines needed are decoded
+                        last = guessed[-1] if len(guessed) else 0
+                        lines = block[:ends[last]].decode('utf-8').split('\n')
                     if i == 0:
-                        column_names = self.get_column_names(first_line=line)
-                    if i < skip or not line or line.startswith('#'):
-                        # We'll call blank lines comments
-                        comment_lines += 1
-                    else:
-                        data_lines += 1
-                        if max_guess_type_data_lines is None or data_lines <= max_guess_type_data_lines:
-                            fields = line.split('\t')
-                            for field_count, field in enumerate(fields):
-                                if field_count >= len(column_types):  # found a previously unknown column, we append None
-                                    column_types.append(None)
-                                column_type = guess_column_type(field)
-                                if type_overrules_type(column_type, column_types[field_count]):
-                                    column_types[field_count] = column_type
-                        if i == 0 and requested_skip is None:
+                        column_names = self.get_column_names(first_line=lines[0])
+                        if requested_skip is None and is_data[0]:
                             # This is our first line, people seem to like to upload files that have a header line, but do not
                             # start with '#' (i.e. all column types would then most likely be detected as str).  We will assume
                             # that the first line is always a header (this was previous behavior - it was always skipped).  When
@@ -395,15 +407,23 @@ class Tabular(TabularData):
                             # "column_types": ["list", "float", "float", "str"]  *** would seem to be the 'Truth' by manual
                             # observation that the first line should be included as data.  The old method would have detected as
                             # "column_types": ["int", "int", "str", "list"]
-                            first_line_column_types = column_types
-                            column_types = [None for col in first_line_column_types]
+                            if len(guessed) and guessed[0] == 0:
+                                guesser.update([lines[0]])
+                                guessed = guessed[1:]
+                            first_line_column_types = guesser.column_types
+                            guesser = block_scan.ColumnTypeGuesser()
+                    guesser.update([lines[j] for j in guessed.tolist()])
+                    block_data_lines = int(np.count_nonzero(is_data[:end]))
+                    data_lines += block_data_lines
+                    comment_lines += end - block_data_lines
+                    i += end
                     if max_data_lines is not None and data_lines >= max_data_lines:
-                        if dataset_fh.tell() != dataset.get_size():
+                        if end < len(is_data) or next(blocks, None) is not None:
                             data_lines = None  # Clear optional data_lines metadata value
                             comment_lines = None  # Clear optional comment_lines metadata value; additional comment lines could appear below this point
                         break
-                    i += 1
 
+        column_types = guesser.column_types
         # we error on the larger number of columns
         # first we pad our column_types by using data from first line
         if len(first_line_column_types) > len(column_types):
@@ -424,6 +444,8 @@ class Tabular(TabularData):
         dataset.metadata.delimiter = '\t'
         if column_names is not None:
             dataset.metadata.column_names = column_names
+        if dataset.has_data():
+            self.set_line_index(dataset)
 
     def as_gbrowse_display_file(self, dataset, **kwd):
         return open(dataset.file_name, 'rb')
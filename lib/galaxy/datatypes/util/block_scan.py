@@ -0,0 +1,499 @@
+"""
+Scan (possibly compressed) text files for metadata in large blocks.
+
+Instead of reading and decoding files line by line, files are read in blocks
+of ``BLOCK_SIZE`` bytes, lines are located with NumPy and classified by their
+first character, so counting lines, comments and sequences takes a single
+pass over the data in C.
+
+Within ``chunked_scanning()``, large uncompressed files are split in chunks
+at line boundaries that are scanned in parallel, and the partial results of
+the chunks are merged.
+"""
+import os
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+from galaxy.util import compression_utils
+
+BLOCK_SIZE = 4 * 1024 * 1024
+
+NEWLINE = ord('\n')
+HASH = ord('#')
+GT = ord('>')
+AT = ord('@')
+# First character of blank lines and of lines starting with a non-ASCII character
+BLANK = -1
+NON_ASCII = 256
+
+# Bytes that may start a line whose first character after str.strip() differs:
+# ASCII whitespace and the first bytes of non-ASCII UTF-8 characters.
+_STRIPPABLE = np.zeros(256, dtype=bool)
+_STRIPPABLE[[ord(c) for c in '\t\x0b\x0c\r\x1c\x1d\x1e\x1f ']] = True
+_STRIPPABLE[0x80:] = True
+
+COLUMN_TYPES = ['int', 'float', 'list', 'str']  # From most specific to most general
+STR_RANK = COLUMN_TYPES.index('str')
+# Number of distinct values per column remembered to avoid guessing their type again
+MAX_SEEN_VALUES = 10000
+# Newline separated values that are all valid int() or float() input, to check whole columns at once
+_INTS_RE = re.compile(r'[+-]?[0-9]+(?:\n[+-]?[0-9]+)*')
+_FLOAT = r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?'
+_FLOATS_RE = re.compile(rf'{_FLOAT}(?:\n{_FLOAT})*')
+
+# (map function, chunk size) within chunked_scanning()
+_chunking = None
+
+
+@contextmanager
+def chunked_scanning(map_function, chunk_size):
+    """
+    Within this context, uncompressed files larger than ``chunk_size`` bytes
+    are split in chunks of about ``chunk_size`` bytes at line boundaries,
+    the chunks are scanned with ``map_function`` (e.g. the ``map`` method of
+    a ``multiprocessing.Pool``) and their results merged.
+    """
+    global _chunking
+    previous = _chunking
+    _chunking = (map_function, chunk_size) if chunk_size else None
+    try:
+        yield
+    finally:
+        _chunking = previous
+
+
+def _line_start(fh, offset):
+    """Return the offset of the first line starting at or after ``offset``."""
+    fh.seek(offset - 1)
+    previous = fh.read(1)
+    if previous == b'\n':
+        return offset
+    if previous == b'\r':
+        # A \r\n newline or a \r one
+        return offset + 1 if fh.read(1) == b'\n' else offset
+    fh.readline()
+    return fh.tell()
+
+
+def chunk_bounds(path, chunk_size):
+    """
+    Return the (start, end) offsets of chunks of about ``chunk_size`` bytes
+    of the file at ``path``, each chunk starting at the beginning of a line.
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(mode='wb', delete=False) as fh:
+    ...     _ = fh.write(b'aaa\\r\\nbb\\nc\\rdddd\\n')
+    >>> chunk_bounds(fh.name, 4)
+    [(0, 5), (5, 8), (8, 15)]
+    """
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as fh:
+        for offset in range(chunk_size, size, chunk_size):
+            start = _line_start(fh, max(offset, offsets[-1] + 1))
+            if start >= size:
+                break
+            if start > offsets[-1]:
+                offsets.append(start)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def _chunks(path):
+    """
+    Return the map function and bounds of the chunks the file at ``path``
+    should be scanned in, or ``None`` if it should be scanned at once.
+    """
+    if _chunking is None:
+        return None
+    map_function, chunk_size = _chunking
+    try:
+        if os.path.getsize(path) <= chunk_size:
+            return None
+        compressed_format, fh = compression_utils.get_fileobj_raw(path, mode='rb')
+        fh.close()
+    except OSError:
+        return None
+    if compressed_format:
+        return None
+    bounds = chunk_bounds(path, chunk_size)
+    if len(bounds) < 2:
+        return None
+    return map_function, bounds
+
+
+def iter_line_blocks(path, block_size=BLOCK_SIZE, start=0, end=None):
+    r"""
+    Yield the contents of the (possibly compressed) file at ``path`` in
+    blocks of complete lines, with newlines (``\r\n`` and ``\r``) converted
+    to ``\n``. Only the last block may not end with a newline.
+
+    If ``start`` or ``end`` are given, only the bytes from ``start`` to
+    ``end`` of the uncompressed file at ``path`` are read.
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(mode='wb', delete=False) as fh:
+    ...     _ = fh.write(b'a\r\nbb\rccc\n\ndd')
+    >>> list(iter_line_blocks(fh.name, block_size=3))
+    [b'a\n', b'bb\n', b'ccc\n\n', b'dd']
+    """
+    if start or end is not None:
+        fh = open(path, 'rb')
+        fh.seek(start)
+    else:
+        fh = compression_utils.get_fileobj(path, mode='rb')
+    with fh:
+        rest = b''
+        remaining = end - start if end is not None else None
+        while True:
+            if remaining is None:
+                data = fh.read(block_size)
+            else:
+                data = fh.read(min(block_size, remaining))
+                remaining -= len(data)
+            if not data:
+                break
+            block = rest + data
+            rest = b''
+            if block.endswith(b'\r'):
+                # May be the first half of a \r\n
+                block, rest = block[:-1], b'\r'
+            if b'\r' in block:
+                block = block.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            end = block.rfind(b'\n') + 1
+            if end:
+                yield block[:end]
+            rest = block[end:] + rest
+        if rest:
+            yield rest.replace(b'\r', b'\n')
+
+
+def line_bounds(block):
+    """
+    Return the bytes of ``block`` as a NumPy array, and the offsets of the
+    start and end (newline excluded) of its lines.
+    """
+    data = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(data == NEWLINE)
+    if not block.endswith(b'\n'):
+        ends = np.append(ends, len(block))
+    starts = np.empty_like(ends)
+    if len(ends):
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+    return data, starts, ends
+
+
+def first_bytes(block):
+    """
+    Return the first byte of each line of ``block``, ``NEWLINE`` for empty
+    lines.
+
+    >>> first_bytes(b'#a\\n\\nb\\n').tolist()
+    [35, 10, 98]
+    """
+    data, starts, _ = line_bounds(block)
+    return data[starts]
+
+
+def first_chars(block):
+    """
+    Return the first character of each line of ``block`` after stripping
+    whitespace (like ``str.strip()``): its code for ASCII characters,
+    ``BLANK`` for blank lines and ``NON_ASCII`` for other characters.
+
+    >>> first_chars(b'>a\\n  \\n #b\\n\\nc').tolist()
+    [62, -1, 35, -1, 99]
+    """
+    data, starts, ends = line_bounds(block)
+    chars = data[starts].astype(np.int16)
+    chars[chars == NEWLINE] = BLANK
+    # Only lines starting with whitespace or non-ASCII characters are decoded
+    for i in np.flatnonzero(_STRIPPABLE[data[starts]]).tolist():
+        text = block[starts[i]:ends[i]].decode('utf-8', errors='replace').strip()
+        if not text:
+            chars[i] = BLANK
+        elif text[0] < '\x80':
+            chars[i] = ord(text[0])
+        else:
+            chars[i] = NON_ASCII
+    return chars
+
+
+def _count_data_lines(path, start=0, end=None):
+    data_lines = 0
+    for block in iter_line_blocks(path, start=start, end=end):
+        chars = first_chars(block)
+        data_lines += int(np.count_nonzero((chars != BLANK) & (chars != HASH)))
+    return data_lines
+
+
+def _count_data_lines_chunk(bounds):
+    return _count_data_lines(*bounds)
+
+
+def count_data_lines(path):
+    """
+    Count the lines of the file at ``path`` that are not blank and do not
+    start with ``#`` (ignoring leading whitespace).
+    """
+    chunks = _chunks(path)
+    if chunks:
+        map_function, bounds = chunks
+        return sum(map_function(_count_data_lines_chunk, [(path, start, end) for start, end in bounds]))
+    return _count_data_lines(path)
+
+
+def _scan_fasta(path, start=0, end=None):
+    data_lines = sequences = 0
+    for block in iter_line_blocks(path, start=start, end=end):
+        chars = first_chars(block)
+        data_lines += int(np.count_nonzero(chars != HASH))
+        sequences += int(np.count_nonzero(chars == GT))
+    return data_lines, sequences
+
+
+def _scan_fasta_chunk(bounds):
+    return _scan_fasta(*bounds)
+
+
+def scan_fasta(path):
+    """
+    Return the number of lines (blank ones included) and of sequences
+    (lines starting with ``>``) of the FASTA file at ``path``, lines starting
+    with ``#`` are ignored.
+    """
+    chunks = _chunks(path)
+    if chunks:
+        map_function, bounds = chunks
+        results = map_function(_scan_fasta_chunk, [(path, start, end) for start, end in bounds])
+        return tuple(sum(counts) for counts in zip(*results))
+    return _scan_fasta(path)
+
+
+class FastqScanner:
+    """
+    Count the lines and records of a FASTQ file, a record starts at a line
+    starting with ``@`` at least three lines after the start of the previous
+    one. Lines starting with ``#`` are ignored before the first record.
+
+    To scan a chunk of a file, ``record_start`` is the (negative) offset of
+    the start of the current record relative to the chunk and
+    ``skip_comments`` is ``False`` for chunks after the first data line.
+    """
+
+    def __init__(self, record_start=0, skip_comments=True):
+        self.data_lines = 0
+        self.sequences = 0
+        self.record_start = record_start
+        self.skip_comments = skip_comments
+
+    def update(self, chars):
+        if self.skip_comments and not self.data_lines:
+            comments = np.flatnonzero(chars != HASH)
+            chars = chars[comments[0]:] if len(comments) else chars[:0]
+        headers = np.flatnonzero(chars == AT) + self.data_lines
+        self.data_lines += len(chars)
+        if not len(headers):
+            return
+        if (np.diff(headers) >= 3).all():
+            # Every header after the first one starts a record
+            record_starts = headers[headers - self.record_start >= 3]
+            self.sequences += len(record_starts)
+            if len(record_starts):
+                self.record_start = int(record_starts[-1])
+        else:
+            # Quality lines starting with @
+            for header in headers.tolist():
+                if header - self.record_start >= 3:
+                    self.sequences += 1
+                    self.record_start = header
+
+    def finish(self):
+        # The last record
+        if self.data_lines - self.record_start >= 4:
+            self.sequences += 1
+            self.record_start = self.data_lines
+        return self.data_lines, self.sequences
+
+
+# Number of lines of the current record at the start of a chunk that lead to
+# distinct results, records can only start 3 lines after the previous one.
+_FASTQ_RECORD_OFFSETS = range(4)
+
+
+def _scan_fastq_chunk(bounds):
+    """
+    Scan a chunk of a FASTQ file, for each number of lines of the current
+    record before the chunk (up to 3): return the number of records started
+    in the chunk and the start of the last one (``None`` if none started),
+    with the number of lines of the chunk.
+    """
+    path, start, end = bounds
+    scanners = [FastqScanner(record_start=-offset, skip_comments=not start) for offset in _FASTQ_RECORD_OFFSETS]
+    for block in iter_line_blocks(path, start=start, end=end):
+        chars = first_chars(block)
+        for scanner in scanners:
+            scanner.update(chars)
+    results = [(scanner.sequences, scanner.record_start if scanner.record_start != -offset else None)
+               for offset, scanner in zip(_FASTQ_RECORD_OFFSETS, scanners)]
+    return scanners[0].data_lines, results
+
+
+def _merge_fastq_chunks(chunk_results):
+    data_lines = sequences = record_start = 0
+    for chunk_lines, results in chunk_results:
+        chunk_sequences, chunk_record_start = results[min(data_lines - record_start, 3)]
+        sequences += chunk_sequences
+        if chunk_record_start is not None:
+            record_start = data_lines + chunk_record_start
+        data_lines += chunk_lines
+    scanner = FastqScanner(record_start=record_start)
+    scanner.data_lines, scanner.sequences = data_lines, sequences
+    return scanner.finish()
+
+
+def scan_fastq(path):
+    """
+    Return the number of lines and of records of the FASTQ file at ``path``.
+    """
+    chunks = _chunks(path)
+    if chunks:
+        map_function, bounds = chunks
+        chunk_results = list(map_function(_scan_fastq_chunk, [(path, start, end) for start, end in bounds]))
+        # Comments are only skipped in the first chunk
+        if chunk_results[0][0] or len(chunk_results) == 1:
+            return _merge_fastq_chunks(chunk_results)
+    scanner = FastqScanner()
+    for block in iter_line_blocks(path):
+        scanner.update(first_chars(block))
+    return scanner.finish()
+
+
+def is_int(column_text):
+    # Don't allow underscores in numeric literals (PEP 515)
+    if '_' in column_text:
+        return False
+    try:
+        int(column_text)
+        return True
+    except ValueError:
+        return False
+
+
+def is_float(column_text):
+    # Don't allow underscores in numeric literals (PEP 515)
+    if '_' in column_text:
+        return False
+    try:
+        float(column_text)
+        return True
+    except ValueError:
+        if column_text.strip().lower() == 'na':
+            return True  # na is special cased to be a float
+        return False
+
+
+def is_list(column_text):
+    return "," in column_text
+
+
+def is_str(column_text):
+    # anything, except an empty string, is True
+    return column_text != ""
+
+
+_TYPE_CHECKS = [is_int, is_float, is_list, is_str]
+
+
+def column_type_rank(column_text):
+    """
+    Return the index in ``COLUMN_TYPES`` of the most specific type of
+    ``column_text``, -1 for empty strings.
+
+    >>> [COLUMN_TYPES[column_type_rank(text)] for text in ['1', '1.5e3', 'NA', '1,2', 'a']]
+    ['int', 'float', 'float', 'list', 'str']
+    """
+    for rank, check in enumerate(_TYPE_CHECKS):
+        if check(column_text):
+            return rank
+    return -1
+
+
+@lru_cache(maxsize=None)
+def _rows_re(width):
+    """Return a regular expression matching newline separated lines of ``width`` tab separated fields."""
+    row = r'[^\t\n]*(?:\t[^\t\n]*){%i}' % (width - 1)
+    return re.compile(rf'{row}(?:\n{row})*')
+
+
+class ColumnTypeGuesser:
+    """
+    Guess the types of the columns of tab separated lines, the type of a
+    column is the most general type of its fields (``None`` if all are
+    empty).
+
+    Lines are processed in blocks, column by column, and the type of each
+    distinct field is only guessed once per column; columns whose type is
+    already ``str`` are skipped.
+
+    >>> guesser = ColumnTypeGuesser()
+    >>> guesser.update(['1\\t1\\ta', '2\\t1.5\\tb\\t'])
+    >>> guesser.update(['3\\tNA\\t1,2\\t\\t1,2'])
+    >>> guesser.column_types
+    ['int', 'float', 'str', None, 'list']
+    """
+
+    def __init__(self):
+        self.ranks = []
+        self._seen = []
+
+    def update(self, lines):
+        if not lines:
+            return
+        joined = '\n'.join(lines)
+        width = lines[0].count('\t') + 1
+        if _rows_re(width).fullmatch(joined):
+            # All lines have the same number of fields, split them at once
+            fields = joined.replace('\n', '\t').split('\t')
+            columns = [fields[i::width] for i in range(width)]
+        else:
+            rows = [line.split('\t') for line in lines]
+            width = max(len(row) for row in rows)
+            columns = [[row[i] for row in rows if len(row) > i] for i in range(width)]
+        while len(self.ranks) < width:
+            self.ranks.append(-1)
+            self._seen.append(set())
+        for i, column in enumerate(columns):
+            if self.ranks[i] == STR_RANK:
+                continue
+            seen = self._seen[i]
+            values = set(column)
+            values.difference_update(seen)
+            values.discard('')
+            self.ranks[i] = max(self.ranks[i], self._values_rank(values))
+            if len(seen) < MAX_SEEN_VALUES:
+                seen.update(values)
+
+    @staticmethod
+    def _values_rank(values):
+        if not values:
+            return -1
+        joined = '\n'.join(values)
+        if _INTS_RE.fullmatch(joined):
+            return COLUMN_TYPES.index('int')
+        if _FLOATS_RE.fullmatch(joined):
+            return COLUMN_TYPES.index('float')
+        rank = -1
+        for value in values:
+            rank = max(rank, column_type_rank(value))
+            if rank == STR_RANK:
+                break
+        return rank
+
+    @property
+    def column_types(self):
+        return [COLUMN_TYPES[rank] if rank >= 0 else None for rank in self.ranks]
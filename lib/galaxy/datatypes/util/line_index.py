@@ -0,0 +1,244 @@
+"""
+Sparse line offset indexes of (possibly compressed) text files.
+
+The index of a file stores the offset (in the uncompressed contents) of
+every ``LINES_PER_ENTRY``-th line, so reading lines ``[start, end)`` takes a
+single seek followed by skipping at most ``LINES_PER_ENTRY - 1`` lines.
+
+Compressed files can't be read from an arbitrary offset, but gzip members
+and bzip2 streams can be decompressed on their own: the index of gzip and
+bzip2 files also stores the compressed and uncompressed offsets of some of
+their members (at least ``MIN_BLOCK_DISTANCE`` uncompressed bytes apart),
+which are used to start decompressing close to the lines read. Files made
+of many members (e.g. compressed with ``bgzip`` or ``pbzip2``) are read in
+(nearly) constant time, files made of a single member are decompressed from
+their start.
+
+Lines end with ``\\n`` (``\\r\\n`` newlines are part of the lines).
+"""
+import bisect
+import bz2
+import gzip
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from galaxy.util import compression_utils
+
+# Number of lines between two indexed lines
+LINES_PER_ENTRY = 10000
+# Minimal number of uncompressed bytes between two indexed compressed blocks
+MIN_BLOCK_DISTANCE = 4 * 1024 * 1024
+READ_SIZE = 4 * 1024 * 1024
+NEWLINE = ord('\n')
+FORMAT_VERSION = 1
+
+
+def _gzip_decompressor():
+    return zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+
+_DECOMPRESSORS = {
+    'gzip': _gzip_decompressor,
+    'bz2': bz2.BZ2Decompressor,
+}
+# Readers of the members starting at the current position of a file object
+_COMPRESSED_READERS = {
+    'gzip': lambda fh, mode: gzip.GzipFile(fileobj=fh, mode=mode),
+    'bz2': bz2.BZ2File,
+}
+
+
+def _iter_decompressed(fh, compression):
+    """
+    Yield the decompressed contents of the gzip or bzip2 file ``fh`` in
+    blocks, with the compressed offset of the start of the member they
+    begin if they begin one (None otherwise).
+    """
+    new_decompressor = _DECOMPRESSORS[compression]
+    decompressor = new_decompressor()
+    member_start = 0
+    # Compressed offset of the start of pending
+    offset = 0
+    pending = b''
+    while True:
+        if not pending:
+            pending = fh.read(READ_SIZE)
+            if not pending:
+                break
+        data = decompressor.decompress(pending)
+        if decompressor.eof:
+            offset += len(pending) - len(decompressor.unused_data)
+            pending = decompressor.unused_data
+        else:
+            offset += len(pending)
+            pending = b''
+        if data or member_start is not None:
+            yield member_start, data
+            member_start = None
+        if decompressor.eof:
+            if pending and not pending.strip(b'\0'):
+                # Trailing padding
+                break
+            if not pending:
+                pending = fh.read(READ_SIZE)
+                if not pending:
+                    break
+            member_start = offset
+            decompressor = new_decompressor()
+
+
+class LineIndex:
+    """
+    Offsets of every ``lines_per_entry``-th line of a file, of its blocks if
+    it is compressed, and its number of lines.
+    """
+
+    def __init__(self, lines_per_entry, line_offsets, total_lines, compression=None, block_offsets=None):
+        self.lines_per_entry = lines_per_entry
+        self.line_offsets = np.asarray(line_offsets, dtype=np.uint64)
+        self.total_lines = total_lines
+        self.compression = compression
+        # (compressed offset, uncompressed offset) of blocks
+        self.block_offsets = np.asarray(block_offsets if block_offsets is not None else [(0, 0)], dtype=np.uint64).reshape(-1, 2)
+
+    @classmethod
+    def build(cls, path, lines_per_entry=LINES_PER_ENTRY):
+        """
+        Return the index of the file at ``path``, None if it is compressed
+        in a format that isn't supported (zip).
+        """
+        compression, fh = compression_utils.get_fileobj_raw(path, mode='rb')
+        fh.close()
+        if compression and compression not in _DECOMPRESSORS:
+            return None
+        line_offsets = [0]
+        block_offsets = []
+        total_newlines = 0
+        position = 0
+        last_byte = None
+        with open(path, 'rb') as fh:
+            if compression:
+                blocks = _iter_decompressed(fh, compression)
+            else:
+                blocks = ((0 if offset == 0 else None, data) for offset, data in _iter_blocks(fh))
+            for member_start, data in blocks:
+                if member_start is not None and (not block_offsets or position - block_offsets[-1][1] >= MIN_BLOCK_DISTANCE):
+                    block_offsets.append((member_start, position))
+                if not data:
+                    continue
+                newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == NEWLINE)
+                # Line n starts after the (n - 1)-th newline
+                first = (-(total_newlines + 1)) % lines_per_entry
+                line_offsets.extend((newlines[first::lines_per_entry] + (position + 1)).tolist())
+                total_newlines += len(newlines)
+                position += len(data)
+                last_byte = data[-1]
+        if line_offsets[-1] == position and position:
+            # A newline ends the file, no line starts there
+            line_offsets.pop()
+        total_lines = total_newlines + (1 if last_byte is not None and last_byte != NEWLINE else 0)
+        return cls(lines_per_entry, line_offsets, total_lines, compression=compression, block_offsets=block_offsets or None)
+
+    def write(self, path):
+        # Pass a file object, numpy would add a .npz extension to the path
+        with open(path, 'wb') as fh:
+            np.savez(
+                fh,
+                version=FORMAT_VERSION,
+                lines_per_entry=self.lines_per_entry,
+                line_offsets=self.line_offsets,
+                total_lines=self.total_lines,
+                compression=self.compression or '',
+                block_offsets=self.block_offsets,
+            )
+
+    @classmethod
+    def read(cls, path):
+        with np.load(path, allow_pickle=False) as index:
+            if int(index['version']) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported line index version {int(index['version'])}")
+            return cls(
+                int(index['lines_per_entry']),
+                index['line_offsets'],
+                int(index['total_lines']),
+                compression=str(index['compression']) or None,
+                block_offsets=index['block_offsets'],
+            )
+
+    @contextmanager
+    def open_at_line(self, path, line):
+        """
+        Open the (possibly compressed) file at ``path`` in binary mode at
+        the start of ``line``.
+        """
+        entry = min(line // self.lines_per_entry, len(self.line_offsets) - 1)
+        offset = int(self.line_offsets[entry])
+        with open(path, 'rb') as fh:
+            if self.compression:
+                block = bisect.bisect_right(self.block_offsets[:, 1].tolist(), offset) - 1
+                compressed_offset, uncompressed_offset = (int(value) for value in self.block_offsets[block])
+                fh.seek(compressed_offset)
+                with _COMPRESSED_READERS[self.compression](fh, mode='rb') as compressed_fh:
+                    _skip_bytes(compressed_fh, offset - uncompressed_offset)
+                    _skip_lines(compressed_fh, line - entry * self.lines_per_entry)
+                    yield compressed_fh
+            else:
+                fh.seek(offset)
+                _skip_lines(fh, line - entry * self.lines_per_entry)
+                yield fh
+
+
+def _iter_blocks(fh):
+    offset = 0
+    while True:
+        data = fh.read(READ_SIZE)
+        if not data:
+            break
+        yield offset, data
+        offset += len(data)
+
+
+def _skip_lines(fh, lines):
+    for _ in range(lines):
+        if not fh.readline():
+            break
+
+
+def _skip_bytes(fh, size):
+    while size > 0:
+        skipped = len(fh.read(min(size, READ_SIZE)))
+        if not skipped:
+            break
+        size -= skipped
+
+
+def read_lines(path, start, end, index=None, max_bytes=None):
+    """
+    Return the lines ``[start, end)`` of the (possibly compressed) file at
+    ``path`` (with their newlines), using its ``LineIndex`` if given.
+    Reading stops after the first line reaching ``max_bytes`` bytes.
+    """
+    lines = []
+    if end is not None and end <= start:
+        return lines
+    if index is not None:
+        opened = index.open_at_line(path, start)
+    else:
+        opened = compression_utils.get_fileobj(path, mode='rb')
+    with opened as fh:
+        if index is None:
+            _skip_lines(fh, start)
+        size = 0
+        line_number = start
+        while end is None or line_number < end:
+            line = fh.readline()
+            if not line:
+                break
+            lines.append(line)
+            line_number += 1
+            size += len(line)
+            if max_bytes is not None and size >= max_bytes:
+                break
+    return lines
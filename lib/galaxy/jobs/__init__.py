@@ -295,6 +295,7 @@ class JobConfiguration(ConfiguresHandlers):
     DEFAULT_NWORKERS = 4
 
     DEFAULT_HANDLER_READY_WINDOW_SIZE = 100
+    DEFAULT_HANDLER_DEPENDENCY_TRACKING_RECONCILE_INTERVAL = 300
 
     JOB_RESOURCE_CONDITIONAL_XML = """<conditional name="__job_resource">
         <param name="__job_resource__select" type="select" label="Job Resource Parameters">
@@ -318,6 +319,8 @@ class JobConfiguration(ConfiguresHandlers):
         self.handler_assignment_methods_configured = False
         self.handler_max_grab = None
         self.handler_ready_window_size = None
+        self.handler_dependency_tracking = False
+        self.handler_dependency_tracking_reconcile_interval = None
         self.destinations = {}
         self.default_destination_id = None
         self.tools = {}
@@ -410,6 +413,9 @@ class JobConfiguration(ConfiguresHandlers):
             log.info("Tag [%s] handlers: %s", tag, ', '.join(handlers))
         self.handler_ready_window_size = int(handling_config_dict.get(
             'ready_window_size', JobConfiguration.DEFAULT_HANDLER_READY_WINDOW_SIZE))
+        self.handler_dependency_tracking = util.asbool(handling_config_dict.get('dependency_tracking', False))
+        self.handler_dependency_tracking_reconcile_interval = int(handling_config_dict.get(
+            'dependency_tracking_reconcile_interval', JobConfiguration.DEFAULT_HANDLER_DEPENDENCY_TRACKING_RECONCILE_INTERVAL))
 
         # Parse environments
         job_metrics = self.app.job_metrics
@@ -579,6 +585,7 @@ class JobConfiguration(ConfiguresHandlers):
         else:
             self.app.application_stack.init_job_handling(self)
         self.handler_ready_window_size = JobConfiguration.DEFAULT_HANDLER_READY_WINDOW_SIZE
+        self.handler_dependency_tracking_reconcile_interval = JobConfiguration.DEFAULT_HANDLER_DEPENDENCY_TRACKING_RECONCILE_INTERVAL
         # Set the destination
         self.default_destination_id = 'local'
         self.destinations['local'] = [JobDestination(id='local', runner='local')]
@@ -1497,10 +1504,10 @@ class JobWrapper(HasResourceParameters):
 
     def enqueue(self):
         job = self.get_job()
-        # Change to queued state before handing to worker thread so the runner won't pick it up again
-        self.change_state(model.Job.states.QUEUED, flush=False, job=job)
         # Persist the destination so that the job will be included in counts if using concurrency limits
         self.set_job_destination(self.job_destination, None, flush=False, job=job)
+        # Change to queued state before handing to worker thread so the runner won't pick it up again
+        self.change_state(model.Job.states.QUEUED, flush=False, job=job)
         # Set object store after job destination so can leverage parameters...
         self._set_object_store_ids(job)
         self.sa_session.flush()
@@ -2141,6 +2148,8 @@ class JobWrapper(HasResourceParameters):
                                                                         tool=self.tool,
                                                                         job=job,
                                                                         max_metadata_value_size=self.app.config.max_metadata_value_size,
+                                                                        metadata_processes=self.app.config.metadata_processes,
+                                                                        metadata_chunk_size=self.app.config.metadata_chunk_size,
                                                                         validate_outputs=self.validate_outputs,
                                                                         **kwds)
         if resolve_metadata_dependencies:
@@ -0,0 +1,119 @@
+"""
+Incrementally maintained counts of dispatched jobs used to enforce job concurrency limits.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event
+from sqlalchemy.sql.expression import (
+    and_,
+    func,
+    null,
+    select,
+)
+
+from galaxy import model
+
+log = logging.getLogger(__name__)
+
+# States counted against the per-user limit
+USER_COUNTED_STATES = (model.Job.states.QUEUED, model.Job.states.RUNNING, model.Job.states.RESUBMITTED)
+# States counted against the per-destination limits
+DESTINATION_COUNTED_STATES = (model.Job.states.QUEUED, model.Job.states.RUNNING)
+
+
+class RunningJobCounter:
+    """
+    Per-user, per-user-and-destination and per-destination counts of queued and running jobs.
+
+    The counts are loaded from the database by :meth:`reconcile` and between reconciliations they are updated
+    whenever the state of a job changes in this process (by listening for changes to ``Job.state``), so checking
+    a limit does not require querying the job table. Jobs dispatched by other handlers are only accounted for once
+    the counts are reconciled.
+    """
+
+    def __init__(self, reconcile_interval):
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._last_reconcile = None
+        self._user_counts = defaultdict(int)
+        self._user_destination_counts = defaultdict(lambda: defaultdict(int))
+        self._destination_counts = defaultdict(int)
+        self._listening = False
+
+    def start(self):
+        if not self._listening:
+            event.listen(model.Job.state, 'set', self._on_state_set, active_history=True)
+            self._listening = True
+
+    def shutdown(self):
+        if self._listening:
+            event.remove(model.Job.state, 'set', self._on_state_set)
+            self._listening = False
+
+    def get_user_count(self, user_id):
+        with self._lock:
+            return self._user_counts.get(user_id, 0)
+
+    def get_user_destination_counts(self, user_id):
+        with self._lock:
+            return dict(self._user_destination_counts.get(user_id, {}))
+
+    def get_destination_counts(self):
+        with self._lock:
+            return dict(self._destination_counts)
+
+    def reconcile_if_needed(self, sa_session):
+        if self._last_reconcile is None or time.time() - self._last_reconcile >= self.reconcile_interval:
+            self.reconcile(sa_session)
+
+    def reconcile(self, sa_session):
+        """Replace the counts with ones computed from the job table."""
+        job_table = model.Job.table
+        user_counts = defaultdict(int)
+        user_destination_counts = defaultdict(lambda: defaultdict(int))
+        destination_counts = defaultdict(int)
+        result = sa_session.execute(select([job_table.c.user_id, func.count(job_table.c.user_id)])
+                                    .where(and_(job_table.c.state.in_(USER_COUNTED_STATES),
+                                                job_table.c.user_id != null()))
+                                    .group_by(job_table.c.user_id))
+        for user_id, count in result:
+            user_counts[user_id] = count
+        result = sa_session.execute(select([job_table.c.user_id, job_table.c.destination_id, func.count(job_table.c.id)])
+                                    .where(job_table.c.state.in_(DESTINATION_COUNTED_STATES))
+                                    .group_by(job_table.c.user_id, job_table.c.destination_id))
+        for user_id, destination_id, count in result:
+            user_destination_counts[user_id][destination_id] = count
+            destination_counts[destination_id] += count
+        with self._lock:
+            drift = sum(abs(self._user_counts.get(user_id, 0) - user_counts.get(user_id, 0))
+                        for user_id in set(self._user_counts) | set(user_counts))
+            self._user_counts = user_counts
+            self._user_destination_counts = user_destination_counts
+            self._destination_counts = destination_counts
+            self._last_reconcile = time.time()
+        if drift:
+            log.debug("Reconciled running job counts, per-user counts drifted by %d job(s)", drift)
+
+    def transition(self, user_id, destination_id, old_state, new_state):
+        """Account for a job of ``user_id`` at ``destination_id`` changing from ``old_state`` to ``new_state``."""
+        if old_state == new_state:
+            return
+        with self._lock:
+            if user_id is not None:
+                delta = (new_state in USER_COUNTED_STATES) - (old_state in USER_COUNTED_STATES)
+                if delta:
+                    self._user_counts[user_id] = max(self._user_counts[user_id] + delta, 0)
+            delta = (new_state in DESTINATION_COUNTED_STATES) - (old_state in DESTINATION_COUNTED_STATES)
+            if delta:
+                user_destination_counts = self._user_destination_counts[user_id]
+                user_destination_counts[destination_id] = max(user_destination_counts[destination_id] + delta, 0)
+                self._destination_counts[destination_id] = max(self._destination_counts[destination_id] + delta, 0)
+
+    def _on_state_set(self, job, value, oldvalue, initiator):
+        if not isinstance(oldvalue, str):
+            # New (not yet persisted) job, nothing is being counted yet
+            return
+        self.transition(job.user_id, job.destination_id, oldvalue, value)
@@ -11,6 +11,10 @@ from queue import (
 )
 
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import (
+    joinedload,
+    selectinload,
+)
 from sqlalchemy.sql.expression import (
     and_,
     func,
@@ -27,7 +31,9 @@ from galaxy.jobs import (
     JobWrapper,
     TaskWrapper
 )
+from galaxy.jobs.counts import RunningJobCounter
 from galaxy.jobs.mapper import JobNotReadyException
+from galaxy.jobs.readiness import JobReadinessTracker
 from galaxy.util import unicodify
 from galaxy.util.custom_logging import get_logger
 from galaxy.util.monitors import Monitors
@@ -170,6 +176,10 @@ class JobHandlerQueue(Monitors):
 
         # Initialize structures for handling job limits
         self.__clear_job_count()
+        # Counts maintained on job state changes and reconciled periodically (if enabled)
+        self.running_job_counter = None
+        if self.app.config.job_count_reconcile_interval:
+            self.running_job_counter = RunningJobCounter(self.app.config.job_count_reconcile_interval)
 
         # Keep track of the pid that started the job manager, only it
         # has valid threads
@@ -180,6 +190,11 @@ class JobHandlerQueue(Monitors):
         self.waiting_jobs = []
         # Contains wrappers of jobs that are limited or ready (so they aren't created unnecessarily/multiple times)
         self.job_wrappers = {}
+        # Tracks input dependencies of new jobs so that only jobs whose inputs changed are checked (if enabled)
+        self.readiness_tracker = None
+        if self.track_jobs_in_database and self.app.job_config.handler_dependency_tracking:
+            self.readiness_tracker = JobReadinessTracker(
+                app, reconcile_interval=self.app.job_config.handler_dependency_tracking_reconcile_interval)
         name = "JobHandlerQueue.monitor_thread"
         self._init_monitor_thread(name, target=self.__monitor, config=app.config)
         self.job_grabber = None
@@ -199,6 +214,8 @@ class JobHandlerQueue(Monitors):
         Starts the JobHandler's thread after checking for any unhandled jobs.
         """
         log.debug('Handler queue starting for jobs assigned to handler: %s', self.app.config.server_name)
+        if self.running_job_counter is not None:
+            self.running_job_counter.start()
         # Recover jobs at startup
         self.__check_jobs_at_startup()
         # Start the queue
@@ -337,44 +354,10 @@ class JobHandlerQueue(Monitors):
         if self.track_jobs_in_database:
             # Clear the session so we get fresh states for job and all datasets
             self.sa_session.expunge_all()
-            # Fetch all new jobs
-            hda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
-                .join(model.JobToInputDatasetAssociation) \
-                .join(model.HistoryDatasetAssociation) \
-                .join(model.Dataset) \
-                .filter(and_(model.Job.state == model.Job.states.NEW,
-                             model.Dataset.state.in_(model.Dataset.non_ready_states))).subquery()
-            ldda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
-                .join(model.JobToInputLibraryDatasetAssociation) \
-                .join(model.LibraryDatasetDatasetAssociation) \
-                .join(model.Dataset) \
-                .filter(and_(model.Job.state == model.Job.states.NEW,
-                             model.Dataset.state.in_(model.Dataset.non_ready_states))).subquery()
-            rank = func.rank().over(partition_by=model.Job.table.c.user_id,
-                                    order_by=model.Job.table.c.id).label('rank')
-            job_filter_conditions = (
-                (model.Job.state == model.Job.states.NEW),
-                (model.Job.handler == self.app.config.server_name),
-                ~model.Job.table.c.id.in_(hda_not_ready),
-                ~model.Job.table.c.id.in_(ldda_not_ready))
-            if self.app.config.user_activation_on:
-                job_filter_conditions = job_filter_conditions + (
-                    or_((model.Job.user_id == null()), (model.User.active == true())),)
-            if self.sa_session.bind.name == 'sqlite':
-                query_objects = (model.Job,)
+            if self.readiness_tracker is not None:
+                jobs_to_check = self.__get_tracked_ready_jobs()
             else:
-                query_objects = (model.Job, rank)
-            ready_query = self.sa_session.query(*query_objects).enable_eagerloads(False) \
-                .outerjoin(model.User) \
-                .filter(and_(*job_filter_conditions)) \
-                .order_by(model.Job.id)
-            if self.sa_session.bind.name == 'sqlite':
-                jobs_to_check = ready_query.all()
-            else:
-                ranked = ready_query.subquery()
-                jobs_to_check = self.sa_session.query(model.Job) \
-                    .join(ranked, model.Job.id == ranked.c.id) \
-                    .filter(ranked.c.rank <= self.app.job_config.handler_ready_window_size).all()
+                jobs_to_check = self.__get_ready_jobs()
             # Filter jobs with invalid input states
             jobs_to_check = self.__filter_jobs_with_invalid_input_states(jobs_to_check)
             # Fetch all "resubmit" jobs
@@ -400,6 +383,10 @@ class JobHandlerQueue(Monitors):
                 pass
         # Ensure that we get new job counts on each iteration
         self.__clear_job_count()
+        if self.running_job_counter is not None:
+            self.running_job_counter.reconcile_if_needed(self.sa_session)
+        # Load what is needed to check this iteration's jobs in bulk rather than once per job
+        copied_from_jobs = self.__prefetch_for_jobs(jobs_to_check)
         # Check resubmit jobs first so that limits of new jobs will still be enforced
         for job in resubmit_jobs:
             log.debug('(%s) Job was resubmitted and is being dispatched immediately', job.id)
@@ -416,7 +403,7 @@ class JobHandlerQueue(Monitors):
                 # Check the job's dependencies, requeue if they're not done.
                 # Some of these states will only happen when using the in-memory job queue
                 if job.copied_from_job_id:
-                    copied_from_job = self.sa_session.query(model.Job).get(job.copied_from_job_id)
+                    copied_from_job = copied_from_jobs.get(job.copied_from_job_id) or self.sa_session.query(model.Job).get(job.copied_from_job_id)
                     job.numeric_metrics = copied_from_job.numeric_metrics
                     job.text_metrics = copied_from_job.text_metrics
                     job.dependencies = copied_from_job.dependencies
@@ -479,6 +466,112 @@ class JobHandlerQueue(Monitors):
         # Done with the session
         self.sa_session.remove()
 
+    def __get_ready_jobs(self):
+        """
+        Query for new jobs assigned to this handler whose inputs are all ready, limited to
+        ``handler_ready_window_size`` jobs per user.
+        """
+        # Fetch all new jobs
+        hda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
+            .join(model.JobToInputDatasetAssociation) \
+            .join(model.HistoryDatasetAssociation) \
+            .join(model.Dataset) \
+            .filter(and_(model.Job.state == model.Job.states.NEW,
+                         model.Dataset.state.in_(model.Dataset.non_ready_states))).subquery()
+        ldda_not_ready = self.sa_session.query(model.Job.id).enable_eagerloads(False) \
+            .join(model.JobToInputLibraryDatasetAssociation) \
+            .join(model.LibraryDatasetDatasetAssociation) \
+            .join(model.Dataset) \
+            .filter(and_(model.Job.state == model.Job.states.NEW,
+                         model.Dataset.state.in_(model.Dataset.non_ready_states))).subquery()
+        rank = func.rank().over(partition_by=model.Job.table.c.user_id,
+                                order_by=model.Job.table.c.id).label('rank')
+        job_filter_conditions = (
+            (model.Job.state == model.Job.states.NEW),
+            (model.Job.handler == self.app.config.server_name),
+            ~model.Job.table.c.id.in_(hda_not_ready),
+            ~model.Job.table.c.id.in_(ldda_not_ready))
+        if self.app.config.user_activation_on:
+            job_filter_conditions = job_filter_conditions + (
+                or_((model.Job.user_id == null()), (model.User.active == true())),)
+        if self.sa_session.bind.name == 'sqlite':
+            query_objects = (model.Job,)
+        else:
+            query_objects = (model.Job, rank)
+        ready_query = self.sa_session.query(*query_objects).enable_eagerloads(False) \
+            .outerjoin(model.User) \
+            .filter(and_(*job_filter_conditions)) \
+            .order_by(model.Job.id)
+        if self.sa_session.bind.name == 'sqlite':
+            return ready_query.all()
+        else:
+            ranked = ready_query.subquery()
+            return self.sa_session.query(model.Job) \
+                .join(ranked, model.Job.id == ranked.c.id) \
+                .filter(ranked.c.rank <= self.app.job_config.handler_ready_window_size).all()
+
+    def __get_tracked_ready_jobs(self):
+        """
+        Like ``__get_ready_jobs`` but only looks at the candidate jobs maintained by the readiness
+        tracker instead of scanning all new jobs and their inputs.
+        """
+        candidates = self.readiness_tracker.update(self.sa_session)
+        if not candidates:
+            return []
+        rows = self.sa_session.query(model.Job.table.c.id, model.Job.table.c.user_id, model.User.table.c.active) \
+            .outerjoin(model.User.table, model.Job.table.c.user_id == model.User.table.c.id) \
+            .filter(and_(model.Job.table.c.id.in_(candidates),
+                         model.Job.table.c.state == model.Job.states.NEW,
+                         model.Job.table.c.handler == self.app.config.server_name)) \
+            .order_by(model.Job.table.c.id).all()
+        # Anything that is no longer new (dispatched, deleted, copied, ...) does not need to be tracked any longer
+        for job_id in candidates - {row[0] for row in rows}:
+            self.readiness_tracker.discard_job(job_id)
+        window_size = self.app.job_config.handler_ready_window_size
+        user_window = defaultdict(int)
+        ready_job_ids = []
+        for job_id, user_id, user_active in rows:
+            if self.app.config.user_activation_on and user_id is not None and not user_active:
+                continue
+            if user_window[user_id] >= window_size:
+                continue
+            user_window[user_id] += 1
+            ready_job_ids.append(job_id)
+        if not ready_job_ids:
+            return []
+        return self.sa_session.query(model.Job).filter(model.Job.table.c.id.in_(ready_job_ids)) \
+            .order_by(model.Job.table.c.id).all()
+
+    def __prefetch_for_jobs(self, jobs):
+        """
+        Load the data needed to check ``jobs`` with a fixed number of queries: the jobs they were copied from, their
+        users and input dataset associations, the quotas of their users and, if job counts are cached, the concurrency
+        counts of just the users and sessions owning these jobs. Returns a dict of copied-from jobs by id.
+        """
+        if not jobs:
+            return {}
+        job_ids = [job.id for job in jobs]
+        copied_from_ids = {job.copied_from_job_id for job in jobs if job.copied_from_job_id}
+        copied_from_jobs = {}
+        if copied_from_ids:
+            copied_from_jobs = {j.id: j for j in self.sa_session.query(model.Job).filter(model.Job.id.in_(copied_from_ids))}
+        # Populate the identity map so that job.user and job.input_datasets do not lazy load per job
+        self.sa_session.query(model.Job) \
+            .options(joinedload(model.Job.user), selectinload(model.Job.input_datasets)) \
+            .filter(model.Job.id.in_(job_ids)).all()
+        user_ids = {job.user_id for job in jobs if job.user_id is not None}
+        self.user_quotas = self.app.quota_agent.get_quotas(user_ids)
+        limits = self.app.job_config.limits
+        if self.running_job_counter is None and self.app.config.cache_user_job_count and \
+                (limits.registered_user_concurrent_jobs or limits.destination_user_concurrent_jobs):
+            if user_ids:
+                self.__cache_user_job_count(user_ids)
+                self.__cache_user_job_count_per_destination(user_ids)
+        if limits.anonymous_user_concurrent_jobs:
+            session_ids = {job.session_id for job in jobs if job.user_id is None and job.session_id is not None}
+            self.__cache_session_job_count(session_ids)
+        return copied_from_jobs
+
     def __filter_jobs_with_invalid_input_states(self, jobs):
         """
         Takes  list of jobs and filters out jobs whose input datasets are in invalid state and
@@ -576,6 +669,8 @@ class JobHandlerQueue(Monitors):
         if state == JOB_READY:
             # PASS.  increase usage by one job (if caching) so that multiple jobs aren't dispatched on this queue iteration
             self.increase_running_job_count(job.user_id, job_destination.id)
+            if job.user_id is None and self.session_job_count is not None:
+                self.session_job_count[job.session_id] = self.session_job_count.get(job.session_id, 0) + 1
             for job_to_input_dataset_association in job.input_datasets:
                 # We record the input dataset version, now that we know the inputs are ready
                 if job_to_input_dataset_association.dataset:
@@ -614,7 +709,8 @@ class JobHandlerQueue(Monitors):
 
         if state == JOB_READY:
             state = self.__check_user_jobs(job, job_wrapper)
-        if state == JOB_READY and self.app.quota_agent.is_over_quota(self.app, job, job_destination):
+        if state == JOB_READY and self.app.quota_agent.is_over_quota(self.app, job, job_destination,
+                                                                     quota=self.user_quotas.get(job.user_id, False)):
             return JOB_USER_OVER_QUOTA, job_destination
         # Check total walltime limits
         if (state == JOB_READY and "delta" in self.app.job_config.limits.total_walltime):
@@ -684,8 +780,24 @@ class JobHandlerQueue(Monitors):
         self.user_job_count = None
         self.user_job_count_per_destination = None
         self.total_job_count_per_destination = None
+        self.session_job_count = None
+        self.user_quotas = {}
+
+    def __cache_session_job_count(self, session_ids):
+        # Count queued and running jobs of the given anonymous sessions in a single query
+        self.session_job_count = {}
+        if not session_ids:
+            return
+        result = self.sa_session.execute(select([model.Job.table.c.session_id, func.count(model.Job.table.c.id)])
+                                         .where(and_(model.Job.table.c.state.in_((model.Job.states.QUEUED, model.Job.states.RUNNING)),
+                                                     model.Job.table.c.session_id.in_(session_ids)))
+                                         .group_by(model.Job.table.c.session_id))
+        for row in result:
+            self.session_job_count[row[0]] = row[1]
 
     def get_user_job_count(self, user_id):
+        if self.running_job_counter is not None:
+            return self.running_job_counter.get_user_count(user_id)
         self.__cache_user_job_count()
         # This could have been incremented by a previous job dispatched on this iteration, even if we're not caching
         rval = self.user_job_count.get(user_id, 0)
@@ -700,15 +812,19 @@ class JobHandlerQueue(Monitors):
                 rval += row[0]
         return rval
 
-    def __cache_user_job_count(self):
-        # Cache the job count if necessary
+    def __cache_user_job_count(self, user_ids=None):
+        # Cache the job count if necessary, optionally only for the given users
         if self.user_job_count is None and self.app.config.cache_user_job_count:
             self.user_job_count = {}
+            if user_ids is None:
+                user_filter = model.Job.table.c.user_id != null()
+            else:
+                user_filter = model.Job.table.c.user_id.in_(user_ids)
             query = self.sa_session.execute(select([model.Job.table.c.user_id, func.count(model.Job.table.c.user_id)])
                                             .where(and_(model.Job.table.c.state.in_((model.Job.states.QUEUED,
                                                                                      model.Job.states.RUNNING,
                                                                                      model.Job.states.RESUBMITTED)),
-                                                        (model.Job.table.c.user_id != null())))
+                                                        user_filter))
                                             .group_by(model.Job.table.c.user_id))
             for row in query:
                 self.user_job_count[row[0]] = row[1]
@@ -716,6 +832,8 @@ class JobHandlerQueue(Monitors):
             self.user_job_count = {}
 
     def get_user_job_count_per_destination(self, user_id):
+        if self.running_job_counter is not None:
+            return self.running_job_counter.get_user_destination_counts(user_id)
         self.__cache_user_job_count_per_destination()
         cached = self.user_job_count_per_destination.get(user_id, {})
         if self.app.config.cache_user_job_count:
@@ -735,12 +853,15 @@ class JobHandlerQueue(Monitors):
                 rval[row['destination_id']] = rval.get(row['destination_id'], 0) + row['job_count']
         return rval
 
-    def __cache_user_job_count_per_destination(self):
-        # Cache the job count if necessary
+    def __cache_user_job_count_per_destination(self, user_ids=None):
+        # Cache the job count if necessary, optionally only for the given users
         if self.user_job_count_per_destination is None and self.app.config.cache_user_job_count:
             self.user_job_count_per_destination = {}
+            job_filter_conditions = [model.Job.table.c.state.in_((model.Job.states.QUEUED, model.Job.states.RUNNING))]
+            if user_ids is not None:
+                job_filter_conditions.append(model.Job.table.c.user_id.in_(user_ids))
             result = self.sa_session.execute(select([model.Job.table.c.user_id, model.Job.table.c.destination_id, func.count(model.Job.table.c.user_id).label('job_count')])
-                                             .where(and_(model.Job.table.c.state.in_((model.Job.states.QUEUED, model.Job.states.RUNNING))))
+                                             .where(and_(*job_filter_conditions))
                                              .group_by(model.Job.table.c.user_id, model.Job.table.c.destination_id))
             for row in result:
                 if row['user_id'] not in self.user_job_count_per_destination:
@@ -750,6 +871,9 @@ class JobHandlerQueue(Monitors):
             self.user_job_count_per_destination = {}
 
     def increase_running_job_count(self, user_id, destination_id):
+        if self.running_job_counter is not None:
+            # Dispatched jobs are counted when they change to the queued state
+            return
         if self.app.job_config.limits.registered_user_concurrent_jobs or \
            self.app.job_config.limits.anonymous_user_concurrent_jobs or \
            self.app.job_config.limits.destination_user_concurrent_jobs:
@@ -800,10 +924,13 @@ class JobHandlerQueue(Monitors):
         elif job.galaxy_session:
             # Anonymous users only get the hard limit
             if self.app.job_config.limits.anonymous_user_concurrent_jobs:
-                count = self.sa_session.query(model.Job).enable_eagerloads(False) \
-                            .filter(and_(model.Job.session_id == job.galaxy_session.id,
-                                         or_(model.Job.state == model.Job.states.RUNNING,
-                                             model.Job.state == model.Job.states.QUEUED))).count()
+                if self.session_job_count is not None:
+                    count = self.session_job_count.get(job.session_id, 0)
+                else:
+                    count = self.sa_session.query(model.Job).enable_eagerloads(False) \
+                        .filter(and_(model.Job.session_id == job.galaxy_session.id,
+                                     or_(model.Job.state == model.Job.states.RUNNING,
+                                         model.Job.state == model.Job.states.QUEUED))).count()
                 if count >= self.app.job_config.limits.anonymous_user_concurrent_jobs:
                     return JOB_WAIT
         else:
@@ -821,6 +948,8 @@ class JobHandlerQueue(Monitors):
                 self.total_job_count_per_destination[row['destination_id']] = row['job_count']
 
     def get_total_job_count_per_destination(self):
+        if self.running_job_counter is not None:
+            return self.running_job_counter.get_destination_counts()
         self.__cache_total_job_count_per_destination()
         # Always use caching (at worst a job will have to wait one iteration,
         # and this would be more fair anyway as it ensures FIFO scheduling,
@@ -882,6 +1011,8 @@ class JobHandlerQueue(Monitors):
             self.sleeper.wake()
             self.shutdown_monitor()
             log.info("job handler queue stopped")
+            if self.running_job_counter is not None:
+                self.running_job_counter.shutdown()
             self.dispatcher.shutdown()
 
 
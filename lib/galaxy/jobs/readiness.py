@@ -0,0 +1,151 @@
+"""
+Dependency tracking for the job handler's ready-to-run checks.
+
+Rather than asking the database on every handler iteration which of the (potentially very many) ``new`` jobs have
+all of their inputs ready, :class:`JobReadinessTracker` keeps a persistent index of the input datasets each ``new``
+job is still waiting on. On each iteration only jobs that are newly created (or put back in the ``new`` state) and
+datasets that changed state since the previous iteration are examined, so the cost of a handler cycle is proportional
+to the number of jobs whose inputs changed rather than to the size of the queue.
+"""
+import datetime
+import logging
+import time
+from collections import defaultdict
+
+from sqlalchemy.sql.expression import (
+    and_,
+    or_,
+)
+
+from galaxy import model
+from galaxy.model.orm.now import now
+
+log = logging.getLogger(__name__)
+
+# Dataset update times are set by the (possibly remote) process that changed the dataset, so look back a little
+# further than the previous iteration to tolerate clock skew between Galaxy processes. Re-examining a dataset or job
+# is harmless.
+DEFAULT_CLOCK_SKEW_SLACK = 30
+DEFAULT_RECONCILE_INTERVAL = 300
+
+
+class JobReadinessTracker:
+    """
+    Index of ``new`` jobs assigned to a handler and the input datasets that are not ready yet.
+
+    Jobs whose inputs are all in a ready state (which includes error states - those jobs are paused or failed by the
+    handler's invalid input checks) are *candidates* and are the only jobs the handler needs to look at.
+    """
+
+    def __init__(self, app, reconcile_interval=DEFAULT_RECONCILE_INTERVAL, clock_skew_slack=DEFAULT_CLOCK_SKEW_SLACK):
+        self.app = app
+        self.reconcile_interval = reconcile_interval
+        self.clock_skew_slack = datetime.timedelta(seconds=clock_skew_slack)
+        self.reset()
+
+    def reset(self):
+        # job id -> ids of input datasets the job is still waiting on
+        self.pending_inputs = {}
+        # dataset id -> ids of jobs waiting on the dataset
+        self.dependents = defaultdict(set)
+        # ids of jobs with no pending inputs
+        self.candidates = set()
+        self.max_job_id = 0
+        self.last_update = None
+        self.last_reconcile = None
+
+    @property
+    def tracked_job_count(self):
+        return len(self.pending_inputs) + len(self.candidates)
+
+    def register_job(self, job_id, pending_dataset_ids):
+        """Start (or restart) tracking a ``new`` job that waits on ``pending_dataset_ids``."""
+        self.discard_job(job_id)
+        pending_dataset_ids = set(pending_dataset_ids)
+        if pending_dataset_ids:
+            self.pending_inputs[job_id] = pending_dataset_ids
+            for dataset_id in pending_dataset_ids:
+                self.dependents[dataset_id].add(job_id)
+        else:
+            self.candidates.add(job_id)
+        self.max_job_id = max(self.max_job_id, job_id)
+
+    def discard_job(self, job_id):
+        """Stop tracking a job, e.g. because it was dispatched, paused, failed or deleted."""
+        self.candidates.discard(job_id)
+        for dataset_id in self.pending_inputs.pop(job_id, ()):
+            dependents = self.dependents.get(dataset_id)
+            if dependents is not None:
+                dependents.discard(job_id)
+                if not dependents:
+                    del self.dependents[dataset_id]
+
+    def dataset_ready(self, dataset_id):
+        """Mark a dataset as having reached a ready state, promoting any dependent jobs with no other pending inputs."""
+        for job_id in self.dependents.pop(dataset_id, ()):
+            pending = self.pending_inputs.get(job_id)
+            if pending is None:
+                continue
+            pending.discard(dataset_id)
+            if not pending:
+                del self.pending_inputs[job_id]
+                self.candidates.add(job_id)
+
+    def update(self, sa_session):
+        """
+        Bring the index up to date with the database and return the set of candidate job ids.
+
+        A full rebuild is done on the first call and then every ``reconcile_interval`` seconds to pick up any change
+        that was missed (e.g. state changes made outside of the ORM).
+        """
+        current_time = now()
+        if self.last_reconcile is None or time.time() - self.last_reconcile >= self.reconcile_interval:
+            self.reset()
+            self.last_reconcile = time.time()
+            self._track_jobs(sa_session, self._new_job_ids(sa_session, full=True))
+            log.debug("Job readiness tracker rebuilt: %d jobs pending inputs, %d candidates",
+                      len(self.pending_inputs), len(self.candidates))
+        else:
+            since = self.last_update - self.clock_skew_slack
+            self._track_jobs(sa_session, self._new_job_ids(sa_session, since=since))
+            if self.dependents:
+                self._update_datasets(sa_session, since)
+        self.last_update = current_time
+        return self.candidates
+
+    def _new_job_ids(self, sa_session, full=False, since=None):
+        filters = [
+            model.Job.table.c.state == model.Job.states.NEW,
+            model.Job.table.c.handler == self.app.config.server_name,
+        ]
+        if not full:
+            # Jobs created since the last iteration, or jobs that were updated (e.g. resumed or reset to new)
+            filters.append(or_(model.Job.table.c.id > self.max_job_id,
+                               model.Job.table.c.update_time >= since))
+        query = sa_session.query(model.Job.table.c.id).filter(and_(*filters))
+        return [row[0] for row in query]
+
+    def _track_jobs(self, sa_session, job_ids):
+        if not job_ids:
+            return
+        pending = defaultdict(set)
+        for job_to_input_table, input_id_column, input_association in [
+                (model.JobToInputDatasetAssociation.table, 'dataset_id', model.HistoryDatasetAssociation),
+                (model.JobToInputLibraryDatasetAssociation.table, 'ldda_id', model.LibraryDatasetDatasetAssociation)]:
+            query = sa_session.query(job_to_input_table.c.job_id, model.Dataset.table.c.id) \
+                .join(input_association.table, job_to_input_table.c[input_id_column] == input_association.table.c.id) \
+                .join(model.Dataset.table, input_association.table.c.dataset_id == model.Dataset.table.c.id) \
+                .filter(and_(job_to_input_table.c.job_id.in_(job_ids),
+                             model.Dataset.table.c.state.in_(model.Dataset.non_ready_states)))
+            for job_id, dataset_id in query:
+                pending[job_id].add(dataset_id)
+        for job_id in job_ids:
+            self.register_job(job_id, pending.get(job_id, ()))
+
+    def _update_datasets(self, sa_session, since):
+        query = sa_session.query(model.Dataset.table.c.id) \
+            .filter(and_(model.Dataset.table.c.update_time >= since,
+                         ~model.Dataset.table.c.state.in_(model.Dataset.non_ready_states)))
+        for (dataset_id,) in query:
+            if dataset_id in self.dependents:
+                self.dataset_ready(dataset_id)
@@ -19,6 +19,7 @@ from galaxy import model
 from galaxy.job_execution.output_collect import default_exit_code_file, read_exit_code_from
 from galaxy.jobs.command_factory import build_command
 from galaxy.jobs.runners.util import runner_states
+from galaxy.jobs.runners.util.async_monitor import AsyncJobMonitor
 from galaxy.jobs.runners.util.env import env_to_statement
 from galaxy.jobs.runners.util.job_script import (
     job_script,
@@ -30,6 +31,7 @@ from galaxy.tool_util.deps.dependencies import (
 )
 from galaxy.tool_util.output_checker import DETECTED_JOB_STATE
 from galaxy.util import (
+    asbool,
     DATABASE_MAX_STRING_SIZE,
     ExecutionTimer,
     in_directory,
@@ -660,9 +662,18 @@ class AsynchronousJobRunner(BaseJobRunner, Monitors):
     thread to monitor the state of asynchronous jobs and submitting those jobs
     to the correct methods (queue, finish, cleanup) at appropriate times..
     """
+    DEFAULT_SPECS = dict(
+        BaseJobRunner.DEFAULT_SPECS,
+        monitor_min_interval=dict(map=float, valid=lambda x: float(x) > 0, default=1.0),
+        monitor_max_interval=dict(map=float, valid=lambda x: float(x) > 0, default=1.0),
+        monitor_queue_size_step=dict(map=int, valid=lambda x: int(x) > 0, default=1000),
+        async_monitor=dict(map=asbool, default=False),
+        async_monitor_concurrency=dict(map=int, valid=lambda x: int(x) > 0, default=10),
+    )
 
     def __init__(self, app, nworkers, **kwargs):
         super().__init__(app, nworkers, **kwargs)
+        self.monitor_interval = self.runner_params.monitor_min_interval
         # 'watched' and 'queue' are both used to keep track of jobs to watch.
         # 'queue' is used to add new watched jobs, and can be called from
         # any thread (usually by the 'queue_job' method). 'watched' must only
@@ -670,6 +681,8 @@ class AsynchronousJobRunner(BaseJobRunner, Monitors):
         # to 'watched' and then manage the watched jobs.
         self.watched = []
         self.monitor_queue = Queue()
+        # Monitor lag statistics, updated periodically by the asyncio monitor loop.
+        self.monitor_lag = None
 
     def _init_monitor_thread(self):
         name = f"{self.runner_name}.monitor_thread"
@@ -684,6 +697,10 @@ class AsynchronousJobRunner(BaseJobRunner, Monitors):
         Watches jobs currently in the monitor queue and deals with state
         changes (queued to running) and job completion.
         """
+        if self.runner_params.async_monitor:
+            if type(self).check_watched_items is AsynchronousJobRunner.check_watched_items:
+                return self._async_monitor().run()
+            log.warning("%s: runner checks watched jobs in bulk, ignoring async_monitor", self.runner_name)
         while True:
             # Take any new watched jobs and put them on the monitor list
             try:
@@ -698,11 +715,49 @@ class AsynchronousJobRunner(BaseJobRunner, Monitors):
                 pass
             # Iterate over the list of watched jobs and check state
             try:
-                self.check_watched_items()
+                state_changes = self.check_watched_items()
             except Exception:
                 log.exception('Unhandled exception checking active jobs')
+                state_changes = None
             # Sleep a bit before the next state check
-            time.sleep(1)
+            time.sleep(self._next_monitor_interval(state_changes))
+
+    def _async_monitor(self):
+        """
+        Return an asyncio monitor loop checking watched jobs concurrently with
+        per-job intervals between ``monitor_min_interval`` and ``monitor_max_interval``.
+        Only used for runners implementing ``check_watched_item``.
+        """
+        return AsyncJobMonitor(
+            self,
+            concurrency=self.runner_params.async_monitor_concurrency,
+            min_interval=self.runner_params.monitor_min_interval,
+            max_interval=self.runner_params.monitor_max_interval,
+            statsd_client=self.app.execution_timer_factory.galaxy_statsd_client,
+        )
+
+    def _next_monitor_interval(self, state_changes):
+        """
+        Return the number of seconds to wait before checking watched jobs again.
+
+        ``state_changes`` is the number of watched jobs that changed state in the
+        last check (None if the runner does not report it). The interval is halved
+        whenever jobs change state and grows while they do not, between
+        ``monitor_min_interval`` and ``monitor_max_interval``. Large queues are
+        checked less often: the interval is at least ``monitor_min_interval`` for
+        each ``monitor_queue_size_step`` watched jobs.
+        """
+        min_interval = self.runner_params.monitor_min_interval
+        max_interval = max(min_interval, self.runner_params.monitor_max_interval)
+        queue_size_interval = min(max_interval, min_interval * (1 + len(self.watched) // self.runner_params.monitor_queue_size_step))
+        if state_changes is None:
+            interval = min_interval
+        elif state_changes:
+            interval = self.monitor_interval / 2
+        else:
+            interval = min(max_interval, self.monitor_interval * 1.5)
+        self.monitor_interval = max(queue_size_interval, interval)
+        return self.monitor_interval
 
     def monitor_job(self, job_state):
         self.monitor_queue.put(job_state)
@@ -722,6 +777,9 @@ class AsynchronousJobRunner(BaseJobRunner, Monitors):
         states. Subclasses can opt to override this directly (as older job runners will
         initially) or just override check_watched_item and allow the list processing to
         reuse the logic here.
+
+        Subclasses overriding this may return the number of jobs that changed state,
+        which allows adapting the interval between checks (see `_next_monitor_interval`).
         """
         new_watched = []
         for async_job_state in self.watched:
@@ -2,6 +2,7 @@
 Job control via a command line interface (e.g. qsub/qstat), possibly over a remote connection (e.g. ssh).
 """
 
+import json
 import logging
 import time
 
@@ -151,6 +152,10 @@ class ShellJobRunner(AsynchronousJobRunner):
         new_watched = []
 
         job_states = self.__get_job_states()
+        missing = [ajs for ajs in self.watched
+                   if ajs.job_id not in job_states and ajs.job_wrapper.get_state() != model.Job.states.DELETED]
+        if missing:
+            job_states.update(self.__get_single_job_states(missing))
 
         for ajs in self.watched:
             external_job_id = ajs.job_id
@@ -158,16 +163,8 @@ class ShellJobRunner(AsynchronousJobRunner):
             old_state = ajs.old_state
             state = job_states.get(external_job_id, None)
             if state is None:
-                if ajs.job_wrapper.get_state() == model.Job.states.DELETED:
-                    continue
-
-                log.debug(f"({id_tag}/{external_job_id}) job not found in batch state check")
-                shell_params, job_params = self.parse_destination_params(ajs.job_destination.params)
-                shell, job_interface = self.get_cli_plugins(shell_params, job_params)
-                cmd_out = shell.execute(job_interface.get_single_status(external_job_id))
-                state = job_interface.parse_single_status(cmd_out.stdout, external_job_id)
-                if not state == model.Job.states.OK:
-                    log.warning(f'({id_tag}/{external_job_id}) job not found in batch state check, but found in individual state check')
+                # Job deleted in Galaxy and gone from the batch state check
+                continue
             job_state = ajs.job_wrapper.get_state()
             if state != old_state:
                 log.debug(f"({id_tag}/{external_job_id}) state change: from {old_state} to {state}")
@@ -208,24 +205,46 @@ class ShellJobRunner(AsynchronousJobRunner):
                 ajs.runner_state = JobState.runner_states.MEMORY_LIMIT_REACHED
                 ajs.fail_message = "Tool failed due to insufficient memory. Try with more memory."
 
+    def __group_by_shell(self, job_states):
+        """
+        Group job states by shell and job interface, so that commands for
+        all jobs sharing a shell can be sent at once.
+        """
+        plugins = {}
+        groups = {}
+        for ajs in job_states:
+            shell_params, job_params = self.parse_destination_params(ajs.job_destination.params)
+            key = (json.dumps(shell_params, sort_keys=True), json.dumps(job_params, sort_keys=True))
+            if key not in plugins:
+                plugins[key] = self.get_cli_plugins(shell_params, job_params)
+            shell, job_interface = plugins[key]
+            shell_group = groups.setdefault(key[0], (shell, {}))[1]
+            shell_group.setdefault(key[1], (job_interface, []))[1].append(ajs)
+        return groups.values()
+
     def __get_job_states(self):
-        job_destinations = {}
         job_states = {}
-        # unique the list of destinations
-        for ajs in self.watched:
-            if ajs.job_destination.id not in job_destinations:
-                job_destinations[ajs.job_destination.id] = dict(job_destination=ajs.job_destination, job_ids=[ajs.job_id])
-            else:
-                job_destinations[ajs.job_destination.id]['job_ids'].append(ajs.job_id)
-        # check each destination for the listed job ids
-        for v in job_destinations.values():
-            job_destination = v['job_destination']
-            job_ids = v['job_ids']
-            shell_params, job_params = self.parse_destination_params(job_destination.params)
-            shell, job_interface = self.get_cli_plugins(shell_params, job_params)
-            cmd_out = shell.execute(job_interface.get_status(job_ids))
-            assert cmd_out.returncode == 0, cmd_out.stderr
-            job_states.update(job_interface.parse_status(cmd_out.stdout, job_ids))
+        # check the listed job ids with one remote command per shell
+        for shell, job_groups in self.__group_by_shell(self.watched):
+            job_groups = [(job_interface, [ajs.job_id for ajs in group]) for job_interface, group in job_groups.values()]
+            cmds = [job_interface.get_status(job_ids) for job_interface, job_ids in job_groups]
+            for (job_interface, job_ids), cmd_out in zip(job_groups, shell.execute_many(cmds)):
+                assert cmd_out.returncode == 0, cmd_out.stderr
+                job_states.update(job_interface.parse_status(cmd_out.stdout, job_ids))
+        return job_states
+
+    def __get_single_job_states(self, missing):
+        job_states = {}
+        for shell, job_groups in self.__group_by_shell(missing):
+            checks = [(job_interface, ajs) for job_interface, group in job_groups.values() for ajs in group]
+            cmds = [job_interface.get_single_status(ajs.job_id) for job_interface, ajs in checks]
+            for (job_interface, ajs), cmd_out in zip(checks, shell.execute_many(cmds)):
+                id_tag = ajs.job_wrapper.get_id_tag()
+                log.debug(f"({id_tag}/{ajs.job_id}) job not found in batch state check")
+                state = job_interface.parse_single_status(cmd_out.stdout, ajs.job_id)
+                if not state == model.Job.states.OK:
+                    log.warning(f'({id_tag}/{ajs.job_id}) job not found in batch state check, but found in individual state check')
+                job_states[ajs.job_id] = state
         return job_states
 
     def stop_job(self, job_wrapper):
@@ -255,7 +255,18 @@ class DRMAAJobRunner(AsynchronousJobRunner):
             if job_state != model.Job.states.DELETED:
                 self.work_queue.put((self.finish_job, ajs))
 
-    def check_watched_item(self, ajs, new_watched):
+    def _bulk_job_status(self, external_job_ids):
+        """
+        Return a dictionary mapping (some of) the given external job ids to their
+        DRMAA job state, queried in bulk. Jobs missing from the result are checked
+        one by one with the DRMAA session.
+
+        DRMAA only allows querying the status of a single job, subclasses may
+        implement this with DRM specific tools.
+        """
+        return {}
+
+    def check_watched_item(self, ajs, new_watched, job_states=None):
         """
         look at a single watched job, determine its state, and deal with errors
         that could happen in this process. to be called from check_watched_items()
@@ -274,13 +285,18 @@ class DRMAAJobRunner(AsynchronousJobRunner):
 
         Note that None is returned in all cases where the loop in check_watched_items
         is to be continued
+
+        If ``job_states`` (as returned by `_bulk_job_status`) contains the job, its
+        state is used instead of querying the DRM.
         """
         external_job_id = ajs.job_id
         galaxy_id_tag = ajs.job_wrapper.get_id_tag()
         state = None
         try:
             assert external_job_id not in (None, 'None'), f'({galaxy_id_tag}/{external_job_id}) Invalid job id'
-            state = self.ds.job_status(external_job_id)
+            state = (job_states or {}).get(external_job_id)
+            if state is None:
+                state = self.ds.job_status(external_job_id)
             # Reset exception retries
             for retry_exception in RETRY_EXCEPTIONS_LOWER:
                 setattr(ajs, f"{retry_exception}_retries", 0)
@@ -321,17 +337,24 @@ class DRMAAJobRunner(AsynchronousJobRunner):
     def check_watched_items(self):
         """
         Called by the monitor thread to look at each watched job and deal
-        with state changes.
+        with state changes. Returns the number of jobs that changed state.
         """
         new_watched = []
+        state_changes = 0
+        try:
+            job_states = self._bulk_job_status([ajs.job_id for ajs in self.watched])
+        except Exception:
+            log.exception("Failed to check the state of watched jobs in bulk, checking jobs one by one")
+            job_states = {}
         for ajs in self.watched:
             external_job_id = ajs.job_id
             galaxy_id_tag = ajs.job_wrapper.get_id_tag()
             old_state = ajs.old_state
-            state = self.check_watched_item(ajs, new_watched)
+            state = self.check_watched_item(ajs, new_watched, job_states=job_states)
             if state is None:
                 continue
             if state != old_state:
+                state_changes += 1
                 log.debug(f"({galaxy_id_tag}/{external_job_id}) state change: {self.drmaa_job_state_strings[state]}")
             if state == drmaa.JobState.RUNNING and not ajs.running:
                 ajs.running = True
@@ -352,6 +375,7 @@ class DRMAAJobRunner(AsynchronousJobRunner):
             new_watched.append(ajs)
         # Replace the watch list with the updated version
         self.watched = new_watched
+        return state_changes
 
     def stop_job(self, job_wrapper):
         """Attempts to delete a job from the DRM queue"""
@@ -3,6 +3,7 @@ Job runner plugin for executing jobs on the local system via the command line.
 """
 import datetime
 import logging
+import math
 import os
 import subprocess
 import tempfile
@@ -18,6 +19,11 @@ from . import (
     BaseJobRunner,
     JobState
 )
+from .util.local_scheduler import (
+    available_cores,
+    available_memory,
+    ResourceScheduler,
+)
 from .util.process_groups import (
     check_pg,
     kill_pg
@@ -31,16 +37,29 @@ DEFAULT_POOL_SLEEP_TIME = 1
 # TODO: Set to false and just get rid of this option. It would simplify this
 # class nicely. -John
 DEFAULT_EMBED_METADATA_IN_JOB = True
+# Job metric recorded by the cgroup job metrics plugin, used to estimate the memory of jobs.
+CGROUP_MEMORY_METRIC = "memory.max_usage_in_bytes"
 
 
 class LocalJobRunner(BaseJobRunner):
     """
-    Job runner backed by a finite pool of worker threads. FIFO scheduling
+    Job runner backed by a finite pool of worker threads. FIFO scheduling,
+    or resource-aware scheduling if the ``resource_scheduling`` param is set.
     """
     runner_name = "LocalRunner"
 
-    def __init__(self, app, nworkers):
+    def __init__(self, app, nworkers, **kwargs):
         """Start the job runner """
+        runner_param_specs = dict(
+            resource_scheduling=dict(map=asbool, default=False),
+            resource_cores=dict(map=int, valid=lambda x: int(x) >= 0, default=0),
+            resource_memory=dict(map=int, valid=lambda x: int(x) >= 0, default=0),
+            resource_backfill_timeout=dict(map=float, valid=lambda x: float(x) >= 0, default=300),
+            resource_memory_history=dict(map=int, valid=lambda x: int(x) >= 0, default=20),
+        )
+        if 'runner_param_specs' not in kwargs:
+            kwargs['runner_param_specs'] = dict()
+        kwargs['runner_param_specs'].update(runner_param_specs)
 
         # create a local copy of os.environ to use as env for subprocess.Popen
         self._environ = os.environ.copy()
@@ -51,17 +70,29 @@ class LocalJobRunner(BaseJobRunner):
         if not ('TMPDIR' in self._environ or 'TEMP' in self._environ or 'TMP' in self._environ):
             self._environ['TEMP'] = os.path.abspath(tempfile.gettempdir())
 
-        super().__init__(app, nworkers)
+        super().__init__(app, nworkers, **kwargs)
+        self._scheduler = None
+        if self.runner_params.resource_scheduling:
+            self._scheduler = ResourceScheduler(
+                cores=self.runner_params.resource_cores or available_cores(),
+                memory=self.runner_params.resource_memory or available_memory(),
+                dispatch=self._dispatch_job,
+                backfill_timeout=self.runner_params.resource_backfill_timeout,
+            )
+            log.info("%s: scheduling jobs on %d cores and %d MB of memory", self.runner_name, self._scheduler.cores, self._scheduler.memory)
         self._init_worker_threads()
 
+    def _local_slots(self, job_wrapper):
+        # slots would be cleaner name, but don't want deployers to see examples and think it
+        # is going to work with other job runners.
+        return job_wrapper.job_destination.params.get("local_slots", None) or os.environ.get("GALAXY_SLOTS", None)
+
     def __command_line(self, job_wrapper):
         """
         """
         command_line = job_wrapper.runner_command_line
 
-        # slots would be cleaner name, but don't want deployers to see examples and think it
-        # is going to work with other job runners.
-        slots = job_wrapper.job_destination.params.get("local_slots", None) or os.environ.get("GALAXY_SLOTS", None)
+        slots = self._local_slots(job_wrapper)
         if slots:
             slots_statement = 'GALAXY_SLOTS="%d"; export GALAXY_SLOTS; GALAXY_SLOTS_CONFIGURED="1"; export GALAXY_SLOTS_CONFIGURED;' % (int(slots))
         else:
@@ -81,6 +112,55 @@ class LocalJobRunner(BaseJobRunner):
         self.write_executable_script(job_file, job_file_contents)
         return job_file, exit_code_path
 
+    def mark_as_queued(self, job_wrapper):
+        if self._scheduler is None:
+            return super().mark_as_queued(job_wrapper)
+        slots = self._local_slots(job_wrapper)
+        cores = int(slots) if slots else 1
+        memory = job_wrapper.job_destination.params.get("local_memory", None)
+        memory = int(memory) if memory else self._estimate_memory(job_wrapper)
+        self._scheduler.submit(job_wrapper, cores=cores, memory=memory)
+
+    def _estimate_memory(self, job_wrapper):
+        """
+        Estimate the memory (in MB) a job needs from the maximum memory usage
+        of the most recent jobs of the same tool, as recorded by the cgroup
+        job metrics plugin. Return 0 if unknown.
+        """
+        history = self.runner_params.resource_memory_history
+        if not history or not self._scheduler.memory:
+            return 0
+        try:
+            usages = self.sa_session.query(model.JobMetricNumeric.metric_value).join(
+                model.Job, model.Job.id == model.JobMetricNumeric.job_id
+            ).filter(
+                model.Job.tool_id == job_wrapper.get_job().tool_id,
+                model.JobMetricNumeric.plugin == "cgroup",
+                model.JobMetricNumeric.metric_name == CGROUP_MEMORY_METRIC,
+            ).order_by(model.JobMetricNumeric.job_id.desc()).limit(history).all()
+        except Exception:
+            log.exception("(%s) failed to estimate job memory from job metrics", job_wrapper.get_id_tag())
+            return 0
+        if not usages:
+            return 0
+        return int(math.ceil(max(usage for usage, in usages) / 1024 ** 2))
+
+    def _dispatch_job(self, job_wrapper, waited):
+        log.debug("(%s) waited %.1f seconds for resources (%d of %d cores, %d of %d MB in use, %d jobs waiting)",
+                  job_wrapper.get_id_tag(), waited, self._scheduler.used_cores, self._scheduler.cores,
+                  self._scheduler.used_memory, self._scheduler.memory, self._scheduler.pending)
+        statsd_client = self.app.execution_timer_factory.galaxy_statsd_client
+        if statsd_client:
+            statsd_client.timing(f"internals.galaxy.jobs.runners.{self.__class__.__name__.lower()}.queue_wait", waited * 1000.0)
+        self.work_queue.put((self.queue_scheduled_job, job_wrapper))
+
+    def queue_scheduled_job(self, job_wrapper):
+        """Run a job started by the resource scheduler and release its resources once finished."""
+        try:
+            self.queue_job(job_wrapper)
+        finally:
+            self._scheduler.release(job_wrapper)
+
     def queue_job(self, job_wrapper):
         if not self._prepare_job_local(job_wrapper):
             return
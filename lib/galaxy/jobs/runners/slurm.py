@@ -3,6 +3,7 @@ SLURM job control via the DRMAA API.
 """
 import os
 import time
+from collections import defaultdict
 
 from galaxy import model
 from galaxy.jobs.runners.drmaa import DRMAAJobRunner
@@ -29,10 +30,65 @@ SLURM_MEMORY_LIMIT_EXCEEDED_PARTIAL_WARNINGS = [': Exceeded job memory limit at
 OUT_OF_MEMORY_MSG = 'This job was terminated because it used more memory than it was allocated.'
 PROBABLY_OUT_OF_MEMORY_MSG = 'This job was cancelled probably because it used more memory than it was allocated.'
 
+# Maximum number of job ids passed to a single squeue call, keeps the command line
+# well below the maximum length of a single argument.
+SQUEUE_MAX_JOB_IDS = 5000
+
 
 class SlurmJobRunner(DRMAAJobRunner):
     runner_name = "SlurmRunner"
     restrict_job_name_length = False
+    # Set to False if squeue cannot be run by Galaxy
+    squeue_available = True
+
+    def _bulk_job_status(self, external_job_ids):
+        """
+        Query the state of all watched jobs with one squeue call per cluster
+        (and per ``SQUEUE_MAX_JOB_IDS`` jobs) instead of one DRMAA call per job.
+        """
+        if not self.squeue_available:
+            return {}
+        # Only states of jobs waiting or running in SLURM are used, terminal
+        # states are left to DRMAA (which knows about exit codes).
+        squeue_drmaa_states = {
+            'PENDING': self.drmaa_job_states.QUEUED_ACTIVE,
+            'CONFIGURING': self.drmaa_job_states.RUNNING,
+            'RUNNING': self.drmaa_job_states.RUNNING,
+        }
+        job_ids_by_cluster = defaultdict(list)
+        for external_job_id in external_job_ids:
+            if external_job_id in (None, 'None'):
+                continue
+            # custom slurm-drmaa-with-cluster-support job id syntax
+            job_id, _, cluster = external_job_id.partition('.')
+            job_ids_by_cluster[cluster].append(job_id)
+        job_states = {}
+        for cluster, job_ids in job_ids_by_cluster.items():
+            for i in range(0, len(job_ids), SQUEUE_MAX_JOB_IDS):
+                cmd = ['squeue', '--noheader', '--format=%i %T']
+                if cluster:
+                    cmd.extend(['-M', cluster])
+                cmd.extend(['-j', ','.join(job_ids[i:i + SQUEUE_MAX_JOB_IDS])])
+                try:
+                    stdout = commands.execute(cmd)
+                except commands.CommandLineException as e:
+                    # e.g. none of the jobs is known to slurmctld anymore
+                    log.debug('Unable to check the state of jobs with squeue, falling back to DRMAA: %s', e)
+                    continue
+                except OSError:
+                    log.warning('Unable to run squeue, job states will be checked one by one with DRMAA', exc_info=True)
+                    self.squeue_available = False
+                    return {}
+                for line in stdout.splitlines():
+                    fields = line.split()
+                    # squeue -M prints a "CLUSTER: name" line first
+                    if len(fields) != 2 or fields[0] == 'CLUSTER:':
+                        continue
+                    job_id, slurm_state = fields
+                    drmaa_state = squeue_drmaa_states.get(slurm_state)
+                    if drmaa_state is not None:
+                        job_states[f'{job_id}.{cluster}' if cluster else job_id] = drmaa_state
+        return job_states
 
     def _complete_terminal_job(self, ajs, drmaa_state, **kwargs):
         def _get_slurm_state_with_sacct(job_id, cluster):
@@ -0,0 +1,181 @@
+"""
+Check the jobs watched by an asynchronous job runner concurrently using asyncio.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty
+
+log = logging.getLogger(__name__)
+
+# Seconds between monitor lag reports.
+LAG_REPORT_INTERVAL = 60
+# Maximum seconds to wait before taking newly queued jobs.
+NEW_JOBS_INTERVAL = 1.0
+
+
+class MonitorLag:
+    """Track how late watched jobs are checked compared to when they were due."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.checks = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, lag):
+        lag = max(0.0, lag)
+        self.checks += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+
+    def to_dict(self):
+        return {
+            'checks': self.checks,
+            'mean': self.total / self.checks if self.checks else 0.0,
+            'max': self.max,
+        }
+
+
+class _WatchedJob:
+    __slots__ = ('job_state', 'last_change', 'due')
+
+    def __init__(self, job_state, now):
+        self.job_state = job_state
+        self.last_change = now
+        self.due = now
+
+
+def _job_state_key(job_state):
+    return getattr(job_state, 'old_state', None), getattr(job_state, 'running', None)
+
+
+class AsyncJobMonitor:
+    """
+    Monitor loop checking each job watched by an ``AsynchronousJobRunner``
+    on its own schedule.
+
+    ``check_watched_item`` of the runner is called from a pool of
+    ``concurrency`` threads, so slow status queries for some jobs do not
+    delay the others. New jobs and jobs that recently changed state are
+    checked every ``min_interval`` seconds, jobs whose state has not changed
+    for a while are checked less often (every tenth of the time since their
+    last state change), at most every ``max_interval`` seconds. Finished and
+    failed jobs are handed to the runner's ``work_queue`` by
+    ``check_watched_item`` as in the threaded monitor loop.
+    """
+
+    def __init__(self, runner, concurrency, min_interval, max_interval, statsd_client=None):
+        self.runner = runner
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.statsd_client = statsd_client
+        self.lag = MonitorLag()
+        self._jobs = set()
+        self._schedule = []
+        self._counter = itertools.count()
+        self._watched_changed = False
+
+    def run(self):
+        """Run the monitor in the calling thread until the runner's stop signal is received."""
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"{self.runner.runner_name}.monitor")
+        try:
+            loop.run_until_complete(self.monitor(loop, executor))
+        finally:
+            executor.shutdown(wait=True)
+            loop.close()
+
+    async def monitor(self, loop, executor):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        checks = set()
+        last_report = time.time()
+        while True:
+            if self._take_new_jobs():
+                if checks:
+                    await asyncio.wait(checks)
+                self._update_watched()
+                self.runner.handle_stop()
+                return
+            now = time.time()
+            while self._schedule and self._schedule[0][0] <= now:
+                watched_job = heapq.heappop(self._schedule)[2]
+                check = asyncio.ensure_future(self._check(loop, executor, semaphore, watched_job))
+                checks.add(check)
+                check.add_done_callback(checks.discard)
+            self._update_watched()
+            if now - last_report >= LAG_REPORT_INTERVAL:
+                self.report_lag()
+                last_report = now
+            delay = NEW_JOBS_INTERVAL
+            if self._schedule:
+                delay = min(delay, max(0.0, self._schedule[0][0] - now))
+            await asyncio.sleep(delay)
+
+    def _take_new_jobs(self):
+        """Move jobs from the runner's monitor queue to the schedule, return True on stop."""
+        from galaxy.jobs.runners import STOP_SIGNAL
+        now = time.time()
+        try:
+            while True:
+                job_state = self.runner.monitor_queue.get_nowait()
+                if job_state is STOP_SIGNAL:
+                    return True
+                self._add(_WatchedJob(job_state, now))
+        except Empty:
+            return False
+
+    def _update_watched(self):
+        # Keep the runner's list of watched jobs current for introspection.
+        if self._watched_changed:
+            self.runner.watched = [watched_job.job_state for watched_job in self._jobs]
+            self._watched_changed = False
+
+    def _add(self, watched_job):
+        self._jobs.add(watched_job)
+        self._watched_changed = True
+        heapq.heappush(self._schedule, (watched_job.due, next(self._counter), watched_job))
+
+    async def _check(self, loop, executor, semaphore, watched_job):
+        async with semaphore:
+            self.lag.add(time.time() - watched_job.due)
+            job_state = watched_job.job_state
+            key = _job_state_key(job_state)
+            try:
+                new_job_state = await loop.run_in_executor(executor, self.runner.check_watched_item, job_state)
+            except Exception:
+                log.exception('Unhandled exception checking active job')
+                new_job_state = job_state
+        now = time.time()
+        if not new_job_state:
+            self._jobs.discard(watched_job)
+            self._watched_changed = True
+            return
+        if new_job_state is not job_state or _job_state_key(new_job_state) != key:
+            watched_job.last_change = now
+            self._watched_changed = True
+        watched_job.job_state = new_job_state
+        watched_job.due = now + self.interval(watched_job, now)
+        heapq.heappush(self._schedule, (watched_job.due, next(self._counter), watched_job))
+
+    def interval(self, watched_job, now):
+        return min(self.max_interval, max(self.min_interval, (now - watched_job.last_change) / 10))
+
+    def report_lag(self):
+        lag = self.lag.to_dict()
+        self.runner.monitor_lag = lag
+        if not lag['checks']:
+            return
+        log.debug("%s: checked %d watched jobs, %d in total, monitor lag mean %.3fs max %.3fs",
+                  self.runner.runner_name, lag['checks'], len(self._jobs), lag['mean'], lag['max'])
+        if self.statsd_client:
+            timer_id = f"internals.galaxy.jobs.runners.{self.runner.runner_name.lower()}.monitor_lag"
+            self.statsd_client.timing(timer_id, lag['mean'] * 1000.0)
+            self.statsd_client.timing(f"{timer_id}_max", lag['max'] * 1000.0)
+        self.lag.reset()
@@ -1,11 +1,18 @@
 """
 Abstract base class for runners which execute commands via a shell.
 """
+import re
+import uuid
 from abc import (
     ABCMeta,
     abstractmethod
 )
 
+from galaxy.util.bunch import Bunch
+
+# Return code of commands whose result is missing from the output of a pipelined command.
+MISSING_RESULT_RETURN_CODE = -1
+
 
 class BaseShellExec(metaclass=ABCMeta):
 
@@ -19,3 +26,67 @@ class BaseShellExec(metaclass=ABCMeta):
         """
         Execute the specified command via defined shell.
         """
+
+    def execute_many(self, cmds, timeout=60):
+        """
+        Execute the specified commands via defined shell, return a result for each command.
+        """
+        return [self.execute(cmd, timeout=timeout) for cmd in cmds]
+
+
+class PipelinedShellMixin:
+    """
+    Execute several commands in a single invocation of a (remote) shell,
+    avoiding a round trip (and connection) per command.
+    """
+
+    def execute_many(self, cmds, timeout=60):
+        if len(cmds) < 2:
+            return [self.execute(cmd, timeout=timeout) for cmd in cmds]
+        marker = f"GALAXY_CLI_RESULT_{uuid.uuid4().hex}"
+        result = self.execute(pipeline_commands(cmds, marker), timeout=timeout)
+        return split_pipelined_result(result, len(cmds), marker)
+
+
+def pipeline_commands(cmds, marker):
+    """
+    Return a shell script running ``cmds`` one after the other, delimiting
+    their output and return code with ``marker``.
+
+    >>> from .local import LocalShell
+    >>> marker = 'MARKER'
+    >>> result = LocalShell().execute(pipeline_commands(['echo a', 'echo b >&2; false', 'printf c'], marker))
+    >>> [(r.stdout, r.stderr, r.returncode) for r in split_pipelined_result(result, 3, marker)]
+    [('a\\n', '', 0), ('', 'b\\n', 1), ('c', '', 0)]
+    """
+    lines = []
+    for cmd in cmds:
+        lines.append(cmd)
+        # Print the return code first, before the second printf resets $?.
+        lines.append(f"printf '\\n%s %d\\n' {marker} $?")
+        lines.append(f"printf '\\n%s\\n' {marker} >&2")
+    return "\n".join(lines)
+
+
+def split_pipelined_result(result, count, marker):
+    """
+    Split the result of a script built by `pipeline_commands` into ``count`` results.
+    Commands that did not run (e.g. the connection failed) get the error of the script.
+    """
+    stdout = re.split(r"\n{} (-?\d+)\n".format(re.escape(marker)), result.stdout)
+    stderr = result.stderr.split(f"\n{marker}\n")
+    results = []
+    for i in range(count):
+        if 2 * i + 1 < len(stdout):
+            results.append(Bunch(
+                stdout=stdout[2 * i],
+                stderr=stderr[i] if i < len(stderr) else '',
+                returncode=int(stdout[2 * i + 1]),
+            ))
+        else:
+            results.append(Bunch(
+                stdout='',
+                stderr=result.stderr,
+                returncode=result.returncode or MISSING_RESULT_RETURN_CODE,
+            ))
+    return results
@@ -1,4 +1,6 @@
 import logging
+import os
+import threading
 import time
 
 import paramiko
@@ -10,6 +12,7 @@ from galaxy.util import (
     unicodify,
 )
 from galaxy.util.bunch import Bunch
+from . import PipelinedShellMixin
 from .local import LocalShell
 
 log = logging.getLogger(__name__)
@@ -18,7 +21,13 @@ logging.getLogger("paramiko").setLevel(logging.WARNING)  # paramiko logging is v
 __all__ = ('RemoteShell', 'SecureShell', 'GlobusSecureShell', 'ParamikoShell')
 
 
-class RemoteShell(LocalShell):
+# OpenSSH expands %r, %h and %p to remote user, host and port, sharing one master connection per destination host.
+# The socket must not be in a directory other users can write to, or they could hijack the connection.
+DEFAULT_CONTROL_PATH = os.path.join(os.path.expanduser('~'), '.ssh', 'galaxy-%r@%h:%p')
+DEFAULT_CONTROL_PERSIST = 600
+
+
+class RemoteShell(PipelinedShellMixin, LocalShell):
 
     def __init__(self, rsh='rsh', rcp='rcp', hostname='localhost', username=None, options=None, **kwargs):
         super().__init__(**kwargs)
@@ -42,8 +51,20 @@ class RemoteShell(LocalShell):
 
 class SecureShell(RemoteShell):
 
-    def __init__(self, rsh='ssh', rcp='scp', private_key=None, port=None, strict_host_key_checking=True, **kwargs):
+    def __init__(self, rsh='ssh', rcp='scp', private_key=None, port=None, strict_host_key_checking=True,
+                 connection_sharing=False, control_path=DEFAULT_CONTROL_PATH, control_persist=DEFAULT_CONTROL_PERSIST, **kwargs):
         options = []
+        if string_as_bool(connection_sharing):
+            # Keep a master connection open and multiplex commands over it
+            # instead of opening a new SSH connection per command.
+            control_dir = os.path.dirname(control_path)
+            if control_dir and not os.path.isdir(control_dir):
+                os.makedirs(control_dir, mode=0o700)
+            options.extend([
+                "-o", "ControlMaster=auto",
+                "-o", f"ControlPath={control_path}",
+                "-o", f"ControlPersist={control_persist}",
+            ])
         if not string_as_bool(strict_host_key_checking):
             options.extend(["-o", "StrictHostKeyChecking=no", "-o", "UserKnownHostsFile=/dev/null"])
         options.extend(["-o", "ConnectTimeout=60"])
@@ -54,7 +75,7 @@ class SecureShell(RemoteShell):
         super().__init__(rsh=rsh, rcp=rcp, options=options, **kwargs)
 
 
-class ParamikoShell:
+class ParamikoShell(PipelinedShellMixin):
 
     def __init__(self, username, hostname, password=None, private_key=None, port=22, timeout=60, strict_host_key_checking=True, **kwargs):
         self.username = username
@@ -65,6 +86,7 @@ class ParamikoShell:
         self.timeout = int(timeout) if timeout else timeout
         self.strict_host_key_checking = string_as_bool(strict_host_key_checking)
         self.ssh = None
+        self._connect_lock = threading.Lock()
         self.retry_action_executor = RetryActionExecutor(max_retries=100, interval_max=300)
         self.connect()
 
@@ -88,7 +110,8 @@ class ParamikoShell:
             except paramiko.SSHException as e:
                 log.error(e)
                 time.sleep(10)
-                self.connect()
+                with self._connect_lock:
+                    self.connect()
                 _, stdout, stderr = self._execute(cmd, timeout)
             return stdout, stderr
 
@@ -0,0 +1,158 @@
+"""
+Schedule local jobs according to the cores and memory they request and the
+capacity of the machine (or the cgroup Galaxy runs in).
+"""
+import logging
+import math
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CGROUP_MOUNT = "/sys/fs/cgroup"
+# cgroup v1 reports a huge number (close to 2**63) for an unlimited memory.limit_in_bytes
+UNLIMITED_CGROUP_MEMORY = 2 ** 60
+
+
+def _read_cgroup_file(cgroup_mount, *paths):
+    for path in paths:
+        try:
+            with open(os.path.join(cgroup_mount, path)) as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def cgroup_cpu_limit(cgroup_mount=DEFAULT_CGROUP_MOUNT):
+    """Return the number of cores available to the cgroup Galaxy runs in, None if unlimited."""
+    cpu_max = _read_cgroup_file(cgroup_mount, "cpu.max")
+    try:
+        if cpu_max is not None:
+            quota, period = cpu_max.split()
+            if quota == "max":
+                return None
+        else:
+            quota = _read_cgroup_file(cgroup_mount, "cpu,cpuacct/cpu.cfs_quota_us", "cpu/cpu.cfs_quota_us")
+            period = _read_cgroup_file(cgroup_mount, "cpu,cpuacct/cpu.cfs_period_us", "cpu/cpu.cfs_period_us")
+            if quota is None or period is None or int(quota) < 0:
+                return None
+        return max(1, math.ceil(int(quota) / int(period)))
+    except ValueError:
+        return None
+
+
+def cgroup_memory_limit(cgroup_mount=DEFAULT_CGROUP_MOUNT):
+    """Return the memory (in MB) available to the cgroup Galaxy runs in, None if unlimited."""
+    limit = _read_cgroup_file(cgroup_mount, "memory.max", "memory/memory.limit_in_bytes")
+    try:
+        if limit is None or limit == "max" or int(limit) >= UNLIMITED_CGROUP_MEMORY:
+            return None
+        return int(limit) // 1024 ** 2
+    except ValueError:
+        return None
+
+
+def available_cores(cgroup_mount=DEFAULT_CGROUP_MOUNT):
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    cgroup_cores = cgroup_cpu_limit(cgroup_mount)
+    if cgroup_cores is not None:
+        cores = min(cores, cgroup_cores)
+    return cores
+
+
+def available_memory(cgroup_mount=DEFAULT_CGROUP_MOUNT):
+    """Return the memory (in MB) of the machine or of the cgroup Galaxy runs in, if lower."""
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 1024 ** 2
+    except (ValueError, OSError, AttributeError):
+        memory = None
+    cgroup_memory = cgroup_memory_limit(cgroup_mount)
+    if cgroup_memory is not None:
+        memory = cgroup_memory if memory is None else min(memory, cgroup_memory)
+    return memory or 0
+
+
+class _PendingJob:
+    __slots__ = ('item', 'cores', 'memory', 'submit_time')
+
+    def __init__(self, item, cores, memory):
+        self.item = item
+        self.cores = cores
+        self.memory = memory
+        self.submit_time = time.time()
+
+
+class ResourceScheduler:
+    """
+    Start jobs when the cores and memory (in MB) they request are free.
+
+    Jobs are started in submission order, but smaller jobs submitted later are
+    backfilled into free capacity while the first waiting job does not fit.
+    Once the first waiting job has waited ``backfill_timeout`` seconds, no more
+    jobs are backfilled so that it does not starve. A ``memory`` capacity of 0
+    disables memory accounting.
+
+    ``dispatch(item, waited)`` is called, with the scheduler's lock held, for
+    each job that can start, ``release(item)`` must be called once it finished.
+    """
+
+    def __init__(self, cores, memory, dispatch, backfill_timeout=300):
+        self.cores = cores
+        self.memory = memory
+        self.dispatch = dispatch
+        self.backfill_timeout = backfill_timeout
+        self.used_cores = 0
+        self.used_memory = 0
+        self._pending = []
+        self._running = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def submit(self, item, cores=1, memory=0):
+        cores = max(1, cores)
+        if cores > self.cores:
+            log.warning("Job requests %d cores, more than the %d available, limiting it to %d", cores, self.cores, self.cores)
+            cores = self.cores
+        if not self.memory:
+            memory = 0
+        elif memory > self.memory:
+            log.warning("Job requests %d MB of memory, more than the %d MB available, limiting it to %d MB", memory, self.memory, self.memory)
+            memory = self.memory
+        with self._lock:
+            self._pending.append(_PendingJob(item, cores, memory))
+            self._schedule()
+
+    def release(self, item):
+        with self._lock:
+            cores, memory = self._running.pop(id(item))
+            self.used_cores -= cores
+            self.used_memory -= memory
+            self._schedule()
+
+    def _fits(self, job):
+        return self.used_cores + job.cores <= self.cores and (not self.memory or self.used_memory + job.memory <= self.memory)
+
+    def _schedule(self):
+        now = time.time()
+        waiting = []
+        blocked_since = None
+        for job in self._pending:
+            may_start = blocked_since is None or now - blocked_since < self.backfill_timeout
+            if may_start and self._fits(job):
+                self.used_cores += job.cores
+                self.used_memory += job.memory
+                self._running[id(job.item)] = (job.cores, job.memory)
+                self.dispatch(job.item, now - job.submit_time)
+            else:
+                if blocked_since is None:
+                    blocked_since = job.submit_time
+                waiting.append(job)
+        self._pending = waiting
@@ -3,6 +3,14 @@ Mixins for Annotatable model managers and serializers.
 """
 
 import logging
+
+from sqlalchemy import (
+    inspect,
+    sql,
+)
+
+from galaxy import model
+
 log = logging.getLogger(__name__)
 
 
@@ -87,29 +95,41 @@ class AnnotatableDeserializerMixin:
 # TODO: I'm not entirely convinced this (or tags) are a good idea for filters since they involve a/the user
 class AnnotatableFilterMixin:
 
-    def _owner_annotation(self, item):
-        """
-        Get the annotation by the item's owner.
-        """
-        return _match_by_user(item, item.user)
+    valid_ops = ('has', 'contains')
 
-    def filter_annotation_contains(self, item, val):
+    def create_annotation_filter(self, attr, op, val):
         """
-        Test whether `val` is in the owner's annotation.
+        Create an ORM filter selecting items whose owner's annotation contains `val`.
         """
-        owner_annotation = self._owner_annotation(item)
-        if owner_annotation is None:
-            return False
-        return val in owner_annotation
+        if op not in AnnotatableFilterMixin.valid_ops:
+            self.raise_filter_err(attr, op, val, 'bad op in filter')
+
+        def _create_annotation_filter(model_class=None):
+            if model_class is None:
+                return True
+            annotations = inspect(model_class).relationships['annotations']
+            annotation_table = annotations.mapper.class_.table
+            return sql.exists().where(sql.and_(
+                annotations.primaryjoin,
+                annotation_table.c.user_id == _owner_id_column(model_class),
+                annotation_table.c.annotation.contains(val, autoescape=True),
+            ))
+        return _create_annotation_filter
 
     def _add_parsers(self):
-        self.fn_filter_parsers.update(
-            {
-                'annotation': {
-                    'op': {
-                        'has': self.filter_annotation_contains,
-                        'contains': self.filter_annotation_contains,
-                    },
-                },
-            }
-        )
+        self.orm_filter_parsers.update({
+            'annotation': self.create_annotation_filter
+        })
+
+
+def _owner_id_column(model_class):
+    """
+    Return a column expression for the id of the user owning items of `model_class`.
+    """
+    if 'user_id' in model_class.table.c:
+        return model_class.table.c.user_id
+    # history contents are owned by the owner of their history
+    history_table = model.History.table
+    return (sql.select([history_table.c.user_id])
+            .where(history_table.c.id == model_class.table.c.history_id)
+            .scalar_subquery())
@@ -56,6 +56,9 @@ log = logging.getLogger(__name__)
 
 parsed_filter = namedtuple("ParsedFilter", "filter_type filter")
 
+#: number of models loaded per query when streaming results through functional filters
+STREAM_BATCH_SIZE = 1000
+
 
 # ==== accessors from base/controller.py
 def security_check(trans, item, check_ownership=False, check_accessible=False):
@@ -327,12 +330,33 @@ class ModelManager:
 
         # fn filters will change the number of items returnable by limit/offset - remove them here from the orm query
         query = self.query(filters=orm_filters, order_by=order_by, limit=None, offset=None, **kwargs)
-        items = query.all()
+        if order_by is None:
+            # ids follow creation order so the default order can be streamed, stopping once limit + offset
+            # items have passed the fn filters
+            items = self._stream_query(query)
+        else:
+            items = query.all()
 
         # apply limit, offset after SQL filtering
         items = self._apply_fn_filters_gen(items, fn_filters)
         return list(self._apply_fn_limit_offset_gen(items, limit, offset))
 
+    def _stream_query(self, query, batch_size=STREAM_BATCH_SIZE):
+        """
+        Yield the models returned by `query` in id order, loading them `batch_size` at a time.
+        """
+        # page on the primary key rather than with OFFSET so each page is a range scan of the index
+        id_col = self.model_class.id
+        query = query.order_by(None).order_by(id_col)
+        last_id = None
+        while True:
+            page = query if last_id is None else query.filter(id_col > last_id)
+            batch = page.limit(batch_size).all()
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1].id
+
     def _split_filters(self, filters):
         """
         Splits `filters` into a tuple of two lists:
@@ -385,14 +409,17 @@ class ModelManager:
         if offset is not None and offset < 0:
             offset = None
 
+        if limit == 0:
+            return
         yielded = 0
         for i, item in enumerate(items):
             if offset is not None and i < offset:
                 continue
-            if limit is not None and yielded >= limit:
-                break
             yield item
             yielded += 1
+            # stop before pulling (and so possibly loading) the next item
+            if limit is not None and yielded >= limit:
+                break
 
     def by_ids(self, ids, filters=None, **kwargs):
         """
@@ -1154,7 +1181,7 @@ class ModelFilterParser(HasAModelManager):
         Split `id_list_string` at `sep`.
         """
         # TODO: move id decoding out
-        id_list = [self.app.security.decode_id(id_) for id_ in id_list_string.split(sep)]
+        id_list = self.app.security.decode_ids(id_list_string.split(sep))
         return id_list
 
     def parse_int_list(self, int_list_string, sep=','):
@@ -1224,7 +1251,7 @@ class ServiceBase:
         """
         Decodes all encoded IDs in the given list.
         """
-        return [self.decode_id(id) for id in ids]
+        return self.security.decode_ids(str(id) for id in ids)
 
     def encode_all_ids(self, rval, recursive: bool = False):
         """
@@ -1,5 +1,6 @@
 import logging
 
+from sqlalchemy import event
 from sqlalchemy.orm import joinedload, Query
 
 from galaxy import model
@@ -8,6 +9,7 @@ from galaxy.exceptions import (
     MessageException,
     RequestParameterInvalidException
 )
+from galaxy.managers.base import security_check
 from galaxy.managers.collections_util import validate_input_element_identifiers
 from galaxy.model.dataset_collections import builder
 from galaxy.model.dataset_collections.matching import MatchingCollections
@@ -117,11 +119,12 @@ class DatasetCollectionManager:
         if element_identifiers and not trusted_identifiers:
             validate_input_element_identifiers(element_identifiers)
 
+        list_elements = None
         if completed_job and output_name:
             jtodca = next(a for a in completed_job.output_dataset_collection_instances if a.name == output_name)
             dataset_collection = jtodca.dataset_collection_instance.collection
         else:
-            dataset_collection = self.create_dataset_collection(
+            dataset_collection, list_elements = self.__create_dataset_collection(
                 trans=trans,
                 collection_type=collection_type,
                 element_identifiers=element_identifiers,
@@ -129,6 +132,7 @@ class DatasetCollectionManager:
                 hide_source_items=hide_source_items,
                 copy_elements=copy_elements,
                 history=history,
+                defer_list_elements=flush,
             )
 
         implicit_inputs = []
@@ -139,9 +143,13 @@ class DatasetCollectionManager:
         if implicit_collection_info:
             implicit_output_name = implicit_collection_info["implicit_output_name"]
 
-        return self._create_instance_for_collection(
-            trans, parent, name, dataset_collection, implicit_inputs=implicit_inputs, implicit_output_name=implicit_output_name, tags=tags, set_hid=set_hid, flush=flush,
+        dataset_collection_instance = self._create_instance_for_collection(
+            trans, parent, name, dataset_collection, implicit_inputs=implicit_inputs, implicit_output_name=implicit_output_name, tags=tags, set_hid=set_hid,
+            flush=flush and list_elements is None,
         )
+        if list_elements is not None:
+            self.__persist_list_elements(dataset_collection, list_elements)
+        return dataset_collection_instance
 
     def _create_instance_for_collection(self, trans, parent, name, dataset_collection, implicit_output_name=None, implicit_inputs=None, tags=None, set_hid=True, flush=True):
         if isinstance(parent, model.History):
@@ -156,7 +164,7 @@ class DatasetCollectionManager:
             if implicit_output_name:
                 dataset_collection_instance.implicit_output_name = implicit_output_name
 
-            log.debug("Created collection with %d elements" % (len(dataset_collection_instance.collection.elements)))
+            log.debug("Created collection with %d elements" % (dataset_collection_instance.collection.element_count or 0))
 
             if set_hid:
                 parent.add_dataset_collection(dataset_collection_instance)
@@ -185,6 +193,20 @@ class DatasetCollectionManager:
 
     def create_dataset_collection(self, trans, collection_type, element_identifiers=None, elements=None,
                                   hide_source_items=None, copy_elements=False, history=None):
+        dataset_collection, _ = self.__create_dataset_collection(
+            trans, collection_type, element_identifiers=element_identifiers, elements=elements,
+            hide_source_items=hide_source_items, copy_elements=copy_elements, history=history,
+        )
+        return dataset_collection
+
+    def __create_dataset_collection(self, trans, collection_type, element_identifiers=None, elements=None,
+                                    hide_source_items=None, copy_elements=False, history=None, defer_list_elements=False):
+        """
+        Create a dataset collection, and return it with None - or, if
+        defer_list_elements is set and it is a list created from element
+        identifiers, return it without elements along with the elements to
+        insert with __persist_list_elements.
+        """
         # Make sure at least one of these is None.
         assert element_identifiers is None or elements is None
 
@@ -210,13 +232,77 @@ class DatasetCollectionManager:
                 self.__recursively_create_collections_for_elements(trans, elements, hide_source_items, copy_elements=copy_elements, history=history)
         # else if elements is set, it better be an ordered dict!
 
+        list_elements = None
         if elements is not self.ELEMENTS_UNINITIALIZED:
             type_plugin = collection_type_description.rank_type_plugin()
-            dataset_collection = builder.build_collection(type_plugin, elements)
+            if defer_list_elements and element_identifiers is not None and type_plugin.collection_type == "list":
+                dataset_collection, list_elements = self.__create_list_collection(elements)
+            else:
+                dataset_collection = builder.build_collection(type_plugin, elements)
         else:
             dataset_collection = model.DatasetCollection(populated=False)
         dataset_collection.collection_type = collection_type
-        return dataset_collection
+        return dataset_collection, list_elements
+
+    def __create_list_collection(self, elements):
+        """
+        Create a list collection without its elements, and return it with the
+        (element column, element id, element) of each of its elements for
+        __persist_list_elements.
+        """
+        dataset_collection = model.DatasetCollection(element_count=len(elements))
+        list_elements = []
+        for element_identifier, element in elements.items():
+            if isinstance(element, model.HistoryDatasetAssociation):
+                element_column = "hda_id"
+            elif isinstance(element, model.LibraryDatasetDatasetAssociation):
+                element_column = "ldda_id"
+            elif isinstance(element, model.DatasetCollection):
+                element_column = "child_collection_id"
+            else:
+                raise AttributeError(f'Unknown element type provided: {type(element)}')
+            # Commits (e.g. when assigning the hid of the collection instance)
+            # expire loaded objects, reading their ids afterwards would reload
+            # each of them.
+            list_elements.append((element_identifier, element_column, element.id, element))
+        return dataset_collection, list_elements
+
+    def __persist_list_elements(self, dataset_collection, list_elements):
+        """
+        Flush the session, inserting the DatasetCollectionElement rows of
+        dataset_collection with a single executemany (rather than flushing a
+        DatasetCollectionElement object per element) from within the flush, so
+        that the collection, its instance and its elements are committed (or
+        rolled back) together.
+        """
+        context = self.model.context
+        # New elements (copied HDAs, HDAs created from LDDAs, nested collections) need an id
+        context.add_all(element for _, _, element_id, element in list_elements if element_id is None)
+
+        def insert_elements(session, flush_context):
+            rows = []
+            for element_index, (element_identifier, element_column, element_id, element) in enumerate(list_elements):
+                row = dict(
+                    dataset_collection_id=dataset_collection.id,
+                    hda_id=None,
+                    ldda_id=None,
+                    child_collection_id=None,
+                    element_index=element_index,
+                    element_identifier=element_identifier or str(element_index),
+                )
+                row[element_column] = element_id or element.id
+                rows.append(row)
+            if rows:
+                session.execute(model.DatasetCollectionElement.table.insert(), rows)
+
+        session = context()
+        event.listen(session, 'after_flush', insert_elements, once=True)
+        try:
+            context.flush()
+        finally:
+            if event.contains(session, 'after_flush', insert_elements):
+                event.remove(session, 'after_flush', insert_elements)
+        context.expire(dataset_collection, ['elements'])
 
     def _element_identifiers_to_elements(self,
                                          trans,
@@ -409,16 +495,63 @@ class DatasetCollectionManager:
         elements.update(new_elements)
 
     def __load_elements(self, trans, element_identifiers, hide_source_items=False, copy_elements=False, history=None):
+        hdas = self.__load_hdas(trans, element_identifiers)
+        lddas = self.__load_lddas(trans, element_identifiers)
         elements = {}
         for element_identifier in element_identifiers:
             elements[element_identifier["name"]] = self.__load_element(trans,
                                                                        element_identifier=element_identifier,
                                                                        hide_source_items=hide_source_items,
                                                                        copy_elements=copy_elements,
-                                                                       history=history)
+                                                                       history=history,
+                                                                       hdas=hdas,
+                                                                       lddas=lddas)
         return elements
 
-    def __load_element(self, trans, element_identifier, hide_source_items, copy_elements, history=None):
+    @staticmethod
+    def __encoded_ids(element_identifiers, src):
+        encoded_ids = []
+        for element_identifier in element_identifiers:
+            if not isinstance(element_identifier, dict) or "__object__" in element_identifier:
+                continue
+            if element_identifier.get('src', 'hda') == src and element_identifier.get('id'):
+                encoded_ids.append(element_identifier['id'])
+        return encoded_ids
+
+    def __load_hdas(self, trans, element_identifiers):
+        """
+        Decode the ids of the HDA elements of element_identifiers and load
+        them, checking they are accessible, with a few queries for all of
+        them rather than a few queries per element.
+        """
+        encoded_ids = self.__encoded_ids(element_identifiers, 'hda')
+        if not encoded_ids:
+            return {}
+        decoded_ids = trans.app.security.decode_ids(encoded_ids)
+        hdas = self.hda_manager.get_accessible_many(decoded_ids, trans.user)
+        return dict(zip(encoded_ids, hdas))
+
+    def __load_lddas(self, trans, element_identifiers):
+        """
+        Decode the ids of the LDDA elements of element_identifiers and load
+        them with a single query. Their access is checked like
+        LDDAManager.get does, against the library item permissions.
+        """
+        encoded_ids = self.__encoded_ids(element_identifiers, 'ldda')
+        if not encoded_ids:
+            return {}
+        decoded_ids = trans.app.security.decode_ids(encoded_ids)
+        LDDA = model.LibraryDatasetDatasetAssociation
+        found = {ldda.id: ldda for ldda in trans.sa_session.query(LDDA).filter(LDDA.id.in_(set(decoded_ids)))}
+        lddas = {}
+        for encoded_id, decoded_id in zip(encoded_ids, decoded_ids):
+            ldda = found.get(decoded_id)
+            if ldda is None:
+                raise MessageException(f"Invalid LibraryDatasetDatasetAssociation id ( {encoded_id} ) specified", type="error")
+            lddas[encoded_id] = security_check(trans, ldda, check_accessible=True)
+        return lddas
+
+    def __load_element(self, trans, element_identifier, hide_source_items, copy_elements, history=None, hdas=None, lddas=None):
         # if not isinstance( element_identifier, dict ):
         #    # Is allowing this to just be the id of an hda too clever? Somewhat
         #    # consistent with other API methods though.
@@ -450,17 +583,23 @@ class DatasetCollectionManager:
         if tags:
             tag_str = ",".join(str(_) for _ in tags)
         if src_type == 'hda':
-            decoded_id = int(trans.app.security.decode_id(encoded_id))
-            hda = self.hda_manager.get_accessible(decoded_id, trans.user)
+            if hdas and encoded_id in hdas:
+                hda = hdas[encoded_id]
+            else:
+                decoded_id = int(trans.app.security.decode_id(encoded_id))
+                hda = self.hda_manager.get_accessible(decoded_id, trans.user)
             if copy_elements:
                 element = self.hda_manager.copy(hda, history=history or trans.history, hide_copy=True)
             else:
                 element = hda
-            if hide_source_items and self.hda_manager.get_owned(hda.id, user=trans.user, current_history=history or trans.history):
+            if hide_source_items and self.hda_manager.error_unless_owner(hda, user=trans.user, current_history=history or trans.history):
                 hda.visible = False
             self.tag_handler.apply_item_tags(user=trans.user, item=element, tags_str=tag_str)
         elif src_type == 'ldda':
-            element = self.ldda_manager.get(trans, encoded_id, check_accessible=True)
+            if lddas and encoded_id in lddas:
+                element = lddas[encoded_id]
+            else:
+                element = self.ldda_manager.get(trans, encoded_id, check_accessible=True)
             element = element.to_history_dataset_association(history or trans.history, add_to_history=True, visible=not hide_source_items)
             self.tag_handler.apply_item_tags(user=trans.user, item=element, tags_str=tag_str)
         elif src_type == 'hdca':
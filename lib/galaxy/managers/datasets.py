@@ -6,6 +6,8 @@ import logging
 import os
 from typing import Type
 
+from sqlalchemy import sql
+
 from galaxy import (
     exceptions,
     model
@@ -100,6 +102,16 @@ class DatasetManager(base.ModelManager, secured.AccessibleManagerMixin, deletabl
         roles = user.all_roles_exploiting_cache() if user else []
         return self.app.security_agent.can_access_dataset(roles, dataset)
 
+    def accessible_ids(self, dataset_ids, user, **kwargs):
+        """
+        Return the subset of `dataset_ids` readable/viewable to user, checking
+        the permissions of all datasets together.
+        """
+        if self.user_manager.is_admin(user, trans=kwargs.get("trans")):
+            return set(dataset_ids)
+        roles = user.all_roles_exploiting_cache() if user else []
+        return self.app.security_agent.accessible_dataset_ids(roles, dataset_ids)
+
     # TODO: implement above for groups
     # TODO: datatypes?
     # .... data, object_store
@@ -249,6 +261,28 @@ class DatasetAssociationManager(base.ModelManager,
         # defer to the dataset
         return self.dataset_manager.is_accessible(dataset_assoc.dataset, user, **kwargs)
 
+    def get_accessible_many(self, ids, user, batch_size=1000, **kwargs):
+        """
+        Return the DAs with the given ids (in the order of `ids`) if they are
+        all accessible to user, otherwise raise an error.
+
+        DAs are loaded and their permissions checked `batch_size` ids at a
+        time rather than one by one.
+
+        :raises exceptions.ObjectNotFound, exceptions.ItemAccessibilityException:
+        """
+        unique_ids = list(dict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(unique_ids), batch_size):
+            for item in self.by_ids(unique_ids[start:start + batch_size]):
+                found[item.id] = item
+        if len(found) < len(unique_ids):
+            raise exceptions.ObjectNotFound(f"{self.model_class.__name__} not found")
+        accessible = self.dataset_manager.accessible_ids({item.dataset_id for item in found.values()}, user, **kwargs)
+        if any(item.dataset_id not in accessible for item in found.values()):
+            raise exceptions.ItemAccessibilityException(f"{self.model_class.__name__} is not accessible by user")
+        return [found[id] for id in ids]
+
     def purge(self, dataset_assoc, flush=True):
         """
         Purge this DatasetInstance and the dataset underlying it.
@@ -705,33 +739,46 @@ class DatasetAssociationFilterParser(base.ModelFilterParser, deletable.PurgableF
             'name': {'op': ('eq', 'contains', 'like')},
             'state': {'column': '_state', 'op': ('eq', 'in')},
             'visible': {'op': ('eq'), 'val': self.parse_bool},
+            'data_type': self.create_datatype_filter,
         })
         self.fn_filter_parsers.update({
             'genome_build': self.string_standard_ops('dbkey'),
-            'data_type': {
-                'op': {
-                    'eq': self.eq_datatype,
-                    'isinstance': self.isinstance_datatype
-                }
-            }
         })
 
-    def eq_datatype(self, dataset_assoc, class_str):
+    def create_datatype_filter(self, attr, op, val):
         """
-        Is the `dataset_assoc` datatype equal to the registered datatype `class_str`?
+        Create an ORM filter selecting dataset associations whose datatype is
+        equal to (`eq`) the registered datatype `val` or derived from (`isinstance`)
+        any of the registered datatypes in the comma separated string `val`.
         """
-        comparison_class = self.app.datatypes_registry.get_datatype_class_by_name(class_str)
-        return comparison_class and dataset_assoc.datatype.__class__ == comparison_class
+        registry = self.app.datatypes_registry
+        if op == 'eq':
+            comparison_class = registry.get_datatype_class_by_name(val)
 
-    def isinstance_datatype(self, dataset_assoc, class_strs):
-        """
-        Is the `dataset_assoc` datatype derived from any of the registered
-        datatypes in the comma separated string `class_strs`?
-        """
-        parse_datatype_fn = self.app.datatypes_registry.get_datatype_class_by_name
-        comparison_classes = []
-        for class_str in class_strs.split(','):
-            datatype_class = parse_datatype_fn(class_str)
-            if datatype_class:
-                comparison_classes.append(datatype_class)
-        return comparison_classes and isinstance(dataset_assoc.datatype, comparison_classes)
+            def matches(datatype):
+                return comparison_class is not None and datatype.__class__ == comparison_class
+        elif op == 'isinstance':
+            comparison_classes = tuple(filter(None, map(registry.get_datatype_class_by_name, val.split(','))))
+
+            def matches(datatype):
+                return isinstance(datatype, comparison_classes)
+        else:
+            self.raise_filter_err(attr, op, val, 'bad op in filter')
+        extensions = [ext for ext, datatype in registry.datatypes_by_extension.items() if matches(datatype)]
+        # unset, unsniffed and unknown extensions are treated as 'data' (see model.datatype_for_extension)
+        fallback_matches = matches(registry.get_datatype_by_extension('data'))
+
+        def _create_datatype_filter(model_class=None):
+            if model_class is None:
+                return True
+            extension = sql.func.lower(model_class.table.c.extension)
+            cond = extension.in_(extensions)
+            if fallback_matches:
+                cond = sql.or_(
+                    cond,
+                    model_class.table.c.extension.is_(None),
+                    extension.in_(('', 'auto', '_sniff_')),
+                    extension.notin_(list(registry.datatypes_by_extension.keys())),
+                )
+            return cond
+        return _create_datatype_filter
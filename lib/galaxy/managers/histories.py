@@ -407,7 +407,7 @@ class HistorySerializer(sharable.SharableModelSerializer, deletable.PurgableSeri
 
             'empty': lambda i, k, **c: (len(i.datasets) + len(i.dataset_collections)) <= 0,
             'count': lambda i, k, **c: len(i.datasets),
-            'hdas': lambda i, k, **c: [self.app.security.encode_id(hda.id) for hda in i.datasets],
+            'hdas': lambda i, k, **c: self.app.security.encode_ids(hda.id for hda in i.datasets),
             'state_details': self.serialize_state_counts,
             'state_ids': self.serialize_state_ids,
             'contents': self.serialize_contents,
@@ -4,7 +4,11 @@ Mixins for Ratable model managers and serializers.
 import logging
 from typing import Type
 
-from sqlalchemy.sql.expression import func
+from sqlalchemy import inspect
+from sqlalchemy.sql.expression import (
+    func,
+    select,
+)
 
 from galaxy.model import ItemRatingAssociation
 from . import base
@@ -104,22 +108,33 @@ class RatableDeserializerMixin:
 
 class RatableFilterMixin:
 
-    def _ratings_avg_accessor(self, item):
-        return self.manager.ratings_avg(item)
+    valid_ops = ('eq', 'ge', 'le')
+
+    def create_community_rating_filter(self, attr, op, val):
+        """
+        Create an ORM filter comparing the average rating of an item (0 if unrated) with `val`.
+        """
+        if op not in RatableFilterMixin.valid_ops:
+            self.raise_filter_err(attr, op, val, 'bad op in filter')
+        val = float(val)
+
+        def _create_community_rating_filter(model_class=None):
+            if model_class is None:
+                return True
+            ratings = inspect(model_class).relationships['ratings']
+            rating_table = ratings.mapper.class_.table
+            ratings_avg = (select([func.coalesce(func.avg(rating_table.c.rating), 0.0)])
+                           .where(ratings.primaryjoin)
+                           .scalar_subquery())
+            # TODO: default to greater than (currently 'eq' due to base/controller.py)
+            return getattr(ratings_avg, f"__{op}__")(val)
+        return _create_community_rating_filter
 
     def _add_parsers(self):
         """
         Adds the following filters:
             `community_rating`: filter
         """
-        self.fn_filter_parsers.update({
-            'community_rating': {
-                'op': {
-                    'eq': lambda i, v: self._ratings_avg_accessor(i) == v,
-                    # TODO: default to greater than (currently 'eq' due to base/controller.py)
-                    'ge': lambda i, v: self._ratings_avg_accessor(i) >= v,
-                    'le': lambda i, v: self._ratings_avg_accessor(i) <= v,
-                },
-                'val': float
-            }
+        self.orm_filter_parsers.update({
+            'community_rating': self.create_community_rating_filter
         })
@@ -437,7 +437,7 @@ class SharableModelDeserializer(base.ModelDeserializer,
         add or remove user shares in order to update the users_shared_with to
         match the given list finally returning the new list of shares.
         """
-        unencoded_ids = [self.app.security.decode_id(id_) for id_ in val]
+        unencoded_ids = self.app.security.decode_ids(val)
         new_users_shared_with = set(self.manager.user_manager.by_ids(unencoded_ids))
         current_shares = self.manager.get_share_assocs(item)
         currently_shared_with = {share.user for share in current_shares}
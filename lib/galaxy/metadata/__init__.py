@@ -48,6 +48,7 @@ class MetadataCollectionStrategy(metaclass=abc.ABCMeta):
                                 config_file=None, datatypes_config=None,
                                 job_metadata=None, provided_metadata_style=None, compute_tmp_dir=None,
                                 include_command=True, max_metadata_value_size=0,
+                                metadata_processes=1, metadata_chunk_size=0,
                                 object_store_conf=None, tool=None, job=None,
                                 kwds=None):
         """Setup files needed for external metadata collection.
@@ -107,6 +108,7 @@ class PortableDirectoryMetadataGenerator(MetadataCollectionStrategy):
                                 config_file=None, datatypes_config=None,
                                 job_metadata=None, provided_metadata_style=None, compute_tmp_dir=None,
                                 include_command=True, max_metadata_value_size=0,
+                                metadata_processes=1, metadata_chunk_size=0,
                                 validate_outputs=False,
                                 object_store_conf=None, tool=None, job=None,
                                 kwds=None):
@@ -152,6 +154,8 @@ class PortableDirectoryMetadataGenerator(MetadataCollectionStrategy):
             "provided_metadata_style": provided_metadata_style,
             "datatypes_config": datatypes_config,
             "max_metadata_value_size": max_metadata_value_size,
+            "processes": metadata_processes,
+            "chunk_size": metadata_chunk_size,
             "outputs": outputs,
         }
 
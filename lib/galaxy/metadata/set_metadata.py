@@ -12,6 +12,7 @@ constructed automatically).
 """
 import json
 import logging
+import multiprocessing.pool
 import os
 import sys
 import traceback
@@ -25,7 +26,11 @@ except ImportError:
 import galaxy.datatypes.registry
 import galaxy.model.mapping
 from galaxy.datatypes import sniff
-from galaxy.datatypes.data import validate
+from galaxy.datatypes.data import (
+    Text,
+    validate,
+)
+from galaxy.datatypes.util import block_scan
 from galaxy.job_execution.output_collect import (
     collect_dynamic_outputs,
     collect_extra_files,
@@ -105,6 +110,121 @@ def set_meta_with_tool_provided(dataset_instance, file_dict, set_meta_kwds, data
                 dataset_instance.metadata.remove_key(k)
 
 
+def set_peek(dataset_instance, line_count):
+    try:
+        # Certain datatype's set_peek methods contain a line_count argument
+        dataset_instance.set_peek(line_count=line_count)
+    except TypeError:
+        # ... and others don't
+        dataset_instance.set_peek()
+
+
+# Outputs whose metadata is set by worker processes, inherited when forking them
+_parallel_outputs = []
+
+
+def _set_meta_in_worker(index):
+    """
+    Set the metadata (and peek) of ``_parallel_outputs[index]`` and return
+    the changes to apply to the dataset in the parent process.
+    """
+    output = _parallel_outputs[index]
+    dataset = output["dataset"]
+    try:
+        previous_metadata = dict(dataset._metadata)
+        set_meta_with_tool_provided(dataset, output["file_dict"], output["set_meta_kwds"], output["datatypes_registry"], output["max_metadata_value_size"])
+        result = {
+            # Model objects (e.g. MetadataFiles) that are not replaced are kept in the parent
+            "metadata": {k: v for k, v in dataset._metadata.items() if not (hasattr(v, '_sa_instance_state') and v is previous_metadata.get(k))},
+            "removed": [k for k in previous_metadata if k not in dataset._metadata],
+            "extension": dataset.extension,
+        }
+        if output["set_peek"] and dataset.ext != 'auto':
+            set_peek(dataset, output["line_count"])
+            result["peek"] = (dataset.peek, dataset.blurb)
+        return result
+    except Exception:
+        return {"error": traceback.format_exc()}
+
+
+def _apply_worker_result(dataset, result):
+    metadata = dict(dataset._metadata)
+    for key in result["removed"]:
+        metadata.pop(key, None)
+    metadata.update(result["metadata"])
+    dataset._metadata = metadata
+    dataset.extension = result["extension"]
+
+
+def set_meta_in_parallel(outputs, processes, chunk_size):
+    """
+    Set the metadata of ``outputs`` (dictionaries of the arguments of
+    ``set_meta_with_tool_provided``) using a pool of ``processes`` worker
+    processes, and return the results of the workers by output index.
+
+    Line-oriented outputs larger than ``chunk_size`` are processed in this
+    process while their chunks are scanned by the workers (see
+    ``block_scan.chunked_scanning``), the other outputs by the workers -
+    unless the metadata they set cannot be pickled, then these outputs are
+    processed again in this process. A result is ``None`` for outputs
+    processed in this process, and a dictionary with an ``error`` key if
+    setting metadata failed.
+    """
+    global _parallel_outputs
+    results = [None] * len(outputs)
+    _parallel_outputs = outputs
+    try:
+        # Workers must be forked to inherit the outputs
+        pool = multiprocessing.get_context("fork").Pool(processes)
+    except ValueError:
+        _parallel_outputs = []
+        return None
+    try:
+        chunked = []
+        pending = {}
+        for index, output in enumerate(outputs):
+            dataset = output["dataset"]
+            if chunk_size and isinstance(dataset.datatype, Text) and dataset.extension != "_sniff_" and _file_size(dataset) > chunk_size:
+                chunked.append(index)
+            else:
+                pending[index] = pool.apply_async(_set_meta_in_worker, (index,))
+        with block_scan.chunked_scanning(pool.map, chunk_size):
+            for index in chunked:
+                output = outputs[index]
+                try:
+                    set_meta_with_tool_provided(output["dataset"], output["file_dict"], output["set_meta_kwds"], output["datatypes_registry"], output["max_metadata_value_size"])
+                except Exception:
+                    results[index] = {"error": traceback.format_exc()}
+        unpicklable = []
+        for index, async_result in pending.items():
+            try:
+                results[index] = async_result.get()
+            except multiprocessing.pool.MaybeEncodingError:
+                # The metadata set by the worker cannot be sent back, set it again in this process
+                log.debug("Could not pickle the metadata of output %s set by a worker process, setting it serially", index)
+                unpicklable.append(index)
+            except Exception:
+                results[index] = {"error": traceback.format_exc()}
+        for index in unpicklable:
+            output = outputs[index]
+            try:
+                set_meta_with_tool_provided(output["dataset"], output["file_dict"], output["set_meta_kwds"], output["datatypes_registry"], output["max_metadata_value_size"])
+            except Exception:
+                results[index] = {"error": traceback.format_exc()}
+    finally:
+        pool.close()
+        pool.join()
+        _parallel_outputs = []
+    return results
+
+
+def _file_size(dataset):
+    try:
+        return os.path.getsize(dataset.dataset.external_filename)
+    except (OSError, TypeError):
+        return 0
+
+
 def set_metadata():
     set_metadata_portable()
 
@@ -230,6 +350,11 @@ def set_metadata_portable():
                 if filename:
                     unnamed_id_to_path[element['object_id']] = os.path.join(job_context.job_working_directory, filename)
 
+    processes = metadata_params.get("processes", 1)
+    if processes == 0:
+        processes = int(os.environ.get("GALAXY_SLOTS", 1))
+    chunk_size = metadata_params.get("chunk_size") or 0
+    prepared_outputs = []
     for output_name, output_dict in outputs.items():
         dataset_instance_id = output_dict["id"]
         klass = getattr(galaxy.model, output_dict.get('model_class', 'HistoryDatasetAssociation'))
@@ -270,18 +395,61 @@ def set_metadata_portable():
                 setattr(dataset.metadata, metadata_name, metadata_file_override)
             if output_dict.get("validate", False):
                 set_validated_state(dataset)
-            if dataset_instance_id not in unnamed_id_to_path:
-                # We're going to run through set_metadata in collect_dynamic_outputs with more contextual metadata,
-                # so skip set_meta here.
-                set_meta(dataset, file_dict)
-
+            context = None
             if extended_metadata_collection:
                 meta = tool_provided_metadata.get_dataset_meta(output_name, dataset.dataset.id, dataset.dataset.uuid)
                 if meta:
                     context = ExpressionContext(meta, expression_context)
                 else:
                     context = expression_context
+        except Exception:
+            json.dump((False, traceback.format_exc()), open(filename_results_code, 'wt+'))  # setting metadata has failed somehow
+            continue
+        prepared_outputs.append({
+            "dataset": dataset,
+            "file_dict": file_dict,
+            "set_meta_kwds": set_meta_kwds,
+            "datatypes_registry": datatypes_registry,
+            "max_metadata_value_size": max_metadata_value_size,
+            # We're going to run through set_metadata in collect_dynamic_outputs with more contextual metadata,
+            # so skip set_meta here.
+            "set_meta": dataset_instance_id not in unnamed_id_to_path,
+            "set_peek": extended_metadata_collection and Job.states.ERROR != final_job_state,
+            "line_count": context.get('line_count', None) if context is not None else None,
+            "context": context,
+            "filename_out": filename_out,
+            "filename_results_code": filename_results_code,
+            "dataset_filename_override": dataset_filename_override,
+        })
+
+    # Fan out set_meta (and set_peek) over worker processes
+    worker_results = {}
+    parallel_outputs = [output for output in prepared_outputs if output["set_meta"]]
+    if processes and processes > 1 and parallel_outputs:
+        results = set_meta_in_parallel(parallel_outputs, processes, chunk_size)
+        if results is not None:
+            for output, result in zip(parallel_outputs, results):
+                output["set_meta"] = False
+                worker_results[id(output)] = result
+
+    for prepared_output in prepared_outputs:
+        dataset = prepared_output["dataset"]
+        file_dict = prepared_output["file_dict"]
+        set_meta_kwds = prepared_output["set_meta_kwds"]
+        context = prepared_output["context"]
+        dataset_filename_override = prepared_output["dataset_filename_override"]
+        filename_results_code = prepared_output["filename_results_code"]
+        worker_result = worker_results.get(id(prepared_output))
+        try:
+            if prepared_output["set_meta"]:
+                set_meta(dataset, file_dict)
+            elif worker_result and "error" in worker_result:
+                json.dump((False, worker_result["error"]), open(filename_results_code, 'wt+'))  # setting metadata has failed somehow
+                continue
+            elif worker_result:
+                _apply_worker_result(dataset, worker_result)
 
+            if extended_metadata_collection:
                 # Lazy and unattached
                 # if getattr(dataset, "hidden_beneath_collection_instance", None):
                 #    dataset.visible = False
@@ -315,13 +483,11 @@ def set_metadata_portable():
                     # This has already been done:
                     # else:
                     #     self.external_output_metadata.load_metadata(dataset, output_name, self.sa_session, working_directory=self.working_directory, remote_metadata_directory=remote_metadata_directory)
-                    line_count = context.get('line_count', None)
-                    try:
-                        # Certain datatype's set_peek methods contain a line_count argument
-                        dataset.set_peek(line_count=line_count)
-                    except TypeError:
-                        # ... and others don't
-                        dataset.set_peek()
+                    if worker_result and "peek" in worker_result:
+                        # Set by the worker process
+                        dataset.peek, dataset.blurb = worker_result["peek"]
+                    else:
+                        set_peek(dataset, prepared_output["line_count"])
 
                 for context_key in TOOL_PROVIDED_JOB_METADATA_KEYS:
                     if context_key in context:
@@ -331,7 +497,7 @@ def set_metadata_portable():
                 dataset.dataset.external_filename = None
                 export_store.add_dataset(dataset)
             else:
-                dataset.metadata.to_JSON_dict(filename_out)  # write out results of set_meta
+                dataset.metadata.to_JSON_dict(prepared_output["filename_out"])  # write out results of set_meta
 
             json.dump((True, 'Metadata has been set successfully'), open(filename_results_code, 'wt+'))  # setting metadata has succeeded
         except Exception:
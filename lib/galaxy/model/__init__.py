@@ -34,6 +34,7 @@ from sqlalchemy import (
     alias,
     and_,
     BigInteger,
+    bindparam,
     Boolean,
     Column,
     DateTime,
@@ -412,6 +413,8 @@ class JobLike:
 class User(Dictifiable, RepresentById):
     use_pbkdf2 = True
     bootstrap_admin_user = False
+    # Record disk usage adjustments as UserDiskUsageDelta rows (applied in batches) instead of updating the user row
+    use_disk_usage_ledger = False
     api_keys: 'List[APIKeys]'
     """
     Data for a Galaxy user or admin and relations to their
@@ -554,7 +557,11 @@ class User(Dictifiable, RepresentById):
 
     def adjust_total_disk_usage(self, amount):
         if amount != 0:
-            self.disk_usage = func.coalesce(self.table.c.disk_usage, 0) + amount
+            sa_session = object_session(self)
+            if self.use_disk_usage_ledger and self.id is not None and sa_session is not None:
+                sa_session.add(UserDiskUsageDelta(self.id, amount))
+            else:
+                self.disk_usage = func.coalesce(self.table.c.disk_usage, 0) + amount
 
     @property
     def nice_total_disk_usage(self):
@@ -603,12 +610,76 @@ class User(Dictifiable, RepresentById):
                 AND library_dataset_dataset_association.id IS NULL
         """
         sa_session = object_session(self)
+        if not dryrun:
+            max_delta_id = UserDiskUsageDelta.max_id(sa_session, [self.id])
         usage = sa_session.scalar(sql_calc, {'id': self.id})
         if not dryrun:
             self.set_disk_usage(usage)
+            # the new usage accounts for all changes recorded before it was calculated
+            UserDiskUsageDelta.discard(sa_session, [self.id], max_delta_id)
             sa_session.flush()
         return usage
 
+    @staticmethod
+    def calculate_disk_usages(sa_session, user_ids):
+        """
+        Return a dictionary mapping each of the user ids to the user's disk usage
+        (see `calculate_disk_usage`), computed with a single query.
+        """
+        sql_calc = """
+            WITH per_user_histories AS
+            (
+                SELECT id, user_id
+                FROM history
+                WHERE user_id IN :ids
+                    AND NOT purged
+            ),
+            per_user_hdas AS (
+                SELECT DISTINCT per_user_histories.user_id, history_dataset_association.dataset_id
+                FROM history_dataset_association
+                JOIN per_user_histories ON history_dataset_association.history_id = per_user_histories.id
+                WHERE NOT history_dataset_association.purged
+            )
+            SELECT per_user_hdas.user_id, SUM(COALESCE(dataset.total_size, dataset.file_size, 0))
+            FROM per_user_hdas
+            JOIN dataset ON dataset.id = per_user_hdas.dataset_id
+            LEFT OUTER JOIN library_dataset_dataset_association ON dataset.id = library_dataset_dataset_association.dataset_id
+            WHERE library_dataset_dataset_association.id IS NULL
+            GROUP BY per_user_hdas.user_id
+        """
+        usages = {user_id: 0 for user_id in user_ids}
+        if user_ids:
+            statement = text(sql_calc).bindparams(bindparam('ids', expanding=True))
+            for user_id, usage in sa_session.execute(statement, {'ids': list(user_ids)}):
+                usages[user_id] = int(usage or 0)
+        return usages
+
+    @classmethod
+    def reconcile_disk_usage(cls, sa_session, user_ids, dryrun=False):
+        """
+        Recalculate the disk usage of the users with the given ids and, unless
+        `dryrun` is set, replace their stored usage (including pending changes in
+        the disk usage ledger) with it.
+
+        Returns a dictionary mapping the ids of users whose usage was off to a
+        tuple of their previous and recalculated usage.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        max_delta_id = UserDiskUsageDelta.max_id(sa_session, user_ids)
+        current = UserDiskUsageDelta.pending(sa_session, user_ids, max_delta_id)
+        for user_id, disk_usage in sa_session.execute(select([cls.table.c.id, cls.table.c.disk_usage]).where(cls.table.c.id.in_(user_ids))):
+            current[user_id] += int(disk_usage or 0)
+        usages = cls.calculate_disk_usages(sa_session, user_ids)
+        drift = {user_id: (current[user_id], usage) for user_id, usage in usages.items() if current[user_id] != usage}
+        if drift and not dryrun:
+            with sa_session.get_bind().begin() as conn:
+                conn.execute(cls.table.update().where(cls.table.c.id == bindparam('b_user_id')).values(disk_usage=bindparam('b_usage')),
+                             [{'b_user_id': user_id, 'b_usage': usage} for user_id, (_, usage) in drift.items()])
+                UserDiskUsageDelta.discard(conn, user_ids, max_delta_id)
+        return drift
+
     @staticmethod
     def user_template_environment(user):
         """
@@ -673,6 +744,71 @@ class User(Dictifiable, RepresentById):
         session.flush()
 
 
+class UserDiskUsageDelta(RepresentById):
+    """
+    A change of a user's disk usage not yet added to ``galaxy_user.disk_usage``.
+
+    Recording changes here instead of updating the user row keeps concurrent
+    dataset creation, copies, purges and job completions from contending for the
+    same user row. Pending changes are added to the users' disk usage in batches
+    by :meth:`apply`.
+    """
+
+    def __init__(self, user_id, delta):
+        self.user_id = user_id
+        self.delta = delta
+
+    @classmethod
+    def apply(cls, sa_session, batch_size=10000):
+        """
+        Add up to `batch_size` pending changes to the disk usage of their users
+        and remove them from the ledger. Returns the number of changes applied.
+        """
+        table = cls.table
+        with sa_session.get_bind().begin() as conn:
+            # lock the changes so that concurrent calls do not apply them twice
+            rows = conn.execute(select([table.c.id, table.c.user_id, table.c.delta])
+                                .order_by(table.c.id)
+                                .limit(batch_size)
+                                .with_for_update()).fetchall()
+            if not rows:
+                return 0
+            totals = defaultdict(int)
+            for _, user_id, delta in rows:
+                totals[user_id] += delta
+            params = [{'b_user_id': user_id, 'b_delta': delta} for user_id, delta in totals.items() if delta]
+            if params:
+                user_table = User.table
+                conn.execute(user_table.update()
+                             .where(user_table.c.id == bindparam('b_user_id'))
+                             .values(disk_usage=func.coalesce(user_table.c.disk_usage, 0) + bindparam('b_delta')),
+                             params)
+            conn.execute(table.delete().where(table.c.id.in_([row[0] for row in rows])))
+        return len(rows)
+
+    @classmethod
+    def max_id(cls, connection, user_ids):
+        """Return the id of the latest pending change of any of the users, or None."""
+        return connection.scalar(select([func.max(cls.table.c.id)]).where(cls.table.c.user_id.in_(user_ids)))
+
+    @classmethod
+    def pending(cls, connection, user_ids, max_id):
+        """Return the total of the pending changes up to `max_id` of each of the users."""
+        totals = defaultdict(int)
+        if max_id is not None:
+            for user_id, delta in connection.execute(select([cls.table.c.user_id, func.sum(cls.table.c.delta)])
+                                                     .where(and_(cls.table.c.user_id.in_(user_ids), cls.table.c.id <= max_id))
+                                                     .group_by(cls.table.c.user_id)):
+                totals[user_id] = int(delta)
+        return totals
+
+    @classmethod
+    def discard(cls, connection, user_ids, max_id):
+        """Remove the pending changes up to `max_id` of the users (e.g. because their usage was recalculated)."""
+        if max_id is not None:
+            connection.execute(cls.table.delete().where(and_(cls.table.c.user_id.in_(user_ids), cls.table.c.id <= max_id)))
+
+
 class PasswordResetToken(_HasTable):
     def __init__(self, user, token=None):
         if token:
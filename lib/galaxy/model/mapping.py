@@ -10,6 +10,7 @@ from typing import Optional, Type
 from sqlalchemy import (
     and_,
     asc,
+    BigInteger,
     Boolean,
     Column,
     DateTime,
@@ -138,6 +139,13 @@ model.PasswordResetToken.table = Table(
     Column("expiration_time", DateTime),
     Column("user_id", Integer, ForeignKey("galaxy_user.id"), index=True))
 
+model.UserDiskUsageDelta.table = Table(
+    "user_disk_usage_delta", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("create_time", DateTime, default=now),
+    Column("user_id", Integer, ForeignKey("galaxy_user.id"), index=True, nullable=False),
+    Column("delta", BigInteger, nullable=False))
+
 
 model.DynamicTool.table = Table(
     "dynamic_tool", metadata,
@@ -1857,6 +1865,8 @@ mapper_registry.map_imperatively(model.User, model.User.table, properties=dict(
 mapper_registry.map_imperatively(model.PasswordResetToken, model.PasswordResetToken.table,
        properties=dict(user=relation(model.User, backref="reset_tokens")))
 
+mapper_registry.map_imperatively(model.UserDiskUsageDelta, model.UserDiskUsageDelta.table)
+
 
 # Set up proxy so that this syntax is possible:
 # <user_obj>.preferences[pref_name] = pref_value
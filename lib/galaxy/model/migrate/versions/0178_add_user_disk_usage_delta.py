@@ -0,0 +1,41 @@
+"""
+Add user_disk_usage_delta table for incremental disk usage accounting
+"""
+
+import datetime
+import logging
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, MetaData, Table
+
+from galaxy.model.migrate.versions.util import (
+    create_table,
+    drop_table
+)
+
+log = logging.getLogger(__name__)
+now = datetime.datetime.utcnow
+metadata = MetaData()
+
+UserDiskUsageDeltaTable = Table(
+    "user_disk_usage_delta",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("create_time", DateTime, default=now),
+    Column("user_id", Integer, ForeignKey("galaxy_user.id"), index=True, nullable=False),
+    Column("delta", BigInteger, nullable=False),
+)
+
+
+def upgrade(migrate_engine):
+    print(__doc__)
+    metadata.bind = migrate_engine
+    metadata.reflect()
+
+    create_table(UserDiskUsageDeltaTable)
+
+
+def downgrade(migrate_engine):
+    metadata.bind = migrate_engine
+    metadata.reflect()
+
+    drop_table(UserDiskUsageDeltaTable)
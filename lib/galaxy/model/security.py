@@ -488,6 +488,26 @@ class GalaxyRBACAgent(RBACAgent):
 
         return True
 
+    def accessible_dataset_ids(self, user_roles, dataset_ids, batch_size=1000):
+        """
+        Return the subset of dataset_ids that can be accessed with user_roles,
+        i.e. the datasets without access roles and those whose access roles
+        are all in user_roles, querying the access permissions of batch_size
+        datasets at a time.
+        """
+        user_role_ids = {galaxy.model.cached_id(role) for role in user_roles}
+        dataset_ids = list(set(dataset_ids))
+        accessible = set(dataset_ids)
+        DatasetPermissions = self.model.DatasetPermissions
+        for start in range(0, len(dataset_ids), batch_size):
+            access_roles = self.sa_session.query(DatasetPermissions.dataset_id, DatasetPermissions.role_id) \
+                .filter(and_(DatasetPermissions.dataset_id.in_(dataset_ids[start:start + batch_size]),
+                             DatasetPermissions.action == self.permitted_actions.DATASET_ACCESS.action))
+            for dataset_id, role_id in access_roles:
+                if role_id not in user_role_ids:
+                    accessible.discard(dataset_id)
+        return accessible
+
     def can_manage_dataset(self, roles, dataset):
         return self.allow_action(roles, self.permitted_actions.DATASET_MANAGE_PERMISSIONS, dataset)
 
@@ -12,6 +12,8 @@ import random
 import shutil
 import threading
 import time
+from collections import defaultdict, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
 
@@ -28,8 +30,18 @@ from galaxy.util.path import (
     safe_relpath,
 )
 from galaxy.util.sleeper import Sleeper
+from .placement import (
+    CAPACITY_PLACEMENT,
+    CapacityAwarePlacement,
+    PLACEMENT_STRATEGIES,
+    WEIGHTED_PLACEMENT,
+)
 
 NO_SESSION_ERROR_MESSAGE = "Attempted to 'create' object store entity in configuration with no database session present."
+# Number of objects whose location is remembered by ObjectLocationCache.
+DEFAULT_LOCATION_CACHE_SIZE = 100000
+# Number of objects checked concurrently by the batch methods of concrete object stores.
+DEFAULT_BATCH_CONCURRENCY = 8
 
 log = logging.getLogger(__name__)
 
@@ -211,6 +223,24 @@ class ObjectStore(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def exists_many(self, objs, base_dir=None, dir_only=False, extra_dir=None, extra_dir_at_root=False, alt_name=None):
+        """Return a list telling for each object in `objs` whether it exists (as `exists`)."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def size_many(self, objs, extra_dir=None, extra_dir_at_root=False, alt_name=None, obj_dir=False):
+        """Return a list of the sizes of the objects in `objs` (as `size`)."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_filenames_many(self, objs, base_dir=None, dir_only=False, extra_dir=None, extra_dir_at_root=False, alt_name=None, obj_dir=False):
+        """
+        Return a list of the filenames of the objects in `objs` (as
+        `get_filename`), with `None` for objects that do not exist.
+        """
+        raise NotImplementedError()
+
 
 class BaseObjectStore(ObjectStore):
 
@@ -329,6 +359,30 @@ class BaseObjectStore(ObjectStore):
     def get_store_by(self, obj, **kwargs):
         return self._invoke('get_store_by', obj, **kwargs)
 
+    def exists_many(self, objs, **kwargs):
+        return self._exists_many(list(objs), **kwargs)
+
+    def size_many(self, objs, **kwargs):
+        return self._size_many(list(objs), **kwargs)
+
+    def get_filenames_many(self, objs, **kwargs):
+        return self._get_filenames_many(list(objs), **kwargs)
+
+    def _exists_many(self, objs, **kwargs):
+        return [self._exists(obj, **kwargs) for obj in objs]
+
+    def _size_many(self, objs, **kwargs):
+        return [self._size(obj, **kwargs) for obj in objs]
+
+    def _get_filenames_many(self, objs, **kwargs):
+        return [self._get_filename_or_none(obj, **kwargs) for obj in objs]
+
+    def _get_filename_or_none(self, obj, **kwargs):
+        try:
+            return self._get_filename(obj, **kwargs)
+        except ObjectNotFound:
+            return None
+
 
 class ConcreteObjectStore(BaseObjectStore):
     """Subclass of ObjectStore for stores that don't delegate (non-nested).
@@ -373,6 +427,24 @@ class ConcreteObjectStore(BaseObjectStore):
     def _get_store_by(self, obj):
         return self.store_by
 
+    batch_concurrency = DEFAULT_BATCH_CONCURRENCY
+
+    def _map_objects(self, function, objs):
+        """Apply `function` to each of `objs` using `batch_concurrency` threads (e.g. to stat files or HEAD keys concurrently)."""
+        if len(objs) < 2:
+            return [function(obj) for obj in objs]
+        with ThreadPoolExecutor(max_workers=min(self.batch_concurrency, len(objs))) as executor:
+            return list(executor.map(function, objs))
+
+    def _exists_many(self, objs, **kwargs):
+        return self._map_objects(lambda obj: self._exists(obj, **kwargs), objs)
+
+    def _size_many(self, objs, **kwargs):
+        return self._map_objects(lambda obj: self._size(obj, **kwargs), objs)
+
+    def _get_filenames_many(self, objs, **kwargs):
+        return self._map_objects(lambda obj: self._get_filename_or_none(obj, **kwargs), objs)
+
 
 class DiskObjectStore(ConcreteObjectStore):
     """
@@ -643,18 +715,83 @@ class DiskObjectStore(ConcreteObjectStore):
         return (float(st.f_blocks - st.f_bavail) / st.f_blocks) * 100
 
 
+class ObjectLocationCache:
+    """
+    Remember for ``ttl`` seconds which backend of a nested object store an
+    object was found in, or that it was found in none of them.
+
+    Locations are remembered per object and per combination of keyword
+    arguments (``extra_dir``, ``alt_name``, ...) and forgotten when
+    ``invalidate`` is called for the object. A ``ttl`` of 0 disables the cache.
+    """
+
+    MISSING = object()
+
+    def __init__(self, ttl, max_size=DEFAULT_LOCATION_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._locations = OrderedDict()
+
+    @staticmethod
+    def _keys(obj, kwargs):
+        try:
+            return (obj.__class__.__name__, obj.id), frozenset(kwargs.items())
+        except TypeError:
+            # Unhashable keyword argument values, don't cache.
+            return None, None
+
+    def get(self, obj, **kwargs):
+        """Return the cached location of ``obj``, ``MISSING`` if unknown."""
+        if not self.ttl:
+            return self.MISSING
+        obj_key, kwargs_key = self._keys(obj, kwargs)
+        if obj_key is None:
+            return self.MISSING
+        with self._lock:
+            location, expires = self._locations.get(obj_key, {}).get(kwargs_key, (self.MISSING, 0))
+        if expires < time.time():
+            return self.MISSING
+        return location
+
+    def set(self, obj, location, **kwargs):
+        if not self.ttl:
+            return
+        obj_key, kwargs_key = self._keys(obj, kwargs)
+        if obj_key is None:
+            return
+        with self._lock:
+            locations = self._locations.pop(obj_key, {})
+            locations[kwargs_key] = (location, time.time() + self.ttl)
+            self._locations[obj_key] = locations
+            while len(self._locations) > self.max_size:
+                self._locations.popitem(last=False)
+
+    def invalidate(self, obj):
+        """Forget the locations of ``obj``, e.g. because it was created or deleted."""
+        if not self.ttl:
+            return
+        obj_key, _ = self._keys(obj, {})
+        with self._lock:
+            self._locations.pop(obj_key, None)
+
+
 class NestedObjectStore(BaseObjectStore):
 
     """
     Base for ObjectStores that use other ObjectStores.
 
     Example: DistributedObjectStore, HierarchicalObjectStore
+
+    If ``object_store_location_cache_ttl`` is set in the config, the backend
+    objects were found in is remembered for that many seconds.
     """
 
     def __init__(self, config, config_xml=None):
         """Extend `ObjectStore`'s constructor."""
         super().__init__(config)
         self.backends = {}
+        self.location_cache = ObjectLocationCache(getattr(config, "object_store_location_cache_ttl", 0))
 
     def shutdown(self):
         """For each backend, shuts them down."""
@@ -673,6 +810,7 @@ class NestedObjectStore(BaseObjectStore):
     def _create(self, obj, **kwargs):
         """Create a backing file in a random backend."""
         random.choice(list(self.backends.values())).create(obj, **kwargs)
+        self.location_cache.invalidate(obj)
 
     def _empty(self, obj, **kwargs):
         """For the first backend that has this `obj`, determine if it is empty."""
@@ -684,7 +822,10 @@ class NestedObjectStore(BaseObjectStore):
 
     def _delete(self, obj, **kwargs):
         """For the first backend that has this `obj`, delete it."""
-        return self._call_method('_delete', obj, False, False, **kwargs)
+        try:
+            return self._call_method('_delete', obj, False, False, **kwargs)
+        finally:
+            self.location_cache.invalidate(obj)
 
     def _get_data(self, obj, **kwargs):
         """For the first backend that has this `obj`, get data from it."""
@@ -722,12 +863,67 @@ class NestedObjectStore(BaseObjectStore):
         except AttributeError:
             return str(obj)
 
+    def _locate(self, obj, **kwargs):
+        """Return the key of the first backend in which `obj` exists, None if there is none."""
+        location = self.location_cache.get(obj, **kwargs)
+        if location is not ObjectLocationCache.MISSING:
+            return location
+        location = None
+        for key, store in self.backends.items():
+            if store.exists(obj, **kwargs):
+                location = key
+                break
+        self.location_cache.set(obj, location, **kwargs)
+        return location
+
+    def _locate_many(self, objs, **kwargs):
+        """Return the key of the first backend each of `objs` exists in, asking each backend about all objects not found yet at once."""
+        locations = [self.location_cache.get(obj, **kwargs) for obj in objs]
+        pending = [i for i, location in enumerate(locations) if location is ObjectLocationCache.MISSING]
+        for key, store in self.backends.items():
+            if not pending:
+                break
+            not_found = []
+            for i, exists in zip(pending, store.exists_many([objs[i] for i in pending], **kwargs)):
+                if exists:
+                    locations[i] = key
+                    self.location_cache.set(objs[i], key, **kwargs)
+                else:
+                    not_found.append(i)
+            pending = not_found
+        for i in pending:
+            locations[i] = None
+            self.location_cache.set(objs[i], None, **kwargs)
+        return locations
+
+    def _call_method_many(self, method, objs, default, **kwargs):
+        """Call batch `method` of each backend with the objects found in it."""
+        results = [default] * len(objs)
+        by_location = defaultdict(list)
+        for i, location in enumerate(self._locate_many(objs, **kwargs)):
+            if location is not None:
+                by_location[location].append(i)
+        for location, indexes in by_location.items():
+            backend_results = self.backends[location].__getattribute__(method)([objs[i] for i in indexes], **kwargs)
+            for i, result in zip(indexes, backend_results):
+                results[i] = result
+        return results
+
+    def _exists_many(self, objs, **kwargs):
+        return self._call_method_many('exists_many', objs, False, **kwargs)
+
+    def _size_many(self, objs, **kwargs):
+        return self._call_method_many('size_many', objs, 0, **kwargs)
+
+    def _get_filenames_many(self, objs, **kwargs):
+        return self._call_method_many('get_filenames_many', objs, None, **kwargs)
+
     def _call_method(self, method, obj, default, default_is_exception,
             **kwargs):
         """Check all children object stores for the first one with the dataset."""
-        for store in self.backends.values():
-            if store.exists(obj, **kwargs):
-                return store.__getattribute__(method)(obj, **kwargs)
+        location = self._locate(obj, **kwargs)
+        if location is not None:
+            return self.backends[location].__getattribute__(method)(obj, **kwargs)
         if default_is_exception:
             raise default('objectstore, _call_method failed: %s on %s, kwargs: %s'
                           % (method, self._repr_object_for_exception(obj), str(kwargs)))
@@ -742,7 +938,9 @@ class DistributedObjectStore(NestedObjectStore):
 
     When getting objects the first store where the object exists is used.
     When creating objects they are created in a store selected randomly, but
-    with weighting.
+    with weighting. With the ``capacity`` placement strategy, weights are
+    scaled by the free capacity and measured speed of each store (see
+    :class:`galaxy.objectstore.placement.CapacityAwarePlacement`).
     """
     store_type = 'distributed'
 
@@ -768,6 +966,9 @@ class DistributedObjectStore(NestedObjectStore):
         self.original_weighted_backend_ids = []
         self.max_percent_full = {}
         self.global_max_percent_full = config_dict.get("global_max_percent_full", 0)
+        self.placement_strategy = config_dict.get("placement", WEIGHTED_PLACEMENT)
+        if self.placement_strategy not in PLACEMENT_STRATEGIES:
+            raise Exception(f"Unknown placement strategy '{self.placement_strategy}', must be one of {', '.join(PLACEMENT_STRATEGIES)}")
         random.seed()
 
         for backend_def in config_dict["backends"]:
@@ -788,8 +989,16 @@ class DistributedObjectStore(NestedObjectStore):
 
         self.original_weighted_backend_ids = self.weighted_backend_ids
 
+        self.placement = CapacityAwarePlacement(
+            {backend_id: len([i for i in self.original_weighted_backend_ids if i == backend_id]) for backend_id in self.backends},
+            self.max_percent_full,
+            self.global_max_percent_full,
+        )
+        if self.placement_strategy == CAPACITY_PLACEMENT:
+            self.__update_usage()
+
         self.sleeper = None
-        if fsmon and (self.global_max_percent_full or [_ for _ in self.max_percent_full.values() if _ != 0.0]):
+        if fsmon and (self.placement_strategy == CAPACITY_PLACEMENT or self.global_max_percent_full or [_ for _ in self.max_percent_full.values() if _ != 0.0]):
             self.sleeper = Sleeper()
             self.filesystem_monitor_thread = threading.Thread(target=self.__filesystem_monitor)
             self.filesystem_monitor_thread.setDaemon(True)
@@ -806,6 +1015,7 @@ class DistributedObjectStore(NestedObjectStore):
         backends = []
         config_dict = {
             'global_max_percent_full': float(backends_root.get('maxpctfull', 0)),
+            'placement': backends_root.get('placement', WEIGHTED_PLACEMENT),
             'backends': backends,
         }
 
@@ -850,6 +1060,7 @@ class DistributedObjectStore(NestedObjectStore):
     def to_dict(self):
         as_dict = super().to_dict()
         as_dict["global_max_percent_full"] = self.global_max_percent_full
+        as_dict["placement"] = self.placement_strategy
         backends = []
         for backend_id, backend in self.backends.items():
             backend_as_dict = backend.to_dict()
@@ -866,23 +1077,36 @@ class DistributedObjectStore(NestedObjectStore):
         if self.sleeper is not None:
             self.sleeper.wake()
 
+    def __update_usage(self):
+        new_weighted_backend_ids = self.original_weighted_backend_ids
+        for id, backend in self.backends.items():
+            maxpct = self.max_percent_full[id] or self.global_max_percent_full
+            try:
+                pct = backend.get_store_usage_percent()
+            except OSError:
+                log.warning("Failed to get usage of backend object store with ID %s", id, exc_info=True)
+                continue
+            self.placement.update_usage(id, pct)
+            if maxpct and pct > maxpct:
+                new_weighted_backend_ids = [_ for _ in new_weighted_backend_ids if _ != id]
+        self.weighted_backend_ids = new_weighted_backend_ids
+
     def __filesystem_monitor(self):
         while self.running:
-            new_weighted_backend_ids = self.original_weighted_backend_ids
-            for id, backend in self.backends.items():
-                maxpct = self.max_percent_full[id] or self.global_max_percent_full
-                pct = backend.get_store_usage_percent()
-                if pct > maxpct:
-                    new_weighted_backend_ids = [_ for _ in new_weighted_backend_ids if _ != id]
-            self.weighted_backend_ids = new_weighted_backend_ids
+            self.__update_usage()
             self.sleeper.sleep(120)  # Test free space every 2 minutes
 
+    def _choose_backend_id(self):
+        if self.placement_strategy == CAPACITY_PLACEMENT:
+            return self.placement.choose()
+        return random.choice(self.weighted_backend_ids)
+
     def _create(self, obj, **kwargs):
         """The only method in which obj.object_store_id may be None."""
         if obj.object_store_id is None or not self._exists(obj, **kwargs):
             if obj.object_store_id is None or obj.object_store_id not in self.backends:
                 try:
-                    obj.object_store_id = random.choice(self.weighted_backend_ids)
+                    obj.object_store_id = self._choose_backend_id()
                 except IndexError:
                     raise ObjectInvalid('objectstore.create, could not generate '
                                         'obj.object_store_id: %s, kwargs: %s'
@@ -892,7 +1116,18 @@ class DistributedObjectStore(NestedObjectStore):
             else:
                 log.debug("Using preferred backend '%s' for creation of %s %s"
                           % (obj.object_store_id, obj.__class__.__name__, obj.id))
+            start = time.time()
             self.backends[obj.object_store_id].create(obj, **kwargs)
+            self.placement.record_create(obj.object_store_id, time.time() - start)
+            self.location_cache.invalidate(obj)
+
+    def _update_from_file(self, obj, **kwargs):
+        start = time.time()
+        result = super()._update_from_file(obj, **kwargs)
+        file_name = kwargs.get('file_name')
+        if file_name and obj.object_store_id in self.backends and os.path.isfile(file_name):
+            self.placement.record_write(obj.object_store_id, os.path.getsize(file_name), time.time() - start)
+        return result
 
     def _call_method(self, method, obj, default, default_is_exception, **kwargs):
         object_store_id = self.__get_store_id_for(obj, **kwargs)
@@ -914,13 +1149,86 @@ class DistributedObjectStore(NestedObjectStore):
         # if this instance has been switched from a non-distributed to a
         # distributed object store, or if the object's store id is invalid,
         # try to locate the object
-        for id, store in self.backends.items():
-            if store.exists(obj, **kwargs):
-                log.warning('%s object with ID %s found in backend object store with ID %s'
-                            % (obj.__class__.__name__, obj.id, id))
-                obj.object_store_id = id
-                return id
-        return None
+        id = self._locate(obj, **kwargs)
+        if id is not None:
+            log.warning('%s object with ID %s found in backend object store with ID %s'
+                        % (obj.__class__.__name__, obj.id, id))
+            obj.object_store_id = id
+        return id
+
+    def _locate_many(self, objs, **kwargs):
+        locations = [obj.object_store_id if obj.object_store_id in self.backends else None for obj in objs]
+        unknown = [i for i, location in enumerate(locations) if location is None]
+        if unknown:
+            # Objects without a valid object_store_id, search the backends.
+            for i, location in zip(unknown, super()._locate_many([objs[i] for i in unknown], **kwargs)):
+                if location is not None:
+                    log.warning('%s object with ID %s found in backend object store with ID %s'
+                                % (objs[i].__class__.__name__, objs[i].id, location))
+                    objs[i].object_store_id = location
+                    locations[i] = location
+        return locations
+
+    def relocate(self, objs):
+        """
+        Set the ``object_store_id`` of objects without one (or with an unknown
+        one) to the ID of the backend they are found in.
+
+        Return the objects whose ``object_store_id`` was changed, for the
+        caller to persist.
+        """
+        relocated = []
+        for obj in objs:
+            if obj.object_store_id in self.backends:
+                continue
+            if self.__get_store_id_for(obj) is not None:
+                relocated.append(obj)
+        return relocated
+
+    def migrate(self, obj, target_id):
+        """
+        Copy the file and extra files of ``obj`` to backend ``target_id`` and
+        set its ``object_store_id`` to ``target_id``. Return the number of bytes copied.
+
+        The object is not deleted from its previous backend, call
+        ``purge_from`` once the new ``object_store_id`` is persisted.
+        """
+        source_id = self.__get_store_id_for(obj)
+        if source_id is None:
+            raise ObjectNotFound(f'objectstore.migrate, {self._repr_object_for_exception(obj)} not found in any backend')
+        if source_id == target_id:
+            return 0
+        source, target = self.backends[source_id], self.backends[target_id]
+        file_name = source.get_filename(obj)
+        target.update_from_file(obj, file_name=file_name, create=True)
+        copied = os.path.getsize(file_name)
+        source_extra_dir = self.__extra_files_dir(source, obj)
+        if source_extra_dir and source.exists(obj, extra_dir=source_extra_dir, dir_only=True):
+            source_extra_path = source.get_filename(obj, extra_dir=source_extra_dir, dir_only=True)
+            target_extra_dir = self.__extra_files_dir(target, obj)
+            for root, _dirs, files in os.walk(source_extra_path):
+                extra_dir = os.path.normpath(os.path.join(target_extra_dir, os.path.relpath(root, source_extra_path)))
+                for f in files:
+                    path = os.path.join(root, f)
+                    target.update_from_file(obj, extra_dir=extra_dir, alt_name=f, file_name=path, create=True, preserve_symlinks=True)
+                    copied += os.path.getsize(path)
+        obj.object_store_id = target_id
+        self.location_cache.invalidate(obj)
+        return copied
+
+    def purge_from(self, obj, backend_id):
+        """Delete the file and extra files of ``obj`` from backend ``backend_id``, which must not be its current one."""
+        assert obj.object_store_id != backend_id, "Refusing to delete an object from its current backend"
+        backend = self.backends[backend_id]
+        backend.delete(obj)
+        extra_dir = self.__extra_files_dir(backend, obj)
+        if extra_dir and backend.exists(obj, extra_dir=extra_dir, dir_only=True):
+            backend.delete(obj, entire_dir=True, extra_dir=extra_dir, dir_only=True)
+
+    @staticmethod
+    def __extra_files_dir(backend, obj):
+        store_by = backend.get_store_by(obj)
+        return f"dataset_{getattr(obj, store_by)}_files" if store_by else None
 
 
 class HierarchicalObjectStore(NestedObjectStore):
@@ -966,14 +1274,15 @@ class HierarchicalObjectStore(NestedObjectStore):
 
     def _exists(self, obj, **kwargs):
         """Check all child object stores."""
-        for store in self.backends.values():
-            if store.exists(obj, **kwargs):
-                return True
-        return False
+        return self._locate(obj, **kwargs) is not None
+
+    def _exists_many(self, objs, **kwargs):
+        return [location is not None for location in self._locate_many(objs, **kwargs)]
 
     def _create(self, obj, **kwargs):
         """Call the primary object store."""
         self.backends[0].create(obj, **kwargs)
+        self.location_cache.invalidate(obj)
 
 
 def type_to_object_store_class(store, fsmon=False):
@@ -981,6 +1290,9 @@ def type_to_object_store_class(store, fsmon=False):
     objectstore_constructor_kwds = {}
     if store == 'disk':
         objectstore_class = DiskObjectStore
+    elif store == 'dedup':
+        from .dedup import DedupDiskObjectStore
+        objectstore_class = DedupDiskObjectStore
     elif store == 's3':
         from .s3 import S3ObjectStore
         objectstore_class = S3ObjectStore
@@ -5,8 +5,6 @@ Object Store plugin for the Microsoft Azure Block Blob Storage system
 import logging
 import os
 import shutil
-import threading
-import time
 from datetime import datetime
 
 try:
@@ -26,11 +24,12 @@ from galaxy.util import (
     umask_fix_perms
 )
 from galaxy.util.path import safe_relpath
-from galaxy.util.sleeper import Sleeper
-from ..objectstore import (
-    ConcreteObjectStore,
-    convert_bytes,
+from .caching import (
+    CachingObjectStoreMixin,
+    DEFAULT_CACHE_RECONCILE_INTERVAL,
+    DEFAULT_EVICTION_POLICY,
 )
+from ..objectstore import ConcreteObjectStore
 
 NO_BLOBSERVICE_ERROR_MESSAGE = ("ObjectStore configured, but no azure.storage.blob dependency available."
                                 "Please install and properly configure azure.storage.blob or modify Object Store configuration.")
@@ -52,6 +51,8 @@ def parse_config_xml(config_xml):
         c_xml = config_xml.findall('cache')[0]
         cache_size = float(c_xml.get('size', -1))
         staging_path = c_xml.get('path', None)
+        eviction_policy = c_xml.get('eviction_policy', DEFAULT_EVICTION_POLICY)
+        reconcile_interval = int(c_xml.get('reconcile_interval', DEFAULT_CACHE_RECONCILE_INTERVAL))
 
         tag, attrs = 'extra_dir', ('type', 'path')
         extra_dirs = config_xml.findall(tag)
@@ -72,6 +73,8 @@ def parse_config_xml(config_xml):
             'cache': {
                 'size': cache_size,
                 'path': staging_path,
+                'eviction_policy': eviction_policy,
+                'reconcile_interval': reconcile_interval,
             },
             'extra_dirs': extra_dirs,
         }
@@ -81,7 +84,7 @@ def parse_config_xml(config_xml):
         raise
 
 
-class AzureBlobObjectStore(ConcreteObjectStore):
+class AzureBlobObjectStore(CachingObjectStoreMixin, ConcreteObjectStore):
     """
     Object store that stores objects as blobs in an Azure Blob Container. A local
     cache exists that is used as an intermediate location for files between
@@ -106,6 +109,8 @@ class AzureBlobObjectStore(ConcreteObjectStore):
 
         self.cache_size = cache_dict.get('size', -1)
         self.staging_path = cache_dict.get('path') or self.config.object_store_cache_path
+        self.eviction_policy = cache_dict.get('eviction_policy', DEFAULT_EVICTION_POLICY)
+        self.reconcile_interval = cache_dict.get('reconcile_interval', DEFAULT_CACHE_RECONCILE_INTERVAL)
 
         self._initialize()
 
@@ -117,13 +122,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
 
         # Clean cache only if value is set in galaxy.ini
         if self.cache_size != -1:
-            # Convert GBs to bytes for comparison
-            self.cache_size = self.cache_size * 1073741824
-            # Helper for interruptable sleep
-            self.sleeper = Sleeper()
-            self.cache_monitor_thread = threading.Thread(target=self.__cache_monitor)
-            self.cache_monitor_thread.start()
-            log.info("Cache cleaner manager started")
+            self._start_cache_monitor(self.eviction_policy, self.reconcile_interval)
 
     def to_dict(self):
         as_dict = super().to_dict()
@@ -139,6 +138,8 @@ class AzureBlobObjectStore(ConcreteObjectStore):
             'cache': {
                 'size': self.cache_size,
                 'path': self.staging_path,
+                'eviction_policy': self.eviction_policy,
+                'reconcile_interval': self.reconcile_interval,
             }
         })
         return as_dict
@@ -249,6 +250,8 @@ class AzureBlobObjectStore(ConcreteObjectStore):
         # Now pull in the file
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
+        if file_ok:
+            self._cache_pulled(rel_path)
         return file_ok
 
     def _transfer_cb(self, complete, total):
@@ -391,6 +394,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
             if not dir_only:
                 rel_path = os.path.join(rel_path, alt_name if alt_name else f"dataset_{self._get_object_id(obj)}.dat")
                 open(os.path.join(self.staging_path, rel_path), 'w').close()
+                self._cache_updated(rel_path)
                 self._push_to_os(rel_path, from_string='')
 
     def _empty(self, obj, **kwargs):
@@ -429,6 +433,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
             # but requires iterating through each individual blob in Azure and deleing it.
             if entire_dir and extra_dir:
                 shutil.rmtree(self._get_cache_path(rel_path))
+                self._cache_removed(rel_path)
                 blobs = self.service.list_blobs(self.container_name, prefix=rel_path)
                 for blob in blobs:
                     log.debug("Deleting from Azure: %s", blob)
@@ -437,6 +442,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
             else:
                 # Delete from cache first
                 os.unlink(self._get_cache_path(rel_path))
+                self._cache_removed(rel_path)
                 # Delete from S3 as well
                 if self._in_azure(rel_path):
                     log.debug("Deleting from Azure: %s", rel_path)
@@ -453,6 +459,8 @@ class AzureBlobObjectStore(ConcreteObjectStore):
         # Check cache first and get file if not there
         if not self._in_cache(rel_path):
             self._pull_into_cache(rel_path)
+        else:
+            self._cache_hit(rel_path)
         # Read the file content from cache
         data_file = open(self._get_cache_path(rel_path))
         data_file.seek(start)
@@ -481,6 +489,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            self._cache_hit(rel_path)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
         elif self._exists(obj, **kwargs):
@@ -514,6 +523,7 @@ class AzureBlobObjectStore(ConcreteObjectStore):
                     log.exception("Trouble copying source file '%s' to cache '%s'", source_file, cache_file)
             else:
                 source_file = self._get_cache_path(rel_path)
+            self._cache_updated(rel_path)
 
             self._push_to_os(rel_path, source_file)
 
@@ -533,53 +543,6 @@ class AzureBlobObjectStore(ConcreteObjectStore):
     def _get_store_usage_percent(self):
         return 0.0
 
-    ##################
-    # Secret Methods #
-    ##################
-
-    def __cache_monitor(self):
-        time.sleep(2)  # Wait for things to load before starting the monitor
-        while self.running:
-            total_size = 0
-            # Is this going to be too expensive of an operation to be done frequently?
-            file_list = []
-            for dirpath, _, filenames in os.walk(self.staging_path):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    file_size = os.path.getsize(filepath)
-                    total_size += file_size
-                    # Get the time given file was last accessed
-                    last_access_time = time.localtime(os.stat(filepath)[7])
-                    # Compose a tuple of the access time and the file path
-                    file_tuple = last_access_time, filepath, file_size
-                    file_list.append(file_tuple)
-            # Sort the file list (based on access time)
-            file_list.sort()
-            # Initiate cleaning once within 10% of the defined cache size?
-            cache_limit = self.cache_size * 0.9
-            if total_size > cache_limit:
-                log.info("Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
-                         convert_bytes(total_size), convert_bytes(cache_limit))
-                # How much to delete? If simply deleting up to the cache-10% limit,
-                # is likely to be deleting frequently and may run the risk of hitting
-                # the limit - maybe delete additional #%?
-                # For now, delete enough to leave at least 10% of the total cache free
-                delete_this_much = total_size - cache_limit
-                # Keep deleting datasets from file_list until deleted_amount does not
-                # exceed delete_this_much; start deleting from the front of the file list,
-                # which assumes the oldest files come first on the list.
-                deleted_amount = 0
-                for entry in enumerate(file_list):
-                    if deleted_amount < delete_this_much:
-                        deleted_amount += entry[2]
-                        os.remove(entry[1])
-                        # Debugging code for printing deleted files' stats
-                        # folder, file_name = os.path.split(f[1])
-                        # file_date = time.strftime("%m/%d/%y %H:%M:%S", f[0])
-                        # log.debug("%s. %-25s %s, size %s (deleted %s/%s)" \
-                        #     % (i, file_name, convert_bytes(f[2]), file_date, \
-                        #     convert_bytes(deleted_amount), convert_bytes(delete_this_much)))
-                    else:
-                        log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(deleted_amount))
-
-            self.sleeper.sleep(30)  # Test cache size every 30 seconds?
+    def shutdown(self):
+        super().shutdown()
+        self._stop_cache_monitor()
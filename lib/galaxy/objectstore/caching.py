@@ -0,0 +1,337 @@
+"""
+Index and clean the local cache of object stores keeping files in remote
+storage (S3, Azure, cloud providers, iRODS).
+
+Instead of walking the whole cache directory to find the files to evict,
+accesses to cached files are recorded in an sqlite index (path, size, last
+access time and number of accesses) kept next to the cached files. The total
+size of the cache is maintained by triggers, and the least recently (or least
+frequently) used files are found through an index, so cleaning the cache does
+work proportional to the number of files evicted, not to the size of the cache.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from galaxy.util.sleeper import Sleeper
+from ..objectstore import convert_bytes
+
+log = logging.getLogger(__name__)
+
+CACHE_INDEX_FILENAME = ".galaxy_cache_index.sqlite"
+EVICTION_POLICIES = {
+    'lru': 'atime',
+    'lfu': 'hits, atime',
+}
+DEFAULT_EVICTION_POLICY = 'lru'
+DEFAULT_CACHE_MONITOR_INTERVAL = 30
+# Walk the cache directory to index files that were not recorded at this
+# interval (in seconds, 0 to only walk it when the index is created).
+DEFAULT_CACHE_RECONCILE_INTERVAL = 3600
+# Clean the cache once it is larger than this fraction of its size, down to this fraction.
+CACHE_LIMIT_FRACTION = 0.9
+EVICTION_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    atime REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS ix_cache_entry_atime ON cache_entry (atime);
+CREATE INDEX IF NOT EXISTS ix_cache_entry_hits_atime ON cache_entry (hits, atime);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size (id, total) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entry_insert AFTER INSERT ON cache_entry
+BEGIN
+    UPDATE cache_size SET total = total + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_delete AFTER DELETE ON cache_entry
+BEGIN
+    UPDATE cache_size SET total = total - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_update AFTER UPDATE OF size ON cache_entry
+BEGIN
+    UPDATE cache_size SET total = total + NEW.size - OLD.size;
+END;
+"""
+
+
+class CacheStats:
+    """Count cache hits, misses and transferred and evicted bytes of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_pulled = 0
+        self.evicted = 0
+        self.bytes_evicted = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_pulled': self.bytes_pulled,
+                'evicted': self.evicted,
+                'bytes_evicted': self.bytes_evicted,
+            }
+
+
+class CacheIndex:
+    """
+    Index of the files in an object store cache.
+
+    Accesses and removals are recorded in memory by ``touch`` and ``remove``
+    (called from request and job handling threads) and written to the index
+    in a single transaction by ``flush``. Files reaching or leaving the cache
+    without being recorded are picked up by ``reconcile``.
+    """
+
+    def __init__(self, staging_path, index_path=None, eviction_policy=DEFAULT_EVICTION_POLICY):
+        if eviction_policy not in EVICTION_POLICIES:
+            raise Exception(f"Unknown cache eviction policy '{eviction_policy}', must be one of {', '.join(EVICTION_POLICIES)}")
+        self.staging_path = staging_path
+        self.index_path = index_path or os.path.join(staging_path, CACHE_INDEX_FILENAME)
+        self.eviction_policy = eviction_policy
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._removed = []
+        if not os.path.exists(staging_path):
+            os.makedirs(staging_path)
+        # A new index needs to be populated with the files already in the cache.
+        self.needs_reconcile = not os.path.exists(self.index_path)
+        self.last_reconciled = time.time()
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.index_path, timeout=60)
+
+    def touch(self, path, size=None):
+        """Record an access to (or a new version of) cached file ``path``."""
+        with self._lock:
+            _, known_size, hits = self._touched.get(path, (None, None, 0))
+            self._touched[path] = (time.time(), size if size is not None else known_size, hits + 1)
+
+    def remove(self, path):
+        """Record the removal of cached file ``path``, or of all files below directory ``path``."""
+        path = path.rstrip(os.sep)
+        prefix = path + os.sep
+        with self._lock:
+            for touched in [p for p in self._touched if p == path or p.startswith(prefix)]:
+                del self._touched[touched]
+            self._removed.append(path)
+
+    def flush(self):
+        """Write recorded accesses and removals to the index."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            removed, self._removed = self._removed, []
+        if not touched and not removed:
+            return
+        with closing(self._connect()) as conn, conn:
+            for path in removed:
+                # '0' sorts right after the path separator, selecting everything below path.
+                conn.execute("DELETE FROM cache_entry WHERE path = ? OR (path >= ? AND path < ?)",
+                             (path, path + os.sep, path + chr(ord(os.sep) + 1)))
+            for path, (atime, size, hits) in touched.items():
+                updated = conn.execute("UPDATE cache_entry SET atime = ?, hits = hits + ?, size = COALESCE(?, size) WHERE path = ?",
+                                       (atime, hits, size, path)).rowcount
+                if not updated:
+                    if size is None:
+                        try:
+                            size = os.path.getsize(path)
+                        except OSError:
+                            continue
+                    conn.execute("INSERT INTO cache_entry (path, size, atime, hits) VALUES (?, ?, ?, ?)",
+                                 (path, size, atime, hits))
+
+    def reconcile(self):
+        """
+        Make the index match the files in the cache directory: index files
+        that are not (using their last access time), drop the entries of
+        files that no longer exist and update the size of files that changed.
+        Entries of files still in the cache keep their access time and hits.
+        """
+        log.info("Indexing object store cache %s", self.staging_path)
+        self.flush()
+        on_disk = {}
+        for dirpath, _, filenames in os.walk(self.staging_path):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if path.startswith(self.index_path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                on_disk[path] = (stat.st_size, stat.st_atime)
+        with closing(self._connect()) as conn, conn:
+            indexed = dict(conn.execute("SELECT path, size FROM cache_entry"))
+            missing = [(path,) for path in indexed if path not in on_disk]
+            unindexed = [(path, size, atime) for path, (size, atime) in on_disk.items() if path not in indexed]
+            resized = [(size, path) for path, (size, _) in on_disk.items() if path in indexed and indexed[path] != size]
+            conn.executemany("DELETE FROM cache_entry WHERE path = ?", missing)
+            conn.executemany("INSERT OR IGNORE INTO cache_entry (path, size, atime) VALUES (?, ?, ?)", unindexed)
+            conn.executemany("UPDATE cache_entry SET size = ? WHERE path = ?", resized)
+        self.needs_reconcile = False
+        self.last_reconciled = time.time()
+        log.info("Indexed %d files in object store cache %s (%d added, %d removed, %d resized)",
+                 len(on_disk), self.staging_path, len(unindexed), len(missing), len(resized))
+
+    def total_size(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT total FROM cache_size").fetchone()[0]
+
+    def evict(self, target_size):
+        """
+        Remove the least recently (or frequently) used files until the cache is
+        not larger than ``target_size`` bytes. Return the number of bytes freed.
+        """
+        order = EVICTION_POLICIES[self.eviction_policy]
+        freed = evicted = 0
+        with closing(self._connect()) as conn:
+            total = conn.execute("SELECT total FROM cache_size").fetchone()[0]
+            while total > target_size:
+                entries = conn.execute(f"SELECT path, size FROM cache_entry ORDER BY {order} LIMIT ?", (EVICTION_BATCH_SIZE,)).fetchall()
+                if not entries:
+                    break
+                removed = []
+                for path, size in entries:
+                    if total <= target_size:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError:
+                        # Drop it from the index anyway so it is not picked again.
+                        log.warning("Failed to remove file %s from object store cache", path, exc_info=True)
+                    removed.append((path,))
+                    total -= size
+                    freed += size
+                    evicted += 1
+                with conn:
+                    conn.executemany("DELETE FROM cache_entry WHERE path = ?", removed)
+        self.stats.add(evicted=evicted, bytes_evicted=freed)
+        return freed
+
+
+class InProcessCacheMonitor:
+    """
+    Periodically flush a ``CacheIndex`` and evict files once the cache exceeds
+    ``cache_size`` bytes, reconciling the index with the cache directory every
+    ``reconcile_interval`` seconds (if not 0) and when the index is created.
+    """
+
+    def __init__(self, cache_index, cache_size, interval=DEFAULT_CACHE_MONITOR_INTERVAL,
+                 reconcile_interval=DEFAULT_CACHE_RECONCILE_INTERVAL):
+        self.cache_index = cache_index
+        self.cache_size = cache_size
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self.running = True
+        # Helper for interruptable sleep
+        self.sleeper = Sleeper()
+        self.cache_monitor_thread = threading.Thread(target=self._monitor, name="ObjectStoreCacheMonitor")
+        self.cache_monitor_thread.daemon = True
+        self.cache_monitor_thread.start()
+
+    def _monitor(self):
+        self.sleeper.sleep(2)  # Wait for things to load before starting the monitor
+        while self.running:
+            try:
+                self.check()
+            except Exception:
+                log.exception("Failed to clean object store cache %s", self.cache_index.staging_path)
+            self.sleeper.sleep(self.interval)
+
+    def check(self):
+        if self.cache_index.needs_reconcile or \
+                (self.reconcile_interval and time.time() - self.cache_index.last_reconciled >= self.reconcile_interval):
+            self.cache_index.reconcile()
+        self.cache_index.flush()
+        total_size = self.cache_index.total_size()
+        cache_limit = self.cache_size * CACHE_LIMIT_FRACTION
+        if total_size > cache_limit:
+            log.info("Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
+                     convert_bytes(total_size), convert_bytes(cache_limit))
+            freed = self.cache_index.evict(cache_limit)
+            log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(freed))
+        log.debug("Object store cache %s: %s used, %s", self.cache_index.staging_path,
+                  convert_bytes(total_size), self.cache_index.stats.to_dict())
+
+    def shutdown(self):
+        self.running = False
+        self.sleeper.wake()
+        self.cache_monitor_thread.join(5)
+        self.cache_index.flush()
+
+
+class CachingObjectStoreMixin:
+    """
+    Track the files of an object store's local cache (``staging_path``) and
+    keep it below ``cache_size`` bytes, once ``_start_cache_monitor`` is called.
+    """
+    cache_monitor = None
+
+    def _start_cache_monitor(self, eviction_policy=DEFAULT_EVICTION_POLICY, reconcile_interval=DEFAULT_CACHE_RECONCILE_INTERVAL):
+        # Convert GBs to bytes for comparison
+        self.cache_size = self.cache_size * 1073741824
+        cache_index = CacheIndex(self.staging_path, eviction_policy=eviction_policy)
+        self.cache_monitor = InProcessCacheMonitor(cache_index, self.cache_size, reconcile_interval=reconcile_interval)
+        log.info("Cache cleaner manager started")
+
+    def _stop_cache_monitor(self):
+        if self.cache_monitor:
+            log.debug("Shutting down thread")
+            self.cache_monitor.shutdown()
+
+    @property
+    def cache_stats(self):
+        return self.cache_monitor.cache_index.stats.to_dict() if self.cache_monitor else None
+
+    def _cache_hit(self, rel_path):
+        if self.cache_monitor:
+            self.cache_monitor.cache_index.stats.add(hits=1)
+            self.cache_monitor.cache_index.touch(self._get_cache_path(rel_path))
+
+    def _cache_pulled(self, rel_path):
+        """Record that ``rel_path`` was missing from the cache and pulled into it."""
+        if self.cache_monitor:
+            cache_path = self._get_cache_path(rel_path)
+            size = _size_or_none(cache_path)
+            self.cache_monitor.cache_index.stats.add(misses=1, bytes_pulled=size or 0)
+            self.cache_monitor.cache_index.touch(cache_path, size)
+
+    def _cache_updated(self, rel_path):
+        """Record that ``rel_path`` was created or updated in the cache."""
+        if self.cache_monitor:
+            cache_path = self._get_cache_path(rel_path)
+            self.cache_monitor.cache_index.touch(cache_path, _size_or_none(cache_path))
+
+    def _cache_removed(self, rel_path):
+        if self.cache_monitor:
+            self.cache_monitor.cache_index.remove(self._get_cache_path(rel_path))
+
+
+def _size_or_none(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
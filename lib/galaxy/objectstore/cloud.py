@@ -8,8 +8,6 @@ import os
 import os.path
 import shutil
 import subprocess
-import threading
-import time
 from datetime import datetime
 
 from galaxy.exceptions import ObjectInvalid, ObjectNotFound
@@ -18,9 +16,13 @@ from galaxy.util import (
     safe_relpath,
     umask_fix_perms,
 )
-from galaxy.util.sleeper import Sleeper
+from .caching import (
+    CachingObjectStoreMixin,
+    DEFAULT_CACHE_RECONCILE_INTERVAL,
+    DEFAULT_EVICTION_POLICY,
+)
 from .s3 import parse_config_xml
-from ..objectstore import ConcreteObjectStore, convert_bytes
+from ..objectstore import ConcreteObjectStore
 try:
     from cloudbridge.factory import CloudProviderFactory, ProviderList
     from cloudbridge.interfaces.exceptions import InvalidNameException
@@ -56,11 +58,13 @@ class CloudConfigMixin:
             "cache": {
                 "size": self.cache_size,
                 "path": self.staging_path,
+                "eviction_policy": self.eviction_policy,
+                "reconcile_interval": self.reconcile_interval,
             }
         }
 
 
-class Cloud(ConcreteObjectStore, CloudConfigMixin):
+class Cloud(CachingObjectStoreMixin, ConcreteObjectStore, CloudConfigMixin):
     """
     Object store that stores objects as items in an cloud storage. A local
     cache exists that is used as an intermediate location for files between
@@ -90,6 +94,8 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
 
         self.cache_size = cache_dict.get('size', -1)
         self.staging_path = cache_dict.get('path') or self.config.object_store_cache_path
+        self.eviction_policy = cache_dict.get('eviction_policy', DEFAULT_EVICTION_POLICY)
+        self.reconcile_interval = cache_dict.get('reconcile_interval', DEFAULT_CACHE_RECONCILE_INTERVAL)
 
         self._initialize()
 
@@ -101,13 +107,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         self.bucket = self._get_bucket(self.bucket_name)
         # Clean cache only if value is set in galaxy.ini
         if self.cache_size != -1:
-            # Convert GBs to bytes for comparison
-            self.cache_size = self.cache_size * 1073741824
-            # Helper for interruptable sleep
-            self.sleeper = Sleeper()
-            self.cache_monitor_thread = threading.Thread(target=self.__cache_monitor)
-            self.cache_monitor_thread.start()
-            log.info("Cache cleaner manager started")
+            self._start_cache_monitor(self.eviction_policy, self.reconcile_interval)
         # Test if 'axel' is available for parallel download and pull the key into cache
         try:
             subprocess.call('axel')
@@ -243,70 +243,6 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         as_dict.update(self._config_to_dict())
         return as_dict
 
-    def __cache_monitor(self):
-        time.sleep(2)  # Wait for things to load before starting the monitor
-        while self.running:
-            total_size = 0
-            # Is this going to be too expensive of an operation to be done frequently?
-            file_list = []
-            for dirpath, _, filenames in os.walk(self.staging_path):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    file_size = os.path.getsize(filepath)
-                    total_size += file_size
-                    # Get the time given file was last accessed
-                    last_access_time = time.localtime(os.stat(filepath)[7])
-                    # Compose a tuple of the access time and the file path
-                    file_tuple = last_access_time, filepath, file_size
-                    file_list.append(file_tuple)
-            # Sort the file list (based on access time)
-            file_list.sort()
-            # Initiate cleaning once within 10% of the defined cache size?
-            cache_limit = self.cache_size * 0.9
-            if total_size > cache_limit:
-                log.info("Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
-                         convert_bytes(total_size), convert_bytes(cache_limit))
-                # How much to delete? If simply deleting up to the cache-10% limit,
-                # is likely to be deleting frequently and may run the risk of hitting
-                # the limit - maybe delete additional #%?
-                # For now, delete enough to leave at least 10% of the total cache free
-                delete_this_much = total_size - cache_limit
-                self.__clean_cache(file_list, delete_this_much)
-            self.sleeper.sleep(30)  # Test cache size every 30 seconds?
-
-    def __clean_cache(self, file_list, delete_this_much):
-        """ Keep deleting files from the file_list until the size of the deleted
-        files is greater than the value in delete_this_much parameter.
-
-        :type file_list: list
-        :param file_list: List of candidate files that can be deleted. This method
-            will start deleting files from the beginning of the list so the list
-            should be sorted accordingly. The list must contains 3-element tuples,
-            positioned as follows: position 0 holds file last accessed timestamp
-            (as time.struct_time), position 1 holds file path, and position 2 has
-            file size (e.g., (<access time>, /mnt/data/dataset_1.dat), 472394)
-
-        :type delete_this_much: int
-        :param delete_this_much: Total size of files, in bytes, that should be deleted.
-        """
-        # Keep deleting datasets from file_list until deleted_amount does not
-        # exceed delete_this_much; start deleting from the front of the file list,
-        # which assumes the oldest files come first on the list.
-        deleted_amount = 0
-        for entry in enumerate(file_list):
-            if deleted_amount < delete_this_much:
-                deleted_amount += entry[2]
-                os.remove(entry[1])
-                # Debugging code for printing deleted files' stats
-                # folder, file_name = os.path.split(f[1])
-                # file_date = time.strftime("%m/%d/%y %H:%M:%S", f[0])
-                # log.debug("%s. %-25s %s, size %s (deleted %s/%s)" \
-                #     % (i, file_name, convert_bytes(f[2]), file_date, \
-                #     convert_bytes(deleted_amount), convert_bytes(delete_this_much)))
-            else:
-                log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(deleted_amount))
-                return
-
     def _get_bucket(self, bucket_name):
         try:
             bucket = self.conn.storage.buckets.get(bucket_name)
@@ -421,6 +357,8 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         # Now pull in the file
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
+        if file_ok:
+            self._cache_pulled(rel_path)
         return file_ok
 
     def _transfer_cb(self, complete, total):
@@ -570,6 +508,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
             if not dir_only:
                 rel_path = os.path.join(rel_path, alt_name if alt_name else f"dataset_{self._get_object_id(obj)}.dat")
                 open(os.path.join(self.staging_path, rel_path), 'w').close()
+                self._cache_updated(rel_path)
                 self._push_to_os(rel_path, from_string='')
 
     def _empty(self, obj, **kwargs):
@@ -609,6 +548,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
             # but requires iterating through each individual key in S3 and deleing it.
             if entire_dir and extra_dir:
                 shutil.rmtree(self._get_cache_path(rel_path))
+                self._cache_removed(rel_path)
                 results = self.bucket.objects.list(prefix=rel_path)
                 for key in results:
                     log.debug("Deleting key %s", key.name)
@@ -617,6 +557,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
             else:
                 # Delete from cache first
                 os.unlink(self._get_cache_path(rel_path))
+                self._cache_removed(rel_path)
                 # Delete from S3 as well
                 if self._key_exists(rel_path):
                     key = self.bucket.objects.get(rel_path)
@@ -634,6 +575,8 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         # Check cache first and get file if not there
         if not self._in_cache(rel_path):
             self._pull_into_cache(rel_path)
+        else:
+            self._cache_hit(rel_path)
         # Read the file content from cache
         data_file = open(self._get_cache_path(rel_path))
         data_file.seek(start)
@@ -662,6 +605,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            self._cache_hit(rel_path)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
         elif self._exists(obj, **kwargs):
@@ -697,6 +641,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
                     log.exception("Trouble copying source file '%s' to cache '%s'", source_file, cache_file)
             else:
                 source_file = self._get_cache_path(rel_path)
+            self._cache_updated(rel_path)
             # Update the file on cloud
             self._push_to_os(rel_path, source_file)
         else:
@@ -715,3 +660,7 @@ class Cloud(ConcreteObjectStore, CloudConfigMixin):
 
     def _get_store_usage_percent(self):
         return 0.0
+
+    def shutdown(self):
+        super().shutdown()
+        self._stop_cache_monitor()
@@ -0,0 +1,229 @@
+"""
+Disk object store storing identical files only once.
+"""
+import logging
+import os
+import shutil
+import stat
+import uuid
+
+from galaxy.util import umask_fix_perms
+from galaxy.util.hash_util import memory_bound_hexdigest
+from galaxy.util.path import safe_makedirs
+from . import DiskObjectStore
+
+log = logging.getLogger(__name__)
+
+DEDUP_HASH_FUNCTION = "SHA-256"
+# Directory (below files_dir) blobs are stored in.
+BLOBS_DIR_NAME = "_blobs"
+TEMP_PREFIX = ".tmp_"
+
+
+class DedupDiskObjectStore(DiskObjectStore):
+    """
+    Disk object store that stores identical files only once.
+
+    Files written with ``update_from_file`` are hashed, stored under their
+    hash in a content addressed directory
+    (``<files_dir>/_blobs/ab/cd/abcd...``), and the file of the object is
+    replaced by a hard link to that blob. The link count of a blob is the
+    number of files referencing it (plus one), a blob is removed when the
+    last file linking to it is deleted.
+
+    Blobs are shared between objects and hence read-only, they are never
+    modified in place, updating an object links it to another blob. Files
+    created with ``create`` and written in place (e.g. by tools) are not
+    deduplicated until they are updated with ``update_from_file``.
+
+    The SHA-256 hash of the primary file of datasets is recorded as a
+    ``DatasetHash``, and used to find their blob when they are deleted.
+    """
+    store_type = 'dedup'
+
+    def __init__(self, config, config_dict):
+        super().__init__(config, config_dict)
+        self.blobs_path = os.path.join(self.file_path, BLOBS_DIR_NAME)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blobs_path, digest[:2], digest[2:4], digest)
+
+    def _update_from_file(self, obj, file_name=None, create=False, **kwargs):
+        # Files in extra_dirs may not be on the same filesystem as the blobs
+        if not file_name or kwargs.get('base_dir') or (kwargs.get('preserve_symlinks') and os.path.islink(file_name)):
+            return super()._update_from_file(obj, file_name=file_name, create=create, **kwargs)
+        kwargs.pop('preserve_symlinks', None)
+        if create:
+            self._create(obj, **kwargs)
+        if not self._exists(obj, **kwargs):
+            return
+        path = self._get_filename(obj, **kwargs)
+        previous_digest = self._recorded_hash(obj) if self._is_primary_file(**kwargs) else None
+        try:
+            digest = self._store_blob(file_name)
+            try:
+                self._link_blob(digest, path, previous_digest)
+            except FileNotFoundError:
+                # The last reference to the blob was deleted concurrently
+                digest = self._store_blob(file_name)
+                self._link_blob(digest, path, previous_digest)
+        except OSError as ex:
+            log.critical(f'Error storing {file_name} as {path}: {ex}')
+            raise ex
+        if self._is_primary_file(**kwargs):
+            self._record_hash(obj, digest)
+
+    def _store_blob(self, file_name):
+        """Store the contents of ``file_name`` as a blob unless it exists and return its hash."""
+        digest = memory_bound_hexdigest(hash_func_name=DEDUP_HASH_FUNCTION, path=file_name)
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            blob_dir = os.path.dirname(blob_path)
+            safe_makedirs(blob_dir)
+            temp_path = os.path.join(blob_dir, f"{TEMP_PREFIX}{uuid.uuid4().hex}")
+            try:
+                shutil.copyfile(file_name, temp_path)
+                umask_fix_perms(temp_path, self.config.umask, 0o444)
+                try:
+                    os.link(temp_path, blob_path)
+                except FileExistsError:
+                    # Stored concurrently
+                    pass
+            finally:
+                os.unlink(temp_path)
+        return digest
+
+    def _link_blob(self, digest, path, previous_digest=None):
+        blob_path = self._blob_path(digest)
+        if os.path.exists(path) and os.path.samefile(blob_path, path):
+            return
+        previous_blob_path = self._find_blob(path, previous_digest)
+        # Replace the file atomically, readers see either the old or the new contents
+        temp_path = f"{path}{TEMP_PREFIX}{uuid.uuid4().hex}"
+        os.link(blob_path, temp_path)
+        os.replace(temp_path, path)
+        if previous_blob_path:
+            self._release_blob(previous_blob_path)
+
+    def _find_blob(self, path, digest=None):
+        """Return the path of the blob ``path`` is linked to, or None if it is not linked to a blob."""
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode) or st.st_nlink < 2:
+            return None
+        if digest is None or not os.path.exists(self._blob_path(digest)):
+            digest = memory_bound_hexdigest(hash_func_name=DEDUP_HASH_FUNCTION, path=path)
+        blob_path = self._blob_path(digest)
+        try:
+            if os.path.samefile(blob_path, path):
+                return blob_path
+        except OSError:
+            pass
+        return None
+
+    def _release_blob(self, blob_path):
+        """Remove the blob at ``blob_path`` if no file links to it anymore."""
+        # A file linked to the blob concurrently keeps its contents (the
+        # inode), the blob is just stored again the next time it is needed.
+        try:
+            if os.stat(blob_path).st_nlink == 1:
+                os.unlink(blob_path)
+        except OSError as ex:
+            log.warning(f'Error removing blob {blob_path}: {ex}')
+
+    def _delete(self, obj, entire_dir=False, **kwargs):
+        blob_paths = []
+        if self._exists(obj, **kwargs):
+            path = self._get_filename(obj, **kwargs)
+            if entire_dir and (kwargs.get('extra_dir') or kwargs.get('obj_dir')):
+                for root, _, files in os.walk(path):
+                    blob_paths.extend(self._find_blob(os.path.join(root, name)) for name in files)
+            elif self._is_primary_file(**kwargs):
+                blob_paths.append(self._find_blob(path, self._recorded_hash(obj)))
+            else:
+                blob_paths.append(self._find_blob(path))
+        deleted = super()._delete(obj, entire_dir=entire_dir, **kwargs)
+        if deleted:
+            for blob_path in blob_paths:
+                if blob_path:
+                    self._release_blob(blob_path)
+        return deleted
+
+    @staticmethod
+    def _is_primary_file(dir_only=False, extra_dir=None, alt_name=None, obj_dir=False, **kwargs):
+        return not (dir_only or extra_dir or alt_name or obj_dir)
+
+    @staticmethod
+    def _recorded_hash(obj):
+        for dataset_hash in getattr(obj, 'hashes', None) or []:
+            if dataset_hash.hash_function == DEDUP_HASH_FUNCTION and dataset_hash.extra_files_path is None:
+                return dataset_hash.hash_value
+        return None
+
+    def _record_hash(self, obj, digest):
+        # Only datasets have hashes
+        if not hasattr(obj, 'hashes'):
+            return
+        from galaxy.model import DatasetHash
+        for dataset_hash in list(obj.hashes):
+            if dataset_hash.hash_function == DEDUP_HASH_FUNCTION and dataset_hash.extra_files_path is None:
+                if dataset_hash.hash_value == digest:
+                    return
+                # The contents changed
+                obj.hashes.remove(dataset_hash)
+        dataset_hash = DatasetHash()
+        dataset_hash.hash_function = DEDUP_HASH_FUNCTION
+        dataset_hash.hash_value = digest
+        dataset_hash.extra_files_path = None
+        obj.hashes.append(dataset_hash)
+
+    def _blob_stats(self):
+        for root, _, files in os.walk(self.blobs_path):
+            for name in files:
+                if name.startswith(TEMP_PREFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    # Removed concurrently
+                    continue
+
+    def get_dedup_stats(self):
+        """
+        Return the number of blobs and of files linking to them, the
+        logical size of these files (as if they were not deduplicated), the
+        physical size of the blobs and the deduplication ratio.
+        """
+        blobs = references = logical_size = physical_size = 0
+        for _, st in self._blob_stats():
+            if st.st_nlink < 2:
+                continue
+            blobs += 1
+            references += st.st_nlink - 1
+            logical_size += st.st_size * (st.st_nlink - 1)
+            physical_size += st.st_size
+        return {
+            "blobs": blobs,
+            "references": references,
+            "logical_size": logical_size,
+            "physical_size": physical_size,
+            "ratio": logical_size / physical_size if physical_size else 1.0,
+        }
+
+    def collect_garbage(self):
+        """
+        Remove blobs no file links to anymore (e.g. files that were removed
+        without using the object store). Return the number and total size of
+        the blobs removed.
+        """
+        removed = removed_size = 0
+        for path, st in self._blob_stats():
+            if st.st_nlink == 1:
+                self._release_blob(path)
+                if not os.path.exists(path):
+                    removed += 1
+                    removed_size += st.st_size
+        return removed, removed_size
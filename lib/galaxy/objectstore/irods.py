@@ -4,6 +4,7 @@ Object Store plugin for the Integrated Rule-Oriented Data System (iRODS)
 import logging
 import os
 import shutil
+from collections import defaultdict
 from datetime import datetime
 from functools import partial
 from pathlib import Path
@@ -11,8 +12,10 @@ from pathlib import Path
 try:
     import irods
     import irods.keywords as kw
+    from irods.column import Criterion, In
     from irods.exception import CollectionDoesNotExist
     from irods.exception import DataObjectDoesNotExist
+    from irods.models import Collection, DataObject
     from irods.session import iRODSSession
 except ImportError:
     irods = None
@@ -20,11 +23,18 @@ except ImportError:
 from galaxy.exceptions import ObjectInvalid, ObjectNotFound
 from galaxy.util import directory_hash_id, ExecutionTimer, umask_fix_perms
 from galaxy.util.path import safe_relpath
+from .caching import (
+    CachingObjectStoreMixin,
+    DEFAULT_CACHE_RECONCILE_INTERVAL,
+    DEFAULT_EVICTION_POLICY,
+)
 from ..objectstore import DiskObjectStore
 
 IRODS_IMPORT_MESSAGE = ('The Python irods package is required to use this feature, please install it')
 # 1 MB
 CHUNK_SIZE = 2**20
+# Maximum number of data object names in a single query
+QUERY_BATCH_SIZE = 500
 log = logging.getLogger(__name__)
 
 
@@ -69,6 +79,8 @@ def parse_config_xml(config_xml):
             _config_xml_error('cache')
         cache_size = float(c_xml[0].get('size', -1))
         staging_path = c_xml[0].get('path', None)
+        eviction_policy = c_xml[0].get('eviction_policy', DEFAULT_EVICTION_POLICY)
+        reconcile_interval = int(c_xml[0].get('reconcile_interval', DEFAULT_CACHE_RECONCILE_INTERVAL))
 
         attrs = ('type', 'path')
         e_xml = config_xml.findall('extra_dir')
@@ -96,6 +108,8 @@ def parse_config_xml(config_xml):
             'cache': {
                 'size': cache_size,
                 'path': staging_path,
+                'eviction_policy': eviction_policy,
+                'reconcile_interval': reconcile_interval,
             },
             'extra_dirs': extra_dirs,
         }
@@ -128,11 +142,13 @@ class CloudConfigMixin:
             'cache': {
                 'size': self.cache_size,
                 'path': self.staging_path,
+                'eviction_policy': self.eviction_policy,
+                'reconcile_interval': self.reconcile_interval,
             }
         }
 
 
-class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
+class IRODSObjectStore(CachingObjectStoreMixin, DiskObjectStore, CloudConfigMixin):
     """
     Object store that stores files as data objects in an iRODS Zone. A local cache
     exists that is used as an intermediate location for files between Galaxy and iRODS.
@@ -194,6 +210,8 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         self.staging_path = cache_dict.get('path') or self.config.object_store_cache_path
         if self.staging_path is None:
             _config_dict_error('cache->path')
+        self.eviction_policy = cache_dict.get('eviction_policy', DEFAULT_EVICTION_POLICY)
+        self.reconcile_interval = cache_dict.get('reconcile_interval', DEFAULT_CACHE_RECONCILE_INTERVAL)
 
         extra_dirs = {e['type']: e['path'] for e in config_dict.get('extra_dirs', [])}
         if not extra_dirs:
@@ -211,6 +229,9 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         self.session = iRODSSession(host=self.host, port=self.port, user=self.username, password=self.password, zone=self.zone, refresh_time=self.refresh_time)
         # Set connection timeout
         self.session.connection_timeout = self.timeout
+        # Clean cache only if value is set in the configuration
+        if self.cache_size != -1:
+            self._start_cache_monitor(self.eviction_policy, self.reconcile_interval)
         log.debug("irods_pt __init__: %s", ipt_timer)
 
     def shutdown(self):
@@ -221,6 +242,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
             self.session.cleanup()
         except OSError:
             pass
+        self._stop_cache_monitor()
         log.debug("irods_pt shutdown: %s", ipt_timer)
 
     @classmethod
@@ -320,6 +342,28 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         finally:
             log.debug("irods_pt _data_object_exists: %s", ipt_timer)
 
+    def _data_object_sizes(self, rel_paths):
+        """
+        Return the sizes of the data objects among ``rel_paths`` that exist
+        in iRODS, querying the catalog once per collection.
+        """
+        ipt_timer = ExecutionTimer()
+        by_collection = defaultdict(dict)
+        for rel_path in rel_paths:
+            p = Path(rel_path)
+            by_collection[f"{self.home}/{str(p.parent)}"][p.name] = rel_path
+        sizes = {}
+        for collection_path, names in by_collection.items():
+            data_object_names = list(names)
+            for i in range(0, len(data_object_names), QUERY_BATCH_SIZE):
+                query = self.session.query(DataObject.name, DataObject.size).filter(
+                    Criterion('=', Collection.name, collection_path)).filter(
+                    In(DataObject.name, data_object_names[i:i + QUERY_BATCH_SIZE]))
+                for row in query:
+                    sizes[names[row[DataObject.name]]] = row[DataObject.size]
+        log.debug("irods_pt _data_object_sizes: %s", ipt_timer)
+        return sizes
+
     def _in_cache(self, rel_path):
         """ Check if the given dataset is in the local cache and return True if so. """
         cache_path = self._get_cache_path(rel_path)
@@ -335,6 +379,8 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
         log.debug("irods_pt _pull_into_cache: %s", ipt_timer)
+        if file_ok:
+            self._cache_pulled(rel_path)
         return file_ok
 
     def _download(self, rel_path):
@@ -498,6 +544,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
             if not dir_only:
                 rel_path = os.path.join(rel_path, alt_name if alt_name else f"dataset_{self._get_object_id(obj)}.dat")
                 open(os.path.join(self.staging_path, rel_path), 'w').close()
+                self._cache_updated(rel_path)
                 self._push_to_irods(rel_path, from_string='')
         log.debug("irods_pt _create: %s", ipt_timer)
 
@@ -508,6 +555,25 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
             raise ObjectNotFound('objectstore.empty, object does not exist: %s, kwargs: %s'
                                  % (str(obj), str(kwargs)))
 
+    def _exists_many(self, objs, **kwargs):
+        if kwargs.get('dir_only', False):
+            return super()._exists_many(objs, **kwargs)
+        rel_paths = [self._construct_path(obj, **kwargs) for obj in objs]
+        in_cache = [self._in_cache(rel_path) for rel_path in rel_paths]
+        sizes = self._data_object_sizes([rel_path for rel_path, cached in zip(rel_paths, in_cache) if not cached])
+        return [cached or rel_path in sizes for rel_path, cached in zip(rel_paths, in_cache)]
+
+    def _size_many(self, objs, **kwargs):
+        rel_paths = [self._construct_path(obj, **kwargs) for obj in objs]
+        sizes = self._data_object_sizes([rel_path for rel_path in rel_paths if not self._in_cache(rel_path)])
+        results = []
+        for obj, rel_path in zip(objs, rel_paths):
+            if rel_path in sizes:
+                results.append(sizes[rel_path])
+            else:
+                results.append(self._size(obj, **kwargs))
+        return results
+
     def _size(self, obj, **kwargs):
         ipt_timer = ExecutionTimer()
         rel_path = self._construct_path(obj, **kwargs)
@@ -545,6 +611,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
             # but requires iterating through each individual key in irods and deleing it.
             if entire_dir and extra_dir:
                 shutil.rmtree(self._get_cache_path(rel_path))
+                self._cache_removed(rel_path)
 
                 col_path = f"{self.home}/{str(rel_path)}"
                 col = None
@@ -570,6 +637,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
                 # Delete from cache first
                 try:
                     os.unlink(self._get_cache_path(rel_path))
+                    self._cache_removed(rel_path)
                 except FileNotFoundError:
                     # File was not in cache. Ok to ignore the exception and move on
                     pass
@@ -601,6 +669,8 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         # Check cache first and get file if not there
         if not self._in_cache(rel_path):
             self._pull_into_cache(rel_path)
+        else:
+            self._cache_hit(rel_path)
         # Read the file content from cache
         data_file = open(self._get_cache_path(rel_path))
         data_file.seek(start)
@@ -632,6 +702,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            self._cache_hit(rel_path)
             log.debug("irods_pt _get_filename: %s", ipt_timer)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
@@ -672,6 +743,7 @@ class IRODSObjectStore(DiskObjectStore, CloudConfigMixin):
                     log.exception("Trouble copying source file '%s' to cache '%s'", source_file, cache_file)
             else:
                 source_file = self._get_cache_path(rel_path)
+            self._cache_updated(rel_path)
             # Update the file on iRODS
             self._push_to_irods(rel_path, source_file)
         else:
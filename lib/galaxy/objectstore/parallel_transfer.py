@@ -0,0 +1,71 @@
+"""
+Transfer large objects between remote storage and the local cache in parts,
+using several threads.
+"""
+import logging
+import math
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+# Smallest part worth a separate request (also S3's minimum multipart upload part size).
+MIN_PART_SIZE = 8 * MB
+DEFAULT_TRANSFER_CONCURRENCY = 4
+
+
+def part_size_for(size, concurrency, max_part_size, min_part_size=MIN_PART_SIZE):
+    """Split ``size`` bytes in about ``concurrency`` parts of at most ``max_part_size`` bytes."""
+    part_size = math.ceil(size / max(1, concurrency))
+    return int(max(min_part_size, min(part_size, max_part_size)))
+
+
+def byte_ranges(size, part_size):
+    """
+    Return the (first byte, last byte) ranges of the parts of an object of
+    ``size`` bytes, as used in HTTP ``Range`` headers.
+
+    >>> byte_ranges(10, 4)
+    [(0, 3), (4, 7), (8, 9)]
+    >>> byte_ranges(0, 4)
+    []
+    """
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def parallel_download(fetch_range, size, destination, part_size, concurrency=DEFAULT_TRANSFER_CONCURRENCY):
+    """
+    Download an object of ``size`` bytes to ``destination`` in parts of
+    ``part_size`` bytes, using ``concurrency`` threads.
+
+    ``fetch_range(start, end, fh)`` must write bytes ``start`` to ``end``
+    (inclusive) of the object to the file object ``fh``. Parts are written
+    to a temporary file next to ``destination``, which is only moved into
+    place once all parts are downloaded, so a partial download is never
+    mistaken for a cached file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(destination), prefix=f".{os.path.basename(destination)}.", suffix=".part")
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.truncate(size)
+
+        def download_part(byte_range):
+            start, end = byte_range
+            with open(temp_path, 'r+b') as part_fh:
+                part_fh.seek(start)
+                fetch_range(start, end, part_fh)
+
+        ranges = byte_ranges(size, part_size)
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(ranges)))) as executor:
+            # list() re-raises the first failure of a part
+            list(executor.map(download_part, ranges))
+        os.replace(temp_path, destination)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    log.debug("Downloaded %d bytes to %s in %d parts", size, destination, len(ranges))
@@ -0,0 +1,187 @@
+"""
+Choose the backend of a distributed object store new datasets are created
+in, and move datasets between backends to even out their usage.
+"""
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+WEIGHTED_PLACEMENT = 'weighted'
+CAPACITY_PLACEMENT = 'capacity'
+PLACEMENT_STRATEGIES = (WEIGHTED_PLACEMENT, CAPACITY_PLACEMENT)
+# Weight of the last measurement in the moving averages of latency and throughput.
+EWMA_ALPHA = 0.2
+# Lower bound of the factor slow backends' weights are multiplied by, so they still get some writes (and measurements).
+MIN_SPEED_FACTOR = 0.1
+
+
+class BackendPerformance:
+    """Exponentially weighted moving averages of a backend's create latency and write throughput."""
+
+    def __init__(self):
+        self.latency = None
+        self.throughput = None
+
+    @staticmethod
+    def _ewma(average, value):
+        return value if average is None else (1 - EWMA_ALPHA) * average + EWMA_ALPHA * value
+
+    def record_latency(self, seconds):
+        self.latency = self._ewma(self.latency, seconds)
+
+    def record_throughput(self, bytes_per_second):
+        self.throughput = self._ewma(self.throughput, bytes_per_second)
+
+
+class CapacityAwarePlacement:
+    """
+    Weighted random choice of backends, where the configured weight of each
+    backend is scaled by:
+
+    - its headroom, the fraction of its capacity below its maximum percent
+      full that is still free, so backends converge to the same fullness
+      instead of all reaching their limit at the same time, and
+    - its speed relative to the fastest backend, by create latency and by
+      write throughput (at least ``MIN_SPEED_FACTOR`` each).
+    """
+
+    def __init__(self, weights, max_percent_full, global_max_percent_full=0, rng=None):
+        self.weights = dict(weights)
+        self.max_percent_full = {backend_id: max_percent_full.get(backend_id) or global_max_percent_full or 100.0 for backend_id in self.weights}
+        self.percent_full = {backend_id: 0.0 for backend_id in self.weights}
+        self.performance = {backend_id: BackendPerformance() for backend_id in self.weights}
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def update_usage(self, backend_id, percent_full):
+        self.percent_full[backend_id] = percent_full
+
+    def record_create(self, backend_id, seconds):
+        with self._lock:
+            self.performance[backend_id].record_latency(seconds)
+
+    def record_write(self, backend_id, nbytes, seconds):
+        if nbytes and seconds > 0:
+            with self._lock:
+                self.performance[backend_id].record_throughput(nbytes / seconds)
+
+    def headroom(self, backend_id):
+        limit = self.max_percent_full[backend_id]
+        return max(0.0, (limit - self.percent_full[backend_id]) / limit)
+
+    def effective_weights(self, exclude=()):
+        backend_ids = [backend_id for backend_id in self.weights if backend_id not in exclude]
+        latencies = [self.performance[b].latency for b in backend_ids if self.performance[b].latency]
+        throughputs = [self.performance[b].throughput for b in backend_ids if self.performance[b].throughput]
+        best_latency = min(latencies) if latencies else None
+        best_throughput = max(throughputs) if throughputs else None
+        weights = {}
+        for backend_id in backend_ids:
+            performance = self.performance[backend_id]
+            speed = 1.0
+            if best_latency and performance.latency:
+                speed *= max(MIN_SPEED_FACTOR, best_latency / performance.latency)
+            if best_throughput and performance.throughput:
+                speed *= max(MIN_SPEED_FACTOR, performance.throughput / best_throughput)
+            weights[backend_id] = self.weights[backend_id] * self.headroom(backend_id) * speed
+        return weights
+
+    def choose(self, exclude=()):
+        """Return the ID of the backend to create a dataset in, raise IndexError if all are full."""
+        weights = {backend_id: weight for backend_id, weight in self.effective_weights(exclude).items() if weight > 0}
+        if not weights:
+            raise IndexError("No backend with free capacity")
+        backend_ids = list(weights)
+        return self.rng.choices(backend_ids, weights=[weights[b] for b in backend_ids])[0]
+
+
+class Rebalancer:
+    """
+    Move datasets out of the backends of a ``DistributedObjectStore`` that
+    are fuller than the average by more than ``tolerance`` percent, into
+    backends chosen by its placement engine (excluding the backends being
+    emptied), until none of them is.
+
+    ``commit`` is called after an object was copied and its
+    ``object_store_id`` changed, and must persist it. Objects are not deleted
+    from their previous backend right away: running jobs and other Galaxy
+    processes may still use their previous location. The moves are recorded
+    in ``moves`` as ``(object id, previous backend id, time moved)`` tuples,
+    for ``purge_moved`` to delete them after a grace period. At most
+    ``max_bytes_per_second`` bytes are copied per second (0 for no limit).
+    """
+
+    def __init__(self, object_store, commit, max_bytes_per_second=0, tolerance=5.0, sleep=time.sleep):
+        self.object_store = object_store
+        self.commit = commit
+        self.max_bytes_per_second = max_bytes_per_second
+        self.tolerance = tolerance
+        self.sleep = sleep
+        self.moved = 0
+        self.bytes_moved = 0
+        self.moves = []
+        self.purged = 0
+
+    def overfull_backends(self):
+        usage = {backend_id: backend.get_store_usage_percent() for backend_id, backend in self.object_store.backends.items()}
+        for backend_id, percent_full in usage.items():
+            self.object_store.placement.update_usage(backend_id, percent_full)
+        mean = sum(usage.values()) / len(usage)
+        return {backend_id for backend_id, percent_full in usage.items() if percent_full > mean + self.tolerance}
+
+    def run(self, candidates):
+        """
+        Move ``candidates`` (coldest first) stored in overfull backends until
+        no backend is overfull. Return the number of objects moved.
+        """
+        start = time.time()
+        overfull = self.overfull_backends()
+        for obj in candidates:
+            if not overfull:
+                break
+            source_id = obj.object_store_id
+            if source_id not in overfull:
+                continue
+            try:
+                target_id = self.object_store.placement.choose(exclude=overfull)
+            except IndexError:
+                log.warning("No backend with free capacity to move datasets to")
+                break
+            self.bytes_moved += self.object_store.migrate(obj, target_id)
+            self.commit()
+            self.moves.append((obj.id, source_id, time.time()))
+            self.moved += 1
+            log.debug("Moved %s %s from backend %s to %s", obj.__class__.__name__, obj.id, source_id, target_id)
+            if self.max_bytes_per_second:
+                self.sleep(max(0.0, self.bytes_moved / self.max_bytes_per_second - (time.time() - start)))
+            overfull = self.overfull_backends()
+        return self.moved
+
+    def purge_moved(self, moves, objects, grace_period, busy=()):
+        """
+        Delete the objects of ``moves`` (as recorded in ``moves`` by ``run``)
+        moved at least ``grace_period`` seconds ago from their previous
+        backend, and return the moves still pending.
+
+        ``objects`` maps the ids of the moved objects to them, the moves of
+        objects in ``busy`` (e.g. the ids of the inputs of unfinished jobs)
+        stay pending.
+        """
+        cutoff = time.time() - grace_period
+        pending = []
+        for move in moves:
+            object_id, source_id, moved_time = move
+            if moved_time > cutoff or object_id in busy:
+                pending.append(move)
+                continue
+            obj = objects.get(object_id)
+            if obj is None or obj.object_store_id == source_id:
+                # Gone, or moved back since
+                continue
+            self.object_store.purge_from(obj, source_id)
+            self.purged += 1
+            log.debug("Purged %s %s from backend %s", obj.__class__.__name__, object_id, source_id)
+        return pending
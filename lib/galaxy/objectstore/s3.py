@@ -2,13 +2,12 @@
 Object Store plugin for the Amazon Simple Storage Service (S3)
 """
 import logging
-import multiprocessing
 import os
 import shutil
-import subprocess
-import threading
 import time
+from collections import defaultdict
 from datetime import datetime
+from functools import partial
 
 try:
     # Imports are done this way to allow objectstore code to be used outside of Galaxy.
@@ -24,12 +23,22 @@ from galaxy.util import (
     directory_hash_id,
     string_as_bool,
     umask_fix_perms,
-    which,
+    unicodify,
 )
 from galaxy.util.path import safe_relpath
-from galaxy.util.sleeper import Sleeper
+from .caching import (
+    CachingObjectStoreMixin,
+    DEFAULT_CACHE_RECONCILE_INTERVAL,
+    DEFAULT_EVICTION_POLICY,
+)
+from .parallel_transfer import (
+    DEFAULT_TRANSFER_CONCURRENCY,
+    MB,
+    parallel_download,
+    part_size_for,
+)
 from .s3_multipart_upload import multipart_upload
-from ..objectstore import ConcreteObjectStore, convert_bytes
+from ..objectstore import ConcreteObjectStore
 
 NO_BOTO_ERROR_MESSAGE = ("S3/Swift object store configured, but no boto dependency available."
                          "Please install and properly configure boto or modify object store configuration.")
@@ -58,11 +67,14 @@ def parse_config_xml(config_xml):
         host = cn_xml.get('host', None)
         port = int(cn_xml.get('port', 6000))
         multipart = string_as_bool(cn_xml.get('multipart', 'True'))
+        transfer_concurrency = int(cn_xml.get('transfer_concurrency', DEFAULT_TRANSFER_CONCURRENCY))
         is_secure = string_as_bool(cn_xml.get('is_secure', 'True'))
         conn_path = cn_xml.get('conn_path', '/')
 
         c_xml = config_xml.findall('cache')[0]
         cache_size = float(c_xml.get('size', -1))
+        eviction_policy = c_xml.get('eviction_policy', DEFAULT_EVICTION_POLICY)
+        reconcile_interval = int(c_xml.get('reconcile_interval', DEFAULT_CACHE_RECONCILE_INTERVAL))
 
         staging_path = c_xml.get('path', None)
 
@@ -88,12 +100,15 @@ def parse_config_xml(config_xml):
                 'host': host,
                 'port': port,
                 'multipart': multipart,
+                'transfer_concurrency': transfer_concurrency,
                 'is_secure': is_secure,
                 'conn_path': conn_path,
             },
             'cache': {
                 'size': cache_size,
                 'path': staging_path,
+                'eviction_policy': eviction_policy,
+                'reconcile_interval': reconcile_interval,
             },
             'extra_dirs': extra_dirs,
         }
@@ -119,18 +134,21 @@ class CloudConfigMixin:
                 'host': self.host,
                 'port': self.port,
                 'multipart': self.multipart,
+                'transfer_concurrency': self.transfer_concurrency,
                 'is_secure': self.is_secure,
                 'conn_path': self.conn_path,
             },
             'cache': {
                 'size': self.cache_size,
                 'path': self.staging_path,
+                'eviction_policy': self.eviction_policy,
+                'reconcile_interval': self.reconcile_interval,
             },
             'enable_cache_monitor': False,
         }
 
 
-class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
+class S3ObjectStore(CachingObjectStoreMixin, ConcreteObjectStore, CloudConfigMixin):
     """
     Object store that stores objects as items in an AWS S3 bucket. A local
     cache exists that is used as an intermediate location for files between
@@ -159,11 +177,14 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         self.host = connection_dict.get('host', None)
         self.port = connection_dict.get('port', 6000)
         self.multipart = connection_dict.get('multipart', True)
+        self.transfer_concurrency = connection_dict.get('transfer_concurrency', DEFAULT_TRANSFER_CONCURRENCY)
         self.is_secure = connection_dict.get('is_secure', True)
         self.conn_path = connection_dict.get('conn_path', '/')
 
         self.cache_size = cache_dict.get('size', -1)
         self.staging_path = cache_dict.get('path') or self.config.object_store_cache_path
+        self.eviction_policy = cache_dict.get('eviction_policy', DEFAULT_EVICTION_POLICY)
+        self.reconcile_interval = cache_dict.get('reconcile_interval', DEFAULT_CACHE_RECONCILE_INTERVAL)
 
         extra_dirs = {
             e['type']: e['path'] for e in config_dict.get('extra_dirs', [])}
@@ -188,22 +209,11 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         self._configure_connection()
         self._bucket = self._get_bucket(self.bucket)
         self.start_cache_monitor()
-        # Test if 'axel' is available for parallel download and pull the key into cache
-        if which('axel'):
-            self.use_axel = True
-        else:
-            self.use_axel = False
 
     def start_cache_monitor(self):
         # Clean cache only if value is set in galaxy.ini
         if self.cache_size != -1 and self.enable_cache_monitor:
-            # Convert GBs to bytes for comparison
-            self.cache_size = self.cache_size * 1073741824
-            # Helper for interruptable sleep
-            self.sleeper = Sleeper()
-            self.cache_monitor_thread = threading.Thread(target=self.__cache_monitor)
-            self.cache_monitor_thread.start()
-            log.info("Cache cleaner manager started")
+            self._start_cache_monitor(self.eviction_policy, self.reconcile_interval)
 
     def _configure_connection(self):
         log.debug("Configuring S3 Connection")
@@ -222,70 +232,6 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         as_dict.update(self._config_to_dict())
         return as_dict
 
-    def __cache_monitor(self):
-        time.sleep(2)  # Wait for things to load before starting the monitor
-        while self.running:
-            total_size = 0
-            # Is this going to be too expensive of an operation to be done frequently?
-            file_list = []
-            for dirpath, _, filenames in os.walk(self.staging_path):
-                for filename in filenames:
-                    filepath = os.path.join(dirpath, filename)
-                    file_size = os.path.getsize(filepath)
-                    total_size += file_size
-                    # Get the time given file was last accessed
-                    last_access_time = time.localtime(os.stat(filepath)[7])
-                    # Compose a tuple of the access time and the file path
-                    file_tuple = last_access_time, filepath, file_size
-                    file_list.append(file_tuple)
-            # Sort the file list (based on access time)
-            file_list.sort()
-            # Initiate cleaning once within 10% of the defined cache size?
-            cache_limit = self.cache_size * 0.9
-            if total_size > cache_limit:
-                log.info("Initiating cache cleaning: current cache size: %s; clean until smaller than: %s",
-                         convert_bytes(total_size), convert_bytes(cache_limit))
-                # How much to delete? If simply deleting up to the cache-10% limit,
-                # is likely to be deleting frequently and may run the risk of hitting
-                # the limit - maybe delete additional #%?
-                # For now, delete enough to leave at least 10% of the total cache free
-                delete_this_much = total_size - cache_limit
-                self.__clean_cache(file_list, delete_this_much)
-            self.sleeper.sleep(30)  # Test cache size every 30 seconds?
-
-    def __clean_cache(self, file_list, delete_this_much):
-        """ Keep deleting files from the file_list until the size of the deleted
-        files is greater than the value in delete_this_much parameter.
-
-        :type file_list: list
-        :param file_list: List of candidate files that can be deleted. This method
-            will start deleting files from the beginning of the list so the list
-            should be sorted accordingly. The list must contains 3-element tuples,
-            positioned as follows: position 0 holds file last accessed timestamp
-            (as time.struct_time), position 1 holds file path, and position 2 has
-            file size (e.g., (<access time>, /mnt/data/dataset_1.dat), 472394)
-
-        :type delete_this_much: int
-        :param delete_this_much: Total size of files, in bytes, that should be deleted.
-        """
-        # Keep deleting datasets from file_list until deleted_amount does not
-        # exceed delete_this_much; start deleting from the front of the file list,
-        # which assumes the oldest files come first on the list.
-        deleted_amount = 0
-        for entry in file_list:
-            if deleted_amount < delete_this_much:
-                deleted_amount += entry[2]
-                os.remove(entry[1])
-                # Debugging code for printing deleted files' stats
-                # folder, file_name = os.path.split(f[1])
-                # file_date = time.strftime("%m/%d/%y %H:%M:%S", f[0])
-                # log.debug("%s. %-25s %s, size %s (deleted %s/%s)" \
-                #     % (i, file_name, convert_bytes(f[2]), file_date, \
-                #     convert_bytes(deleted_amount), convert_bytes(delete_this_much)))
-            else:
-                log.debug("Cache cleaning done. Total space freed: %s", convert_bytes(deleted_amount))
-                return
-
     def _get_bucket(self, bucket_name):
         """ Sometimes a handle to a bucket is not established right away so try
         it a few times. Raise error is connection is not established. """
@@ -386,6 +332,31 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
             return False
         return exists
 
+    def _list_key_sizes(self, rel_paths):
+        """
+        Return the sizes of the keys among ``rel_paths`` that exist in S3,
+        listing each directory holding several of them once instead of
+        requesting each key.
+        """
+        by_prefix = defaultdict(set)
+        for rel_path in rel_paths:
+            by_prefix[os.path.dirname(rel_path)].add(rel_path)
+        sizes = {}
+        for prefix, names in by_prefix.items():
+            try:
+                if len(names) == 1:
+                    name = next(iter(names))
+                    key = self._bucket.get_key(name)
+                    keys = [key] if key else []
+                else:
+                    keys = self._bucket.list(prefix=f"{prefix}/" if prefix else "", delimiter='/')
+                for key in keys:
+                    if key.name in names:
+                        sizes[key.name] = key.size
+            except S3ResponseError:
+                log.exception("Trouble listing S3 keys with prefix '%s'", prefix)
+        return sizes
+
     def _in_cache(self, rel_path):
         """ Check if the given dataset is in the local cache and return True if so. """
         # log.debug("------ Checking cache for rel_path %s" % rel_path)
@@ -423,6 +394,8 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         # Now pull in the file
         file_ok = self._download(rel_path)
         self._fix_permissions(self._get_cache_path(rel_path_dir))
+        if file_ok:
+            self._cache_pulled(rel_path)
         return file_ok
 
     def _transfer_cb(self, complete, total):
@@ -437,13 +410,12 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
                 log.critical("File %s is larger (%s) than the cache size (%s). Cannot download.",
                              rel_path, key.size, self.cache_size)
                 return False
-            if self.use_axel:
-                log.debug("Parallel pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
-                ncores = multiprocessing.cpu_count()
-                url = key.generate_url(7200)
-                ret_code = subprocess.call(['axel', '-a', '-n', str(ncores), url])
-                if ret_code == 0:
-                    return True
+            part_size = part_size_for(key.size, self.transfer_concurrency, self.max_chunk_size * MB)
+            if self.transfer_concurrency > 1 and key.size > part_size:
+                log.debug("Parallel pulling key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
+                parallel_download(partial(self._download_range, rel_path), key.size, self._get_cache_path(rel_path),
+                                  part_size, self.transfer_concurrency)
+                return True
             else:
                 log.debug("Pulled key '%s' into cache to %s", rel_path, self._get_cache_path(rel_path))
                 self.transfer_progress = 0  # Reset transfer progress counter
@@ -453,6 +425,26 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
             log.exception("Problem downloading key '%s' from S3 bucket '%s'", rel_path, self._bucket.name)
         return False
 
+    def _download_range(self, rel_path, start, end, fh):
+        # Key objects keep the state of their last request, so use one per range.
+        key = Key(self._bucket, rel_path)
+        key.get_contents_to_file(fh, headers={'Range': f'bytes={start}-{end}'})
+
+    def _get_range(self, rel_path, start, count):
+        """
+        Read ``count`` bytes starting at ``start`` directly from S3, without
+        pulling the object into the cache. Return None if it can't be read.
+        """
+        key = Key(self._bucket, rel_path)
+        try:
+            return key.get_contents_as_string(headers={'Range': f'bytes={start}-{start + count - 1}'})
+        except S3ResponseError as e:
+            if e.status == 416:
+                # Requested range starts past the end of the object
+                return b''
+            log.exception("Problem reading range of key '%s' from S3 bucket '%s'", rel_path, self._bucket.name)
+        return None
+
     def _push_to_os(self, rel_path, source_file=None, from_string=None):
         """
         Push the file pointed to by ``rel_path`` to the object store naming the key
@@ -482,7 +474,8 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
                                                        cb=self._transfer_cb,
                                                        num_cb=10)
                     else:
-                        multipart_upload(self.s3server, self._bucket, key.name, source_file, mb_size)
+                        multipart_upload(self.s3server, self._bucket, key.name, source_file,
+                                         concurrency=self.transfer_concurrency)
                     end_time = datetime.now()
                     log.debug("Pushed cache file '%s' to key '%s' (%s bytes transfered in %s sec)",
                               source_file, rel_path, os.path.getsize(source_file), end_time - start_time)
@@ -574,6 +567,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
             if not dir_only:
                 rel_path = os.path.join(rel_path, alt_name if alt_name else f"dataset_{self._get_object_id(obj)}.dat")
                 open(os.path.join(self.staging_path, rel_path), 'w').close()
+                self._cache_updated(rel_path)
                 self._push_to_os(rel_path, from_string='')
 
     def _empty(self, obj, **kwargs):
@@ -583,6 +577,26 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
             raise ObjectNotFound('objectstore.empty, object does not exist: %s, kwargs: %s'
                                  % (str(obj), str(kwargs)))
 
+    def _exists_many(self, objs, **kwargs):
+        if kwargs.get('dir_only', False):
+            return super()._exists_many(objs, **kwargs)
+        rel_paths = [self._construct_path(obj, **kwargs) for obj in objs]
+        sizes = self._list_key_sizes(rel_paths)
+        # Objects only in the cache are pushed to S3 by _exists
+        return [rel_path in sizes or (self._in_cache(rel_path) and self._exists(obj, **kwargs))
+                for obj, rel_path in zip(objs, rel_paths)]
+
+    def _size_many(self, objs, **kwargs):
+        rel_paths = [self._construct_path(obj, **kwargs) for obj in objs]
+        sizes = self._list_key_sizes([rel_path for rel_path in rel_paths if not self._in_cache(rel_path)])
+        results = []
+        for obj, rel_path in zip(objs, rel_paths):
+            if rel_path in sizes:
+                results.append(sizes[rel_path])
+            else:
+                results.append(self._size(obj, **kwargs))
+        return results
+
     def _size(self, obj, **kwargs):
         rel_path = self._construct_path(obj, **kwargs)
         if self._in_cache(rel_path):
@@ -613,6 +627,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
             # but requires iterating through each individual key in S3 and deleing it.
             if entire_dir and extra_dir:
                 shutil.rmtree(self._get_cache_path(rel_path))
+                self._cache_removed(rel_path)
                 results = self._bucket.get_all_keys(prefix=rel_path)
                 for key in results:
                     log.debug("Deleting key %s", key.name)
@@ -621,6 +636,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
             else:
                 # Delete from cache first
                 os.unlink(self._get_cache_path(rel_path))
+                self._cache_removed(rel_path)
                 # Delete from S3 as well
                 if self._key_exists(rel_path):
                     key = Key(self._bucket, rel_path)
@@ -637,13 +653,20 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         rel_path = self._construct_path(obj, **kwargs)
         # Check cache first and get file if not there
         if not self._in_cache(rel_path):
+            if count > 0:
+                # Serve slices (e.g. previews) without pulling the whole object
+                content = self._get_range(rel_path, start, count)
+                if content is not None:
+                    return unicodify(content, error='ignore')
             self._pull_into_cache(rel_path)
-        # Read the file content from cache
-        data_file = open(self._get_cache_path(rel_path))
-        data_file.seek(start)
-        content = data_file.read(count)
-        data_file.close()
-        return content
+        else:
+            self._cache_hit(rel_path)
+        # Read the file content from cache, ``start`` and ``count`` are in
+        # bytes as for the ranged reads above
+        with open(self._get_cache_path(rel_path), 'rb') as data_file:
+            data_file.seek(start)
+            content = data_file.read(count)
+        return unicodify(content, error='ignore')
 
     def _get_filename(self, obj, **kwargs):
         base_dir = kwargs.get('base_dir', None)
@@ -666,6 +689,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
         #     return cache_path
         # Check if the file exists in the cache first
         if self._in_cache(rel_path):
+            self._cache_hit(rel_path)
             return cache_path
         # Check if the file exists in persistent storage and, if it does, pull it into cache
         elif self._exists(obj, **kwargs):
@@ -701,6 +725,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
                     log.exception("Trouble copying source file '%s' to cache '%s'", source_file, cache_file)
             else:
                 source_file = self._get_cache_path(rel_path)
+            self._cache_updated(rel_path)
             # Update the file on S3
             self._push_to_os(rel_path, source_file)
         else:
@@ -722,11 +747,7 @@ class S3ObjectStore(ConcreteObjectStore, CloudConfigMixin):
 
     def shutdown(self):
         self.running = False
-        thread = getattr(self, 'cache_monitor_thread', None)
-        if thread:
-            log.debug("Shutting down thread")
-            self.sleeper.wake()
-            thread.join(5)
+        self._stop_cache_monitor()
 
 
 class SwiftObjectStore(S3ObjectStore):
@@ -1,14 +1,21 @@
 #!/usr/bin/env python
 """
 Split large file into multiple pieces for upload to S3.
-This parallelizes the task over available cores using multiprocessing.
+This parallelizes the task over several threads, each with its own connection.
 Code mostly taken form CloudBioLinux.
 """
 
-import glob
+import logging
 import os
-import subprocess
-import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .parallel_transfer import (
+    byte_ranges,
+    DEFAULT_TRANSFER_CONCURRENCY,
+    MB,
+    MIN_PART_SIZE,
+    part_size_for,
+)
 
 try:
     import boto
@@ -16,6 +23,8 @@ try:
 except ImportError:
     boto = None  # type: ignore
 
+log = logging.getLogger(__name__)
+
 
 def mp_from_ids(s3server, mp_id, mp_keyname, mp_bucketname):
     """Get the multipart upload from the bucket and multipart IDs.
@@ -44,37 +53,34 @@ def mp_from_ids(s3server, mp_id, mp_keyname, mp_bucketname):
     return mp
 
 
-def transfer_part(s3server, mp_id, mp_keyname, mp_bucketname, i, part):
-    """Transfer a part of a multipart upload. Designed to be run in parallel.
+def transfer_part(s3server, mp_id, mp_keyname, mp_bucketname, i, source_file, start, end):
+    """Transfer bytes ``start`` to ``end`` of ``source_file`` as part ``i``
+    of a multipart upload. Designed to be run in parallel.
     """
     mp = mp_from_ids(s3server, mp_id, mp_keyname, mp_bucketname)
-    with open(part, 'rb') as t_handle:
-        mp.upload_part_from_file(t_handle, i + 1)
-    os.remove(part)
+    with open(source_file, 'rb') as t_handle:
+        t_handle.seek(start)
+        mp.upload_part_from_file(t_handle, i + 1, size=end - start + 1)
 
 
-def multipart_upload(s3server, bucket, s3_key_name, tarball, mb_size):
+def multipart_upload(s3server, bucket, s3_key_name, tarball, concurrency=DEFAULT_TRANSFER_CONCURRENCY):
     """Upload large files using Amazon's multipart upload functionality.
-    """
-    def split_file(in_file, mb_size, split_num=5):
-        prefix = os.path.join(os.path.dirname(in_file),
-                              f"{os.path.basename(s3_key_name)}S3PART")
-        max_chunk = s3server['max_chunk_size']
-        # Split chunks so they are 5MB < chunk < 250MB(max_chunk_size)
-        split_size = int(max(min(mb_size / (split_num * 2.0), max_chunk), 5))
-        if not os.path.exists(f"{prefix}aa"):
-            cl = ["split", f"-b{split_size}m", in_file, prefix]
-            subprocess.check_call(cl)
-        return sorted(glob.glob(f"{prefix}*"))
 
+    Parts of at most ``max_chunk_size`` MB are read directly from ``tarball``
+    and uploaded by ``concurrency`` threads.
+    """
+    size = os.path.getsize(tarball)
+    part_size = part_size_for(size, concurrency, max(s3server['max_chunk_size'] * MB, MIN_PART_SIZE))
     mp = bucket.initiate_multipart_upload(s3_key_name,
                                           reduced_redundancy=s3server['use_rr'])
-
-    for (i, part) in enumerate(split_file(tarball, mb_size)):
-        t = threading.Thread(
-            target=transfer_part,
-            args=(s3server, mp.id, mp.key_name, mp.bucket_name, i, part))
-        t.start()
-        t.join()
-
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [executor.submit(transfer_part, s3server, mp.id, mp.key_name, mp.bucket_name, i, tarball, start, end)
+                       for (i, (start, end)) in enumerate(byte_ranges(size, part_size))]
+            for future in futures:
+                future.result()
+    except Exception:
+        log.exception("Multipart upload of '%s' to key '%s' failed, cancelling it", tarball, s3_key_name)
+        mp.cancel_upload()
+        raise
     mp.complete_upload()
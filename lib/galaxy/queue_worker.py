@@ -237,6 +237,13 @@ def recalculate_user_disk_usage(app, **kwargs):
         log.error("Recalculate user disk usage task received without user_id.")
 
 
+def invalidate_quota_cache(app, **kwargs):
+    log.debug("Executing invalidate quota cache control task.")
+    invalidate_cache = getattr(app.quota_agent, 'invalidate_cache', None)
+    if invalidate_cache:
+        invalidate_cache()
+
+
 def reload_tool_data_tables(app, **kwargs):
     path = kwargs.get('path')
     table_name = kwargs.get('table_name')
@@ -322,6 +329,7 @@ control_message_to_task = {
     'admin_job_lock': admin_job_lock,
     'reload_sanitize_allowlist': reload_sanitize_allowlist,
     'recalculate_user_disk_usage': recalculate_user_disk_usage,
+    'invalidate_quota_cache': invalidate_quota_cache,
     'rebuild_toolbox_search_index': rebuild_toolbox_search_index,
     'reconfigure_watcher': reconfigure_watcher,
     'reload_tour': reload_tour,
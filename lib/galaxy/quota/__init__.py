@@ -1,10 +1,29 @@
 """Galaxy Quotas"""
 import logging
+import threading
+import time
+
+from sqlalchemy import (
+    and_,
+    event,
+    false,
+    select,
+)
+from sqlalchemy.orm import object_session
 
 import galaxy.util
 
 log = logging.getLogger(__name__)
 
+# Models whose changes can alter the effective quota of a user
+QUOTA_MODEL_NAMES = (
+    'Quota',
+    'DefaultQuotaAssociation',
+    'UserQuotaAssociation',
+    'GroupQuotaAssociation',
+    'UserGroupAssociation',
+)
+
 
 class QuotaAgent():  # metaclass=abc.ABCMeta
     """Abstraction around querying Galaxy for quota available and used.
@@ -33,6 +52,14 @@ class QuotaAgent():  # metaclass=abc.ABCMeta
             quota_str = 'unlimited'
         return quota_str
 
+    def get_quotas(self, user_ids):
+        """Return a dictionary mapping each of the (registered) user ids to the user's quota.
+
+        False (rather than None, which means no quota) is returned for quotas
+        that are unknown and must be computed by `is_over_quota`.
+        """
+        return {user_id: False for user_id in user_ids}
+
     # TODO: make abstractmethod after they work better with mypy
     def get_percent(self, trans=None, user=False, history=False, usage=False, quota=False):
         """Return the percentage of any storage quota applicable to the user/transaction."""
@@ -49,12 +76,15 @@ class QuotaAgent():  # metaclass=abc.ABCMeta
             usage = user.total_disk_usage
         return usage
 
-    def is_over_quota(self, app, job, job_destination):
+    def is_over_quota(self, app, job, job_destination, quota=False):
         """Return True if the user or history is over quota for specified job.
 
         job_destination unused currently but an important future application will
         be admins and/or users dynamically specifying which object stores to use
         and that will likely come in through the job destination.
+
+        If the quota of the job's user is already known (e.g. from `get_quotas`)
+        it can be passed as `quota`.
         """
 
 
@@ -74,16 +104,30 @@ class NoQuotaAgent(QuotaAgent):
     def get_percent(self, trans=None, user=False, history=False, usage=False, quota=False):
         return None
 
-    def is_over_quota(self, app, job, job_destination):
+    def is_over_quota(self, app, job, job_destination, quota=False):
         return False
 
 
 class DatabaseQuotaAgent(QuotaAgent):
-    """Class that handles galaxy quotas"""
+    """Class that handles galaxy quotas
+
+    If `cache_ttl` is set, the effective quota of each user (and the default
+    quotas) are cached for up to that many seconds. The cache is cleared
+    whenever quotas, quota associations or group memberships are changed in this
+    process, and other processes are told to clear theirs through the
+    `queue_worker` (if given).
+    """
 
-    def __init__(self, model):
+    def __init__(self, model, cache_ttl=0, queue_worker=None):
         self.model = model
         self.sa_session = model.context
+        self.cache_ttl = cache_ttl
+        self.queue_worker = queue_worker
+        self._cache_lock = threading.Lock()
+        # user id or default quota type -> (quota, expiration time)
+        self._quota_cache = {}
+        if cache_ttl:
+            self._listen_for_quota_changes()
 
     def get_quota(self, user):
         """
@@ -99,6 +143,8 @@ class DatabaseQuotaAgent(QuotaAgent):
         """
         if not user:
             return self.default_unregistered_quota
+        if self.cache_ttl:
+            return self.get_quotas([user.id])[user.id]
         quotas = []
         for group in [uga.group for uga in user.groups]:
             for quota in [gqa.quota for gqa in group.quotas]:
@@ -107,24 +153,61 @@ class DatabaseQuotaAgent(QuotaAgent):
         for quota in [uqa.quota for uqa in user.quotas]:
             if quota not in quotas:
                 quotas.append(quota)
+        return self._resolve_quota((quota.operation, quota.bytes) for quota in quotas if not quota.deleted)
+
+    def get_quotas(self, user_ids):
+        """
+        Return a dictionary mapping each of the user ids to the user's quota (see
+        `get_quota`), loading the quotas of all users not in the cache at once.
+        """
+        rval = {}
+        missing = set()
+        for user_id in user_ids:
+            cached = self._get_cached(user_id)
+            if cached is not None:
+                rval[user_id] = cached[0]
+            else:
+                missing.add(user_id)
+        if not missing:
+            return rval
+        missing = sorted(missing)
+        quota_table = self.model.Quota.table
+        user_quotas = select([self.model.UserQuotaAssociation.table.c.user_id, quota_table.c.id, quota_table.c.operation, quota_table.c.bytes]) \
+            .where(and_(self.model.UserQuotaAssociation.table.c.quota_id == quota_table.c.id,
+                        self.model.UserQuotaAssociation.table.c.user_id.in_(missing),
+                        quota_table.c.deleted == false()))
+        group_quotas = select([self.model.UserGroupAssociation.table.c.user_id, quota_table.c.id, quota_table.c.operation, quota_table.c.bytes]) \
+            .where(and_(self.model.UserGroupAssociation.table.c.group_id == self.model.GroupQuotaAssociation.table.c.group_id,
+                        self.model.GroupQuotaAssociation.table.c.quota_id == quota_table.c.id,
+                        self.model.UserGroupAssociation.table.c.user_id.in_(missing),
+                        quota_table.c.deleted == false()))
+        quotas_by_user = {user_id: {} for user_id in missing}
+        for statement in (user_quotas, group_quotas):
+            for user_id, quota_id, operation, quota_bytes in self.sa_session.execute(statement):
+                quotas_by_user[user_id][quota_id] = (operation, quota_bytes)
+        for user_id, quotas in quotas_by_user.items():
+            rval[user_id] = self._resolve_quota(quotas.values())
+            self._set_cached(user_id, rval[user_id])
+        return rval
+
+    def _resolve_quota(self, quotas):
+        """Combine the (operation, bytes) of the non-deleted quotas of a registered user."""
         use_default = True
         max = 0
         adjustment = 0
         rval = 0
-        for quota in quotas:
-            if quota.deleted:
-                continue
-            if quota.operation == '=' and quota.bytes == -1:
+        for operation, quota_bytes in quotas:
+            if operation == '=' and quota_bytes == -1:
                 rval = None
                 break
-            elif quota.operation == '=':
+            elif operation == '=':
                 use_default = False
-                if quota.bytes > max:
-                    max = quota.bytes
-            elif quota.operation == '+':
-                adjustment += quota.bytes
-            elif quota.operation == '-':
-                adjustment -= quota.bytes
+                if quota_bytes > max:
+                    max = quota_bytes
+            elif operation == '+':
+                adjustment += quota_bytes
+            elif operation == '-':
+                adjustment -= quota_bytes
         if use_default:
             max = self.default_registered_quota
             if max is None:
@@ -144,12 +227,60 @@ class DatabaseQuotaAgent(QuotaAgent):
         return self._default_quota(self.model.DefaultQuotaAssociation.types.REGISTERED)
 
     def _default_quota(self, default_type):
+        cached = self._get_cached(default_type)
+        if cached is not None:
+            return cached[0]
         dqa = self.sa_session.query(self.model.DefaultQuotaAssociation).filter(self.model.DefaultQuotaAssociation.table.c.type == default_type).first()
-        if not dqa:
+        if not dqa or dqa.quota.bytes < 0:
+            quota = None
+        else:
+            quota = dqa.quota.bytes
+        self._set_cached(default_type, quota)
+        return quota
+
+    # ---- cache
+    def _get_cached(self, key):
+        if not self.cache_ttl:
             return None
-        if dqa.quota.bytes < 0:
+        with self._cache_lock:
+            cached = self._quota_cache.get(key)
+        if cached is None or cached[1] < time.time():
             return None
-        return dqa.quota.bytes
+        return cached
+
+    def _set_cached(self, key, quota):
+        if self.cache_ttl:
+            with self._cache_lock:
+                self._quota_cache[key] = (quota, time.time() + self.cache_ttl)
+
+    def invalidate_cache(self):
+        """Forget all cached quotas."""
+        with self._cache_lock:
+            self._quota_cache = {}
+
+    def _listen_for_quota_changes(self):
+        for model_name in QUOTA_MODEL_NAMES:
+            model_class = getattr(self.model, model_name)
+            for event_name in ('after_insert', 'after_update', 'after_delete'):
+                event.listen(model_class, event_name, self._on_quota_model_change)
+        event.listen(self.sa_session, 'after_commit', self._after_commit)
+
+    def _on_quota_model_change(self, mapper, connection, target):
+        self.invalidate_cache()
+        session = object_session(target)
+        if session is not None:
+            session.info['quotas_changed'] = True
+
+    def _after_commit(self, session):
+        if not session.info.pop('quotas_changed', False):
+            return
+        # clear again, quotas may have been cached between the flush and the commit
+        self.invalidate_cache()
+        if self.queue_worker is not None:
+            try:
+                self.queue_worker.send_control_task('invalidate_quota_cache', noop_self=True)
+            except Exception:
+                log.exception("Failed to notify other processes of quota changes")
 
     def set_default_quota(self, default_type, quota):
         # Unset the current default(s) associated with this quota, if there are any
@@ -215,8 +346,9 @@ class DatabaseQuotaAgent(QuotaAgent):
                 self.sa_session.add(gqa)
             self.sa_session.flush()
 
-    def is_over_quota(self, app, job, job_destination):
-        quota = self.get_quota(job.user)
+    def is_over_quota(self, app, job, job_destination, quota=False):
+        if quota is False:
+            quota = self.get_quota(job.user)
         if quota is not None:
             try:
                 usage = self.get_usage(user=job.user, history=job.history)
@@ -227,10 +359,10 @@ class DatabaseQuotaAgent(QuotaAgent):
         return False
 
 
-def get_quota_agent(config, model) -> QuotaAgent:
+def get_quota_agent(config, model, queue_worker=None) -> QuotaAgent:
     quota_agent: QuotaAgent
     if config.enable_quotas:
-        quota_agent = galaxy.quota.DatabaseQuotaAgent(model)
+        quota_agent = galaxy.quota.DatabaseQuotaAgent(model, cache_ttl=config.quota_cache_ttl, queue_worker=queue_worker)
     else:
         quota_agent = galaxy.quota.NoQuotaAgent()
     return quota_agent
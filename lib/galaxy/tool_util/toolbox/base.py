@@ -4,6 +4,7 @@ import os
 import string
 import time
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from errno import ENOENT
 from typing import Dict, List
 from urllib.parse import urlparse
@@ -45,6 +46,7 @@ from .parser import (
     get_toolbox_parser
 )
 from .tags import tool_tag_manager
+from .timings import ToolLoadTimings
 from .views.edam import EdamPanelMode, EdamToolPanelView
 from .views.interface import (
     ToolBoxRegistry,
@@ -123,6 +125,11 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
         # Cache for tool's to_dict calls specific to toolbox. Invalidates on toolbox reload.
         self._tool_to_dict_cache = {}
         self._tool_to_dict_cache_admin = {}
+        # Time spent loading each tool, per phase.
+        self.load_timings = ToolLoadTimings()
+        # Tool sources being loaded concurrently during startup, by tool config file.
+        self._tool_source_futures = {}
+        self._tool_source_executor = None
         # In-memory dictionary that defines the layout of the tool panel.
         self._tool_panel = ToolPanelElements()
         self._index = 0
@@ -201,6 +208,9 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
         """
         execution_timer = ExecutionTimer()
         self._tool_tag_manager.reset_tags()
+        load_threads = getattr(self.app.config, "toolbox_load_threads", 0)
+        if load_threads > 0:
+            self._tool_source_executor = ThreadPoolExecutor(max_workers=load_threads, thread_name_prefix="ToolboxLoader")
         config_filenames = listify(config_filenames)
         for config_filename in config_filenames:
             if os.path.isdir(config_filename):
@@ -224,7 +234,15 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
                     raise
             except Exception:
                 log.exception("Error loading tools defined in config %s", config_filename)
+        if self._tool_source_executor:
+            # Drop tool sources that were not used (e.g. tools that failed to load or were already cached)
+            for future in self._tool_source_futures.values():
+                future.cancel()
+            self._tool_source_executor.shutdown()
+            self._tool_source_executor = None
+            self._tool_source_futures = {}
         log.debug("Reading tools from config files finished %s", execution_timer)
+        log.debug(self.load_timings.report())
 
     def _init_tools_from_config(self, config_filename):
         """
@@ -271,7 +289,12 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
         tool_path = self.__resolve_tool_path(tool_path, config_filename)
         # Only load the panel_dict under certain conditions.
         load_panel_dict = not self._integrated_tool_panel_config_has_contents
-        for item in tool_conf_source.parse_items():
+        items = tool_conf_source.parse_items()
+        self._warm_tool_document_cache(self._tool_paths_for_items(items, tool_path), tool_cache_data_dir=tool_cache_data_dir)
+        if self._tool_source_executor:
+            self._preload_tool_sources(self._tool_paths_for_items(items, tool_path), tool_cache_data_dir=tool_cache_data_dir)
+        # Tools are created and added to the panel one by one, in config order.
+        for item in items:
             index = self._index
             self._index += 1
             if parsing_shed_tool_conf:
@@ -712,6 +735,44 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
     def _path_template_kwds(self):
         return {}
 
+    def _tool_paths_for_items(self, items, tool_path):
+        """Yield the paths of the tool files referenced by tool conf `items` (including those in sections)."""
+        template_kwds = self._path_template_kwds()
+        for item in items:
+            if item.type == 'tool':
+                path = string.Template(item.get("file")).safe_substitute(**template_kwds)
+                yield os.path.join(tool_path, path)
+            elif item.type == 'section':
+                yield from self._tool_paths_for_items(item.items, tool_path)
+
+    def _warm_tool_document_cache(self, config_files, tool_cache_data_dir=None):
+        """Prepare cached documents of the tools in `config_files` before they are loaded one by one."""
+
+    def _preload_tool_sources(self, config_files, tool_cache_data_dir=None):
+        """Start loading the tool sources of `config_files` in the toolbox loader thread pool."""
+        for config_file in config_files:
+            if config_file not in self._tool_source_futures and not self.load_tool_from_cache(config_file):
+                self._tool_source_futures[config_file] = self._tool_source_executor.submit(
+                    self._timed_load_tool_source, config_file, tool_cache_data_dir=tool_cache_data_dir)
+
+    def _preloaded_tool_source(self, config_file):
+        """
+        Return the result of `_load_tool_source` for `config_file` if it has been
+        preloaded (waiting for it to finish), else None.
+        """
+        future = self._tool_source_futures.pop(config_file, None)
+        if future is not None:
+            return future.result()
+        return None
+
+    def _timed_load_tool_source(self, config_file, tool_cache_data_dir=None):
+        with self.load_timings.time(config_file, 'parse'):
+            return self._load_tool_source(config_file, tool_cache_data_dir=tool_cache_data_dir)
+
+    def _load_tool_source(self, config_file, tool_cache_data_dir=None):
+        """Load the (expanded) tool source of `config_file`, this may be called from loader threads."""
+        raise NotImplementedError()
+
     def _load_tool_tag_set(self, item, panel_dict, integrated_panel_dict, tool_path, load_panel_dict, guid=None, index=None, tool_cache_data_dir=None):
         try:
             path_template = item.get("file")
@@ -754,7 +815,8 @@ class AbstractToolBox(Dictifiable, ManagesIntegratedToolPanelMixin):
                     tool.version = item.elem.find("version").text
                 if item.has_elem:
                     self._tool_tag_manager.handle_tags(tool.id, item.elem)
-                self.__add_tool(tool, load_panel_dict, panel_dict)
+                with self.load_timings.time(concrete_path, 'panel'):
+                    self.__add_tool(tool, load_panel_dict, panel_dict)
             # Always load the tool into the integrated_panel_dict, or it will not be included in the integrated_tool_panel.xml file.
             integrated_panel_dict.update_or_append(index, key, tool)
             # If labels were specified in the toolbox config, attach them to
@@ -0,0 +1,56 @@
+"""Collect the time spent loading each tool of a toolbox, broken down by phase."""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict
+
+# Phases of loading a tool: reading and expanding the tool source,
+# creating the Tool object and adding it to the tool panel.
+PHASES = ('parse', 'create', 'panel')
+
+
+class ToolLoadTimings:
+    """
+    Record time spent loading tools per tool and per phase (see ``PHASES``).
+
+    Phases of different tools may run concurrently (e.g. tool sources parsed
+    by a thread pool), so totals are the cumulative time spent in each phase,
+    not the elapsed time.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._timings: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    @contextmanager
+    def time(self, path, phase):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(path, phase, time.time() - start)
+
+    def add(self, path, phase, seconds):
+        with self._lock:
+            self._timings[path][phase] += seconds
+
+    def clear(self):
+        with self._lock:
+            self._timings.clear()
+
+    def to_dict(self):
+        with self._lock:
+            return {path: dict(phases) for path, phases in self._timings.items()}
+
+    def report(self, slowest=10):
+        """Return a summary of time spent per phase and on the `slowest` tools."""
+        timings = self.to_dict()
+        totals = {phase: sum(phases.get(phase, 0) for phases in timings.values()) for phase in PHASES}
+        lines = ["Loaded {} tools, cumulative time per phase: {}".format(
+            len(timings), ", ".join(f"{phase} {total:.2f}s" for phase, total in totals.items()))]
+        by_total = sorted(timings.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        for path, phases in by_total[:slowest]:
+            lines.append("  {:.3f}s {} ({})".format(
+                sum(phases.values()), path, ", ".join(f"{phase} {phases.get(phase, 0):.3f}s" for phase in PHASES)))
+        return "\n".join(lines)
@@ -55,7 +55,10 @@ from galaxy.tools.actions import DefaultToolAction
 from galaxy.tools.actions.data_manager import DataManagerToolAction
 from galaxy.tools.actions.data_source import DataSourceToolAction
 from galaxy.tools.actions.model_operations import ModelOperationToolAction
-from galaxy.tools.cache import ToolDocumentCache
+from galaxy.tools.cache import (
+    SharedToolDocumentCache,
+    ToolDocumentCache,
+)
 from galaxy.tools.imp_exp import JobImportHistoryArchiveWrapper
 from galaxy.tools.parameters import (
     check_param,
@@ -85,6 +88,7 @@ from galaxy.tools.parameters.meta import expand_meta_parameters
 from galaxy.tools.parameters.wrapped_json import json_wrap
 from galaxy.tools.test import parse_tests
 from galaxy.util import (
+    ExecutionTimer,
     in_directory,
     listify,
     Params,
@@ -338,10 +342,41 @@ class ToolBox(BaseGalaxyToolBox):
     def get_cache_region(self, tool_cache_data_dir):
         if self.app.config.enable_tool_document_cache:
             if tool_cache_data_dir not in self.cache_regions:
-                self.cache_regions[tool_cache_data_dir] = ToolDocumentCache(cache_dir=tool_cache_data_dir)
+                if self.app.config.tool_document_cache_mode == 'shared':
+                    cache = SharedToolDocumentCache(cache_dir=tool_cache_data_dir)
+                else:
+                    cache = ToolDocumentCache(cache_dir=tool_cache_data_dir)
+                self.cache_regions[tool_cache_data_dir] = cache
             return self.cache_regions[tool_cache_data_dir]
 
+    def _warm_tool_document_cache(self, config_files, tool_cache_data_dir=None):
+        cache = self.get_cache_region(tool_cache_data_dir or self.app.config.tool_cache_data_dir)
+        processes = self.app.config.tool_document_cache_warmup_processes if cache else 0
+        if processes > 0 and not cache.disabled:
+            execution_timer = ExecutionTimer()
+            added = cache.warmup(
+                list(config_files),
+                processes=processes,
+                enable_beta_formats=getattr(self.app.config, "enable_beta_tool_formats", False),
+            )
+            log.debug("Added %d tool documents to the tool document cache %s", added, execution_timer)
+
     def create_tool(self, config_file, tool_cache_data_dir=None, **kwds):
+        tool_source, add_to_cache = self._preloaded_tool_source(config_file) or self._timed_load_tool_source(config_file, tool_cache_data_dir)
+        if add_to_cache:
+            cache = self.get_cache_region(tool_cache_data_dir or self.app.config.tool_cache_data_dir)
+            cache.set(config_file, tool_source)
+        with self.load_timings.time(config_file, 'create'):
+            tool = self._create_tool_from_source(tool_source, config_file=config_file, **kwds)
+            if not self.app.config.delay_tool_initialization:
+                tool.assert_finalized(raise_if_invalid=True)
+        return tool
+
+    def _load_tool_source(self, config_file, tool_cache_data_dir=None):
+        """
+        Return the expanded tool source of `config_file` (from the tool document
+        cache if possible) and whether it should be added to the cache.
+        """
         cache = self.get_cache_region(tool_cache_data_dir or self.app.config.tool_cache_data_dir)
         if config_file.endswith('.xml') and cache and not cache.disabled:
             tool_document = cache.get(config_file)
@@ -351,15 +386,9 @@ class ToolBox(BaseGalaxyToolBox):
                     xml_tree=etree.ElementTree(etree.fromstring(tool_document['document'].encode('utf-8'))),
                     macro_paths=tool_document['macro_paths']
                 )
-            else:
-                tool_source = self.get_expanded_tool_source(config_file)
-                cache.set(config_file, tool_source)
-        else:
-            tool_source = self.get_expanded_tool_source(config_file)
-        tool = self._create_tool_from_source(tool_source, config_file=config_file, **kwds)
-        if not self.app.config.delay_tool_initialization:
-            tool.assert_finalized(raise_if_invalid=True)
-        return tool
+                return tool_source, False
+            return self.get_expanded_tool_source(config_file), True
+        return self.get_expanded_tool_source(config_file), False
 
     def get_expanded_tool_source(self, config_file, **kwargs):
         try:
@@ -103,6 +103,8 @@ class SetMetadataToolAction(ToolAction):
                                                                      job_metadata=os.path.join(job_working_dir, 'working', tool.provided_metadata_file),
                                                                      include_command=False,
                                                                      max_metadata_value_size=app.config.max_metadata_value_size,
+                                                                     metadata_processes=app.config.metadata_processes,
+                                                                     metadata_chunk_size=app.config.metadata_chunk_size,
                                                                      validate_outputs=validate_outputs,
                                                                      job=job,
                                                                      kwds={'overwrite': overwrite})
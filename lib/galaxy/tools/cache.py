@@ -4,8 +4,11 @@ import os
 import shutil
 import sqlite3
 import tempfile
+import time
 import zlib
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from threading import Lock
 from typing import Dict, List, Tuple
 
@@ -17,14 +20,17 @@ from sqlalchemy.orm.session import sessionmaker
 from sqlitedict import SqliteDict
 
 from galaxy.model.tool_shed_install import ToolShedRepository
+from galaxy.tool_util.parser import get_tool_source
 from galaxy.tool_util.toolbox.base import ToolConfRepository
 from galaxy.util import unicodify
-from galaxy.util.hash_util import md5_hash_file
+from galaxy.util.hash_util import md5, md5_hash_file
 
 
 log = logging.getLogger(__name__)
 
 CURRENT_TOOL_CACHE_VERSION = 0
+TOOL_DOCUMENT_CACHE_MODES = ('default', 'shared')
+_MISSING = object()
 
 
 def encoder(obj):
@@ -35,6 +41,72 @@ def decoder(obj):
     return json.loads(zlib.decompress(bytes(obj)).decode('utf-8'))
 
 
+def expand_tool_document(config_file, enable_beta_formats=False):
+    """
+    Parse and expand the tool at `config_file`, returning the parts of the tool
+    document that are stored in the cache (or None if the tool is invalid).
+
+    Used by :meth:`ToolDocumentCache.warmup` in worker processes.
+    """
+    try:
+        tool_source = get_tool_source(config_file, enable_beta_formats=enable_beta_formats)
+        return {
+            'document': tool_source.to_string(),
+            'macro_paths': tool_source.macro_paths,
+            'paths_and_modtimes': tool_source.paths_and_modtimes(),
+        }
+    except Exception:
+        # Errors are reported when the tool is loaded.
+        return None
+
+
+def directory_digest(directory):
+    """
+    Return a digest of the names, sizes and modification times of the files in
+    `directory`, or None if the directory cannot be read.
+    """
+    entries = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_file():
+                    stat = entry.stat()
+                    entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    except OSError:
+        return None
+    return md5(json.dumps(sorted(entries)).encode('utf-8')).hexdigest()
+
+
+class DirectoryManifest:
+    """
+    Digests of the directories containing tool and macro files (for tool shed
+    tools the repository directory), each computed once and then reused for
+    every tool document validated against it.
+    """
+
+    def __init__(self):
+        self._digests = {}
+        self._lock = Lock()
+
+    def digest(self, directory):
+        digest = self._digests.get(directory, _MISSING)
+        if digest is _MISSING:
+            digest = directory_digest(directory)
+            with self._lock:
+                self._digests[directory] = digest
+        return digest
+
+    def digests_for_paths(self, paths):
+        return {directory: self.digest(directory) for directory in {os.path.dirname(path) for path in paths}}
+
+    def is_current(self, digests):
+        return all(digest is not None and self.digest(directory) == digest for directory, digest in digests.items())
+
+    def invalidate(self, directory):
+        with self._lock:
+            self._digests.pop(directory, None)
+
+
 class ToolDocumentCache:
 
     def __init__(self, cache_dir):
@@ -70,8 +142,8 @@ class ToolDocumentCache:
         return os.access(self.cache_file, os.W_OK)
 
     def reopen_ro(self):
-        self._get_cache(flag='r')
         self.writeable_cache_file = None
+        self._get_cache(flag='r')
 
     def get(self, config_file):
         try:
@@ -83,12 +155,16 @@ class ToolDocumentCache:
             return None
         if tool_document.get('tool_cache_version') != CURRENT_TOOL_CACHE_VERSION:
             return None
-        if self.cache_file_is_writeable:
-            for path, modtime in tool_document['paths_and_modtimes'].items():
-                if os.path.getmtime(path) != modtime:
-                    return None
+        if self.cache_file_is_writeable and not self._is_current(tool_document):
+            return None
         return tool_document
 
+    def _is_current(self, tool_document):
+        for path, modtime in tool_document['paths_and_modtimes'].items():
+            if os.path.getmtime(path) != modtime:
+                return False
+        return True
+
     def _make_writable(self):
         if not self.writeable_cache_file:
             self.writeable_cache_file = tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='cache.sqlite.tmp', delete=False)
@@ -103,22 +179,50 @@ class ToolDocumentCache:
             self.reopen_ro()
 
     def set(self, config_file, tool_source):
+        self._set_document(config_file, {
+            'document': tool_source.to_string(),
+            'macro_paths': tool_source.macro_paths,
+            'paths_and_modtimes': tool_source.paths_and_modtimes(),
+        })
+
+    def _set_document(self, config_file, to_persist):
         try:
             if self.cache_file_is_writeable:
                 self._make_writable()
-                to_persist = {
-                    'document': tool_source.to_string(),
-                    'macro_paths': tool_source.macro_paths,
-                    'paths_and_modtimes': tool_source.paths_and_modtimes(),
-                    'tool_cache_version': CURRENT_TOOL_CACHE_VERSION,
-                }
+                to_persist['tool_cache_version'] = CURRENT_TOOL_CACHE_VERSION
                 try:
-                    self._cache[config_file] = to_persist
+                    self._store(config_file, to_persist)
                 except RuntimeError:
                     log.debug("Tool document cache not writeable")
         except sqlite3.OperationalError:
             log.debug("Tool document cache unavailable")
 
+    def _store(self, config_file, to_persist):
+        self._cache[config_file] = to_persist
+
+    def warmup(self, config_files, processes=None, enable_beta_formats=False):
+        """
+        Parse and expand the tools in `config_files` that are missing from the
+        cache (or outdated) in a pool of `processes` worker processes.
+
+        Returns the number of tool documents added to the cache.
+        """
+        if self.disabled or not self.cache_file_is_writeable:
+            return 0
+        missing = [config_file for config_file in config_files if config_file.endswith('.xml') and not self.get(config_file)]
+        if not missing:
+            return 0
+        processes = processes or os.cpu_count() or 1
+        added = 0
+        expand = partial(expand_tool_document, enable_beta_formats=enable_beta_formats)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            chunksize = max(1, len(missing) // (processes * 4))
+            for config_file, to_persist in zip(missing, executor.map(expand, missing, chunksize=chunksize)):
+                if to_persist:
+                    self._set_document(config_file, to_persist)
+                    added += 1
+        return added
+
     def delete(self, config_file):
         if self.cache_file_is_writeable:
             self._make_writable()
@@ -135,6 +239,142 @@ class ToolDocumentCache:
                 pass
 
 
+class SharedToolDocumentCache(ToolDocumentCache):
+    """
+    Tool document cache for many Galaxy processes sharing a (possibly network)
+    cache directory.
+
+    Tool documents are validated against digests of the directories containing
+    their tool and macro files, computed once per directory, instead of
+    checking the modification time of every path on each lookup. Each write
+    session appends a new segment database instead of copying the whole cache,
+    and segments are merged into the main database once there are more than
+    ``max_segments`` of them.
+    """
+    max_segments = 8
+
+    def __init__(self, cache_dir):
+        self.segment_dir = os.path.join(cache_dir, 'segments')
+        self.manifest = DirectoryManifest()
+        self._segments = []
+        self._writer = None
+        super().__init__(cache_dir)
+        self._writeable = os.access(self.cache_file, os.W_OK)
+
+    @property
+    def cache_file_is_writeable(self):
+        return self._writeable
+
+    def close(self):
+        for db in [self._cache, *self._segments]:
+            db and db.close()
+        self._segments = []
+
+    def _segment_paths(self):
+        try:
+            return sorted(os.path.join(self.segment_dir, name) for name in os.listdir(self.segment_dir) if name.endswith('.sqlite'))
+        except FileNotFoundError:
+            return []
+
+    def _get_cache(self, flag='r', create_if_necessary=False):
+        try:
+            if create_if_necessary:
+                if not os.path.exists(self.segment_dir):
+                    os.makedirs(self.segment_dir)
+                if not os.path.exists(self.cache_file):
+                    SqliteDict(self.cache_file, flag='c', encode=encoder, decode=decoder, autocommit=False).close()
+            self._cache = SqliteDict(self.cache_file, flag='r', encode=encoder, decode=decoder, autocommit=False)
+            # Newest segment first, so that it takes precedence.
+            self._segments = [SqliteDict(path, flag='r', encode=encoder, decode=decoder, autocommit=False) for path in reversed(self._segment_paths())]
+        except (OSError, RuntimeError, sqlite3.OperationalError):
+            log.warning('Tool document cache unavailable')
+            self._cache = None
+            self._segments = []
+            self.disabled = True
+
+    def reopen_ro(self):
+        self.close()
+        super().reopen_ro()
+
+    def _lookup(self, config_file):
+        for db in [self._writer, *self._segments, self._cache]:
+            if db is not None:
+                tool_document = db.get(config_file, _MISSING)
+                if tool_document is not _MISSING:
+                    # An empty document marks a deleted tool.
+                    return tool_document
+        return None
+
+    def get(self, config_file):
+        try:
+            tool_document = self._lookup(config_file)
+        except sqlite3.OperationalError:
+            log.debug("Tool document cache unavailable")
+            return None
+        if not tool_document:
+            return None
+        if tool_document.get('tool_cache_version') != CURRENT_TOOL_CACHE_VERSION:
+            return None
+        if self.cache_file_is_writeable:
+            # Documents stored without digests (e.g. by the default cache mode) cannot be validated
+            directory_digests = tool_document.get('directory_digests')
+            if not directory_digests or not self.manifest.is_current(directory_digests):
+                return None
+        return tool_document
+
+    def _make_writable(self):
+        if not self._writer:
+            self.writeable_cache_file = tempfile.NamedTemporaryFile(dir=self.segment_dir, suffix='.sqlite.tmp', delete=False)
+            self._writer = SqliteDict(self.writeable_cache_file.name, flag='c', encode=encoder, decode=decoder, autocommit=False)
+
+    def _store(self, config_file, to_persist):
+        to_persist['directory_digests'] = self.manifest.digests_for_paths(to_persist['paths_and_modtimes'])
+        self._writer[config_file] = to_persist
+
+    def delete(self, config_file):
+        self.manifest.invalidate(os.path.dirname(config_file))
+        if self.cache_file_is_writeable and self._lookup(config_file):
+            self._make_writable()
+            self._writer[config_file] = {}
+
+    def persist(self):
+        if self._writer:
+            self._writer.commit()
+            self._writer.close()
+            segment_path = os.path.join(self.segment_dir, '%020d-%d.sqlite' % (time.time() * 1000000, os.getpid()))
+            os.rename(self.writeable_cache_file.name, segment_path)
+            self._writer = None
+            self.writeable_cache_file = None
+            self.close()
+            self._compact()
+            self.reopen_ro()
+
+    def _compact(self):
+        segment_paths = self._segment_paths()
+        if len(segment_paths) <= self.max_segments:
+            return
+        compacted = tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='cache.sqlite.tmp', delete=False)
+        try:
+            shutil.copy(self.cache_file, compacted.name)
+            with SqliteDict(compacted.name, flag='c', encode=encoder, decode=decoder, autocommit=False) as db:
+                for segment_path in segment_paths:
+                    with SqliteDict(segment_path, flag='r', encode=encoder, decode=decoder) as segment:
+                        for config_file, tool_document in segment.items():
+                            if tool_document:
+                                db[config_file] = tool_document
+                            elif config_file in db:
+                                del db[config_file]
+                db.commit()
+            os.rename(compacted.name, self.cache_file)
+            for segment_path in segment_paths:
+                os.unlink(segment_path)
+        except Exception:
+            # Another process may be compacting the same segments, which is harmless.
+            log.debug("Failed to compact tool document cache segments", exc_info=True)
+            if os.path.exists(compacted.name):
+                os.unlink(compacted.name)
+
+
 class ToolCache:
     """
     Cache tool definitions to allow quickly reloading the whole
@@ -1,6 +1,10 @@
 """Entry point for the usage of Cheetah templating within Galaxy."""
 
+import hashlib
+import threading
 import traceback
+from collections import OrderedDict
+from functools import lru_cache
 from lib2to3.refactor import RefactoringTool
 
 import packaging.version
@@ -17,6 +21,11 @@ from . import unicodify
 myfixes = [f for f in myfixes if not f.startswith('libpasteurize')]
 refactoring_tool = RefactoringTool(myfixes, {'print_function': True})
 
+DEFAULT_TEMPLATE_CACHE_SIZE = 1000
+# Cache variant of the classes compiled from the futurized module code of
+# templates that cannot be parsed on python 3
+PARSE_ERROR_FALLBACK = 'parse_error_fallback'
+
 
 class FixedModuleCodeCompiler(Compiler):
 
@@ -27,6 +36,84 @@ class FixedModuleCodeCompiler(Compiler):
         return self._moduleDef
 
 
+class CompiledTemplateCache:
+    """Bounded LRU cache of compiled Cheetah template classes.
+
+    Cheetah's own compilation cache is unbounded and keyed on the identity of
+    the compiler class, so it never hits for the compiler classes created by
+    the python 2 fallbacks below. This cache is keyed on a hash of the template
+    text and of the compiler (including the module code of fixed module code
+    compilers).
+    """
+
+    def __init__(self, maxsize=DEFAULT_TEMPLATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._classes = OrderedDict()
+
+    def get_class(self, template_text, compiler_class, variant=None, compile=None):
+        """Return the compiled class of ``template_text``, compiling it with
+        ``compile()`` (by default with ``compiler_class``) if it isn't cached.
+
+        Classes compiled differently from the same template and compiler are
+        cached under their own ``variant``.
+        """
+        template_hash = _hash(template_text)
+        key = (template_hash, _compiler_key(compiler_class), variant)
+        klass = self._lookup(key)
+        if klass is not None:
+            return klass
+        if compile is None:
+            klass = Template.compile(source=template_text, compilerClass=compiler_class, cacheCompilationResults=False, useCache=False)
+        else:
+            klass = compile()
+        with self._lock:
+            self._classes[key] = klass
+            while len(self._classes) > self.maxsize:
+                self._classes.popitem(last=False)
+        return klass
+
+    def get_cached_class(self, template_text, compiler_class, variant=None):
+        """Return the cached compiled class of ``template_text``, or None."""
+        template_hash = _hash(template_text)
+        return self._lookup((template_hash, _compiler_key(compiler_class), variant))
+
+    def _lookup(self, key):
+        with self._lock:
+            klass = self._classes.get(key)
+            if klass is not None:
+                self._classes.move_to_end(key)
+            return klass
+
+    def __len__(self):
+        with self._lock:
+            return len(self._classes)
+
+    def clear(self):
+        with self._lock:
+            self._classes.clear()
+
+
+def _hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _compiler_key(compiler_class):
+    module_code = getattr(compiler_class, 'module_code', None)
+    if module_code is not None:
+        return _hash(module_code)
+    return compiler_class
+
+
+template_cache = CompiledTemplateCache()
+
+
+def _compile_futurized(template_text, compiler_class):
+    module_code = Template.compile(source=template_text, compilerClass=compiler_class, returnAClass=False).decode('utf-8')
+    module_code = futurize_preprocessor(module_code)
+    return Template.compile(source=template_text, compilerClass=create_compiler_class(module_code), cacheCompilationResults=False, useCache=False)
+
+
 def create_compiler_class(module_code):
 
     class CustomCompilerClass(FixedModuleCodeCompiler):
@@ -56,25 +143,25 @@ def fill_template(template_text,
         context = kwargs
     if isinstance(python_template_version, str):
         python_template_version = packaging.version.parse(python_template_version)
-    try:
-        klass = Template.compile(source=template_text, compilerClass=compiler_class)
-    except ParseError as e:
-        # Might happen on invalid syntax within a cheetah statement, like `#if $smxsize <> 128.0`
-        if first_exception is None:
-            first_exception = e
-        if python_template_version.release[0] < 3 and retry > 0:
-            module_code = Template.compile(source=template_text, compilerClass=compiler_class, returnAClass=False).decode('utf-8')
-            module_code = futurize_preprocessor(module_code)
-            compiler_class = create_compiler_class(module_code)
-            return fill_template(
-                template_text=template_text,
-                context=context,
-                retry=retry - 1,
-                compiler_class=compiler_class,
-                first_exception=first_exception,
-                python_template_version=python_template_version,
-            )
-        raise first_exception or e
+    klass = None
+    if python_template_version.release[0] < 3:
+        # Templates that could only be compiled from futurized module code
+        klass = template_cache.get_cached_class(template_text, compiler_class, variant=PARSE_ERROR_FALLBACK)
+    if klass is None:
+        try:
+            klass = template_cache.get_class(template_text, compiler_class)
+        except ParseError as e:
+            # Might happen on invalid syntax within a cheetah statement, like `#if $smxsize <> 128.0`
+            if first_exception is None:
+                first_exception = e
+            if python_template_version.release[0] >= 3 or retry <= 0:
+                raise first_exception
+            try:
+                klass = template_cache.get_class(template_text, compiler_class, variant=PARSE_ERROR_FALLBACK,
+                                                 compile=lambda: _compile_futurized(template_text, compiler_class))
+            except ParseError:
+                raise first_exception
+            retry -= 1
     t = klass(searchList=[context])
     try:
         return unicodify(t, log_exception=False)
@@ -126,6 +213,7 @@ def fill_template(template_text,
         raise first_exception or e
 
 
+@lru_cache(maxsize=100)
 def futurize_preprocessor(source):
     source = str(refactoring_tool.refactor_string(source, name='auto_translate_cheetah'))
     # libfuturize.fixes.fix_unicode_keep_u' breaks from Cheetah.compat import unicode
@@ -14,6 +14,7 @@ from sqlalchemy.orm import object_session
 
 from galaxy.exceptions import HandlerAssignmentError
 from galaxy.util import (
+    asbool,
     ExecutionTimer,
     listify
 )
@@ -89,6 +90,12 @@ class ConfiguresHandlers:
             ready_window_size_str = config_element.attrib.get("ready_window_size", None)
             if ready_window_size_str:
                 handling_config_dict["ready_window_size"] = int(ready_window_size_str)
+            dependency_tracking_str = config_element.attrib.get("dependency_tracking", None)
+            if dependency_tracking_str:
+                handling_config_dict["dependency_tracking"] = asbool(dependency_tracking_str)
+            reconcile_interval_str = config_element.attrib.get("dependency_tracking_reconcile_interval", None)
+            if reconcile_interval_str:
+                handling_config_dict["dependency_tracking_reconcile_interval"] = int(reconcile_interval_str)
 
         return handling_config_dict
 
@@ -107,6 +107,12 @@ class BaseController:
         """
         return trans.security.encode_all_ids(rval, recursive=recursive)
 
+    def encode_all_ids_many(self, trans, rvals, recursive=False):
+        """
+        Encodes all ids (see `encode_all_ids`) in the list of dicts rvals at once.
+        """
+        return trans.security.encode_all_ids_many(rvals, recursive=recursive)
+
     # TODO this will be replaced by lib.galaxy.managers.base.ModelFilterParser.build_filter_params
     def parse_filter_params(self, qdict, filter_attr_key='q', filter_value_key='qv', attr_op_split_char='-'):
         """
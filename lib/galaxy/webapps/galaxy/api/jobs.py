@@ -203,10 +203,10 @@ class JobController(BaseGalaxyAPIController, UsesVisualizationMixin):
         query = query.offset(offset)
         query = query.limit(limit)
 
+        jobs = query.all()
+        job_dicts = self.encode_all_ids_many(trans, [job.to_dict(view, system_details=is_admin) for job in jobs], True)
         out = []
-        for job in query.all():
-            job_dict = job.to_dict(view, system_details=is_admin)
-            j = self.encode_all_ids(trans, job_dict, True)
+        for job, j in zip(jobs, job_dicts):
             if view == 'admin_job_list':
                 j['decoded_job_id'] = job.id
             if user_details:
@@ -504,7 +504,7 @@ class JobController(BaseGalaxyAPIController, UsesVisualizationMixin):
                                                 job_state=payload.get('state'))
             if job:
                 jobs.append(job)
-        return [self.encode_all_ids(trans, single_job.to_dict('element'), True) for single_job in jobs]
+        return self.encode_all_ids_many(trans, [single_job.to_dict('element') for single_job in jobs], True)
 
     @expose_api_anonymous
     def error(self, trans: ProvidesUserContext, id, payload, **kwd):
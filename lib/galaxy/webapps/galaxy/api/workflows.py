@@ -853,7 +853,7 @@ class WorkflowsAPIController(BaseGalaxyAPIController, UsesStoredWorkflowMixin, U
             invocations.append(workflow_invocation)
 
         trans.sa_session.flush()
-        invocations = [self.encode_all_ids(trans, invocation.to_dict(), recursive=True) for invocation in invocations]
+        invocations = self.encode_all_ids_many(trans, [invocation.to_dict() for invocation in invocations], recursive=True)
 
         if is_batch:
             return invocations
@@ -1327,7 +1327,7 @@ class WorkflowsAPIController(BaseGalaxyAPIController, UsesStoredWorkflowMixin, U
         for (job_source_type, job_source_id, _) in invocation_job_source_iter(trans.sa_session, decoded_invocation_id):
             ids.append(job_source_id)
             types.append(job_source_type)
-        return [self.encode_all_ids(trans, s) for s in fetch_job_states(trans.sa_session, ids, types)]
+        return self.encode_all_ids_many(trans, fetch_job_states(trans.sa_session, ids, types))
 
     @expose_api_anonymous_and_sessionless
     def invocation_jobs_summary(self, trans: GalaxyWebTransaction, invocation_id, **kwd):
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Time the creation of list collections from element identifiers (as done by
+the API) by DatasetCollectionManager.create, and compare it with loading and
+checking the access of the elements one by one as it used to be done.
+
+Runs against an in-memory SQLite database by default.
+
+ % python scripts/benchmark_collection_creation.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'lib')))
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'test')))
+
+from sqlalchemy import event
+from unit.unittest_utils import galaxy_mock
+
+from galaxy import model
+from galaxy.managers.collections import DatasetCollectionManager
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='numbers of elements of the created lists')
+parser.add_argument('--database-connection', default='sqlite:///:memory:', help='database to create the collections in')
+parser.add_argument('--private', type=float, default=0.5, help='fraction of the datasets with access restricted to their owner')
+parser.add_argument('--no-legacy', action='store_true', help='do not time the element by element creation')
+
+
+class StatementCounter:
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def create_hdas(trans, history, size, private):
+    session = trans.sa_session
+    private_role = trans.app.security_agent.get_private_user_role(trans.user, auto_create=True)
+    access = trans.app.security_agent.permitted_actions.DATASET_ACCESS.action
+    hdas = []
+    for i in range(size):
+        dataset = model.Dataset(state=model.Dataset.states.OK)
+        if i < size * private:
+            session.add(model.DatasetPermissions(access, dataset, private_role))
+        hdas.append(model.HistoryDatasetAssociation(name=f'element{i}', history=history, dataset=dataset,
+                                                    hid=i + 1, sa_session=session))
+    session.add_all(hdas)
+    session.flush()
+    return hdas
+
+
+def legacy_create(trans, manager, history, element_identifiers):
+    """Load and check the access of each element, then let the ORM insert them."""
+    elements = {}
+    for element_identifier in element_identifiers:
+        decoded_id = int(trans.app.security.decode_id(element_identifier['id']))
+        elements[element_identifier['name']] = manager.hda_manager.get_accessible(decoded_id, trans.user)
+    return manager.create(trans, history, 'legacy', 'list', elements=elements)
+
+
+def timed(trans, counter, function):
+    trans.sa_session.expunge_all()
+    statements = counter.count
+    start = time.time()
+    hdca = function()
+    elapsed = time.time() - start
+    return elapsed, counter.count - statements, hdca.collection.element_count
+
+
+def main():
+    args = parser.parse_args()
+    trans = galaxy_mock.MockTrans(database_connection=args.database_connection)
+    trans.app.config.is_admin_user = lambda user: False
+    counter = StatementCounter(trans.app.model.engine)
+    manager = trans.app[DatasetCollectionManager]
+
+    print('%10s %-8s %10s %12s' % ('Elements', 'Path', 'Time (s)', 'Statements'))
+    for size in args.sizes:
+        user = model.User(email=f'user{size}@example.org', password='password')
+        trans.sa_session.add(user)
+        trans.set_user(user)
+        history = model.History(name=f'benchmark {size}', user=user)
+        trans.sa_session.add(history)
+        trans.set_history(history)
+        hdas = create_hdas(trans, history, size, args.private)
+        element_identifiers = [dict(src='hda', name=hda.name, id=trans.security.encode_id(hda.id)) for hda in hdas]
+        user_id, history_id = user.id, history.id
+
+        def reload():
+            trans.set_user(trans.sa_session.query(model.User).get(user_id))
+            trans.set_history(trans.sa_session.query(model.History).get(history_id))
+            return trans.history
+
+        runs = [('bulk', lambda: manager.create(trans, reload(), 'bulk', 'list', element_identifiers=element_identifiers))]
+        if not args.no_legacy:
+            runs.append(('legacy', lambda: legacy_create(trans, manager, reload(), element_identifiers)))
+        for name, function in runs:
+            elapsed, statements, element_count = timed(trans, counter, function)
+            assert element_count == size, element_count
+            print('%10i %-8s %10.3f %12i' % (size, name, elapsed, statements))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+Compare the time taken to set the metadata of generated tabular, FASTA and
+FASTQ files by the block based scanners of the Tabular, Sequence and FASTQ
+datatypes with the line by line implementations they replaced.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'lib')))
+
+from galaxy.datatypes.data import Text
+from galaxy.datatypes.sequence import Fasta, FastqSanger
+from galaxy.datatypes.tabular import Tabular
+from galaxy.util import compression_utils
+from galaxy.util.bunch import Bunch
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--size', type=int, default=100, help='size of the generated files in megabytes')
+parser.add_argument('--repeat', type=int, default=3, help='number of times each implementation is timed (best time is reported)')
+parser.add_argument('--seed', type=int, default=1)
+
+
+def legacy_count_data_lines(path):
+    data_lines = 0
+    with compression_utils.get_fileobj(path) as in_file:
+        while True:
+            line = in_file.readline(2 ** 15)
+            if not line:
+                break
+            line = line.strip()
+            if line and not line.startswith('#'):
+                data_lines += 1
+    return data_lines
+
+
+def legacy_scan_fasta(path):
+    data_lines = sequences = 0
+    with compression_utils.get_fileobj(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if line and line.startswith('#'):
+                continue
+            if line and line.startswith('>'):
+                sequences += 1
+            data_lines += 1
+    return data_lines, sequences
+
+
+def legacy_scan_fastq(path):
+    data_lines = sequences = seq_counter = 0
+    with compression_utils.get_fileobj(path) as in_file:
+        for line in in_file:
+            line = line.strip()
+            if line and line.startswith('#') and not data_lines:
+                continue
+            seq_counter += 1
+            data_lines += 1
+            if line and line.startswith('@') and seq_counter >= 4:
+                sequences += 1
+                seq_counter = 1
+        if seq_counter >= 4:
+            sequences += 1
+    return data_lines, sequences
+
+
+def legacy_tabular_column_types(path, max_data_lines=100000):
+    """The per cell type guessing of Tabular.set_meta (without its first line special case)."""
+    order = ['int', 'float', 'list', 'str']
+
+    def guess(text):
+        if '_' not in text:
+            try:
+                int(text)
+                return 0
+            except ValueError:
+                try:
+                    float(text)
+                    return 1
+                except ValueError:
+                    if text.strip().lower() == 'na':
+                        return 1
+        if ',' in text:
+            return 2
+        return 3 if text else -1
+
+    ranks = []
+    data_lines = 0
+    with compression_utils.get_fileobj(path) as fh:
+        for line in fh:
+            line = line.rstrip('\r\n')
+            if not line or line.startswith('#'):
+                continue
+            data_lines += 1
+            for i, field in enumerate(line.split('\t')):
+                if i >= len(ranks):
+                    ranks.append(-1)
+                ranks[i] = max(ranks[i], guess(field))
+            if data_lines >= max_data_lines:
+                break
+    return [order[rank] if rank >= 0 else None for rank in ranks]
+
+
+def _write(path, size, line):
+    with open(path, 'w') as fh:
+        written = 0
+        while written < size:
+            text = line()
+            fh.write(text)
+            written += len(text)
+
+
+def generate(directory, size, rng):
+    bases = 'ACGT'
+    files = {}
+    files['tabular'] = os.path.join(directory, 'test.tabular')
+    _write(files['tabular'], size, lambda: 'chr%i\t%i\t%.3f\t%s\n' % (rng.randint(1, 22), rng.randint(0, 10 ** 8), rng.random(), rng.choice(['+', '-'])))
+    files['fasta'] = os.path.join(directory, 'test.fasta')
+    _write(files['fasta'], size, lambda: '>seq%i\n%s\n' % (rng.randint(0, 10 ** 6), ''.join(rng.choice(bases) for _ in range(80))))
+    files['fastq'] = os.path.join(directory, 'test.fastq')
+    _write(files['fastq'], size, lambda: '@read%i\n%s\n+\n%s\n' % (rng.randint(0, 10 ** 6), 'ACGT' * 25, 'F' * 100))
+    return files
+
+
+def dataset_for(path):
+    return Bunch(file_name=path, metadata=Bunch(), has_data=lambda: True, get_size=lambda: os.path.getsize(path))
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        result = function()
+        times.append(time.time() - start)
+    return min(times), result
+
+
+def main():
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp()
+    try:
+        files = generate(directory, args.size * 1024 * 1024, rng)
+        fastq = FastqSanger()
+        fastq.max_optional_metadata_filesize = -1
+
+        tabular = Tabular()
+        # Only compare the column type guessing
+        tabular.line_index_min_size = float('inf')
+
+        def new_tabular():
+            dataset = dataset_for(files['tabular'])
+            tabular.set_meta(dataset)
+            return dataset.metadata.column_types
+
+        def new_sequences(datatype, path):
+            dataset = dataset_for(path)
+            datatype.set_meta(dataset)
+            return dataset.metadata.data_lines, dataset.metadata.sequences
+
+        benchmarks = [
+            ('Text.count_data_lines', lambda: legacy_count_data_lines(files['tabular']),
+             lambda: Text().count_data_lines(dataset_for(files['tabular']))),
+            ('Tabular.set_meta', lambda: legacy_tabular_column_types(files['tabular']), new_tabular),
+            ('Sequence.set_meta (FASTA)', lambda: legacy_scan_fasta(files['fasta']),
+             lambda: new_sequences(Fasta(), files['fasta'])),
+            ('BaseFastq.set_meta', lambda: legacy_scan_fastq(files['fastq']),
+             lambda: new_sequences(fastq, files['fastq'])),
+        ]
+        print('%-28s %10s %10s %8s' % ('', 'Legacy (s)', 'Block (s)', 'Speedup'))
+        for name, legacy, new in benchmarks:
+            legacy_time, legacy_result = best_time(legacy, args.repeat)
+            new_time, new_result = best_time(new, args.repeat)
+            assert legacy_result == new_result, f'{name}: {legacy_result} != {new_result}'
+            print('%-28s %10.3f %10.3f %7.1fx' % (name, legacy_time, new_time, legacy_time / new_time))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
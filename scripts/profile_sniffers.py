@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Sniff the datatype of files and report the sniffers that take the most time,
+and those reading more than a byte budget of the files (e.g. sniffers
+re-opening files and reading them further than the sniffed prefix).
+
+ % python scripts/profile_sniffers.py test-data/ --top 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'lib')))
+
+import galaxy.datatypes.registry
+from galaxy.datatypes import sniff
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+DATATYPES_CONFIG = os.path.join(PROJECT_DIR, "lib", "galaxy", "config", "sample", "datatypes_conf.xml.sample")
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('paths', nargs='+', help='files or directories (searched recursively) to sniff')
+parser.add_argument('--datatypes-config', default=DATATYPES_CONFIG, help='datatypes configuration file')
+parser.add_argument('--byte-budget', type=int, default=sniff.SNIFF_PREFIX_BYTES, help='bytes a sniffer may read per file')
+parser.add_argument('--top', type=int, default=20, help='number of sniffers to report (0 for all)')
+
+
+def iter_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main():
+    args = parser.parse_args()
+    datatypes_registry = galaxy.datatypes.registry.Registry()
+    datatypes_registry.load_datatypes(root_dir=PROJECT_DIR, config=args.datatypes_config)
+    sniff_order = datatypes_registry.sniff_order
+
+    files = 0
+    start = time.time()
+    with sniff.profile_sniffers(byte_budget=args.byte_budget) as profile:
+        for path in iter_files(args.paths):
+            sniff.guess_ext(path, sniff_order)
+            files += 1
+    elapsed = time.time() - start
+
+    print(f'Sniffed {files} files in {elapsed:.2f}s with {len(sniff_order)} sniffers')
+    print('%-30s %8s %8s %10s %12s %12s' % ('Datatype', 'Calls', 'Matches', 'Time (s)', 'Read (MB)', 'Over budget'))
+    for ext, stats in profile.slowest(args.top or len(profile.stats)):
+        print('%-30s %8i %8i %10.3f %12.1f %12i' % (
+            ext, stats['calls'], stats['matches'], stats['seconds'], stats['bytes_read'] / 1024 / 1024, stats['over_budget']))
+    if not profile.measure_bytes:
+        print('The bytes read by sniffers could not be measured on this system')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Move datasets that have not been updated recently out of the backends of a
+distributed object store that are fuller than the others.
+
+Datasets are deleted from their previous backend by a later run of this
+script, after a grace period (running jobs and Galaxy processes may still use
+their previous location). The moves not purged yet are recorded in the
+--pending-purges file.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+
+from sqlalchemy import false, null, select, union
+
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'lib')))
+
+import galaxy.config
+from galaxy.objectstore import build_object_store_from_config, DistributedObjectStore
+from galaxy.objectstore.placement import Rebalancer
+from galaxy.util.script import app_properties_from_args, populate_config_args
+
+parser = argparse.ArgumentParser(description=__doc__)
+populate_config_args(parser)
+parser.add_argument('--min-age', type=int, default=30, help='only move datasets not updated for this many days')
+parser.add_argument('--tolerance', type=float, default=5.0, help='move datasets out of backends fuller than the average by more than this many percent')
+parser.add_argument('--max-mb-per-second', type=float, default=50.0, help='copy at most this many megabytes per second (0 for no limit)')
+parser.add_argument('--limit', type=int, default=None, help='move at most this many datasets')
+parser.add_argument('--grace-period', type=float, default=24.0, help='delete moved datasets from their previous backend this many hours after moving them')
+parser.add_argument('--pending-purges', default=None, help='file recording the moved datasets not yet deleted from their previous backend (default: rebalance_object_store_pending.json in the data directory)')
+parser.add_argument('--debug', action='store_true', help='log each dataset moved')
+args = parser.parse_args()
+
+
+def init():
+    app_properties = app_properties_from_args(args)
+    config = galaxy.config.Configuration(**app_properties)
+
+    object_store = build_object_store_from_config(config)
+    model = galaxy.config.init_models_from_config(config, object_store=object_store)
+    return config, model, object_store
+
+
+def active_job_input_dataset_ids(model):
+    """Select the ids of the datasets used as inputs by unfinished jobs."""
+    job = model.Job.table
+    selects = []
+    for association, instance_id, instance in ((model.JobToInputDatasetAssociation, 'dataset_id', model.HistoryDatasetAssociation),
+                                               (model.JobToInputLibraryDatasetAssociation, 'ldda_id', model.LibraryDatasetDatasetAssociation)):
+        selects.append(select([instance.table.c.dataset_id]).select_from(
+            association.table.join(job, association.table.c.job_id == job.c.id).join(instance.table, association.table.c[instance_id] == instance.table.c.id)
+        ).where(job.c.state.notin_(model.Job.terminal_states)))
+    return union(*selects)
+
+
+def load_pending_purges(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [tuple(move) for move in json.load(f)]
+
+
+def save_pending_purges(path, moves):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(moves, f)
+    os.rename(path + '.tmp', path)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    print('Loading Galaxy model...')
+    config, model, object_store = init()
+    if not isinstance(object_store, DistributedObjectStore):
+        print('Datasets can only be moved between the backends of a distributed object store.')
+        sys.exit(1)
+    sa_session = model.context.current
+    pending_purges_path = args.pending_purges or os.path.join(config.data_dir, 'rebalance_object_store_pending.json')
+    active_inputs = active_job_input_dataset_ids(model)
+
+    rebalancer = Rebalancer(object_store, commit=sa_session.flush,
+                            max_bytes_per_second=args.max_mb_per_second * 1024 * 1024, tolerance=args.tolerance)
+    moves = load_pending_purges(pending_purges_path)
+    if moves:
+        moved_ids = [object_id for object_id, _, _ in moves]
+        objects = {dataset.id: dataset for dataset in sa_session.query(model.Dataset).filter(model.Dataset.table.c.id.in_(moved_ids))}
+        busy = {row[0] for row in sa_session.execute(active_inputs)}
+        moves = rebalancer.purge_moved(moves, objects, args.grace_period * 3600, busy=busy)
+        save_pending_purges(pending_purges_path, moves)
+        print('Deleted %i moved datasets from their previous backend, %i pending' % (rebalancer.purged, len(moves)))
+
+    overfull = rebalancer.overfull_backends()
+    if not overfull:
+        print('No backend is fuller than the others by more than %.1f%%, nothing to do.' % args.tolerance)
+        sys.exit(0)
+    print('Moving datasets out of backends %s...' % ', '.join(sorted(overfull)))
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=args.min_age)
+    candidates = sa_session.query(model.Dataset).filter(
+        model.Dataset.table.c.purged == false(),
+        model.Dataset.table.c.state == model.Dataset.states.OK,
+        model.Dataset.table.c.object_store_id.in_(list(overfull)),
+        model.Dataset.table.c.update_time < cutoff,
+        # Files of these are not (only) stored where the object store expects them
+        model.Dataset.table.c.external_filename == null(),
+        model.Dataset.table.c._extra_files_path == null(),
+        # Unfinished jobs use the current location of their inputs
+        model.Dataset.table.c.id.notin_(active_inputs),
+    ).order_by(model.Dataset.table.c.update_time).limit(args.limit).enable_eagerloads(False)
+    try:
+        moved = rebalancer.run(candidates.yield_per(100))
+    finally:
+        save_pending_purges(pending_purges_path, moves + rebalancer.moves)
+    print('Moved %i datasets (%.1f MB), they will be deleted from their previous backend after %.1f hours' % (
+        moved, rebalancer.bytes_moved / 1024 / 1024, args.grace_period))
+    object_store.shutdown()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Report how much storage is saved by storing datasets with identical contents
+only once, per user and overall.
+
+Datasets are considered identical if they have the same SHA-256 hash (as
+recorded by the dedup object store), datasets without one are counted as
+unique. The ratio is the size of the datasets of a user divided by the size
+of their distinct contents.
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+from sqlalchemy import and_, false, null
+
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'lib')))
+
+import galaxy.config
+from galaxy.objectstore import build_object_store_from_config
+from galaxy.objectstore.dedup import DEDUP_HASH_FUNCTION, DedupDiskObjectStore
+from galaxy.util.script import app_properties_from_args, populate_config_args
+
+parser = argparse.ArgumentParser(description=__doc__)
+populate_config_args(parser)
+parser.add_argument('--top', type=int, default=20, help='number of users to report, by bytes saved (0 for all)')
+args = parser.parse_args()
+
+
+def init():
+    app_properties = app_properties_from_args(args)
+    config = galaxy.config.Configuration(**app_properties)
+
+    object_store = build_object_store_from_config(config)
+    model = galaxy.config.init_models_from_config(config, object_store=object_store)
+    return model, object_store
+
+
+class DedupRatio:
+
+    def __init__(self):
+        self.datasets = set()
+        self.hashes = set()
+        self.logical_size = 0
+        self.physical_size = 0
+
+    def add(self, dataset_id, size, hash_value):
+        if dataset_id in self.datasets:
+            return
+        self.datasets.add(dataset_id)
+        self.logical_size += size
+        if hash_value is None or hash_value not in self.hashes:
+            self.physical_size += size
+            if hash_value is not None:
+                self.hashes.add(hash_value)
+
+    @property
+    def saved(self):
+        return self.logical_size - self.physical_size
+
+    @property
+    def ratio(self):
+        return self.logical_size / self.physical_size if self.physical_size else 1.0
+
+
+def _format(label, ratio):
+    return '%-40s %10i %12.1f %12.1f %8.2f' % (label, len(ratio.datasets), ratio.logical_size / 1024 / 1024, ratio.physical_size / 1024 / 1024, ratio.ratio)
+
+
+def _dedup_stores(object_store):
+    if isinstance(object_store, DedupDiskObjectStore):
+        yield object_store
+    for backend in getattr(object_store, 'backends', {}).values():
+        yield from _dedup_stores(backend)
+
+
+if __name__ == '__main__':
+    print('Loading Galaxy model...')
+    model, object_store = init()
+    sa_session = model.context.current
+
+    dataset = model.Dataset.table
+    dataset_hash = model.DatasetHash.table
+    query = sa_session.query(
+        model.History.table.c.user_id, dataset.c.id, dataset.c.file_size, dataset_hash.c.hash_value
+    ).select_from(model.HistoryDatasetAssociation).join(
+        model.History, model.History.table.c.id == model.HistoryDatasetAssociation.table.c.history_id
+    ).join(
+        model.Dataset, dataset.c.id == model.HistoryDatasetAssociation.table.c.dataset_id
+    ).outerjoin(
+        model.DatasetHash, and_(dataset_hash.c.dataset_id == dataset.c.id,
+                                dataset_hash.c.hash_function == DEDUP_HASH_FUNCTION,
+                                dataset_hash.c.extra_files_path == null())
+    ).filter(
+        dataset.c.purged == false(),
+        model.History.table.c.user_id != null(),
+    ).distinct()
+
+    overall = DedupRatio()
+    per_user = defaultdict(DedupRatio)
+    for user_id, dataset_id, file_size, hash_value in query.yield_per(1000):
+        overall.add(dataset_id, file_size or 0, hash_value)
+        per_user[user_id].add(dataset_id, file_size or 0, hash_value)
+
+    users = sorted(per_user.items(), key=lambda item: item[1].saved, reverse=True)
+    if args.top:
+        users = users[:args.top]
+    emails = dict(sa_session.query(model.User.table.c.id, model.User.table.c.email).filter(
+        model.User.table.c.id.in_([user_id for user_id, _ in users])))
+    print('%-40s %10s %12s %12s %8s' % ('User', 'Datasets', 'Size (MB)', 'Unique (MB)', 'Ratio'))
+    for user_id, ratio in users:
+        print(_format(emails.get(user_id, str(user_id)), ratio))
+    print(_format('All users', overall))
+
+    for store in _dedup_stores(object_store):
+        stats = store.get_dedup_stats()
+        print('Object store in %s: %i blobs linked %i times, %.1f MB stored as %.1f MB (ratio %.2f)' % (
+            store.file_path, stats['blobs'], stats['references'],
+            stats['logical_size'] / 1024 / 1024, stats['physical_size'] / 1024 / 1024, stats['ratio']))
+    object_store.shutdown()
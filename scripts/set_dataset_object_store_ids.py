@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Find the backend of datasets without a (valid) object_store_id in a
+distributed object store and record it, so that accessing them no longer
+requires probing every backend.
+"""
+
+import argparse
+import os
+import sys
+
+from sqlalchemy import false, null, or_
+
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'lib')))
+
+import galaxy.config
+from galaxy.objectstore import build_object_store_from_config, DistributedObjectStore
+from galaxy.util.script import app_properties_from_args, populate_config_args
+
+parser = argparse.ArgumentParser(description=__doc__)
+populate_config_args(parser)
+parser.add_argument('--batch-size', type=int, default=1000, help='number of datasets to relocate between database flushes')
+args = parser.parse_args()
+
+
+def init():
+    app_properties = app_properties_from_args(args)
+    config = galaxy.config.Configuration(**app_properties)
+
+    object_store = build_object_store_from_config(config)
+    model = galaxy.config.init_models_from_config(config, object_store=object_store)
+    return model, object_store
+
+
+if __name__ == '__main__':
+    print('Loading Galaxy model...')
+    model, object_store = init()
+    if not isinstance(object_store, DistributedObjectStore):
+        print('Only datasets in a distributed object store have an object_store_id, nothing to do.')
+        sys.exit(1)
+    sa_session = model.context.current
+
+    query = sa_session.query(model.Dataset).filter(
+        model.Dataset.table.c.purged == false(),
+        or_(model.Dataset.table.c.object_store_id == null(),
+            model.Dataset.table.c.object_store_id.notin_(list(object_store.backends.keys())))
+    ).enable_eagerloads(False)
+    dataset_count = query.count()
+    print('Processing %i datasets...' % dataset_count)
+    relocated = 0
+    batch = []
+    for dataset in query.yield_per(args.batch_size):
+        batch.append(dataset)
+        if len(batch) == args.batch_size:
+            relocated += len(object_store.relocate(batch))
+            sa_session.flush()
+            batch = []
+            print('\rRelocated %i datasets' % relocated, end=' ')
+            sys.stdout.flush()
+    relocated += len(object_store.relocate(batch))
+    sa_session.flush()
+    print('\rRelocated %i datasets, %i were not found in any backend' % (relocated, dataset_count - relocated))
+    object_store.shutdown()
@@ -35,17 +35,29 @@ if __name__ == '__main__':
     percent = 0
     print('Completed %i%%' % percent, end=' ')
     sys.stdout.flush()
+    batch = []
+
+    def set_total_sizes(datasets):
+        # Get the sizes of all datasets of the batch from the object store at once
+        unsized = [d for d in datasets if d.file_size is None and not d.external_filename]
+        for dataset, size in zip(unsized, object_store.size_many(unsized)):
+            dataset.file_size = size
+        for dataset in datasets:
+            dataset.set_total_size()
+        sa_session.flush()
+
     for i, dataset in enumerate(sa_session.query(model.Dataset).enable_eagerloads(False).yield_per(1000)):
         if dataset.total_size is None:
-            dataset.set_total_size()
+            batch.append(dataset)
             set += 1
             if not set % 1000:
-                sa_session.flush()
+                set_total_sizes(batch)
+                batch = []
         new_percent = int(float(i) / dataset_count * 100)
         if new_percent != percent:
             percent = new_percent
             print('\rCompleted %i%%' % percent, end=' ')
             sys.stdout.flush()
-    sa_session.flush()
+    set_total_sizes(batch)
     print('\rCompleted 100%')
     object_store.shutdown()
@@ -3,6 +3,7 @@
 import argparse
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, 'lib')))
 
@@ -17,6 +18,8 @@ parser = argparse.ArgumentParser()
 parser.add_argument('-u', '--username', dest='username', help='Username of user to update', default='all')
 parser.add_argument('-e', '--email', dest='email', help='Email address of user to update', default='all')
 parser.add_argument('--dry-run', dest='dryrun', help='Dry run (show changes but do not save to database)', action='store_true', default=False)
+parser.add_argument('--chunk-size', dest='chunk_size', type=int, help='Number of users to recalculate per query when processing all users', default=1000)
+parser.add_argument('--workers', dest='workers', type=int, help='Number of chunks of users to recalculate in parallel when processing all users', default=1)
 populate_config_args(parser)
 args = parser.parse_args()
 
@@ -35,6 +38,17 @@ def init():
     return galaxy.config.init_models_from_config(config, object_store=object_store), object_store, engine
 
 
+def print_change(current, new):
+    print('old usage:', nice_size(current), 'change:', end=' ')
+    if new in (current, None):
+        print('none')
+    else:
+        if new > current:
+            print('+%s' % (nice_size(new - current)))
+        else:
+            print('-%s' % (nice_size(current - new)))
+
+
 def quotacheck(sa_session, users, engine):
     sa_session.refresh(user)
     current = user.get_disk_usage()
@@ -48,14 +62,35 @@ def quotacheck(sa_session, users, engine):
     else:
         new = user.calculate_disk_usage()
 
-    print('old usage:', nice_size(current), 'change:', end=' ')
-    if new in (current, None):
-        print('none')
-    else:
-        if new > current:
-            print('+%s' % (nice_size(new - current)))
-        else:
-            print('-%s' % (nice_size(current - new)))
+    print_change(current, new)
+
+
+def quotacheck_all(model):
+    """Recalculate the disk usage of all users in chunks, only reporting users whose usage drifted."""
+    user_ids = [row[0] for row in model.context.query(model.User.id).order_by(model.User.id)]
+    print('Processing %i users...' % len(user_ids))
+    chunks = [user_ids[i:i + args.chunk_size] for i in range(0, len(user_ids), args.chunk_size)]
+
+    def reconcile(chunk):
+        # model.context is a scoped session, each worker thread gets its own session
+        try:
+            return model.User.reconcile_disk_usage(model.context, chunk, dryrun=args.dryrun)
+        finally:
+            model.context.remove()
+
+    drifted = 0
+    processed = 0
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        for chunk, drift in zip(chunks, executor.map(reconcile, chunks)):
+            processed += len(chunk)
+            drifted += len(drift)
+            users = model.context.query(model.User).filter(model.User.id.in_(list(drift))) if drift else []
+            for user in users:
+                current, new = drift[user.id]
+                print(user.username, '<' + user.email + '>:', end=' ')
+                print_change(current, new)
+            print('%3i%%' % int(float(processed) / len(user_ids) * 100))
+    print('Disk usage of %i users drifted' % drifted)
 
 
 if __name__ == '__main__':
@@ -64,11 +99,7 @@ if __name__ == '__main__':
     sa_session = model.context.current
 
     if not args.username and not args.email:
-        user_count = sa_session.query(model.User).count()
-        print('Processing %i users...' % user_count)
-        for i, user in enumerate(sa_session.query(model.User).enable_eagerloads(False).yield_per(1000)):
-            print('%3i%%' % int(float(i) / user_count * 100), end=' ')
-            quotacheck(sa_session, user, engine)
+        quotacheck_all(model)
         print('100% complete')
         object_store.shutdown()
         sys.exit(0)
@@ -220,9 +220,13 @@ def test_hdca_failed_expansion():
 @contextmanager
 def _execute_context():
     job_directory = mkdtemp()
+    # Uploads are copied into the current (job working) directory
+    cwd = os.getcwd()
+    os.chdir(job_directory)
     try:
         yield ExecuteContext(job_directory)
     finally:
+        os.chdir(cwd)
         rmtree(job_directory)
 
 
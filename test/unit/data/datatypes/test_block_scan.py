@@ -0,0 +1,84 @@
+import gzip
+import os
+
+from galaxy.datatypes.sequence import Fasta, FastqSanger
+from galaxy.datatypes.tabular import Tabular
+from galaxy.datatypes.util import block_scan
+from galaxy.util.bunch import Bunch
+from .util import get_tmp_path
+
+
+def _dataset(path):
+    return Bunch(file_name=path, metadata=Bunch(), has_data=lambda: True, get_size=lambda: os.path.getsize(path))
+
+
+def _write(path, contents, compress=False):
+    with open(path, 'wb') as fh:
+        fh.write(gzip.compress(contents) if compress else contents)
+
+
+def test_iter_line_blocks_splits_on_newlines():
+    with get_tmp_path() as path:
+        _write(path, b'line 1\r\nline 2\rline 3\n' * 10)
+        blocks = list(block_scan.iter_line_blocks(path, block_size=16))
+        assert all(block.endswith(b'\n') for block in blocks)
+        assert b''.join(blocks) == b'line 1\nline 2\nline 3\n' * 10
+
+
+def test_count_data_lines():
+    for compress in (False, True):
+        with get_tmp_path() as path:
+            _write(path, b'#comment\n\ndata\n  \n  #indented comment\n\tdata\nlast', compress=compress)
+            assert block_scan.count_data_lines(path) == 3
+
+
+def test_fasta_set_meta():
+    with get_tmp_path() as path:
+        _write(path, b'# comment\n>seq1\nACGT\nACGT\n\n>seq2\nAC\n')
+        dataset = _dataset(path)
+        Fasta().set_meta(dataset)
+        assert dataset.metadata.sequences == 2
+        assert dataset.metadata.data_lines == 6
+
+
+def test_fastq_set_meta():
+    fastq = FastqSanger()
+    fastq.max_optional_metadata_filesize = -1
+    with get_tmp_path() as path:
+        # Quality lines may start with @
+        _write(path, b'#comment\n' + b'@read\nACGT\n+\n@@@@\n' * 3 + b'@read\nACGT\n+\nFFFF')
+        dataset = _dataset(path)
+        fastq.set_meta(dataset)
+        assert dataset.metadata.sequences == 4
+        assert dataset.metadata.data_lines == 16
+
+
+def test_tabular_set_meta():
+    with get_tmp_path() as path:
+        _write(path, b'chrom\tstart\tscore\tnames\n#comment\nchr1\t10\t1.5\ta,b\nchr2\t20\tNA\t\n\nchr3\t30\t2\tc\n')
+        dataset = _dataset(path)
+        Tabular().set_meta(dataset)
+        assert dataset.metadata.column_types == ['str', 'int', 'float', 'str']
+        assert dataset.metadata.data_lines == 4
+        assert dataset.metadata.comment_lines == 2
+        dataset = _dataset(path)
+        Tabular().set_meta(dataset, max_data_lines=2)
+        assert dataset.metadata.data_lines is None
+        assert dataset.metadata.column_types == ['str', 'int', 'float', 'list']
+
+
+def test_column_type_guesser():
+    guesser = block_scan.ColumnTypeGuesser()
+    guesser.update(['1\t2.5\t-3', '+4\t1e3\t٣'])
+    assert guesser.column_types == ['int', 'float', 'int']
+    guesser.update(['1_0\tinf\t', 'x'])
+    assert guesser.column_types == ['str', 'float', 'int']
+
+
+def test_chunked_scanning():
+    with get_tmp_path() as path:
+        _write(path, b'#comment\r\n' + b'@read\r\nACGT\r\n+\r\n@@@@\r\n' * 20 + b'>seq\n\n')
+        expected = block_scan.count_data_lines(path), block_scan.scan_fasta(path), block_scan.scan_fastq(path)
+        for chunk_size in (1, 7, 30):
+            with block_scan.chunked_scanning(map, chunk_size):
+                assert (block_scan.count_data_lines(path), block_scan.scan_fasta(path), block_scan.scan_fastq(path)) == expected
@@ -0,0 +1,75 @@
+import bz2
+import gzip
+import json
+
+import pytest
+
+from galaxy.datatypes.tabular import Tabular
+from galaxy.datatypes.util import line_index
+from galaxy.exceptions import RequestParameterInvalidException
+from galaxy.util.bunch import Bunch
+from .util import (
+    get_dataset,
+    get_tmp_path,
+)
+
+LINES = [b'line %i\t%s\n' % (i, b'x' * (i % 7)) for i in range(1000)]
+
+
+def _compressed(compression, contents, members=1):
+    compress = {'gzip': gzip.compress, 'bz2': bz2.compress}[compression]
+    size = len(contents) // members + 1
+    return b''.join(compress(contents[i:i + size]) for i in range(0, len(contents), size))
+
+
+def _check_index(path, contents, lines_per_entry=7):
+    index = line_index.LineIndex.build(path, lines_per_entry=lines_per_entry)
+    with get_tmp_path() as index_path:
+        index.write(index_path)
+        index = line_index.LineIndex.read(index_path)
+    lines = contents.splitlines(True)
+    assert index.total_lines == len(lines)
+    for start, end in ((0, 3), (6, 8), (7, 7), (500, 523), (990, 2000), (1000, None)):
+        assert line_index.read_lines(path, start, end, index=index) == lines[start:end]
+        assert line_index.read_lines(path, start, end) == lines[start:end]
+    assert line_index.read_lines(path, 10, None, index=index, max_bytes=20) == lines[10:12]
+
+
+def test_line_index():
+    contents = b''.join(LINES)
+    for contents in (contents, contents.rstrip(b'\n')):
+        with get_tmp_path() as path:
+            with open(path, 'wb') as fh:
+                fh.write(contents)
+            _check_index(path, contents)
+
+
+def test_line_index_compressed(monkeypatch):
+    monkeypatch.setattr(line_index, 'MIN_BLOCK_DISTANCE', 100)
+    contents = b''.join(LINES)
+    for compression in ('gzip', 'bz2'):
+        for members in (1, 50):
+            with get_tmp_path() as path:
+                with open(path, 'wb') as fh:
+                    fh.write(_compressed(compression, contents, members=members))
+                index = line_index.LineIndex.build(path)
+                assert index.compression == compression
+                assert len(index.block_offsets) == members
+                _check_index(path, contents)
+
+
+def test_tabular_get_rows():
+    tabular = Tabular()
+    tabular.line_index_min_size = 0
+    with get_dataset('2.tabular', index_attr='line_index') as dataset:
+        tabular.set_line_index(dataset)
+        with open(dataset.file_name, 'rb') as fh:
+            lines = fh.readlines()
+        assert line_index.LineIndex.read(dataset.metadata.line_index.file_name).total_lines == len(lines)
+        trans = Bunch(app=Bunch(config=Bunch(display_chunk_size=1024 ** 2)))
+        rows = json.loads(tabular.display_data(trans, dataset, row_start='1', row_end='3'))
+        assert rows['ck_data'] == b''.join(lines[1:3]).decode()
+        assert (rows['row_start'], rows['row_end'], rows['total_rows']) == (1, 3, len(lines))
+        for row_start, row_end in (('a', '3'), ('-1', '3'), ('1', 'b'), ('1', '-3')):
+            with pytest.raises(RequestParameterInvalidException):
+                tabular.display_data(trans, dataset, row_start=row_start, row_end=row_end)
@@ -1,11 +1,15 @@
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
+from galaxy.datatypes import sniff
 from galaxy.datatypes.sniff import (
     convert_newlines,
     convert_newlines_sep2tabs,
     get_test_fname,
+    profile_sniffers,
+    run_sniffers_raw,
 )
 
 
@@ -76,3 +80,67 @@ def test_convert_sep2tabs(source, expected):
         assert_converts_to_1234_convert_sep2tabs(source, expected=expected)
     else:
         assert_converts_to_1234_convert_sep2tabs(source)
+
+
+class CountingSniffer:
+
+    def __init__(self, file_ext, prefix, magic_numbers=None):
+        self.file_ext = file_ext
+        self.prefix = prefix
+        self.magic_numbers = magic_numbers
+        self.calls = 0
+
+    def sniff_prefix(self, file_prefix):
+        self.calls += 1
+        return file_prefix.startswith_bytes(self.prefix)
+
+
+def _write_bytes(contents):
+    with tempfile.NamedTemporaryFile(delete=False, mode='wb') as tf:
+        tf.write(contents)
+    return tf.name
+
+
+def test_run_sniffers_raw_skips_magic_mismatches():
+    magic = CountingSniffer('magic', b'ABCD', magic_numbers=[b'ABCD', b'XY'])
+    text = CountingSniffer('text', b'ABCD')
+    sniff_order = [magic, text]
+    assert run_sniffers_raw(_write_bytes(b'text file\n'), sniff_order) is None
+    assert (magic.calls, text.calls) == (0, 1)
+    assert run_sniffers_raw(_write_bytes(b'ABCDEF'), sniff_order) == 'magic'
+    assert (magic.calls, text.calls) == (1, 1)
+
+
+def test_run_sniffers_raw_caches_results():
+    sniffer = CountingSniffer('abc', b'ABC')
+    path = _write_bytes(b'ABC')
+    assert run_sniffers_raw(path, [sniffer]) == 'abc'
+    assert run_sniffers_raw(path, [sniffer]) == 'abc'
+    assert sniffer.calls == 1
+    # Same size, possibly same modification time
+    with open(path, 'wb') as fh:
+        fh.write(b'DEF')
+    assert run_sniffers_raw(path, [sniffer]) is None
+    assert sniffer.calls == 2
+
+
+def test_profile_sniffers():
+    sniff_order = [CountingSniffer('first', b'A'), CountingSniffer('second', b'B')]
+    path = _write_bytes(b'BBB')
+    with profile_sniffers(byte_budget=0) as profile:
+        assert run_sniffers_raw(path, sniff_order) == 'second'
+        assert run_sniffers_raw(path, sniff_order) == 'second'
+    assert profile.stats['first']['calls'] == 2
+    assert profile.stats['first']['matches'] == 0
+    assert profile.stats['second']['matches'] == 2
+    assert [ext for ext, _ in profile.slowest(1)] in (['first'], ['second'])
+
+
+def test_run_sniffers_raw_threads(monkeypatch):
+    # Results are evicted from the cache while other threads look them up
+    monkeypatch.setattr(sniff, 'MAX_SNIFF_RESULTS', 2)
+    sniff_order = [CountingSniffer('magic', b'ABCD')]
+    paths = [_write_bytes(b'ABCD %i' % i) for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda path: run_sniffers_raw(path, sniff_order), paths * 50))
+    assert results == ['magic'] * len(paths) * 50
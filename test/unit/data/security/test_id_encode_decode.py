@@ -1,3 +1,6 @@
+import copy
+
+from galaxy.exceptions import MalformedId
 from galaxy.security import idencoding
 
 
@@ -129,3 +132,55 @@ def test_encode_decode_guid():
     encoded_key = test_helper_1.encode_guid(session_key)
     decoded_key = test_helper_1.decode_guid(encoded_key)
     assert session_key == decoded_key, f"{session_key} != {decoded_key}"
+
+
+def test_encode_decode_ids():
+    obj_ids = [1, 2, 12345678, 1234567890123]
+    encoded_ids = test_helper_1.encode_ids(obj_ids)
+    assert encoded_ids == [test_helper_1.encode_id(obj_id) for obj_id in obj_ids]
+    assert test_helper_1.decode_ids(encoded_ids) == obj_ids
+    assert test_helper_1.encode_ids(obj_ids, kind="moo") == [test_helper_1.encode_id(obj_id, kind="moo") for obj_id in obj_ids]
+    assert test_helper_1.encode_ids([]) == []
+    assert test_helper_1.decode_ids([]) == []
+
+
+def test_decode_ids_malformed():
+    encoded_ids = test_helper_1.encode_ids([1, 2])
+    for bad_id in ("notahexid", "abc", ""):
+        try:
+            test_helper_1.decode_ids(encoded_ids + [bad_id])
+        except MalformedId as e:
+            assert f"( {bad_id} )" in str(e)
+        else:
+            raise AssertionError(f"decoding {bad_id!r} should fail")
+
+
+def test_encoded_id_cache():
+    helper = idencoding.IdEncodingHelper(id_secret="secu1", cache_size=2)
+    assert helper.encode_id(1) == test_helper_1.encode_id(1)
+    assert helper.encode_ids([1, 2, 3]) == test_helper_1.encode_ids([1, 2, 3])
+    assert len(helper.encoded_id_cache) == 2
+    assert helper.encode_id(1, kind="moo") == test_helper_1.encode_id(1, kind="moo")
+
+
+def test_encode_all_ids():
+    rvals = [
+        dict(id=1, history_id=2, tool_id="cat1", name="foo", input_ids=[3, 4], nested=dict(id=5, job_id=6),
+             steps=[dict(id=7, inputs=[dict(dataset_id=8)]), "step"]),
+        dict(id=9, job_id=None),
+    ]
+    encode_id = test_helper_1.encode_id
+    expected = [
+        dict(id=encode_id(1), history_id=encode_id(2), tool_id="cat1", name="foo", input_ids=[encode_id(3), encode_id(4)],
+             nested=dict(id=encode_id(5), job_id=encode_id(6)),
+             steps=[dict(id=encode_id(7), inputs=[dict(dataset_id=encode_id(8))]), "step"]),
+        dict(id=encode_id(9), job_id=None),
+    ]
+    assert test_helper_1.encode_all_ids_many(copy.deepcopy(rvals), recursive=True) == expected
+    assert [test_helper_1.encode_all_ids(rval, recursive=True) for rval in copy.deepcopy(rvals)] == expected
+    # Nested dicts and lists are left alone unless recursive
+    encoded = test_helper_1.encode_all_ids_many(copy.deepcopy(rvals))
+    assert encoded[0]["id"] == encode_id(1)
+    assert encoded[0]["input_ids"] == [encode_id(3), encode_id(4)]
+    assert encoded[0]["nested"] == dict(id=5, job_id=6)
+    assert encoded[0]["steps"] == rvals[0]["steps"]
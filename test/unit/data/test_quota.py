@@ -1,7 +1,12 @@
-from galaxy.quota import DatabaseQuotaAgent
+from galaxy.quota import DatabaseQuotaAgent, QuotaAgent
 from .test_galaxy_mapping import BaseModelTestCase
 
 
+def test_base_get_quotas_unknown():
+    # Agents implementing only get_quota must still have is_over_quota compute the quota
+    assert QuotaAgent().get_quotas([1, 2]) == {1: False, 2: False}
+
+
 class CalculateUsageTestCase(BaseModelTestCase):
 
     def test_calculate_usage(self):
@@ -33,6 +38,90 @@ class CalculateUsageTestCase(BaseModelTestCase):
 
         assert u.calculate_disk_usage() == 10
 
+    def test_reconcile_disk_usage(self):
+        model = self.model
+        u = model.User(email="reconcile_usage@example.com", password="password")
+        u2 = model.User(email="reconcile_usage2@example.com", password="password")
+        self.persist(u, u2)
+
+        h = model.History(name="History for reconciling usage", user=u)
+        self.persist(h)
+        d1 = model.HistoryDatasetAssociation(extension="txt", history=h, create_dataset=True, sa_session=model.session)
+        d1.dataset.total_size = 10
+        self.persist(d1)
+
+        assert model.User.calculate_disk_usages(model.session, [u.id, u2.id]) == {u.id: 10, u2.id: 0}
+
+        drift = model.User.reconcile_disk_usage(model.session, [u.id, u2.id], dryrun=True)
+        assert drift == {u.id: (0, 10)}
+        model.session.refresh(u)
+        assert u.disk_usage is None
+
+        drift = model.User.reconcile_disk_usage(model.session, [u.id, u2.id])
+        assert drift == {u.id: (0, 10)}
+        model.session.refresh(u)
+        assert u.disk_usage == 10
+        assert model.User.reconcile_disk_usage(model.session, [u.id, u2.id]) == {}
+
+
+class DiskUsageLedgerTestCase(BaseModelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model.User.use_disk_usage_ledger = True
+
+    def tearDown(self):
+        self.model.User.use_disk_usage_ledger = False
+        super().tearDown()
+
+    def test_apply_deltas(self):
+        model = self.model
+        u = model.User(email="ledger@example.com", password="password")
+        u2 = model.User(email="ledger2@example.com", password="password")
+        self.persist(u, u2)
+
+        u.adjust_total_disk_usage(10)
+        u.adjust_total_disk_usage(5)
+        u2.adjust_total_disk_usage(7)
+        u2.adjust_total_disk_usage(-7)
+        model.session.flush()
+        assert u.disk_usage is None
+        assert self.query(model.UserDiskUsageDelta).count() == 4
+
+        assert model.UserDiskUsageDelta.apply(model.session, batch_size=3) == 3
+        assert model.UserDiskUsageDelta.apply(model.session) == 1
+        assert model.UserDiskUsageDelta.apply(model.session) == 0
+        model.session.refresh(u)
+        model.session.refresh(u2)
+        assert u.disk_usage == 15
+        assert u2.disk_usage == 0
+
+    def test_recalculation_discards_deltas(self):
+        model = self.model
+        u = model.User(email="ledger_recalc@example.com", password="password")
+        self.persist(u)
+        h = model.History(name="History for ledger", user=u)
+        self.persist(h)
+        d1 = model.HistoryDatasetAssociation(extension="txt", history=h, create_dataset=True, sa_session=model.session)
+        d1.dataset.total_size = 10
+        self.persist(d1)
+        u.adjust_total_disk_usage(10)
+        model.session.flush()
+
+        assert model.User.reconcile_disk_usage(model.session, [u.id]) == {}
+        u.adjust_total_disk_usage(20)
+        model.session.flush()
+        # the pending change is not reflected in the datasets and is counted as drift
+        assert model.User.reconcile_disk_usage(model.session, [u.id]) == {u.id: (30, 10)}
+        assert self.query(model.UserDiskUsageDelta).filter_by(user_id=u.id).count() == 0
+
+        u.adjust_total_disk_usage(20)
+        model.session.flush()
+        u.calculate_and_set_disk_usage()
+        assert self.query(model.UserDiskUsageDelta).filter_by(user_id=u.id).count() == 0
+        model.session.refresh(u)
+        assert u.disk_usage == 10
+
 
 class QuotaTestCase(BaseModelTestCase):
 
@@ -112,3 +201,29 @@ class QuotaTestCase(BaseModelTestCase):
             assert not self.quota_agent.is_over_quota(None, job, None)
             user.total_disk_usage = amount + 1
             assert self.quota_agent.is_over_quota(None, job, None)
+
+
+class CachedQuotaTestCase(QuotaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.quota_agent = DatabaseQuotaAgent(self.model, cache_ttl=600)
+
+    def test_get_quotas(self):
+        model = self.model
+        u1 = model.User(email="quota1@example.com", password="password")
+        u2 = model.User(email="quota2@example.com", password="password")
+        self.persist(u1, u2)
+        assert self.quota_agent.get_quotas([u1.id, u2.id]) == {u1.id: None, u2.id: None}
+
+        self._add_user_quota(u1, model.Quota(name="user1 quota base", amount=20, operation="="))
+        self._add_user_quota(u1, model.Quota(name="user1 quota add", amount=30, operation="+"))
+        quota = model.Quota(name="user2 group quota", amount=100, operation="=")
+        self._add_group_quota(u2, quota)
+        assert self.quota_agent.get_quotas([u1.id, u2.id]) == {u1.id: 50, u2.id: 100}
+
+        # changing a quota invalidates the cached quotas
+        quota.bytes = 200
+        self.persist(quota)
+        assert self.quota_agent.get_quotas([u1.id, u2.id]) == {u1.id: 50, u2.id: 200}
+        assert self.quota_agent.get_quota(u2) == 200
@@ -0,0 +1,53 @@
+from galaxy import model
+from galaxy.jobs.counts import RunningJobCounter
+from galaxy.model import mapping
+
+
+def test_transitions():
+    counter = RunningJobCounter(60)
+    counter.transition(1, "local", model.Job.states.NEW, model.Job.states.QUEUED)
+    counter.transition(1, "local", model.Job.states.QUEUED, model.Job.states.RUNNING)
+    counter.transition(1, "cluster", model.Job.states.NEW, model.Job.states.QUEUED)
+    assert counter.get_user_count(1) == 2
+    assert counter.get_user_destination_counts(1) == {"local": 1, "cluster": 1}
+    assert counter.get_destination_counts() == {"local": 1, "cluster": 1}
+
+    # Resubmitted jobs still count against the user, but not against the destination
+    counter.transition(1, "local", model.Job.states.RUNNING, model.Job.states.RESUBMITTED)
+    assert counter.get_user_count(1) == 2
+    assert counter.get_user_destination_counts(1) == {"local": 0, "cluster": 1}
+
+    counter.transition(1, "cluster", model.Job.states.QUEUED, model.Job.states.OK)
+    assert counter.get_user_count(1) == 1
+    assert counter.get_destination_counts() == {"local": 0, "cluster": 0}
+
+
+def test_reconcile_and_state_changes():
+    model_mapping = mapping.init("/tmp", "sqlite:///:memory:", create_tables=True)
+    sa_session = model_mapping.context
+    user = model.User(email="counter@example.org", password="password")
+    sa_session.add(user)
+    jobs = []
+    for state in (model.Job.states.QUEUED, model.Job.states.RUNNING, model.Job.states.OK):
+        job = model.Job()
+        job.user = user
+        job.state = state
+        job.destination_id = "local"
+        sa_session.add(job)
+        jobs.append(job)
+    sa_session.flush()
+
+    counter = RunningJobCounter(60)
+    counter.reconcile(sa_session)
+    assert counter.get_user_count(user.id) == 2
+    assert counter.get_destination_counts() == {"local": 2}
+
+    counter.start()
+    try:
+        jobs[0].set_state(model.Job.states.OK)
+        assert counter.get_user_count(user.id) == 1
+        assert counter.get_user_destination_counts(user.id) == {"local": 1}
+    finally:
+        counter.shutdown()
+    jobs[1].set_state(model.Job.states.OK)
+    assert counter.get_user_count(user.id) == 1
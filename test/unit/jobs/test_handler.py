@@ -0,0 +1,78 @@
+from sqlalchemy import event
+
+import galaxy.datatypes.registry
+from galaxy import model
+from galaxy.jobs.handler import JobHandlerQueue
+from galaxy.model import mapping
+from galaxy.quota import NoQuotaAgent
+from galaxy.util.bunch import Bunch
+
+datatypes_registry = galaxy.datatypes.registry.Registry()
+datatypes_registry.load_datatypes()
+model.set_datatypes_registry(datatypes_registry)
+
+
+def test_prefetch_for_jobs_statement_count():
+    app = _app()
+    sa_session = app.model.context
+    jobs = []
+    for i in range(5):
+        user = model.User(email=f"user{i}@example.org", password="password")
+        history = model.History(user=user)
+        hdas = [_hda(sa_session, history) for _ in range(2)]
+        jobs.append(_new_job(sa_session, user, *hdas))
+    sa_session.flush()
+    job_ids = [job.id for job in jobs]
+    sa_session.expunge_all()
+    jobs = sa_session.query(model.Job).enable_eagerloads(False).filter(model.Job.id.in_(job_ids)).all()
+
+    queue = JobHandlerQueue(app, dispatcher=None)
+    statements = []
+    event.listen(app.model.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    queue._JobHandlerQueue__prefetch_for_jobs(jobs)
+    prefetch_statements = len(statements)
+    for job in jobs:
+        assert job.user.email
+        assert len(job.input_datasets) == 2
+    # The users and input dataset associations of all jobs are loaded by the prefetch
+    assert len(statements) == prefetch_statements
+    assert prefetch_statements <= 3
+
+
+def _hda(sa_session, history):
+    hda = model.HistoryDatasetAssociation(history=history, create_dataset=True, sa_session=sa_session)
+    sa_session.add(hda)
+    return hda
+
+
+def _new_job(sa_session, user, *inputs):
+    job = model.Job()
+    job.user = user
+    job.state = model.Job.states.NEW
+    job.handler = "main"
+    for i, hda in enumerate(inputs):
+        job.add_input_dataset(f"input{i}", hda)
+    sa_session.add(job)
+    return job
+
+
+def _app():
+    return Bunch(
+        config=Bunch(
+            server_name="main",
+            track_jobs_in_database=True,
+            job_count_reconcile_interval=0,
+            cache_user_job_count=False,
+        ),
+        job_config=Bunch(
+            handler_dependency_tracking=False,
+            handler_assignment_methods=None,
+            limits=Bunch(
+                registered_user_concurrent_jobs=None,
+                destination_user_concurrent_jobs={},
+                anonymous_user_concurrent_jobs=None,
+            ),
+        ),
+        model=mapping.init("/tmp", "sqlite:///:memory:", create_tables=True),
+        quota_agent=NoQuotaAgent(),
+    )
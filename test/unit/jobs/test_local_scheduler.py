@@ -0,0 +1,82 @@
+from galaxy.jobs.runners.util import local_scheduler
+from galaxy.jobs.runners.util.local_scheduler import ResourceScheduler
+
+
+def _scheduler(cores=4, memory=0, backfill_timeout=300):
+    started = []
+    scheduler = ResourceScheduler(cores=cores, memory=memory, dispatch=lambda item, waited: started.append(item), backfill_timeout=backfill_timeout)
+    return scheduler, started
+
+
+def test_cores_not_oversubscribed():
+    scheduler, started = _scheduler(cores=4)
+    scheduler.submit("a", cores=2)
+    scheduler.submit("b", cores=2)
+    scheduler.submit("c", cores=1)
+    assert started == ["a", "b"]
+    assert scheduler.pending == 1
+    scheduler.release("a")
+    assert started == ["a", "b", "c"]
+    assert scheduler.used_cores == 3
+
+
+def test_backfill():
+    scheduler, started = _scheduler(cores=4, memory=1000)
+    scheduler.submit("running", cores=2)
+    scheduler.submit("big", cores=4)
+    scheduler.submit("small", cores=1, memory=500)
+    scheduler.submit("large_memory", cores=1, memory=600)
+    # small jobs run while the big job waits for all cores
+    assert started == ["running", "small"]
+    scheduler.release("running")
+    scheduler.release("small")
+    assert started == ["running", "small", "big"]
+    scheduler.release("big")
+    assert started == ["running", "small", "big", "large_memory"]
+
+
+def test_no_backfill_after_timeout():
+    scheduler, started = _scheduler(cores=4, backfill_timeout=0)
+    scheduler.submit("running", cores=2)
+    scheduler.submit("big", cores=4)
+    scheduler.submit("small", cores=1)
+    assert started == ["running"]
+    scheduler.release("running")
+    assert started == ["running", "big"]
+
+
+def test_requests_limited_to_capacity():
+    scheduler, started = _scheduler(cores=2, memory=100)
+    scheduler.submit("a", cores=8, memory=1000)
+    assert started == ["a"]
+    assert (scheduler.used_cores, scheduler.used_memory) == (2, 100)
+
+
+def test_cgroup_limits(tmp_path):
+    cgroup_mount = str(tmp_path)
+    assert local_scheduler.cgroup_cpu_limit(cgroup_mount) is None
+    assert local_scheduler.cgroup_memory_limit(cgroup_mount) is None
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    (tmp_path / "memory.max").write_text("max\n")
+    assert local_scheduler.cgroup_cpu_limit(cgroup_mount) is None
+    assert local_scheduler.cgroup_memory_limit(cgroup_mount) is None
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    (tmp_path / "memory.max").write_text(f"{2 * 1024 ** 3}\n")
+    assert local_scheduler.cgroup_cpu_limit(cgroup_mount) == 3
+    assert local_scheduler.cgroup_memory_limit(cgroup_mount) == 2048
+    assert local_scheduler.available_cores(cgroup_mount) <= 3
+    assert local_scheduler.available_memory(cgroup_mount) <= 2048
+
+
+def test_cgroup_v1_limits(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    (tmp_path / "memory").mkdir()
+    (tmp_path / "memory" / "memory.limit_in_bytes").write_text("9223372036854771712\n")
+    assert local_scheduler.cgroup_cpu_limit(str(tmp_path)) is None
+    assert local_scheduler.cgroup_memory_limit(str(tmp_path)) is None
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+    (tmp_path / "memory" / "memory.limit_in_bytes").write_text(f"{1024 ** 3}\n")
+    assert local_scheduler.cgroup_cpu_limit(str(tmp_path)) == 2
+    assert local_scheduler.cgroup_memory_limit(str(tmp_path)) == 1024
@@ -0,0 +1,94 @@
+import galaxy.datatypes.registry
+from galaxy import model
+from galaxy.jobs.readiness import JobReadinessTracker
+from galaxy.model import mapping
+from galaxy.util.bunch import Bunch
+
+datatypes_registry = galaxy.datatypes.registry.Registry()
+datatypes_registry.load_datatypes()
+model.set_datatypes_registry(datatypes_registry)
+
+
+def test_tracker_index():
+    tracker = _tracker()
+    tracker.register_job(1, [10, 11])
+    tracker.register_job(2, [11])
+    tracker.register_job(3, [])
+    assert tracker.candidates == {3}
+    assert tracker.tracked_job_count == 3
+
+    tracker.dataset_ready(11)
+    assert tracker.candidates == {2, 3}
+    assert tracker.pending_inputs == {1: {10}}
+
+    tracker.dataset_ready(10)
+    assert tracker.candidates == {1, 2, 3}
+    assert not tracker.pending_inputs
+    assert not tracker.dependents
+
+
+def test_tracker_discard():
+    tracker = _tracker()
+    tracker.register_job(1, [10])
+    tracker.register_job(2, [10])
+    tracker.discard_job(1)
+    assert tracker.dependents[10] == {2}
+    tracker.discard_job(2)
+    assert not tracker.dependents
+    # Re-registering a job replaces its pending inputs
+    tracker.register_job(3, [10])
+    tracker.register_job(3, [12])
+    assert set(tracker.dependents) == {12}
+
+
+def test_tracker_update_from_database():
+    app = _app()
+    sa_session = app.model.context
+    user = model.User(email="tracker@example.org", password="password")
+    history = model.History(user=user)
+    ready_hda = _hda(sa_session, history, model.Dataset.states.OK)
+    running_hda = _hda(sa_session, history, model.Dataset.states.RUNNING)
+    waiting_job = _new_job(sa_session, user, ready_hda, running_hda)
+    ready_job = _new_job(sa_session, user, ready_hda)
+    other_handler_job = _new_job(sa_session, user, ready_hda, handler="other")
+    sa_session.flush()
+
+    tracker = JobReadinessTracker(app)
+    assert tracker.update(sa_session) == {ready_job.id}
+    assert tracker.pending_inputs == {waiting_job.id: {running_hda.dataset.id}}
+    assert other_handler_job.id not in tracker.candidates
+
+    running_hda.dataset.state = model.Dataset.states.OK
+    new_job = _new_job(sa_session, user, ready_hda)
+    sa_session.flush()
+    assert tracker.update(sa_session) == {ready_job.id, waiting_job.id, new_job.id}
+
+
+def _hda(sa_session, history, state):
+    hda = model.HistoryDatasetAssociation(history=history, create_dataset=True, sa_session=sa_session)
+    hda.dataset.state = state
+    sa_session.add(hda)
+    return hda
+
+
+def _new_job(sa_session, user, *inputs, handler="main"):
+    job = model.Job()
+    job.user = user
+    job.state = model.Job.states.NEW
+    job.handler = handler
+    for i, hda in enumerate(inputs):
+        job.add_input_dataset(f"input{i}", hda)
+    sa_session.add(job)
+    sa_session.flush()
+    return job
+
+
+def _app():
+    return Bunch(
+        config=Bunch(server_name="main"),
+        model=mapping.init("/tmp", "sqlite:///:memory:", create_tables=True),
+    )
+
+
+def _tracker():
+    return JobReadinessTracker(Bunch(config=Bunch(server_name="main")))
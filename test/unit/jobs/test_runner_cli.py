@@ -0,0 +1,95 @@
+from queue import Queue
+
+from galaxy.jobs import JobDestination
+from galaxy.jobs.runners.cli import ShellJobRunner
+from galaxy.jobs.runners.util.cli import split_params
+from galaxy.jobs.runners.util.cli.job.slurm import Slurm
+from galaxy.jobs.runners.util.cli.shell import PipelinedShellMixin
+from galaxy.model import Job
+from galaxy.util.bunch import Bunch
+
+
+class FakeShell(PipelinedShellMixin):
+
+    def __init__(self, status_output, single_status_outputs):
+        self.status_output = status_output
+        self.single_status_outputs = single_status_outputs
+        self.executed = []
+
+    def execute(self, cmd, timeout=60):
+        self.executed.append(cmd)
+        stdout = []
+        for line in cmd.splitlines():
+            if line.startswith("squeue") and "-j" in line:
+                stdout.append(self.single_status_outputs.get(line.split()[-1], ""))
+            elif line.startswith("squeue"):
+                stdout.append(self.status_output)
+            else:
+                # printf delimiting the results of pipelined commands
+                marker = line.split()[3]
+                if line.endswith(">&2"):
+                    continue
+                stdout.append(f"\n{marker} 0\n")
+        return Bunch(stdout="".join(stdout), stderr="", returncode=0)
+
+
+class FakeJobWrapper:
+
+    def __init__(self, job_id, job_destination):
+        self.job_id = job_id
+        self.job_destination = job_destination
+        self.states = []
+
+    def get_id_tag(self):
+        return str(self.job_id)
+
+    def get_state(self):
+        return Job.states.QUEUED
+
+    def change_state(self, state):
+        self.states.append(state)
+
+
+class FakeShellJobRunner(ShellJobRunner):
+
+    def __init__(self, shell):
+        self.shell = shell
+        self.watched = []
+        self.work_queue = Queue()
+
+    def get_cli_plugins(self, shell_params, job_params):
+        return self.shell, Slurm(**job_params)
+
+    def parse_destination_params(self, params):
+        return split_params(params)
+
+
+def _job_state(job_id, partition):
+    job_destination = JobDestination(id=f"slurm_{partition}", runner="cli", params={
+        "shell_plugin": "SecureShell",
+        "shell_hostname": "cluster",
+        "job_plugin": "Slurm",
+        "job_partition": partition,
+    })
+    job_wrapper = FakeJobWrapper(job_id, job_destination)
+    return Bunch(job_wrapper=job_wrapper, job_id=str(job_id), job_destination=job_destination, old_state=Job.states.QUEUED, running=False)
+
+
+def test_status_checks_batched_per_shell():
+    shell = FakeShell(status_output="JOBID ST\n1 R\n2 PD\n", single_status_outputs={"3": "JOBID ST\n3 R\n"})
+    runner = FakeShellJobRunner(shell)
+    runner.watched = [_job_state(1, "short"), _job_state(2, "long"), _job_state(3, "short"), _job_state(4, "long")]
+    runner.check_watched_items()
+    # One pipelined command checking all destinations, one checking the jobs missing from it
+    assert len(shell.executed) == 2
+    assert shell.executed[0].count("squeue") == 2
+    assert shell.executed[1].count("squeue") == 2
+    assert [ajs.job_id for ajs in runner.watched] == ["1", "2", "3"]
+    assert runner.watched[0].running
+    assert runner.watched[2].running
+    assert runner.watched[0].job_wrapper.states == [Job.states.RUNNING]
+    assert runner.watched[1].job_wrapper.states == []
+    # Job 4 finished
+    method, ajs = runner.work_queue.get_nowait()
+    assert (method.__name__, ajs.job_id) == ("finish_job", "4")
+    assert runner.work_queue.empty()
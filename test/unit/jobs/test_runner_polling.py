@@ -0,0 +1,119 @@
+import threading
+import time
+from queue import Queue
+
+from galaxy.jobs import runners
+from galaxy.jobs.runners import slurm
+from galaxy.jobs.runners.util.async_monitor import AsyncJobMonitor
+from galaxy.util import bunch
+
+
+def _async_runner(**params):
+    runner = runners.AsynchronousJobRunner.__new__(runners.AsynchronousJobRunner)
+    runner.runner_params = runners.RunnerParams(specs=runners.AsynchronousJobRunner.DEFAULT_SPECS, params=params)
+    runner.monitor_interval = runner.runner_params.monitor_min_interval
+    runner.watched = []
+    return runner
+
+
+def test_default_monitor_interval():
+    runner = _async_runner()
+    runner.watched = [object()] * 5000
+    assert runner._next_monitor_interval(0) == 1.0
+    assert runner._next_monitor_interval(None) == 1.0
+
+
+def test_adaptive_monitor_interval():
+    runner = _async_runner(monitor_min_interval="1", monitor_max_interval="10", monitor_queue_size_step="100")
+    assert runner._next_monitor_interval(0) == 1.5
+    assert runner._next_monitor_interval(0) == 2.25
+    assert runner._next_monitor_interval(1) == 1.125
+    for _ in range(10):
+        runner._next_monitor_interval(0)
+    assert runner.monitor_interval == 10
+    # A large queue is not checked more often than once per monitor_min_interval per 100 jobs
+    runner.watched = [object()] * 350
+    for _ in range(10):
+        runner._next_monitor_interval(5)
+    assert runner.monitor_interval == 4
+    assert runner._next_monitor_interval(None) == 4
+
+
+def test_slurm_bulk_job_status(monkeypatch):
+    runner = slurm.SlurmJobRunner.__new__(slurm.SlurmJobRunner)
+    runner.drmaa_job_states = bunch.Bunch(QUEUED_ACTIVE="queued", RUNNING="running")
+    commands_run = []
+
+    def execute(cmd):
+        commands_run.append(cmd)
+        if '-M' in cmd:
+            return "CLUSTER: other\n7 RUNNING\n"
+        return "1 PENDING\n2 RUNNING\n3 COMPLETED\n"
+
+    monkeypatch.setattr(slurm.commands, "execute", execute)
+    job_states = runner._bulk_job_status(["1", "2", "3", "4", "7.other", None])
+    assert job_states == {"1": "queued", "2": "running", "7.other": "running"}
+    assert commands_run == [
+        ["squeue", "--noheader", "--format=%i %T", "-j", "1,2,3,4"],
+        ["squeue", "--noheader", "--format=%i %T", "-M", "other", "-j", "7"],
+    ]
+
+
+class _SlowRunner(runners.AsynchronousJobRunner):
+    runner_name = "SlowRunner"
+
+    def __init__(self, checks_until_done):
+        self.runner_params = runners.RunnerParams(specs=self.DEFAULT_SPECS, params={})
+        self.watched = []
+        self.monitor_queue = Queue()
+        self.checks_until_done = checks_until_done
+        self.checks = []
+        self.running_checks = 0
+        self.max_running_checks = 0
+        self.lock = threading.Lock()
+        self.stopped = False
+
+    def check_watched_item(self, job_state):
+        with self.lock:
+            self.running_checks += 1
+            self.max_running_checks = max(self.max_running_checks, self.running_checks)
+        time.sleep(0.05)
+        with self.lock:
+            self.running_checks -= 1
+            self.checks.append(job_state.job_id)
+        if self.checks.count(job_state.job_id) >= self.checks_until_done[job_state.job_id]:
+            return None
+        return job_state
+
+    def handle_stop(self):
+        self.stopped = True
+
+
+def test_async_monitor():
+    runner = _SlowRunner({1: 1, 2: 1, 3: 1, 4: 4})
+    for job_id in runner.checks_until_done:
+        runner.monitor_job(bunch.Bunch(job_id=job_id, old_state="queued", running=False))
+    monitor = AsyncJobMonitor(runner, concurrency=2, min_interval=0.01, max_interval=0.01)
+    thread = threading.Thread(target=monitor.run)
+    thread.start()
+    while len(runner.checks) < 7:
+        time.sleep(0.01)
+    runner.monitor_queue.put(runners.STOP_SIGNAL)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert runner.stopped
+    assert runner.max_running_checks == 2
+    assert runner.checks.count(4) == 4
+    assert runner.watched == []
+    # Jobs 3 and 4 waited for a free slot
+    monitor.report_lag()
+    assert runner.monitor_lag["checks"] == 7
+    assert runner.monitor_lag["max"] >= 0.05
+
+
+def test_async_monitor_interval():
+    monitor = AsyncJobMonitor(None, concurrency=1, min_interval=1, max_interval=30)
+    watched_job = bunch.Bunch(last_change=100)
+    assert monitor.interval(watched_job, 100) == 1
+    assert monitor.interval(watched_job, 150) == 5
+    assert monitor.interval(watched_job, 1000) == 30
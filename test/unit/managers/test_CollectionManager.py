@@ -2,8 +2,12 @@
 """
 """
 import unittest
+from unittest import mock
 
-from galaxy import model
+from galaxy import (
+    exceptions,
+    model
+)
 from galaxy.managers.collections import DatasetCollectionManager
 from galaxy.managers.datasets import DatasetManager
 from galaxy.managers.hdas import HDAManager
@@ -80,6 +84,88 @@ class DatasetCollectionManagerTestCase(BaseTestCase, CreatesCollectionsMixin):
         hdca2 = self.collection_manager.create(self.trans, history, 'test collection 2', 'list', elements=elements)
         self.assertIsInstance(hdca2, model.HistoryDatasetCollectionAssociation)
 
+    def test_create_nested_list(self):
+        owner = self.user_manager.create(**user2_data)
+        history = self.history_manager.create(name='history1', user=owner)
+        self.trans.set_history(history)
+        hdas = [self.hda_manager.create(name=name, history=history, dataset=self.dataset_manager.create())
+                for name in ('forward', 'reverse')]
+
+        self.log("should be able to create a list:paired Collection via ids, copying the elements")
+        element_identifiers = [
+            dict(src='new_collection', name=name, collection_type='paired', element_identifiers=self.build_element_identifiers(hdas))
+            for name in ('sample1', 'sample2')
+        ]
+        hdca = self.collection_manager.create(self.trans, history, 'test collection', 'list:paired',
+                                              element_identifiers=element_identifiers, copy_elements=True)
+        collection = hdca.collection
+        self.assertEqual(collection.collection_type, 'list:paired')
+        self.assertEqual(collection.element_count, 2)
+        self.assertEqual([element.element_identifier for element in collection.elements], ['sample1', 'sample2'])
+        self.assertEqual([element.element_index for element in collection.elements], [0, 1])
+        for element in collection.elements:
+            self.assertEqual(element.element_type, 'dataset_collection')
+            paired = element.element_object
+            self.assertEqual([e.element_identifier for e in paired.elements], ['forward', 'reverse'])
+            copies = [e.element_object for e in paired.elements]
+            self.assertNotIn(copies[0], hdas)
+            self.assertEqual([copy.dataset for copy in copies], [hda.dataset for hda in hdas])
+
+    def test_create_list_inaccessible(self):
+        owner = self.user_manager.create(**user2_data)
+        non_owner = self.user_manager.create(**user3_data)
+        history = self.history_manager.create(name='history1', user=owner)
+        hda1 = self.hda_manager.create(name='one', history=history, dataset=self.dataset_manager.create())
+        hda2 = self.hda_manager.create(name='two', history=history, dataset=self.dataset_manager.create())
+        self.dataset_manager.permissions.set_private_to_one_user(hda2.dataset, owner)
+
+        self.log("should not be able to create a Collection of datasets the user can't access")
+        self.trans.set_user(non_owner)
+        element_identifiers = self.build_element_identifiers([hda1, hda2])
+        self.assertRaises(exceptions.ItemAccessibilityException, self.collection_manager.create,
+                          self.trans, history, 'test collection', 'list', element_identifiers=element_identifiers)
+
+    def test_create_list_from_lddas(self):
+        owner = self.user_manager.create(**user2_data)
+        history = self.history_manager.create(name='history1', user=owner)
+        library = model.Library(name='library')
+        library.root_folder = model.LibraryFolder(name='root')
+        lddas = []
+        for name in ('one', 'two'):
+            ldda = model.LibraryDatasetDatasetAssociation(name=name, extension='txt', dataset=self.dataset_manager.create(), sa_session=self.trans.sa_session)
+            ldda.library_dataset = model.LibraryDataset(folder=library.root_folder, name=name)
+            lddas.append(ldda)
+        self.trans.sa_session.add_all([library] + lddas)
+        self.trans.sa_session.flush()
+
+        self.log("should create a list of HDAs copied from LDDAs")
+        element_identifiers = [dict(src='ldda', name=ldda.name, id=self.trans.security.encode_id(ldda.id)) for ldda in lddas]
+        hdca = self.collection_manager.create(self.trans, history, 'test collection', 'list', element_identifiers=element_identifiers)
+        elements = hdca.collection.elements
+        self.assertEqual([element.element_identifier for element in elements], ['one', 'two'])
+        self.assertEqual([element.hda.copied_from_library_dataset_dataset_association for element in elements], lddas)
+
+        self.log("should fail on an unknown LDDA")
+        element_identifiers.append(dict(src='ldda', name='three', id=self.trans.security.encode_id(12345)))
+        self.assertRaises(exceptions.MessageException, self.collection_manager.create,
+                          self.trans, history, 'test collection', 'list', element_identifiers=element_identifiers)
+
+    def test_create_list_failure_rolls_back(self):
+        owner = self.user_manager.create(**user2_data)
+        history = self.history_manager.create(name='history1', user=owner)
+        hdas = [self.hda_manager.create(name=name, history=history, dataset=self.dataset_manager.create())
+                for name in ('one', 'two')]
+        context = self.app.model.context
+        collection_count = context.query(model.DatasetCollection).count()
+
+        self.log("should not leave a collection behind if inserting its elements fails")
+        element_identifiers = self.build_element_identifiers(hdas)
+        with mock.patch.object(model.DatasetCollectionElement.table, 'insert', side_effect=RuntimeError("insert failed")):
+            self.assertRaises(RuntimeError, self.collection_manager.create, self.trans, history, 'test collection', 'list',
+                              element_identifiers=element_identifiers)
+        self.assertEqual(context.query(model.DatasetCollection).count(), collection_count)
+        self.assertEqual(context.query(model.HistoryDatasetCollectionAssociation).count(), 0)
+
     def test_update_from_dict(self):
         owner = self.user_manager.create(**user2_data)
 
@@ -260,6 +260,26 @@ class HDAManagerTestCase(HDATestCase):
         self.assertRaises(exceptions.ItemAccessibilityException,
             self.hda_manager.get_accessible, item1.id, anon_user, current_history=self.trans.history)
 
+    def test_get_accessible_many(self):
+        owner = self.user_manager.create(**user2_data)
+        non_owner = self.user_manager.create(**user3_data)
+        history1 = self.history_manager.create(name='history1', user=owner)
+        items = [self.hda_manager.create(history1, self.dataset_manager.create()) for _ in range(3)]
+        ids = [items[2].id, items[0].id, items[2].id]
+
+        self.log("should return the hdas in the order of the ids")
+        self.assertEqual(self.hda_manager.get_accessible_many(ids, non_owner, batch_size=2), [items[2], items[0], items[2]])
+
+        self.log("should raise if any hda is not accessible")
+        self.dataset_manager.permissions.set_private_to_one_user(items[0].dataset, owner)
+        self.assertEqual(self.hda_manager.get_accessible_many(ids, owner), [items[2], items[0], items[2]])
+        self.assertRaises(exceptions.ItemAccessibilityException,
+            self.hda_manager.get_accessible_many, ids, non_owner)
+
+        self.log("should raise if any hda does not exist")
+        self.assertRaises(exceptions.ObjectNotFound,
+            self.hda_manager.get_accessible_many, ids + [items[2].id + 1000], owner)
+
     def test_anon_ownership(self):
         anon_user = None
         self.trans.set_user(anon_user)
@@ -659,16 +679,33 @@ class HDAFilterParserTestCase(HDATestCase):
         self.assertFnFilter(self.filter_parser.parse_filter('genome_build', 'eq', 'wot'))
         self.assertFnFilter(self.filter_parser.parse_filter('genome_build', 'contains', 'wot'))
         # data_type
-        self.assertFnFilter(self.filter_parser.parse_filter('data_type', 'eq', 'wot'))
-        self.assertFnFilter(self.filter_parser.parse_filter('data_type', 'isinstance', 'wot'))
+        self.assertORMFunctionFilter(self.filter_parser.parse_filter('data_type', 'eq', 'wot'))
+        self.assertORMFunctionFilter(self.filter_parser.parse_filter('data_type', 'isinstance', 'wot'))
         # annotatable
-        self.assertFnFilter(self.filter_parser.parse_filter('annotation', 'has', 'wot'))
+        self.assertORMFunctionFilter(self.filter_parser.parse_filter('annotation', 'has', 'wot'))
 
 #     def test_genome_build_filters( self ):
 #         pass
 
-#     def test_data_type_filters( self ):
-#         pass
+    def test_data_type_filters(self):
+        owner = self.user_manager.create(**user2_data)
+        history1 = self.history_manager.create(name='history1', user=owner)
+        hdas = []
+        for extension in ('bed', 'tabular', 'txt', 'data'):
+            hda = self.hda_manager.create(history=history1, dataset=self.dataset_manager.create())
+            hda.extension = extension
+            hdas.append(hda)
+        self.trans.sa_session.flush()
+        bed, tabular, txt, data = hdas
+
+        def filtered(op, val):
+            return self.hda_manager.list(filters=self.filter_parser.parse_filters([('data_type', op, val)]))
+
+        self.assertEqual(filtered('eq', 'tabular.Tabular'), [tabular])
+        self.assertEqual(filtered('isinstance', 'tabular.Tabular'), [bed, tabular])
+        self.assertEqual(filtered('isinstance', 'interval.Bed,data.Text'), [bed, tabular, txt])
+        self.assertEqual(filtered('isinstance', 'data.Data'), hdas)
+        self.assertEqual(filtered('eq', 'wot'), [])
 
 
 # =============================================================================
@@ -306,6 +306,20 @@ class HistoryAsContainerTestCase(HistoryAsContainerBaseTestCase):
         filters = [parsed_filter("orm", column('type_id').in_(['dataset-2', 'dataset_collection-2']))]
         self.assertEqual(self.contents_manager.contents(history, filters=filters), [contents[1], contents[6]])
 
+    def test_annotation_filter(self):
+        user2 = self.user_manager.create(**user2_data)
+        history = self.history_manager.create(name='history', user=user2)
+        contents = [self.add_hda_to_history(history, name=('hda-' + str(x))) for x in range(3)]
+        contents.append(self.add_list_collection_to_history(history, contents[:2]))
+        for item in (contents[1], contents[3]):
+            item.add_item_annotation(self.trans.sa_session, user2, item, "annotated")
+        self.trans.sa_session.flush()
+
+        self.log("annotation filters should apply to both datasets and collections before limit and offset")
+        filters = self.history_contents_filters.parse_filters([('annotation', 'has', 'annotated')])
+        self.assertEqual(self.contents_manager.contents(history, filters=filters), [contents[1], contents[3]])
+        self.assertEqual(self.contents_manager.contents(history, filters=filters, limit=1, offset=1), [contents[3]])
+
 
 class HistoryContentsFilterParserTestCase(HistoryAsContainerBaseTestCase):
 
@@ -762,14 +762,17 @@ class HistoryFiltersTestCase(BaseTestCase):
         history3 = self.history_manager.create(name='history3', user=user2)
 
         filters = self.filter_parser.parse_filters([('annotation', 'has', 'no play'), ])
-        anno_filter = filters[0].filter
+        self.log('annotation filters should be applied in the database')
+        self.assertEqual(filters[0].filter_type, 'orm_function')
 
         history3.add_item_annotation(self.trans.sa_session, user2, history3, "All work and no play")
         self.trans.sa_session.flush()
 
-        self.assertTrue(anno_filter(history3))
-        self.assertFalse(anno_filter(history2))
+        self.assertEqual(self.history_manager.list(filters=filters), [history3])
 
+        self.log('only annotations by the owner should be matched')
+        history2.add_item_annotation(self.trans.sa_session, self.admin_user, history2, "All work and no play")
+        self.trans.sa_session.flush()
         self.assertEqual(self.history_manager.list(filters=filters), [history3])
 
         self.log('should allow combinations of orm and fn filters')
@@ -805,6 +808,44 @@ class HistoryFiltersTestCase(BaseTestCase):
         self.log('1234 should return false through the filter')
         self.assertFalse(filter_(fake))
 
+    def test_fn_filter_streaming(self):
+        user2 = self.user_manager.create(**user2_data)
+        histories = [self.history_manager.create(name=f'history{i}', user=user2) for i in range(5)]
+
+        self.log('streamed queries should return all models in order')
+        query = self.history_manager.query()
+        self.assertEqual(list(self.history_manager._stream_query(query, batch_size=2)), histories)
+
+        self.log('fn filtering should stop once limit and offset are satisfied')
+        seen = []
+        self.filter_parser.fn_filter_parsers = {
+            'name_len': {'op': {'lt': lambda i, v: seen.append(i) or len(i.name) < v}, 'val': int}
+        }
+        filters = self.filter_parser.parse_filters([('name_len', 'lt', '10')])
+        self.assertEqual(self.history_manager.list(filters=filters, offset=1, limit=2), histories[1:3])
+        self.assertEqual(seen, histories[:3])
+
+        self.log('fn filtering should keep an explicit order')
+        order_by = self.history_manager.model_class.name.desc()
+        self.assertEqual(self.history_manager.list(filters=filters, order_by=order_by, limit=2), histories[:-3:-1])
+
+    def test_community_rating_filter(self):
+        user2 = self.user_manager.create(**user2_data)
+        user3 = self.user_manager.create(email='user3@user3.user3', username='user3', password=default_password)
+        history1 = self.history_manager.create(name='history1', user=user2)
+        history2 = self.history_manager.create(name='history2', user=user2)
+        self.history_manager.rate(history1, user2, 4)
+        self.history_manager.rate(history1, user3, 2)
+
+        filters = self.filter_parser.parse_filters([('community_rating', 'eq', '3')])
+        self.assertEqual(filters[0].filter_type, 'orm_function')
+        self.assertEqual(self.history_manager.list(filters=filters), [history1])
+        filters = self.filter_parser.parse_filters([('community_rating', 'le', '1')])
+        self.assertEqual(self.history_manager.list(filters=filters), [history2])
+        self.assertRaises(exceptions.RequestParameterInvalidException, self.filter_parser.parse_filters, [
+            ('community_rating', 'lt', '1'),
+        ])
+
     def test_list(self):
         """
         Test limit and offset in conjunction with both orm and fn filtering.
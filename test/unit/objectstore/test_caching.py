@@ -0,0 +1,121 @@
+import os
+import time
+
+from galaxy.objectstore.caching import (
+    CacheIndex,
+    InProcessCacheMonitor,
+)
+
+
+def _cache_file(staging_path, rel_path, size):
+    path = os.path.join(str(staging_path), rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+def test_touch_and_remove(tmp_path):
+    index = CacheIndex(str(tmp_path))
+    a = _cache_file(tmp_path, "000/dataset_1.dat", 100)
+    b = _cache_file(tmp_path, "000/dataset_2_files/b.txt", 50)
+    c = _cache_file(tmp_path, "000/dataset_2_files/c.txt", 25)
+    for path in (a, b, c):
+        index.touch(path)
+    index.flush()
+    assert index.total_size() == 175
+    # A new version of a file changes the total size
+    index.touch(a, 10)
+    index.flush()
+    assert index.total_size() == 85
+    index.remove(os.path.join(str(tmp_path), "000/dataset_2_files"))
+    index.flush()
+    assert index.total_size() == 10
+
+
+def test_evict_lru(tmp_path):
+    index = CacheIndex(str(tmp_path))
+    paths = [_cache_file(tmp_path, f"dataset_{i}.dat", 100) for i in range(5)]
+    for path in paths:
+        index.touch(path)
+        index.flush()
+    # dataset_0 is now the most recently used
+    index.touch(paths[0])
+    index.flush()
+    assert index.evict(250) == 300
+    assert [os.path.exists(p) for p in paths] == [True, False, False, False, True]
+    assert index.total_size() == 200
+    assert index.stats.to_dict()["evicted"] == 3
+
+
+def test_evict_lfu(tmp_path):
+    index = CacheIndex(str(tmp_path), eviction_policy="lfu")
+    paths = [_cache_file(tmp_path, f"dataset_{i}.dat", 100) for i in range(3)]
+    for i, path in enumerate(paths):
+        for _ in range(3 - i):
+            index.touch(path)
+        index.flush()
+    # dataset_2 is the most recently but least frequently used
+    assert index.evict(200) == 100
+    assert [os.path.exists(p) for p in paths] == [True, True, False]
+
+
+def test_reconcile(tmp_path):
+    _cache_file(tmp_path, "000/dataset_1.dat", 100)
+    _cache_file(tmp_path, "001/dataset_1001.dat", 20)
+    index = CacheIndex(str(tmp_path))
+    assert index.needs_reconcile
+    index.reconcile()
+    assert index.total_size() == 120
+    # An existing index is reused
+    assert not CacheIndex(str(tmp_path)).needs_reconcile
+
+
+def test_reconcile_unrecorded_changes(tmp_path):
+    index = CacheIndex(str(tmp_path), eviction_policy="lfu")
+    kept = _cache_file(tmp_path, "dataset_1.dat", 100)
+    removed = _cache_file(tmp_path, "dataset_2.dat", 50)
+    for _ in range(3):
+        index.touch(kept)
+    index.touch(removed)
+    index.flush()
+    # Files written, rewritten and removed without going through touch and remove
+    os.remove(removed)
+    _cache_file(tmp_path, "dataset_1.dat", 80)
+    unrecorded = _cache_file(tmp_path, "000/dataset_3.dat", 30)
+    index.reconcile()
+    assert index.total_size() == 110
+    # Unrecorded files are evicted too, hits of indexed files are kept
+    assert index.evict(80) == 30
+    assert not os.path.exists(unrecorded)
+    assert os.path.exists(kept)
+
+
+def test_monitor_check(tmp_path):
+    index = CacheIndex(str(tmp_path))
+    old = _cache_file(tmp_path, "dataset_1.dat", 600)
+    past = time.time() - 3600
+    os.utime(old, (past, past))
+    monitor = InProcessCacheMonitor(index, cache_size=1000, interval=3600)
+    try:
+        new = _cache_file(tmp_path, "dataset_2.dat", 400)
+        index.touch(new)
+        monitor.check()
+        assert not os.path.exists(old)
+        assert os.path.exists(new)
+        assert index.total_size() == 400
+        # Unrecorded files are indexed once the reconcile interval elapsed
+        _cache_file(tmp_path, "dataset_3.dat", 300)
+        monitor.check()
+        assert index.total_size() == 400
+        index.last_reconciled -= monitor.reconcile_interval
+        monitor.check()
+        assert index.total_size() == 700
+        # ... if there is one
+        _cache_file(tmp_path, "dataset_4.dat", 100)
+        monitor.reconcile_interval = 0
+        index.last_reconciled -= 3600
+        monitor.check()
+        assert index.total_size() == 700
+    finally:
+        monitor.shutdown()
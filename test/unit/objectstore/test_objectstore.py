@@ -6,6 +6,7 @@ from galaxy.exceptions import ObjectInvalid
 from galaxy.objectstore.azure_blob import AzureBlobObjectStore
 from galaxy.objectstore.cloud import Cloud
 from galaxy.objectstore.pithos import PithosObjectStore
+from galaxy.objectstore.placement import Rebalancer
 from galaxy.objectstore.s3 import S3ObjectStore
 from galaxy.util import directory_hash_id
 from ..unittest_utils.objectstore_helpers import (
@@ -374,6 +375,218 @@ def test_distributed_store():
             assert len(extra_dirs) == 2
 
 
+def test_hierarchical_store_location_cache():
+    with TestConfig(HIERARCHICAL_TEST_CONFIG, location_cache_ttl=60) as (directory, object_store):
+        probes = []
+        for key, backend in object_store.backends.items():
+            backend.exists = _counting(backend.exists, probes, key)
+
+        directory.write("Hello World!", "files2/000/dataset_2.dat")
+        assert object_store.exists(MockDataset(2))
+        assert not object_store.empty(MockDataset(2))
+        assert object_store.get_filename(MockDataset(2)).find("files2") > 0
+        # Located once, probing both backends
+        assert probes == [0, 1]
+
+        # Datasets found nowhere are remembered too
+        assert not object_store.exists(MockDataset(3))
+        assert not object_store.exists(MockDataset(3))
+        assert probes == [0, 1, 0, 1]
+
+        # Creating the dataset forgets its location
+        object_store.create(MockDataset(3))
+        assert object_store.exists(MockDataset(3))
+        object_store.delete(MockDataset(3))
+        assert not object_store.exists(MockDataset(3))
+
+
+def test_distributed_store_relocate():
+    for config_str in [DISTRIBUTED_TEST_CONFIG, DISTRIBUTED_TEST_CONFIG_YAML]:
+        with TestConfig(config_str, location_cache_ttl=60) as (directory, object_store):
+            directory.write("Hello World!", "files2/000/dataset_2.dat")
+            directory.write("Hello World!", "files1/000/dataset_3.dat")
+            legacy, invalid, located, missing = MockDataset(2), MockDataset(3), MockDataset(3), MockDataset(4)
+            invalid.object_store_id = "files_removed"
+            located.object_store_id = "files2"
+            relocated = object_store.relocate([legacy, invalid, located, missing])
+            assert relocated == [legacy, invalid]
+            assert legacy.object_store_id == "files2"
+            assert invalid.object_store_id == "files1"
+            assert located.object_store_id == "files2"
+            assert missing.object_store_id is None
+
+
+def test_distributed_store_capacity_placement():
+    config_str = DISTRIBUTED_TEST_CONFIG.replace("<backends>", '<backends placement="capacity">')
+    with TestConfig(config_str) as (directory, object_store):
+        assert object_store.to_dict()["placement"] == "capacity"
+        object_store.placement.update_usage("files1", 100.0)
+        for i in range(10):
+            dataset = MockDataset(100 + i)
+            object_store.create(dataset)
+            assert dataset.object_store_id == "files2"
+        assert object_store.placement.performance["files2"].latency is not None
+
+
+def test_distributed_store_migrate():
+    with TestConfig(DISTRIBUTED_TEST_CONFIG) as (directory, object_store):
+        directory.write("Hello World!", "files1/000/dataset_2.dat")
+        directory.write("extra", "files1/000/dataset_2_files/sub/extra.txt")
+        dataset = MockDataset(2)
+        dataset.object_store_id = "files1"
+        assert object_store.migrate(dataset, "files2") == len("Hello World!") + len("extra")
+        assert dataset.object_store_id == "files2"
+        # Still in the previous backend until purged from it
+        assert os.path.exists(os.path.join(directory.temp_directory, "files1/000/dataset_2.dat"))
+        object_store.purge_from(dataset, "files1")
+        assert not os.path.exists(os.path.join(directory.temp_directory, "files1/000/dataset_2.dat"))
+        assert not os.path.exists(os.path.join(directory.temp_directory, "files1/000/dataset_2_files"))
+        assert object_store.get_data(dataset) == "Hello World!"
+        extra_path = object_store.get_filename(dataset, extra_dir="dataset_2_files/sub", alt_name="extra.txt")
+        assert extra_path.startswith(os.path.join(directory.temp_directory, "files2"))
+        assert open(extra_path).read() == "extra"
+
+
+def test_distributed_store_rebalance():
+    with TestConfig(DISTRIBUTED_TEST_CONFIG) as (directory, object_store):
+        usage = {"files1": 90.0, "files2": 10.0}
+        for backend_id, backend in object_store.backends.items():
+            backend.get_store_usage_percent = lambda backend_id=backend_id: usage[backend_id]
+        datasets = []
+        for i in range(5):
+            directory.write("Hello World!", f"files1/000/dataset_{i}.dat")
+            dataset = MockDataset(i)
+            dataset.object_store_id = "files1"
+            datasets.append(dataset)
+
+        commits = []
+        sleeps = []
+
+        def commit():
+            commits.append(True)
+            # Moving datasets evens out the usage
+            usage["files1"] -= 20.0
+            usage["files2"] += 20.0
+
+        rebalancer = Rebalancer(object_store, commit=commit, max_bytes_per_second=1024, sleep=sleeps.append)
+        assert rebalancer.overfull_backends() == {"files1"}
+        assert rebalancer.run(datasets) == 2
+        assert [d.object_store_id for d in datasets] == ["files2", "files2", "files1", "files1", "files1"]
+        assert len(commits) == 2
+        assert len(sleeps) == 2
+        # Kept in the previous backend until the grace period is over
+        source_path = os.path.join(directory.temp_directory, "files1/000/dataset_0.dat")
+        assert os.path.exists(source_path)
+        assert [(object_id, source_id) for object_id, source_id, _ in rebalancer.moves] == [(0, "files1"), (1, "files1")]
+        objects = {dataset.id: dataset for dataset in datasets}
+        assert rebalancer.purge_moved(rebalancer.moves, objects, grace_period=3600) == rebalancer.moves
+        assert os.path.exists(source_path)
+        # ... and no unfinished job uses it
+        assert rebalancer.purge_moved(rebalancer.moves, objects, grace_period=0, busy={1}) == rebalancer.moves[1:]
+        assert not os.path.exists(source_path)
+        assert os.path.exists(os.path.join(directory.temp_directory, "files1/000/dataset_1.dat"))
+        assert rebalancer.purged == 1
+
+
+def test_disk_store_batch_methods():
+    with TestConfig(DISK_TEST_CONFIG) as (directory, object_store):
+        directory.write("Hello World!", "files1/000/dataset_1.dat")
+        directory.write("", "files1/000/dataset_3.dat")
+        datasets = [MockDataset(1), MockDataset(2), MockDataset(3)]
+        assert object_store.exists_many(datasets) == [True, False, True]
+        assert object_store.size_many(datasets) == [12, 0, 0]
+        filenames = object_store.get_filenames_many(datasets)
+        assert filenames[0] == os.path.join(directory.temp_directory, "files1/000/dataset_1.dat")
+        assert filenames[1] is None
+        assert object_store.exists_many([]) == []
+
+
+def test_nested_store_batch_methods():
+    for config_str in [HIERARCHICAL_TEST_CONFIG, DISTRIBUTED_TEST_CONFIG]:
+        with TestConfig(config_str) as (directory, object_store):
+            directory.write("Hello World!", "files1/000/dataset_1.dat")
+            directory.write("Hello!", "files2/000/dataset_2.dat")
+            datasets = [MockDataset(1), MockDataset(2), MockDataset(3)]
+            batches = []
+            for backend in object_store.backends.values():
+                backend.exists_many = _recording_batches(backend.exists_many, batches)
+            assert object_store.exists_many(datasets) == [True, True, False]
+            # Backends asked at once about the datasets not found in the previous ones
+            assert batches[:2] == [3, 2]
+            assert object_store.size_many(datasets) == [12, 6, 0]
+            filenames = object_store.get_filenames_many(datasets)
+            assert "files2" in filenames[1]
+            assert filenames[2] is None
+            if object_store.store_type == "distributed":
+                assert [d.object_store_id for d in datasets][:2] == ["files1", "files2"]
+
+
+DEDUP_TEST_CONFIG = """<?xml version="1.0"?>
+<object_store type="dedup">
+    <files_dir path="${temp_directory}/files1"/>
+    <extra_dir type="temp" path="${temp_directory}/tmp1"/>
+    <extra_dir type="job_work" path="${temp_directory}/job_working_directory1"/>
+</object_store>
+"""
+
+
+def test_dedup_store():
+    with TestConfig(DEDUP_TEST_CONFIG) as (directory, object_store):
+        assert object_store.store_type == "dedup"
+        datasets = [MockDataset(1), MockDataset(2), MockDataset(3)]
+        for dataset, contents in zip(datasets, ["reference genome", "reference genome", "reads"]):
+            dataset.hashes = []
+            output_path = directory.write(contents, "job_working_directory1/example_output")
+            object_store.update_from_file(dataset, file_name=output_path, create=True)
+        path1, path2, path3 = (object_store.get_filename(dataset) for dataset in datasets)
+        assert os.path.samefile(path1, path2)
+        assert not os.path.samefile(path1, path3)
+        assert object_store.get_data(datasets[1]) == "reference genome"
+        assert datasets[0].hashes[0].hash_function == "SHA-256"
+        assert datasets[0].hashes[0].hash_value == datasets[1].hashes[0].hash_value
+        stats = object_store.get_dedup_stats()
+        assert stats["blobs"] == 2
+        assert stats["references"] == 3
+        assert stats["physical_size"] == len("reference genome") + len("reads")
+        assert stats["logical_size"] == 2 * len("reference genome") + len("reads")
+
+        # Updating a dataset does not modify the blob shared with others
+        output_path = directory.write("other reads", "job_working_directory1/example_output")
+        object_store.update_from_file(datasets[1], file_name=output_path)
+        assert object_store.get_data(datasets[0]) == "reference genome"
+        assert object_store.get_data(datasets[1]) == "other reads"
+        assert len(datasets[1].hashes) == 1
+        assert object_store.get_dedup_stats()["blobs"] == 3
+
+        # Blobs are removed with the last dataset linking to them
+        assert object_store.delete(datasets[0])
+        assert object_store.get_dedup_stats()["blobs"] == 2
+        assert object_store.delete(datasets[2])
+        assert object_store.get_dedup_stats()["blobs"] == 1
+        assert object_store.get_data(datasets[1]) == "other reads"
+        os.remove(object_store.get_filename(datasets[1]))
+        assert object_store.collect_garbage() == (1, len("other reads"))
+        assert object_store.get_dedup_stats()["blobs"] == 0
+
+
+def _recording_batches(exists_many, batches):
+
+    def recording_exists_many(objs, **kwargs):
+        batches.append(len(objs))
+        return exists_many(objs, **kwargs)
+
+    return recording_exists_many
+
+
+def _counting(exists, probes, key):
+
+    def counting_exists(obj, **kwargs):
+        probes.append(key)
+        return exists(obj, **kwargs)
+
+    return counting_exists
+
+
 # Unit testing the cloud and advanced infrastructure object stores is difficult, but
 # we can at least stub out initializing and test the configuration of these things from
 # XML and dicts.
@@ -468,7 +681,7 @@ def test_config_parse_pithos():
 S3_TEST_CONFIG = """<object_store type="s3">
      <auth access_key="access_moo" secret_key="secret_cow" />
      <bucket name="unique_bucket_name_all_lowercase" use_reduced_redundancy="False" />
-     <cache path="database/object_store_cache" size="1000" />
+     <cache path="database/object_store_cache" size="1000" reconcile_interval="0" />
      <extra_dir type="job_work" path="database/job_working_directory_s3"/>
      <extra_dir type="temp" path="database/tmp_s3"/>
 </object_store>
@@ -488,6 +701,7 @@ bucket:
 cache:
   path: database/object_store_cache
   size: 1000
+  reconcile_interval: 0
 
 extra_dirs:
 - type: job_work
@@ -509,11 +723,13 @@ def test_config_parse_s3():
             assert object_store.host is None
             assert object_store.port == 6000
             assert object_store.multipart is True
+            assert object_store.transfer_concurrency == 4
             assert object_store.is_secure is True
             assert object_store.conn_path == "/"
 
             assert object_store.cache_size == 1000
             assert object_store.staging_path == "database/object_store_cache"
+            assert object_store.reconcile_interval == 0
             assert object_store.extra_dirs["job_work"] == "database/job_working_directory_s3"
             assert object_store.extra_dirs["temp"] == "database/tmp_s3"
 
@@ -540,6 +756,7 @@ def test_config_parse_s3():
 
             _assert_key_has_value(cache_dict, "size", 1000)
             _assert_key_has_value(cache_dict, "path", "database/object_store_cache")
+            _assert_key_has_value(cache_dict, "reconcile_interval", 0)
 
             extra_dirs = as_dict["extra_dirs"]
             assert len(extra_dirs) == 2
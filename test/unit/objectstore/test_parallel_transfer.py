@@ -0,0 +1,48 @@
+import os
+import threading
+
+import pytest
+
+from galaxy.objectstore.parallel_transfer import (
+    MB,
+    parallel_download,
+    part_size_for,
+)
+
+
+def test_part_size_for():
+    assert part_size_for(100 * MB, 4, 250 * MB) == 25 * MB
+    assert part_size_for(10 * MB, 4, 250 * MB) == 8 * MB
+    assert part_size_for(2000 * MB, 4, 250 * MB) == 250 * MB
+
+
+def test_parallel_download(tmp_path):
+    data = os.urandom(1000)
+    requested = []
+    lock = threading.Lock()
+
+    def fetch_range(start, end, fh):
+        with lock:
+            requested.append((start, end))
+        fh.write(data[start:end + 1])
+
+    destination = str(tmp_path / "dataset_1.dat")
+    parallel_download(fetch_range, len(data), destination, part_size=300, concurrency=3)
+    with open(destination, "rb") as f:
+        assert f.read() == data
+    assert sorted(requested) == [(0, 299), (300, 599), (600, 899), (900, 999)]
+    assert os.listdir(str(tmp_path)) == ["dataset_1.dat"]
+
+
+def test_parallel_download_failure(tmp_path):
+
+    def fetch_range(start, end, fh):
+        if start > 0:
+            raise OSError("connection reset")
+        fh.write(b"x" * (end - start + 1))
+
+    destination = str(tmp_path / "dataset_1.dat")
+    with pytest.raises(OSError):
+        parallel_download(fetch_range, 1000, destination, part_size=300, concurrency=2)
+    # No partial file is left behind to be mistaken for a cached dataset
+    assert os.listdir(str(tmp_path)) == []
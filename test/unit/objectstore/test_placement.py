@@ -0,0 +1,46 @@
+import random
+from collections import Counter
+
+import pytest
+
+from galaxy.objectstore.placement import CapacityAwarePlacement
+
+
+def _placement(weights=None, max_percent_full=None, global_max_percent_full=0):
+    weights = weights or {"files1": 1, "files2": 1}
+    return CapacityAwarePlacement(weights, max_percent_full or {}, global_max_percent_full, rng=random.Random(1))
+
+
+def test_weights_scaled_by_headroom():
+    placement = _placement(weights={"files1": 2, "files2": 1}, global_max_percent_full=80)
+    placement.update_usage("files1", 60.0)
+    placement.update_usage("files2", 20.0)
+    weights = placement.effective_weights()
+    assert weights["files1"] == pytest.approx(2 * 0.25)
+    assert weights["files2"] == pytest.approx(0.75)
+    counts = Counter(placement.choose() for _ in range(1000))
+    assert counts["files2"] > counts["files1"] > 0
+
+
+def test_full_backends_not_chosen():
+    placement = _placement(max_percent_full={"files1": 50.0})
+    placement.update_usage("files1", 55.0)
+    assert {placement.choose() for _ in range(100)} == {"files2"}
+    placement.update_usage("files2", 100.0)
+    with pytest.raises(IndexError):
+        placement.choose()
+
+
+def test_weights_scaled_by_speed():
+    placement = _placement()
+    placement.record_create("files1", 0.01)
+    placement.record_create("files2", 0.04)
+    placement.record_write("files1", 100 * 1024 ** 2, 1.0)
+    placement.record_write("files2", 100 * 1024 ** 2, 2.0)
+    weights = placement.effective_weights()
+    assert weights["files1"] == pytest.approx(1.0)
+    assert weights["files2"] == pytest.approx(0.25 * 0.5)
+    # Very slow backends still get some writes
+    placement.record_create("files2", 100.0)
+    assert placement.effective_weights()["files2"] > 0
+    assert set(placement.effective_weights(exclude={"files1"})) == {"files2"}
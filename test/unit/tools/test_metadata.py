@@ -1,16 +1,20 @@
 import os
 import subprocess
 import unittest
+from unittest import mock
 
 from galaxy import model
 from galaxy.job_execution.datasets import DatasetPath
 from galaxy.metadata import get_metadata_compute_strategy
+from galaxy.metadata.set_metadata import set_meta_in_parallel
 from galaxy.objectstore import ObjectStorePopulator
 from galaxy.util import safe_makedirs
 from .. import tools_support
 
 
 class MetadataTestCase(unittest.TestCase, tools_support.UsesApp, tools_support.UsesTools):
+    metadata_processes = 1
+    metadata_chunk_size = 0
 
     def setUp(self):
         super().setUp()
@@ -62,6 +66,57 @@ class MetadataTestCase(unittest.TestCase, tools_support.UsesApp, tools_support.U
         assert output_dataset.metadata.data_lines == 2
         assert output_dataset.metadata.sequences == 1
 
+    def test_parallel_outputs_directory(self):
+        self.app.config.metadata_strategy = "directory"
+        self._test_parallel_outputs()
+
+    def test_parallel_outputs_extended(self):
+        self.app.config.metadata_strategy = "extended"
+        self._test_parallel_outputs()
+
+    def _test_parallel_outputs(self):
+        self.metadata_processes = 2
+        # Split the large output in chunks
+        self.metadata_chunk_size = 64
+        source_file_name = os.path.join(os.getcwd(), "test/functional/tools/for_workflows/cat.xml")
+        self._init_tool_for_path(source_file_name)
+        output_datasets = {
+            "out_file1": self._create_output_dataset(extension="fasta"),
+            "out_file2": self._create_output_dataset(extension="fasta"),
+            "out_file3": self._create_output_dataset(extension="txt"),
+        }
+        sa_session = self.app.model.session
+        sa_session.flush()
+        command = self.metadata_command(output_datasets)
+        self._write_output_dataset_contents(output_datasets["out_file1"], ">seq1\nGCTGCATG\n")
+        self._write_output_dataset_contents(output_datasets["out_file2"], ">seq\nGCTGCATG\n" * 100)
+        self._write_output_dataset_contents(output_datasets["out_file3"], "line\n# comment\n" * 100)
+        self._write_job_files()
+        self.exec_metadata_command(command)
+        for name, output_dataset in output_datasets.items():
+            metadata_set_successfully = self.metadata_compute_strategy.external_metadata_set_successfully(output_dataset, name, sa_session, working_directory=self.job_working_directory)
+            assert metadata_set_successfully
+            self.metadata_compute_strategy.load_metadata(output_dataset, name, sa_session, working_directory=self.job_working_directory)
+        assert output_datasets["out_file1"].metadata.data_lines == 2
+        assert output_datasets["out_file1"].metadata.sequences == 1
+        assert output_datasets["out_file2"].metadata.data_lines == 200
+        assert output_datasets["out_file2"].metadata.sequences == 100
+        assert output_datasets["out_file3"].metadata.data_lines == 100
+
+    def test_parallel_unpicklable_metadata_set_serially(self):
+        parent_pid = os.getpid()
+
+        def set_meta(dataset, *args):
+            # Functions cannot be pickled back from the worker processes
+            dataset._metadata["value"] = "parent" if os.getpid() == parent_pid else (lambda: None)
+
+        dataset = model.HistoryDatasetAssociation(extension="txt")
+        outputs = [dict(dataset=dataset, file_dict=None, set_meta_kwds={}, datatypes_registry=None, max_metadata_value_size=0, set_peek=False)]
+        with mock.patch("galaxy.metadata.set_metadata.set_meta_with_tool_provided", set_meta):
+            results = set_meta_in_parallel(outputs, 2, 0)
+        assert results == [None]
+        assert dataset._metadata["value"] == "parent"
+
     def test_primary_dataset_output_extension_directory(self):
         self.app.config.metadata_strategy = "directory"
         self._test_primary_dataset_output_extension()
@@ -207,7 +262,9 @@ class MetadataTestCase(unittest.TestCase, tools_support.UsesApp, tools_support.U
                                                                     tool=self.tool,
                                                                     job=self.job,
                                                                     object_store_conf=self.app.object_store.to_dict(),
-                                                                    max_metadata_value_size=10000)
+                                                                    max_metadata_value_size=10000,
+                                                                    metadata_processes=self.metadata_processes,
+                                                                    metadata_chunk_size=self.metadata_chunk_size)
         return command
 
     def exec_metadata_command(self, command):
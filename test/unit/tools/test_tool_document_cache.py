@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from galaxy.tool_util.parser import get_tool_source
+from galaxy.tools.cache import (
+    SharedToolDocumentCache,
+    ToolDocumentCache,
+)
+
+TOOL_XML = """<tool id="{tool_id}" name="Test Tool" version="1.0">
+    <macros>
+        <import>macros.xml</import>
+    </macros>
+    <command>echo {tool_id}</command>
+    <expand macro="inputs"/>
+    <outputs/>
+</tool>
+"""
+
+MACROS_XML = """<macros>
+    <xml name="inputs">
+        <inputs/>
+    </xml>
+</macros>
+"""
+
+
+@pytest.fixture
+def tool_files(tmp_path):
+    tool_dir = tmp_path / "tools"
+    tool_dir.mkdir()
+    (tool_dir / "macros.xml").write_text(MACROS_XML)
+    paths = []
+    for i in range(3):
+        path = tool_dir / f"tool_{i}.xml"
+        path.write_text(TOOL_XML.format(tool_id=f"tool_{i}"))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture(params=[ToolDocumentCache, SharedToolDocumentCache])
+def cache_class(request):
+    return request.param
+
+
+def _set_all(cache, paths):
+    for path in paths:
+        cache.set(path, get_tool_source(path))
+    cache.persist()
+
+
+def test_set_and_get(tmp_path, tool_files, cache_class):
+    cache_dir = str(tmp_path / "cache")
+    cache = cache_class(cache_dir)
+    _set_all(cache, tool_files)
+    tool_document = cache.get(tool_files[0])
+    assert "echo tool_0" in tool_document["document"]
+    assert tool_document["macro_paths"] == [os.path.join(os.path.dirname(tool_files[0]), "macros.xml")]
+    cache.close()
+
+    cache = cache_class(cache_dir)
+    assert all(cache.get(path) for path in tool_files)
+    cache.delete(tool_files[0])
+    assert cache.get(tool_files[0]) is None
+    cache.persist()
+    assert cache.get(tool_files[0]) is None
+    assert cache.get(tool_files[1])
+
+
+def test_changed_macro_invalidates_documents(tmp_path, tool_files, cache_class):
+    cache_dir = str(tmp_path / "cache")
+    cache = cache_class(cache_dir)
+    _set_all(cache, tool_files)
+    cache.close()
+
+    macros_path = os.path.join(os.path.dirname(tool_files[0]), "macros.xml")
+    stat = os.stat(macros_path)
+    os.utime(macros_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    cache = cache_class(cache_dir)
+    assert not any(cache.get(path) for path in tool_files)
+
+
+def test_shared_cache_ignores_documents_without_digests(tmp_path, tool_files):
+    cache_dir = str(tmp_path / "cache")
+    cache = ToolDocumentCache(cache_dir)
+    _set_all(cache, tool_files)
+    assert all(cache.get(path) for path in tool_files)
+    cache.close()
+
+    cache = SharedToolDocumentCache(cache_dir)
+    assert not any(cache.get(path) for path in tool_files)
+
+
+def test_shared_cache_appends_segments(tmp_path, tool_files):
+    cache_dir = str(tmp_path / "cache")
+    cache = SharedToolDocumentCache(cache_dir)
+    cache.max_segments = 2
+    for path in tool_files[:2]:
+        cache.set(path, get_tool_source(path))
+        cache.persist()
+    assert len(cache._segment_paths()) == 2
+    assert len(cache._cache) == 0
+
+    # Exceeding max_segments merges the segments into the main database.
+    cache.set(tool_files[2], get_tool_source(tool_files[2]))
+    cache.persist()
+    assert cache._segment_paths() == []
+    assert len(cache._cache) == 3
+    assert all(cache.get(path) for path in tool_files)
+
+
+def test_warmup(tmp_path, tool_files, cache_class):
+    cache_dir = str(tmp_path / "cache")
+    invalid_tool = os.path.join(os.path.dirname(tool_files[0]), "invalid.xml")
+    with open(invalid_tool, "w") as f:
+        f.write("<tool")
+    cache = cache_class(cache_dir)
+    assert cache.warmup(tool_files + [invalid_tool], processes=2) == 3
+    cache.persist()
+    assert all(cache.get(path) for path in tool_files)
+    assert cache.get(invalid_tool) is None
+    assert cache.warmup(tool_files, processes=2) == 0
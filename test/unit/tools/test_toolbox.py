@@ -175,6 +175,22 @@ class ToolBoxTestCase(BaseToolBoxTestCase):
         assert toolbox.get_tool("test_tool") is not None
         assert toolbox.get_tool("not_a_test_tool") is None
 
+    def test_load_files_with_threads(self):
+        self.app.config.toolbox_load_threads = 2
+        self._init_tool()
+        self._init_tool(filename="tool2.xml", tool_id="test_tool_2")
+        self._add_config("""<toolbox><section id="tid" name="TID"><tool file="tool2.xml" /><tool file="tool.xml" /></section></toolbox>""")
+
+        toolbox = self.toolbox
+        assert toolbox.get_tool("test_tool") is not None
+        assert toolbox.get_tool("test_tool_2") is not None
+        # Tools are added to the panel in config order.
+        assert list(toolbox._tool_panel["tid"].elems.keys()) == ["tool_test_tool_2", "tool_test_tool"]
+        assert not toolbox._tool_source_futures
+        timings = toolbox.load_timings.to_dict()
+        assert set(timings[self._tool_path()]) == {"parse", "create", "panel"}
+        assert "Loaded 2 tools" in toolbox.load_timings.report()
+
     def test_record_macros(self):
         self._init_tool()
         self._init_tool(filename="tool_with_macro.xml",
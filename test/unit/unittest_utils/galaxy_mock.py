@@ -193,6 +193,9 @@ class MockAppConfig(Bunch):
         # set by MockDir
         self.root = root
         self.enable_tool_document_cache = False
+        self.tool_document_cache_mode = "default"
+        self.tool_document_cache_warmup_processes = 0
+        self.toolbox_load_threads = 0
         self.tool_cache_data_dir = os.path.join(root, 'tool_cache')
         self.delay_tool_initialization = True
         self.external_chown_script = None
@@ -31,14 +31,14 @@ extra_dirs:
 
 class Config:
 
-    def __init__(self, config_str=DISK_TEST_CONFIG, clazz=None, store_by="id"):
+    def __init__(self, config_str=DISK_TEST_CONFIG, clazz=None, store_by="id", location_cache_ttl=0):
         self.temp_directory = mkdtemp()
         if config_str.startswith("<"):
             config_file = "store.xml"
         else:
             config_file = "store.yaml"
         self.write(config_str, config_file)
-        config = MockConfig(self.temp_directory, config_file, store_by=store_by)
+        config = MockConfig(self.temp_directory, config_file, store_by=store_by, location_cache_ttl=location_cache_ttl)
         if clazz is None:
             self.object_store = objectstore.build_object_store_from_config(config)
         elif config_file == "store.xml":
@@ -65,12 +65,13 @@ class Config:
 
 class MockConfig:
 
-    def __init__(self, temp_directory, config_file, store_by="id"):
+    def __init__(self, temp_directory, config_file, store_by="id", location_cache_ttl=0):
         self.file_path = temp_directory
         self.object_store_config_file = os.path.join(temp_directory, config_file)
         self.object_store_check_old_style = False
         self.object_store_cache_path = os.path.join(temp_directory, "staging")
         self.object_store_store_by = store_by
+        self.object_store_location_cache_ttl = location_cache_ttl
         self.jobs_directory = temp_directory
         self.new_file_path = temp_directory
         self.umask = 0000
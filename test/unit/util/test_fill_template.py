@@ -1,9 +1,15 @@
 import sys
 
 import pytest
+from Cheetah.Compiler import Compiler
 from Cheetah.NameMapper import NotFound
+from Cheetah.Template import Template
 
-from galaxy.util.template import fill_template
+from galaxy.util.template import (
+    CompiledTemplateCache,
+    fill_template,
+    template_cache,
+)
 
 SIMPLE_TEMPLATE = """#for item in $a_list:
     echo $item
@@ -86,3 +92,54 @@ def test_fix_template_two_to_three():
 def test_fix_template_invalid_cheetah():
     template_str = fill_template(INVALID_CHEETAH_SYNTAX, python_template_version='2', retry=1)
     assert template_str == "1 is 1\n"
+
+
+@pytest.fixture
+def compile_calls(monkeypatch):
+    calls = []
+    compile = Template.compile
+
+    def counting_compile(*args, **kwargs):
+        calls.append(kwargs.get('source'))
+        return compile(*args, **kwargs)
+
+    monkeypatch.setattr(Template, 'compile', counting_compile)
+    template_cache.clear()
+    return calls
+
+
+def test_template_cache_hits(compile_calls):
+    template = "#for item in $a_list:\n$item $suffix\n#end for\n"
+    assert fill_template(template, {'a_list': [1], 'suffix': 'a'}) == "1 a\n"
+    assert len(compile_calls) == 1
+    assert fill_template(template, {'a_list': [2], 'suffix': 'b'}) == "2 b\n"
+    assert len(compile_calls) == 1
+
+
+def test_template_cache_futurized_hits(compile_calls):
+    assert fill_template(TWO_TO_THREE_TEMPLATE, python_template_version='2', retry=1) == 'a a 1'
+    # Compiled with the default compiler, then futurized and compiled again
+    compiled = len(compile_calls)
+    assert compiled > 1
+    assert fill_template(TWO_TO_THREE_TEMPLATE, python_template_version='2', retry=1) == 'a a 1'
+    # Both classes were reused the second time
+    assert len(compile_calls) == compiled
+    assert len(template_cache) == 2
+
+
+def test_template_cache_parse_error_fallback_hits(compile_calls):
+    assert fill_template(INVALID_CHEETAH_SYNTAX, python_template_version='2', retry=1) == "1 is 1\n"
+    # Failed to compile with the default compiler, so only the futurized fallback is cached
+    compiled = len(compile_calls)
+    assert len(template_cache) == 1
+    assert fill_template(INVALID_CHEETAH_SYNTAX, python_template_version='2', retry=1) == "1 is 1\n"
+    assert len(compile_calls) == compiled
+
+
+def test_template_cache_eviction():
+    cache = CompiledTemplateCache(maxsize=2)
+    for text in ("a", "b", "c"):
+        cache.get_class(text, Compiler)
+    assert len(cache) == 2
+    klass = cache.get_class("c", Compiler)
+    assert cache.get_class("c", Compiler) is klass